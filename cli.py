@@ -0,0 +1,453 @@
+"""
+    Headless command-line interface of 'Cardfight!! Vanguard' Card manager, meant for batch jobs, servers and cron.
+    Every command prints its result as JSON. Heavy modules are imported only by commands that need them and tkinter is never imported.
+"""
+import argparse
+import json
+import os
+import sys
+from modules.DAO import DAO
+from modules.orm import get_engine, create_schema
+
+def card_to_dict(card, dao: DAO):
+    return {'name': card.name, 'grade': card.grade, 'power': card.power, 'critical': card.critical, 'shield': card.shield,
+            'clan': card.clan_name, 'stacks': [{'id': stack.id, 'rarity': stack.rarity, 'quantity': stack.quantity} for stack in dao.get_card_stacks(card.name)]}
+
+def shield_argument(value: str):
+    return None if value in ('None', '') else value
+
+def exchange_tables(args):
+    from modules.exchange import TABLES
+    unknown = [table for table in args.tables or () if table not in TABLES]
+    if unknown:
+        raise ValueError(f"Unknown tables: {', '.join(unknown)}, known tables are {', '.join(TABLES)}")
+    return args.tables or TABLES
+
+def import_command(dao: DAO, args):
+    sources = args.paths
+    if len(sources) == 1 and os.path.isdir(sources[0]):
+        from modules.exchange import import_collection
+        # Stacks of export are added to the collection, so importing it into the database it came from doubles every copy
+        warning = None if args.replace or not dao.get_stack_count() else 'Copies were added to existing ones, use --replace to set quantities from the export instead'
+        tables = [stats.as_dict() for stats in import_collection(dao, sources[0], args.format, exchange_tables(args), replace=args.replace)]
+        return {'tables': tables, 'warning': warning} if warning else {'tables': tables}
+    if args.sync or args.dry_run:
+        if len(sources) != 1:
+            raise ValueError('--sync works with exactly one xlsx file')
+        from modules.loader import Loader
+        diff = Loader(dao).sync_cards_from_xlsx(sources[0], args.dry_run, not args.keep_missing, args.rejected)
+        if diff is None:
+            raise IOError('Database error, nothing was changed')
+        return {'dry_run': args.dry_run, **diff}
+    if len(sources) == 1 and '#' not in sources[0] and sources[0].lower().endswith('.xlsx'):
+        from modules.loader import Loader
+        imported, rejected = Loader(dao).load_cards_from_xlsx(sources[0], args.rejected)
+        return {'imported': imported, 'rejected': rejected}
+    from modules.pipeline import run_pipeline
+    report = run_pipeline(dao, [tuple(source.split('#', 1)) if '#' in source else (source, None) for source in sources], args.workers)
+    return {'imported': report.imported, 'seconds': round(report.seconds, 3),
+            'errors': [{'source': source, 'row': number, 'reason': reason} for source, number, reason in report.errors]}
+
+def export_command(dao: DAO, args):
+    from modules.exchange import export_collection
+    return {'tables': [stats.as_dict() for stats in export_collection(dao, args.directory, args.format, exchange_tables(args))]}
+
+def report_command(dao: DAO, args):
+    from modules.report import render_reports, FORMATS
+    dao.session.close()
+    return {'reports': render_reports(args.databases or [args.db], args.output, tuple(args.formats or FORMATS), args.workers)}
+
+def seed_command(dao: DAO, args):
+    from modules.loader import Loader, REFERENCE_DATA
+    if not Loader(dao).load_basic_data(args.data or REFERENCE_DATA, args.force):
+        raise IOError('Could not seed reference data')
+    return {'reference_data_version': dao.get_info('reference_data_version')}
+
+def backup_command(dao: DAO, args):
+    from modules.loader import save_backup, default_backup_path
+    backup_path = args.backup or default_backup_path(args.db)
+    dao.session.commit()
+    save_backup(args.db, backup_path)
+    return {'backup': backup_path}
+
+def restore_command(dao: DAO, args):
+    from modules.loader import load_backup, default_backup_path
+    backup_path = args.backup or default_backup_path(args.db)
+    dao.session.close()
+    dao.session.get_bind().dispose()
+    if not load_backup(args.db, backup_path):
+        raise FileNotFoundError(f'No backup at {backup_path}')
+    return {'restored': backup_path}
+
+def stats_command(dao: DAO, args):
+    if args.count_by is None and args.histogram is None and args.crosstab is None:
+        from modules.api import collection_stats
+        return collection_stats(dao)
+    from modules.analytics import CollectionAnalytics, label_texts
+    analytics = CollectionAnalytics(dao)
+    result = {'instances': analytics.total()}
+    if args.count_by is not None:
+        labels, counts = analytics.count_by(args.count_by)
+        result['count_by'] = {'column': args.count_by, 'counts': dict(zip(label_texts(args.count_by, labels), counts.tolist()))}
+    if args.histogram is not None:
+        if args.by is None:
+            edges, counts = analytics.histogram(args.histogram, args.bins)
+            counts = counts.tolist()
+        else:
+            labels, edges, counts = analytics.histogram(args.histogram, args.bins, args.by)
+            counts = dict(zip(label_texts(args.by, labels), counts.tolist()))
+        result['histogram'] = {'column': args.histogram, 'by': args.by, 'edges': edges.tolist(), 'counts': counts}
+    if args.crosstab is not None:
+        rows, columns = args.crosstab
+        row_labels, column_labels, table = analytics.crosstab(rows, columns)
+        column_texts = label_texts(columns, column_labels)
+        result['crosstab'] = {'rows': rows, 'columns': columns,
+                              'table': {row: dict(zip(column_texts, counts)) for row, counts in zip(label_texts(rows, row_labels), table.tolist())}}
+    return result
+
+def prefetch_images_command(dao: DAO, args):
+    from modules.imagestore import ImageStore
+    from modules.scrapper import Scrapper
+    store = ImageStore()
+    scrapper = Scrapper(store, dao)
+    missing = store.missing(card.name for card in dao.get_all_cards())
+    if args.limit is not None:
+        missing = missing[:args.limit]
+    downloaded, failed = [], []
+    for name in missing:
+        try:
+            found = scrapper.extract_image(name)
+        except Exception:
+            found = False
+        (downloaded if found else failed).append(name)
+    store.close()
+    return {'downloaded': downloaded, 'not_found': failed}
+
+def migrate_images_command(dao: DAO, args):
+    from modules.imagestore import ImageStore
+    store = ImageStore()
+    try:
+        return {'migrated': store.migrate_directory(args.path, args.remove)}
+    finally:
+        store.close()
+
+def compact_images_command(dao: DAO, args):
+    from modules.imagestore import ImageStore
+    store = ImageStore()
+    try:
+        before, after = store.compact()
+    finally:
+        store.close()
+    return {'size_before': before, 'size_after': after}
+
+def ingest_wiki_command(dao: DAO, args):
+    from modules.wikidump import ingest_dump
+    return ingest_dump(dao, args.path, args.replace, args.printings, args.images).as_dict()
+
+def search_command(dao: DAO, args):
+    return {'cards': [card_to_dict(card, dao) for card in dao.search_cards(args.text, args.limit)]}
+
+def similar_command(dao: DAO, args):
+    from modules.fuzzy import CardNameIndex, SIMILARITY
+    index = CardNameIndex(dao)
+    return {'similar': [{'name': name, 'similarity': round(score, 3)} for name, score in index.similar(args.name, args.limit, args.threshold or SIMILARITY)]}
+
+def duplicates_command(dao: DAO, args):
+    from modules.fuzzy import CardNameIndex, DUPLICATE_SIMILARITY
+    index = CardNameIndex(dao)
+    threshold = args.threshold or DUPLICATE_SIMILARITY
+    if args.file is None:
+        return {'clusters': [cluster.as_dict() for cluster in index.duplicate_clusters(threshold)]}
+    from modules.loader import read_xlsx_rows, read_csv_rows, normalize_rows
+    rows = read_csv_rows(args.file) if args.file.lower().endswith('.csv') else read_xlsx_rows(args.file)
+    names = [name for name in dict.fromkeys(card['name'] for card in normalize_rows(rows)) if name not in index.ids]
+    return {'names': [{'name': name, 'similar': [{'name': other, 'similarity': round(score, 3)} for other, score in similar]}
+                      for name in names if (similar := index.similar(name, threshold=threshold))]}
+
+def sets_command(dao: DAO, args):
+    from modules.sets import set_completion, load_set_list, SHEET_NAME
+    result = {}
+    if args.load is not None:
+        loaded, rejected = load_set_list(dao, args.load, args.sheet or SHEET_NAME, args.rejected)
+        result['loaded'] = {'printings': loaded, 'rejected': rejected}
+    if args.set_code is None:
+        return {**result, 'sets': [entry.as_dict() for entry in set_completion(dao)]}
+    set_code = args.set_code.upper()
+    entry = next((entry for entry in set_completion(dao) if entry.set_code == set_code), None)
+    if entry is None:
+        raise LookupError(f'No printings of set {set_code}, load its set list first')
+    return {**result, **entry.as_dict(), 'missing': [{'number': printing.number, 'name': printing.card_name, 'rarity': printing.rarity}
+                                                     for printing in dao.get_set_printings(set_code, missing=True)]}
+
+def add_command(dao: DAO, args):
+    if not dao.add_card(args.name, args.grade, args.power, args.critical, args.shield, args.clan, args.rarity):
+        raise IOError('Cannot add card')
+    return {'card': card_to_dict(dao.get_card(args.name), dao)}
+
+def edit_command(dao: DAO, args):
+    stack = dao.get_card_stack(args.id)
+    if stack is None:
+        raise LookupError(f'No card stack with id {args.id}')
+    card = dao.get_card(stack.card_name)
+    name = args.name if args.name is not None else card.name
+    edited = dao.update_card(args.id, name,
+                             args.grade if args.grade is not None else card.grade,
+                             args.power if args.power is not None else card.power,
+                             args.critical if args.critical is not None else card.critical,
+                             args.shield if args.shield is not ... else card.shield,
+                             args.clan if args.clan is not None else card.clan_name,
+                             args.rarity if args.rarity is not None else stack.rarity)
+    if not edited:
+        raise IOError('Cannot edit card')
+    return {'card': card_to_dict(dao.get_card(name), dao)}
+
+def delete_command(dao: DAO, args):
+    if dao.get_card_stack(args.id) is None:
+        raise LookupError(f'No card stack with id {args.id}')
+    if not dao.delete_card(args.id):
+        raise IOError('Cannot delete card')
+    return {'deleted': args.id}
+
+def decks_command(dao: DAO, args):
+    from modules.decks import DeckValidator
+    return {'decks': [report.as_dict() for report in DeckValidator(dao).validate_all()]}
+
+def collections_command(dao: DAO, args):
+    from modules.multicollection import MultiCollectionDAO
+    dao.session.close()
+    multi_dao = MultiCollectionDAO(args.db, args.paths)
+    aliases = list(multi_dao.collections)
+    totals = [{'name': alias, 'path': multi_dao.collections[alias], 'cards': cards, 'copies': copies} for alias, cards, copies in multi_dao.get_collection_totals()]
+    if args.missing_in is not None:
+        return {'collections': totals, 'missing_in': args.missing_in,
+                'cards': [{'name': name, 'copies': copies} for name, copies in multi_dao.get_missing_cards(args.missing_in, limit=args.limit)]}
+    return {'collections': totals,
+            'cards': [{'name': name, 'total': total, 'copies': dict(zip(aliases, copies))} for name, total, *copies in multi_dao.get_combined_counts(args.limit)]}
+
+def export_changes_command(dao: DAO, args):
+    from modules.journal import export_changes
+    return export_changes(dao, args.path, args.peer, args.since).as_dict()
+
+def apply_changes_command(dao: DAO, args):
+    from modules.journal import apply_changes
+    return apply_changes(dao, args.path).as_dict()
+
+def replica_command(dao: DAO, args):
+    replica_id = dao.new_replica_id() if args.new else dao.get_replica_id()
+    dao.session.commit()
+    return {'replica': replica_id, 'last_seq': dao.get_last_seq(), 'peers': [state._asdict() for state in dao.get_sync_states()]}
+
+def vacuum_command(dao: DAO, args):
+    before = os.path.getsize(args.db)
+    if not dao.vacuum():
+        raise IOError('VACUUM failed')
+    return {'size_before': before, 'size_after': os.path.getsize(args.db)}
+
+def analyze_command(dao: DAO, args):
+    if not dao.analyze():
+        raise IOError('ANALYZE failed')
+    return {'analyzed': args.db}
+
+def maintenance_command(dao: DAO, args):
+    from modules.maintenance import Maintenance
+    maintenance = Maintenance(dao)
+    if args.status:
+        return maintenance.status().as_dict()
+    before = os.path.getsize(args.db)
+    results = maintenance.run(args.full)
+    return {'tasks': dict(results), 'size_before': before, 'size_after': os.path.getsize(args.db), 'status': maintenance.status().as_dict()}
+
+def serve_command(dao: DAO, args):
+    from modules.api import ApiServer
+    dao.session.close()
+    server = ApiServer((args.host, args.port), args.db, args.readers, args.verbose)
+    print(f'Serving {args.db} on http://{server.server_address[0]}:{server.server_address[1]}', file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return {'served': args.db}
+
+def create_parser():
+    parser = argparse.ArgumentParser(description="'Cardfight!! Vanguard' Card manager command-line interface.")
+    parser.add_argument('--db', default='vanguard.db', help='path to the collection database')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    command = subparsers.add_parser('import', help='import xlsx/csv files or directory created by export')
+    command.add_argument('paths', nargs='+', help="xlsx file, csv file, 'file.xlsx#Sheet' or export directory")
+    command.add_argument('--format', default='csv', choices=('csv', 'jsonl', 'parquet'), help='format of files in export directory')
+    command.add_argument('--replace', action='store_true', help='set quantities of copies from export directory instead of adding them to existing ones')
+    command.add_argument('-t', '--table', action='append', dest='tables', help='import only given table of export directory, can be repeated')
+    command.add_argument('--sync', action='store_true', help='apply only difference between xlsx file and collection')
+    command.add_argument('--dry-run', action='store_true', help='only report the difference')
+    command.add_argument('--keep-missing', action='store_true', help='do not delete cards missing in the file when syncing')
+    command.add_argument('--rejected', help='path of csv report with rejected rows')
+    command.add_argument('-j', '--workers', type=int, help='number of processes importing many files')
+    command.set_defaults(handler=import_command)
+
+    command = subparsers.add_parser('export', help='export all tables into directory')
+    command.add_argument('directory')
+    command.add_argument('--format', default='csv', choices=('csv', 'jsonl', 'parquet'))
+    command.add_argument('-t', '--table', action='append', dest='tables', help='export only given table, can be repeated')
+    command.set_defaults(handler=export_command)
+
+    command = subparsers.add_parser('report', help='render statistics of collection databases into images and data.json without display')
+    command.add_argument('databases', nargs='*', help='collection databases, by default --db; reports are rendered in parallel')
+    command.add_argument('-o', '--output', default='reports', help='directory into which report of every database is written')
+    command.add_argument('-f', '--format', action='append', choices=('png', 'svg'), dest='formats', help='image format, can be repeated, by default png and svg')
+    command.add_argument('-j', '--workers', type=int, help='number of processes, by default number of processors')
+    command.set_defaults(handler=report_command)
+
+    command = subparsers.add_parser('seed', help='add nations, imaginary gifts and clans from reference data file, new databases are seeded automatically')
+    command.add_argument('--data', help='JSON file with reference data, by default data/reference.json')
+    command.add_argument('--force', action='store_true', help='apply data even if the same version was already applied')
+    command.set_defaults(handler=seed_command)
+
+    command = subparsers.add_parser('backup', help='copy database into backup file')
+    command.add_argument('--backup', help="backup file, by default database name with '_bk' suffix")
+    command.set_defaults(handler=backup_command)
+
+    command = subparsers.add_parser('restore', help='replace database with backup file')
+    command.add_argument('--backup', help="backup file, by default database name with '_bk' suffix")
+    command.set_defaults(handler=restore_command)
+
+    command = subparsers.add_parser('stats', help='print statistics of the collection, or distributions of copies computed in memory by analytics module')
+    columns = ('grade', 'power', 'critical', 'shield', 'clan', 'nation', 'imaginary_gift', 'rarity')
+    command.add_argument('--count-by', choices=columns, help='count copies by values of column')
+    command.add_argument('--histogram', choices=columns[:4], help='histogram of copies by numeric column')
+    command.add_argument('--bins', type=int, default=10, help='number of bins of histogram')
+    command.add_argument('--by', choices=columns, help='split histogram by values of column, ex. power distribution per grade')
+    command.add_argument('--crosstab', nargs=2, choices=columns, metavar=('ROWS', 'COLUMNS'), help='count copies for every pair of values of two columns, ex. rarity spread per nation')
+    command.set_defaults(handler=stats_command)
+
+    command = subparsers.add_parser('prefetch-images', help='download images of cards which are not in image store')
+    command.add_argument('--limit', type=int)
+    command.set_defaults(handler=prefetch_images_command)
+
+    command = subparsers.add_parser('migrate-images', help='move loose images from older versions into image store')
+    command.add_argument('path', nargs='?', default='images', help='directory with loose images')
+    command.add_argument('--remove', action='store_true', help='delete loose files after migration')
+    command.set_defaults(handler=migrate_images_command)
+
+    command = subparsers.add_parser('compact-images', help='drop images no card refers to from packs of image store')
+    command.set_defaults(handler=compact_images_command)
+
+    command = subparsers.add_parser('ingest-wiki', help='read offline dump of the wiki, so images are found without fetching pages')
+    command.add_argument('path', help='MediaWiki XML export, optionally compressed with bz2 or gzip')
+    command.add_argument('--replace', action='store_true', help='delete pages read from earlier dumps')
+    command.add_argument('--printings', action='store_true', help='add card numbers of all card pages as printings of their sets')
+    command.add_argument('--images', help='directory with local copy of images of the wiki, used instead of downloading them')
+    command.set_defaults(handler=ingest_wiki_command)
+
+    command = subparsers.add_parser('search', help='find cards by part of name')
+    command.add_argument('text')
+    command.add_argument('--limit', type=int)
+    command.set_defaults(handler=search_command)
+
+    command = subparsers.add_parser('similar', help='find cards with name similar to given one, ex. differing by a typo or punctuation')
+    command.add_argument('name')
+    command.add_argument('--limit', type=int, default=5)
+    command.add_argument('--threshold', type=float, help='lowest similarity of names from 0 to 1, by default 0.5')
+    command.set_defaults(handler=similar_command)
+
+    command = subparsers.add_parser('duplicates', help='report groups of cards whose names are probably the same card spelled differently')
+    command.add_argument('--file', help='instead check names of xlsx or csv file against the collection before importing it')
+    command.add_argument('--threshold', type=float, help='lowest similarity of names from 0 to 1, by default 0.7')
+    command.set_defaults(handler=duplicates_command)
+
+    command = subparsers.add_parser('sets', help='print completion of all sets, or of one set with its missing cards')
+    command.add_argument('set_code', nargs='?', help='set whose missing cards are listed, ex. V-BT05')
+    command.add_argument('--load', help="xlsx or csv set list with 'Numer', 'Nazwa' and optional 'Rarity' columns, loaded first")
+    command.add_argument('--sheet', help='sheet of xlsx set list')
+    command.add_argument('--rejected', help='path of csv report with rejected rows of set list')
+    command.set_defaults(handler=sets_command)
+
+    command = subparsers.add_parser('add', help='add copy of a card')
+    command.add_argument('name')
+    command.add_argument('--grade', type=int, required=True)
+    command.add_argument('--power', type=int, required=True)
+    command.add_argument('--critical', type=int, default=1)
+    command.add_argument('--shield', type=shield_argument, default=None, help="number, 'Sentinel' or 'None'")
+    command.add_argument('--clan', required=True)
+    command.add_argument('--rarity', default='C')
+    command.set_defaults(handler=add_command)
+
+    command = subparsers.add_parser('edit', help='edit one copy of a card, omitted values are kept')
+    command.add_argument('id', type=int, help='id of card stack, one copy from it is edited')
+    command.add_argument('--name')
+    command.add_argument('--grade', type=int)
+    command.add_argument('--power', type=int)
+    command.add_argument('--critical', type=int)
+    command.add_argument('--shield', type=shield_argument, default=..., help="number, 'Sentinel' or 'None'")
+    command.add_argument('--clan')
+    command.add_argument('--rarity')
+    command.set_defaults(handler=edit_command)
+
+    command = subparsers.add_parser('delete', help='delete one copy of a card')
+    command.add_argument('id', type=int, help='id of card stack, one copy from it is deleted')
+    command.set_defaults(handler=delete_command)
+
+    command = subparsers.add_parser('decks', help='check all decks against deck building rules and the collection')
+    command.set_defaults(handler=decks_command)
+
+    command = subparsers.add_parser('collections', help='combine the collection with other collection databases')
+    command.add_argument('paths', nargs='+', help='other collection databases, named after their files')
+    command.add_argument('--missing-in', help="list only cards missing in given collection ('main' for --db) but present in others")
+    command.add_argument('--limit', type=int)
+    command.set_defaults(handler=collections_command)
+
+    command = subparsers.add_parser('export-changes', help='write changes made after last export for a peer into delta file')
+    command.add_argument('path')
+    command.add_argument('--peer', help='replica id of receiving database, see replica command')
+    command.add_argument('--since', type=int, help='export changes after this sequence number instead of last export for the peer')
+    command.set_defaults(handler=export_changes_command)
+
+    command = subparsers.add_parser('apply-changes', help='apply delta file exported from another copy of the collection')
+    command.add_argument('path')
+    command.set_defaults(handler=apply_changes_command)
+
+    command = subparsers.add_parser('replica', help='print replica id of the database and progress of synchronization with peers')
+    command.add_argument('--new', action='store_true', help='give database new replica id, needed after copying the database file')
+    command.set_defaults(handler=replica_command)
+
+    command = subparsers.add_parser('serve', help='serve the collection as local HTTP/JSON API')
+    command.add_argument('--host', default='127.0.0.1')
+    command.add_argument('--port', type=int, default=8080)
+    command.add_argument('--readers', type=int, default=4, help='number of concurrent read sessions')
+    command.add_argument('-v', '--verbose', action='store_true', help='log every request')
+    command.set_defaults(handler=serve_command)
+
+    command = subparsers.add_parser('vacuum', help='rebuild database file')
+    command.set_defaults(handler=vacuum_command)
+
+    command = subparsers.add_parser('analyze', help='refresh query planner statistics')
+    command.set_defaults(handler=analyze_command)
+
+    command = subparsers.add_parser('maintenance', help='run due maintenance tasks: ANALYZE, incremental vacuum and integrity check')
+    command.add_argument('--full', action='store_true', help='run all tasks completely, also switching database to incremental auto_vacuum')
+    command.add_argument('--status', action='store_true', help='only print state of the database and due tasks')
+    command.set_defaults(handler=maintenance_command)
+    return parser
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    new_database = not os.path.exists(args.db)
+    db_engine = get_engine(args.db)
+    create_schema(db_engine)
+    dao = DAO(db_engine)
+    try:
+        if new_database and args.handler is not seed_command:
+            seed_command(dao, argparse.Namespace(data=None, force=False))
+        result = args.handler(dao, args)
+        code = 0
+    except Exception as error:
+        result = {'error': f'{type(error).__name__}: {error}'}
+        code = 1
+    json.dump(result, sys.stdout, ensure_ascii=False, indent=2, default=str)
+    print()
+    return code
+
+if __name__ == '__main__':
+    sys.exit(main())
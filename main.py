@@ -1,9 +1,13 @@
 from modules.DAO import DAO
-from modules.loader import load_backup
+from modules.loader import load_backup, Loader
 import tkinter as tk
 from modules.gui import CardImageLabel, IMG_SIZE, OperationFrame, CenterFrame
-from modules.orm import engine, Base, Card
-from modules.handler import Handler
+from modules.orm import create_schema, get_engine
+from modules.models import CardRecord
+from modules.events import EventBus
+from modules.plots import PlotFrame
+from modules.profiler import TkProfiler, print_summary
+from modules.maintenance import Maintenance, MaintenanceScheduler
 import os
 
 class Application():
@@ -11,31 +15,40 @@ class Application():
     Main class of whole program. It is defacto the 'Cardfight!! Vanguard' Card manager itself
     
     Attributes:
+        db_path (str): path to the opened collection database.
         dao (DAO): Database Access Object.
         window (tk.Tk): tkinter window which houses all other GUI components.
-        handler (Handler): handler object holding references to main three components of GUI of Application.
-        current_card (Card): currently selected card.
+        events (EventBus): bus through which DAO and GUI components notify each other about changes and selections.
+        current_card (CardRecord): currently selected card, None when collection has no cards yet.
         current_clan (Clan): currently selected clan or all clans.
         card_image_label (CardImageLabel): custom GUI component used to display image of current card.
         right_frame (OperationFrame): custom GUI component used to allow user to add, edit, delte and show plots related to current card or all cards. Also allows for performing a backup.
         center_frame (CenterFrame): custom GUI component used to display all informations about current card and allows for selecing new one with filtering options.
+        plot_frame (PlotFrame): custom GUI component used to display distributions of cards among grades or clans.
+        profiler (TkProfiler): profiler of the session, or None when profiling is not enabled.
+        maintenance_scheduler (MaintenanceScheduler): scheduler running database maintenance while user is idle.
     """
-    def __init__(self):
-        self.dao: DAO = DAO()
+    def __init__(self, db_path: str = 'vanguard.db', profiler: TkProfiler = None):
+        self.db_path: str = db_path
+        self.events: EventBus = EventBus()
+        self.dao: DAO = DAO(get_engine(db_path), events=self.events)
         self.window: tk.Tk = tk.Tk()
-        self.handler: Handler = Handler()
-        self.window.title('Cardfight!! Vanguard Card Manager')
+        self.profiler: TkProfiler = profiler
+        if profiler is not None:
+            profiler.start(self.window, self.dao)
+        self.window.title(f'Cardfight!! Vanguard Card Manager - {os.path.basename(db_path)}')
         self.window.resizable(False, False)
-        self.current_card: Card = self.dao.get_all_cards()[0]
+        cards = self.dao.get_all_cards()
+        self.current_card: CardRecord = cards[0] if cards else None
         self.current_clan: str = 'All Clans'
         
         image_height: int = IMG_SIZE['height'] #px
         
         #Left side content (Image)
-        self.card_image_label = CardImageLabel(self.window, f"images/{self.current_card.name}.jpg")
+        self.card_image_label = CardImageLabel(self.window, self.current_card.name if self.current_card else None, self.events, self.dao)
         
         #Right side content (Options)
-        self.right_frame = OperationFrame(self.window, width=300, height=image_height, dao=self.dao, current_card=self.current_card, handler=self.handler)
+        self.right_frame = OperationFrame(self.window, width=300, height=image_height, dao=self.dao, current_card=self.current_card, events=self.events)
         
         #Main content
         self.center_frame = CenterFrame(self.window, 
@@ -44,24 +57,45 @@ class Application():
                                         dao=self.dao, 
                                         current_card=self.current_card, 
                                         current_clan=self.current_clan, 
-                                        handler=self.handler)
+                                        events=self.events)
         
-        self.handler.configure(self.card_image_label, self.center_frame, self.right_frame)
+        #Plots
+        self.plot_frame = PlotFrame(self.window, width=450, height=image_height, dao=self.dao, events=self.events)
         
         self.card_image_label.pack(side=tk.LEFT)
         self.center_frame.pack(side=tk.LEFT, padx=10)
         self.right_frame.pack(side=tk.LEFT, padx=10)   
+        self.plot_frame.pack(side=tk.LEFT)
         
+        self.maintenance_scheduler = MaintenanceScheduler(Maintenance(self.dao), self.window)
+        self.maintenance_scheduler.start()
         self.window.mainloop()
+        self.maintenance_scheduler.stop()
+        if profiler is not None:
+            print_summary(profiler.stop())
 
 if __name__ == "__main__":
     """
         Starting point of program. 
+        Collection database can be given as argument, by default 'vanguard.db' is opened.
         If no database file is found it will attempt to load the backup file.
-        Then it creates all metadata for db connection and starts the program by creating the Application object
+        Then it creates all metadata for db connection, seeds reference data if its version changed and starts the program by creating the Application object
     """
-    if not os.path.exists('vanguard.db'):
-        load_backup()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="'Cardfight!! Vanguard' Card manager.")
+    parser.add_argument('db', nargs='?', default='vanguard.db', help='path to the collection database')
+    parser.add_argument('--profile', nargs='?', const='profiles', metavar='DIRECTORY',
+                        help='measure every interaction, event loop lag and memory, report is written into directory (profiles by default) on exit')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.db):
+        load_backup(args.db)
         
-    Base.metadata.create_all(engine)
-    Application()
\ No newline at end of file
+    db_engine = get_engine(args.db)
+    create_schema(db_engine)
+    seed_dao = DAO(db_engine)
+    if not Loader(seed_dao).load_basic_data():
+        raise IOError('Could not seed reference data')
+    seed_dao.session.close()
+    Application(args.db, TkProfiler(args.profile) if args.profile else None)
\ No newline at end of file
@@ -1,57 +1,290 @@
 """
     This module is responsible for providing implementation of Database Access Object (DAO).
 """
-from modules.orm import Card, Clan, ImaginaryGift, engine, CardInstance, Nation
+from modules.orm import Card, Clan, ImaginaryGift, engine, CardStack, CardCopy, Nation, DatabaseInfo, Deck, DeckEntry, JournalEntry, SyncState, Printing, WikiPage
+from modules.events import (EventBus, CardData, CardAdded, CardUpdated, CardDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted,
+                            ClanAdded, CollectionReloaded, DeckAdded, DeckEntryChanged, DeckDeleted)
+from modules.models import CardRecord, StackRecord, CopyRecord, ClanRecord, DeckRecord, DeckEntryRecord, JournalRecord, SyncStateRecord, PrintingRecord, SetCompletionRecord, WikiPageRecord
+from modules.filters import CardFilter
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy import update, delete, select, not_, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy import update, delete, select, insert, not_, or_, case, func, text
+from itertools import islice
+from collections import Counter
+from datetime import datetime, timezone
+import uuid
+import sqlite3
 from sqlalchemy.exc import SQLAlchemyError
 
+CARD_COLUMNS = (Card.name, Card.grade, Card.power, Card.critical, Card.shield, Card.clan_name, Clan.nation_name, Clan.imaginary_gift_name)
+STACK_COLUMNS = (CardStack.id, CardStack.card_name, CardStack.rarity, CardStack.quantity)
+COPY_COLUMNS = (CardCopy.id, CardCopy.card_name, CardCopy.rarity, CardCopy.note)
+CLAN_COLUMNS = (Clan.name, Clan.imaginary_gift_name, Clan.nation_name)
+DECK_COLUMNS = (Deck.id, Deck.name, Deck.clan_name, Deck.nation_name)
+DECK_ENTRY_COLUMNS = (DeckEntry.deck_id, DeckEntry.card_name, DeckEntry.quantity)
+JOURNAL_COLUMNS = (JournalEntry.seq, JournalEntry.origin, JournalEntry.origin_seq, JournalEntry.created_at, JournalEntry.operations)
+SYNC_STATE_COLUMNS = (SyncState.peer, SyncState.sent_seq, SyncState.received_seq)
+PRINTING_COLUMNS = (Printing.number, Printing.set_code, Printing.card_name, Printing.rarity, Printing.owned)
+WIKI_PAGE_COLUMNS = (WikiPage.title, WikiPage.name_key, WikiPage.redirect, WikiPage.image, WikiPage.numbers)
+
 class DAO:
     """
-    Class representing Database Access Object.
+    Class representing Database Access Object. Read paths return immutable records from models module instead of ORM objects.
+    Every change of cards, copies, printings and clans made by add_card, add_cards, sync_cards, update_card, delete_card, delete_card_copy, insert_rows, add_stacks, add_printings,
+    add_clan and seed_reference_data is appended to change journal in the same transaction.
     
     Attributes:
         session (Session): session object which allows for interacting with database.
+        events (EventBus): bus on which events describing every committed change are published.
         
     Methods:
-        add_card (bool) -- adds card to the database. If there exists already one copy of the card just its instance will be added.\n
-        get_all_cards (List[Card]) -- returns list of all cards in database (not counting copies).\n
-        get_grade_cards (List[Card]) -- returns list of all cards in database (not counting copies) for specific grade. If grade is 'All' it will return list of all cards in database.\n 
-        get_clan_cards (List[Card]) -- returns list of all cards in database (not counting copies) for specific clan. If clan is'All Clans' it will return list of all cards in database.\n
-        get_clan_grade_cards (List[Card]) -- returns list of all cards in database (not counting copies) for specific clan and grade. Follows the same constraints as two above methods.\n
+        add_card (bool) -- adds card to the database. If there exists already one copy of the card just its copy will be added to the stack of its rarity.\n
+        add_cards (bool) -- adds batch of cards to the database in one transaction, following the same rules as add_card. Cards with card number are also added as printings of their set.\n
+        sync_cards (dict) -- makes collection equal to given cards by applying only the difference in one transaction. Returns the difference, optionally without applying it.\n
+        get_all_cards (List[CardRecord]) -- returns list of all cards in database (not counting copies).\n
+        get_card_names (List[str]) -- returns names of all cards ordered by name.\n
+        get_grade_cards (List[CardRecord]) -- returns list of all cards in database (not counting copies) for specific grade. If grade is 'All' it will return list of all cards in database.\n 
+        get_clan_cards (List[CardRecord]) -- returns list of all cards in database (not counting copies) for specific clan. If clan is'All Clans' it will return list of all cards in database.\n
+        get_clan_grade_cards (List[CardRecord]) -- returns list of all cards in database (not counting copies) for specific clan and grade. Follows the same constraints as two above methods.\n
+        search_cards (List[CardRecord]) -- returns list of cards whose name contains given text, ignoring case.\n
+        get_cards_page (Tuple[int, List[CardRecord]]) -- returns number of all cards matching clan, grade and part of name, and one page of them.\n
+        find_cards (List[CardRecord]) -- returns cards matching given filter in its order, optionally one page of them.\n
+        count_cards (int) -- returns number of cards matching given filter.\n
+        get_card (CardRecord) -- returns card with specified name or None.\n
+        get_card_stack (StackRecord) -- returns stack of copies with specified id or None.\n
         get_card_rarities (str) -- resturns string representing all distinct rarities for all copies of a card with specified name.\n
-        get_card_instances (List[CardInstance]) -- returns list of all instances of a card with specified name.\n
-        get_card_count (int) -- returns number of instances of a card with specified name.\n
+        get_card_stacks (List[StackRecord]) -- returns list of stacks of all rarities of a card with specified name.\n
+        get_card_count (int) -- returns number of copies of a card with specified name.\n
+        get_card_counts (List[Tuple[str, int]]) -- returns list of tuples containing card name and number of its copies for every card.\n
+        get_stack_count (int) -- returns number of stacks of copies in collection.\n
         get_card_grades (List[Tuple[int]]) -- returns list of tuples containing grades for all cards in database.\n
         get_cards_grades_count (List[Tuple[int]]) -- returns list of tuples containing grades and number of cards for specific grade.\n
         get_cards_clan_count (List[Tuple[int]]) -- returns list of tuples containing clans and number of cards for specific clan.\n
-        update_card (bool) -- updates card object, if after update no card with same name exists new card is created.\n
-        delete_card (bool) -- deletes specific instance of a card, returns True if there was no Exception.\n
-        __delete_cards__ (bool) -- deletes all cards that don't have any instances, returns True if there was no Exception.\n
+        get_cards_clan_rarity_count (List[Tuple[str, str, int]]) -- returns list of tuples containing clan, rarity and number of cards for that pair.\n
+        get_cards_power_count (List[Tuple[int]]) -- returns list of tuples containing power and number of cards with that power.\n
+        get_cards_shield_count (List[Tuple[int]]) -- returns list of tuples containing shield and number of cards with that shield.\n
+        get_cards_nation_count (List[Tuple[str, int]]) -- returns list of tuples containing nations and number of cards for specific nation.\n
+        get_cards_gift_count (List[Tuple[str, int]]) -- returns list of tuples containing imaginary gifts and number of cards for specific gift.\n
+        get_card_attributes (List[CardRecord]) -- returns list of all cards with nation and imaginary gift ordered by name.\n
+        get_card_rarity_count (List[Tuple[str, str, int]]) -- returns list of tuples containing card name, rarity and number of copies for that pair.\n
+        stream_rows (Iterator[List[Tuple]]) -- yields all rows of a table in chunks, without loading whole table into memory.\n
+        insert_rows (bool) -- inserts batch of rows into a table in one transaction, rows with already existing primary key are skipped.\n
+        add_stacks (bool) -- adds batch of (card_name, rarity, quantity) rows in one transaction, quantities of already existing stacks are increased or replaced. Copies with extra data over replaced quantity are deleted.\n
+        add_printings (bool) -- adds batch of printings of cards in sets in one transaction, already known card numbers are updated.\n
+        get_set_completion (List[SetCompletionRecord]) -- returns number of printings, owned printings and owned copies of every set with one grouped query.\n
+        get_set_printings (List[PrintingRecord]) -- returns printings of specified set ordered by card number, optionally only the missing ones.\n
+        get_card_printings (List[PrintingRecord]) -- returns printings of a card with specified name in all sets.\n
+        __upsert_printings__ -- upserts printings and counts their owned copies, without committing.\n
+        __select_in__ (List[Row]) -- runs statement restricted to given values of a column in chunks.\n
+        __printing_operations__ (List[list]) -- returns journal operations of given printings which are new or change known ones, before they are upserted.\n
+        add_wiki_pages (bool) -- adds batch of pages of offline wiki dump in one transaction, already known titles are replaced.\n
+        clear_wiki_pages (bool) -- deletes all pages of offline wiki dump.\n
+        get_wiki_pages (List[WikiPageRecord]) -- returns pages of offline wiki dump with given name key ordered by title.\n
+        get_wiki_page (WikiPageRecord) -- returns page of offline wiki dump with given title or None.\n
+        update_card (bool) -- updates one copy from specified stack, if after update no card with same name exists new card is created.\n
+        delete_card (bool) -- deletes one copy from specified stack, returns True if there was no Exception.\n
+        add_card_copy (CopyRecord) -- attaches extra data to one copy from specified stack which did not have any.\n
+        get_card_copies (List[CopyRecord]) -- returns copies with extra data from specified stack.\n
+        delete_card_copy (bool) -- deletes specified copy with extra data, together with its place in the stack.\n
+        __cards__ (List[CardRecord]) -- returns cards matching given criteria, built directly from result rows.\n
+        __take_copy__ -- removes one copy from a stack, deleting the stack when it becomes empty.\n
+        __trim_copies__ -- deletes copies with extra data which do not fit into quantity of their stack, without committing.\n
+        __delete_cards__ (bool) -- deletes all cards that don't have any copies, commits and publishes events of the transaction, returns True if there was no Exception.\n
         add_clan (bool) -- adds new clan to database.\n
-        get_all_clans (List[Clan]) -- returns all clans in database.\n
-        get_clans_with_cards (List[Clan]) -- returns clans for which there exisits at least one card.\n
+        get_all_clans (List[ClanRecord]) -- returns all clans in database.\n
+        get_clans_with_cards (List[ClanRecord]) -- returns clans for which there exisits at least one card.\n
+        add_deck (DeckRecord) -- adds new empty deck, optionally restricted to a clan or nation. Returns None if deck with the same name exists.\n
+        get_all_decks (List[DeckRecord]) -- returns all decks ordered by name.\n
+        get_deck_entries (List[DeckEntryRecord]) -- returns cards of specified deck ordered by name.\n
+        get_all_deck_entries (List[DeckEntryRecord]) -- returns cards of all decks.\n
+        set_deck_entry (bool) -- sets number of copies of a card in a deck, 0 removes the card from the deck.\n
+        delete_deck (bool) -- deletes deck together with its cards.\n
         add_imaginary_gift (bool) -- adds new imaginary gift to database.\n
-        add_nation (bool) -- adds new nation to database.
+        add_nation (bool) -- adds new nation to database.\n
+        get_info (str) -- returns value of database info entry, or None if there is no such entry.\n
+        set_info (bool) -- sets value of database info entry.\n
+        get_replica_id (str) -- returns id identifying this database in change journals, it is created on first use.\n
+        new_replica_id (str) -- gives database new replica id, needed when database file was copied and both copies are changed.\n
+        get_last_seq (int) -- returns sequence number of last entry of change journal, 0 if it is empty.\n
+        get_changes (List[JournalRecord]) -- returns journal entries after given sequence number, optionally without entries made in given database.\n
+        get_sync_states (List[SyncStateRecord]) -- returns progress of synchronization with every known peer.\n
+        set_sent_seq (bool) -- records last sequence number exported for a peer.\n
+        apply_changes (Tuple[int, int, List[Tuple[JournalRecord, str]]]) -- applies journal entries exported by another database in one transaction, entries not fitting the collection are reported as conflicts.\n
+        __journal__ -- appends change made by current transaction to change journal.\n
+        __check_operations__ (str) -- returns reason why journaled operations cannot be applied to the collection, or None.\n
+        __apply_operations__ -- applies journaled operations to the collection.\n
+        seed_reference_data (bool) -- upserts nations, imaginary gifts and clans in one transaction. Nothing is done if the same version of data was already applied.\n
+        __upsert_clans__ -- upserts clans together with their nations and imaginary gifts, without committing.\n
+        vacuum (bool) -- rebuilds database file, reclaiming unused space, optionally changing its auto_vacuum mode.\n
+        analyze (bool) -- gathers statistics used by query planner, optionally examining only limited number of rows of every index.\n
+        incremental_vacuum (bool) -- gives back given number of free pages of database with incremental auto_vacuum to file system, 0 gives back all of them.\n
+        optimize (bool) -- lets SQLite refresh statistics which it considers stale, meant to be run before closing the database.
     """
-    def __init__(self):
-        self.session = sessionmaker(bind=engine)()
+    def __init__(self, db_engine=engine, events: EventBus = None):
+        self.session = sessionmaker(bind=db_engine)()
+        self.events = events if events is not None else EventBus()
+
+    def __card_data__(self, name: str):
+        """
+        Returns snapshot of card attributes as stored in database (with column types applied), or None if there is no such card.
+        """
+        row = self.session.execute(select(Card.name, Card.grade, Card.power, Card.critical, Card.shield, Card.clan_name).where(Card.name == name)).first()
+        return CardData(*row) if row is not None else None
 
     def add_card(self, name: str, grade: int, power: int, critical: int, shield: int | None, clan_name: str, card_rarity: str):
         try:
-            existing_card = self.session.query(Card).filter_by(name=name).first()
+            events = []
+            existing_card = self.__card_data__(name)
             if not existing_card: 
                 self.session.add(Card(name=name, grade=grade, power=power, critical=critical, shield=shield, clan_name=clan_name))
-            self.session.add(CardInstance(card_name=name, rarity=card_rarity))
+            self.session.flush()
+            stack_id = self.__add_copies__(name, card_rarity)
+            card = self.__card_data__(name)
+            if not existing_card:
+                events.append(CardAdded(card))
+            events.append(InstanceAdded(stack_id, card, card_rarity))
+            self.__journal__(events)
+            self.session.commit()
+            self.events.publish_all(events)
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def add_cards(self, cards):
+        """
+        Adds batch of cards in one transaction. Every element of batch is a dictionary with the same keys as arguments of add_card and optionally 'number', card number of the printing.
+        """
+        try:
+            names = {card['name'] for card in cards}
+            existing = {name for (name,) in self.session.query(Card.name).filter(Card.name.in_(names))}
+            new_cards = []
+            for card in cards:
+                if card['name'] not in existing:
+                    existing.add(card['name'])
+                    new_cards.append({'name': card['name'], 'grade': card['grade'], 'power': card['power'], 'critical': card['critical'],
+                                      'shield': card['shield'], 'clan_name': card['clan_name']})
+            if new_cards:
+                self.session.execute(insert(Card), new_cards)
+            quantities = Counter((card['name'], card['card_rarity']) for card in cards)
+            if quantities:
+                self.session.execute(self.__stack_upsert__(), [{'card_name': name, 'rarity': rarity, 'quantity': quantity}
+                                                               for (name, rarity), quantity in quantities.items()])
+            printings = [{'number': card['number'], 'card_name': card['name'], 'rarity': card['card_rarity']} for card in cards if card.get('number')]
+            printing_operations = self.__printing_operations__(printings)
+            if printings:
+                self.__upsert_printings__(printings)
+            added = self.session.execute(select(Card.name, Card.grade, Card.power, Card.critical, Card.shield, Card.clan_name)
+                                         .where(Card.name.in_([card['name'] for card in new_cards]))) if new_cards else []
+            self.__journal__((), [['card_added', list(row)] for row in added] +
+                             [['copies', name, rarity, quantity] for (name, rarity), quantity in quantities.items()] + printing_operations)
             self.session.commit()
+            self.events.publish(CollectionReloaded())
             return True
         except SQLAlchemyError:
             self.session.rollback()
             return False
 
+    def sync_cards(self, cards, delete_missing: bool = True, dry_run: bool = False, chunk_size: int = 1000):
+        """
+        Makes collection equal to given cards. Cards are matched by name and copies by (name, rarity) pair, so syncing the same data again changes nothing.
+        Incoming data is staged into temporary tables and difference is computed with set operations in SQL.
+
+        Args:
+            cards (Iterable[dict]): cards with the same keys as arguments of add_card, every element is one instance.
+            delete_missing (bool): whether cards and instances missing in incoming data should be deleted.
+            dry_run (bool): whether difference should only be computed without changing the collection.
+            chunk_size (int): number of rows staged at once.
+
+        Returns:
+            dict: lists 'cards_added', 'cards_updated', 'cards_deleted', 'instances_added' and 'instances_deleted', or None on database error.
+        """
+        try:
+            self.session.execute(text('DROP TABLE IF EXISTS temp.incoming_cards'))
+            self.session.execute(text('DROP TABLE IF EXISTS temp.incoming_instances'))
+            self.session.execute(text('CREATE TEMP TABLE incoming_cards (name VARCHAR(255) PRIMARY KEY, grade INTEGER, power INTEGER, critical INTEGER, shield INTEGER, clan_name VARCHAR(50))'))
+            self.session.execute(text('CREATE TEMP TABLE incoming_instances (card_name VARCHAR(255), rarity VARCHAR(3), quantity INTEGER, PRIMARY KEY (card_name, rarity))'))
+            iterator = iter(cards)
+            printings = {}
+            while chunk := list(islice(iterator, chunk_size)):
+                self.session.execute(text('INSERT OR REPLACE INTO incoming_cards VALUES (:name, :grade, :power, :critical, :shield, :clan_name)'), chunk)
+                self.session.execute(text('INSERT INTO incoming_instances VALUES (:name, :card_rarity, 1) ON CONFLICT (card_name, rarity) DO UPDATE SET quantity = quantity + 1'), chunk)
+                printings.update((card['number'], {'number': card['number'], 'card_name': card['name'], 'rarity': card['card_rarity']}) for card in chunk if card.get('number'))
+
+            diff = {
+                'cards_added': [tuple(row) for row in self.session.execute(text(
+                    'SELECT * FROM incoming_cards WHERE name IN (SELECT name FROM incoming_cards EXCEPT SELECT name FROM Cards) ORDER BY name'))],
+                'cards_updated': [tuple(row) for row in self.session.execute(text(
+                    'SELECT i.* FROM incoming_cards i JOIN Cards c ON c.name = i.name '
+                    'WHERE c.grade IS NOT i.grade OR c.power IS NOT i.power OR c.critical IS NOT i.critical OR c.shield IS NOT i.shield OR c.clan_name IS NOT i.clan_name '
+                    'ORDER BY i.name'))],
+                'cards_deleted': [row[0] for row in self.session.execute(text(
+                    'SELECT name FROM Cards EXCEPT SELECT name FROM incoming_cards ORDER BY name'))] if delete_missing else [],
+            }
+            deltas = self.session.execute(text(
+                'SELECT card_name, rarity, SUM(quantity) AS delta FROM ('
+                'SELECT card_name, rarity, quantity FROM incoming_instances '
+                'UNION ALL SELECT card_name, rarity, -quantity FROM CardStacks) '
+                'GROUP BY card_name, rarity HAVING delta != 0 ORDER BY card_name, rarity')).fetchall()
+            diff['instances_added'] = [(name, rarity, delta) for name, rarity, delta in deltas if delta > 0]
+            diff['instances_deleted'] = [(name, rarity, -delta) for name, rarity, delta in deltas if delta < 0] if delete_missing else []
+
+            if not dry_run:
+                columns = ('name', 'grade', 'power', 'critical', 'shield', 'clan_name')
+                deleted = self.session.execute(text(
+                    'SELECT name, grade, power, critical, shield, clan_name FROM Cards WHERE name NOT IN (SELECT name FROM incoming_cards) ORDER BY name')).fetchall() if diff['cards_deleted'] else []
+                operations = [['card_added', list(row)] for row in diff['cards_added']]
+                if diff['cards_added']:
+                    self.session.execute(insert(Card), [dict(zip(columns, row)) for row in diff['cards_added']])
+                for row in diff['cards_updated']:
+                    previous = self.__card_data__(row[0])
+                    self.session.execute(update(Card).where(Card.name == row[0]).values(**dict(zip(columns[1:], row[1:]))))
+                    operations.append(['card_updated', list(previous), list(self.__card_data__(row[0]))])
+                operations += [['copies', name, rarity, quantity] for name, rarity, quantity in diff['instances_added']]
+                operations += [['copies', name, rarity, -quantity] for name, rarity, quantity in diff['instances_deleted']]
+                operations += [['card_deleted', list(row)] for row in deleted]
+                if diff['instances_added']:
+                    self.session.execute(self.__stack_upsert__(), [{'card_name': name, 'rarity': rarity, 'quantity': quantity}
+                                                                   for name, rarity, quantity in diff['instances_added']])
+                for name, rarity, quantity in diff['instances_deleted']:
+                    self.session.execute(update(CardStack).where(CardStack.card_name == name, CardStack.rarity == rarity)
+                                         .values(quantity=CardStack.quantity - quantity))
+                if diff['instances_deleted']:
+                    self.__trim_copies__()
+                    self.session.execute(delete(CardStack).where(CardStack.quantity <= 0))
+                if diff['cards_deleted']:
+                    self.session.execute(delete(Card).where(Card.name.in_(diff['cards_deleted'])))
+                operations += self.__printing_operations__(list(printings.values()))
+                if printings:
+                    self.__upsert_printings__(list(printings.values()))
+                self.__journal__((), operations)
+
+            self.session.execute(text('DROP TABLE temp.incoming_cards'))
+            self.session.execute(text('DROP TABLE temp.incoming_instances'))
+            if dry_run:
+                self.session.rollback()
+            else:
+                self.session.commit()
+                self.events.publish(CollectionReloaded())
+            return diff
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def __cards__(self, *criteria, order_by=(), limit: int = None, offset: int = None):
+        statement = select(*CARD_COLUMNS).outerjoin(Clan, Card.clan_name == Clan.name).where(*criteria).order_by(*order_by).limit(limit).offset(offset)
+        return list(map(CardRecord._make, self.session.execute(statement)))
+
     def get_all_cards(self):
         try:
-            return self.session.query(Card).all()
+            return self.__cards__()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_card_names(self):
+        try:
+            return list(self.session.execute(select(Card.name).order_by(Card.name)).scalars())
         except SQLAlchemyError:
             self.session.rollback()
             return []
@@ -59,9 +292,9 @@ class DAO:
     def get_grade_cards(self, grade: str):
         try:
             if grade != 'All':
-                return self.session.query(Card).filter(Card.grade == int(grade)).all()
+                return self.__cards__(Card.grade == int(grade))
             else:
-                return self.session.query(Card).all()
+                return self.__cards__()
         except SQLAlchemyError:
             self.session.rollback()
             return []
@@ -69,7 +302,7 @@ class DAO:
     def get_clan_cards(self, clan: str):
         try:
             if clan != 'All Clans':
-                return self.session.query(Card).filter(Card.clan_name == clan).all()
+                return self.__cards__(Card.clan_name == clan)
             else:
                 return self.get_all_cards()
         except SQLAlchemyError:
@@ -79,50 +312,105 @@ class DAO:
     def get_clan_grade_cards(self, clan: str, grade: str):
         try:
             if clan != 'All Clans':
-                query = self.session.query(Card).filter(Card.clan_name == clan)
                 if grade != 'All':
-                    return query.filter(Card.grade == int(grade)).all()
+                    return self.__cards__(Card.clan_name == clan, Card.grade == int(grade))
                 else:
-                    return query.all()
+                    return self.__cards__(Card.clan_name == clan)
             else:
                 return self.get_grade_cards(grade)
         except SQLAlchemyError:
             self.session.rollback()
             return []
         
+    def search_cards(self, phrase: str, limit: int = None):
+        try:
+            escaped = phrase.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            return self.__cards__(Card.name.ilike(f'%{escaped}%', escape='\\'), order_by=(Card.name,), limit=limit)
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_cards_page(self, clan: str = 'All Clans', grade: str = 'All', phrase: str = None, limit: int = 50, offset: int = 0):
+        try:
+            card_filter = CardFilter().name_contains(phrase).order_by('name')
+            if clan != 'All Clans':
+                card_filter.clan(clan)
+            if grade != 'All':
+                card_filter.grade(grade)
+            return self.count_cards(card_filter), self.find_cards(card_filter, limit, offset)
+        except SQLAlchemyError:
+            self.session.rollback()
+            return 0, []
+
+    def find_cards(self, card_filter: CardFilter, limit: int = None, offset: int = None):
+        try:
+            criteria, ordering = card_filter.compile()
+            return self.__cards__(*criteria, order_by=ordering, limit=limit, offset=offset)
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def count_cards(self, card_filter: CardFilter):
+        try:
+            criteria, _ = card_filter.compile()
+            return self.session.execute(select(func.count()).select_from(Card).where(*criteria)).scalar()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return 0
+        
+    def get_card(self, name: str):
+        try:
+            cards = self.__cards__(Card.name == name)
+            return cards[0] if cards else None
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+        
+    def get_card_stack(self, stack_id: int):
+        try:
+            row = self.session.execute(select(*STACK_COLUMNS).where(CardStack.id == stack_id)).first()
+            return StackRecord._make(row) if row is not None else None
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+        
     def get_card_rarities(self, name: str):
         rarities = []
         try:
-            for _, rarity in (
-                self.session.query(Card, CardInstance.rarity).join(CardInstance)
-                .filter(Card.name == CardInstance.card_name)
-                .filter(Card.name == name)
-                .distinct()):
+            for (rarity,) in self.session.query(CardStack.rarity).filter(CardStack.card_name == name).order_by(CardStack.id):
                 rarities.append(rarity)
         except SQLAlchemyError: 
             self.session.rollback()
         return ', '.join(rarities)
     
-    def get_card_instances(self, name: str):
-        instances = []
-        try:
-            for _, instance in (
-                self.session.query(Card, CardInstance).join(CardInstance)
-                .filter(Card.name == CardInstance.card_name)
-                .filter(Card.name == name)
-                .distinct()):
-                instances.append(instance)
+    def get_card_stacks(self, name: str):
+        try:
+            return list(map(StackRecord._make, self.session.execute(select(*STACK_COLUMNS).where(CardStack.card_name == name).order_by(CardStack.id))))
         except SQLAlchemyError: 
             self.session.rollback()
-        return instances
+            return []
     
     def get_card_count(self, name: str):
         try:
-            return self.session.query(Card).join(CardInstance).filter(Card.name == CardInstance.card_name).filter(Card.name == name).count()
+            return self.session.query(func.coalesce(func.sum(CardStack.quantity), 0)).filter(CardStack.card_name == name).scalar()
         except SQLAlchemyError:
             self.session.rollback()
             return 0
         
+    def get_card_counts(self):
+        try:
+            return self.session.query(CardStack.card_name, func.sum(CardStack.quantity)).group_by(CardStack.card_name).all()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_stack_count(self):
+        try:
+            return self.session.query(func.count(CardStack.id)).scalar()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return 0
+
     def get_card_grades(self):
         try:
             return self.session.query(Card.grade).distinct().order_by(Card.grade).all()
@@ -132,69 +420,414 @@ class DAO:
         
     def get_cards_grades_count(self):
         try:
-            return self.session.query(Card.grade, func.count()).join(CardInstance).group_by(Card.grade).all()
+            return self.session.query(Card.grade, func.sum(CardStack.quantity)).join(CardStack).group_by(Card.grade).all()
         except SQLAlchemyError:
             self.session.rollback()
             return []
         
     def get_cards_clan_count(self):
         try:
-            return self.session.query(Card.clan_name, func.count()).join(CardInstance).group_by(Card.clan_name).all()
+            return self.session.query(Card.clan_name, func.sum(CardStack.quantity)).join(CardStack).group_by(Card.clan_name).all()
         except SQLAlchemyError:
             self.session.rollback()
             return []
         
+    def get_cards_clan_rarity_count(self):
+        try:
+            return (self.session.query(Card.clan_name, CardStack.rarity, func.sum(CardStack.quantity)).join(CardStack)
+                    .group_by(Card.clan_name, CardStack.rarity).order_by(Card.clan_name, CardStack.rarity).all())
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_cards_power_count(self):
+        try:
+            return self.session.query(Card.power, func.sum(CardStack.quantity)).join(CardStack).group_by(Card.power).order_by(Card.power).all()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_cards_shield_count(self):
+        try:
+            return self.session.query(Card.shield, func.sum(CardStack.quantity)).join(CardStack).group_by(Card.shield).order_by(Card.shield).all()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_cards_nation_count(self):
+        try:
+            return (self.session.query(Clan.nation_name, func.sum(CardStack.quantity)).select_from(Card).join(Clan).join(CardStack)
+                    .group_by(Clan.nation_name).order_by(Clan.nation_name).all())
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_cards_gift_count(self):
+        try:
+            return (self.session.query(Clan.imaginary_gift_name, func.sum(CardStack.quantity)).select_from(Card).join(Clan).join(CardStack)
+                    .group_by(Clan.imaginary_gift_name).order_by(Clan.imaginary_gift_name).all())
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_card_attributes(self):
+        try:
+            return self.__cards__(order_by=(Card.name,))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def get_card_rarity_count(self):
+        try:
+            return self.session.query(CardStack.card_name, CardStack.rarity, CardStack.quantity).all()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+        
+    def stream_rows(self, model, chunk_size: int = 1000):
+        """
+        Yields rows of a table in chunks ordered by primary key. Error of database is raised after rollback, so export is never silently cut short.
+        """
+        try:
+            columns = model.__table__.columns
+            result = self.session.execute(select(*columns).order_by(*model.__table__.primary_key.columns).execution_options(yield_per=chunk_size))
+            for partition in result.partitions():
+                yield [tuple(row) for row in partition]
+        except SQLAlchemyError:
+            self.session.rollback()
+            raise
+        
+    def insert_rows(self, model, rows):
+        """
+        Inserts batch of rows into a table in one transaction, rows with already existing primary key are skipped. Added cards and clans are journaled,
+        copies and printings are journaled by add_stacks and add_printings.
+        """
+        try:
+            operations = []
+            if rows:
+                names = {row['name'] for row in rows} if model in (Card, Clan) else set()
+                existing = {name for (name,) in self.__select_in__(select(model.name), model.name, names)} if names else set()
+                self.session.execute(insert(model.__table__).prefix_with('OR IGNORE'), rows)
+                added = sorted(names - existing)
+                if model is Card:
+                    operations = [['card_added', list(row)] for row in sorted(self.__select_in__(
+                        select(Card.name, Card.grade, Card.power, Card.critical, Card.shield, Card.clan_name), Card.name, added))]
+                elif model is Clan:
+                    operations = [['clan', *row] for row in sorted(self.__select_in__(select(Clan.name, Clan.imaginary_gift_name, Clan.nation_name), Clan.name, added))]
+            self.__journal__((), operations)
+            self.session.commit()
+            self.events.publish(CollectionReloaded())
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+        
+    def add_stacks(self, rows, replace: bool = False):
+        """
+        Adds batch of stacks in one transaction. Every row is a dictionary with 'card_name', 'rarity' and 'quantity', quantity of already existing stack is increased,
+        or replaced by the new one if replace is True. Rows of the same stack are summed up first, so batches of single copies cost one statement per stack.
+        Copies with extra data which do not fit into lowered quantity are deleted, newest first.
+        """
+        try:
+            quantities = Counter()
+            for row in rows:
+                quantities[(row['card_name'], row['rarity'])] += int(row['quantity'])
+            if quantities:
+                # Replaced quantity is journaled as difference from current one
+                current = Counter({(name, rarity): quantity for name, rarity, quantity in self.__select_in__(
+                    select(CardStack.card_name, CardStack.rarity, CardStack.quantity), CardStack.card_name, {name for name, _ in quantities})}) if replace else Counter()
+                self.session.execute(self.__stack_upsert__(replace), [{'card_name': name, 'rarity': rarity, 'quantity': quantity} for (name, rarity), quantity in quantities.items()])
+                if replace:
+                    self.__trim_copies__()
+                self.__journal__((), [['copies', name, rarity, quantity - current[(name, rarity)]] for (name, rarity), quantity in quantities.items()
+                                      if quantity != current[(name, rarity)]])
+            self.session.commit()
+            self.events.publish(CollectionReloaded())
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def add_printings(self, printings):
+        """
+        Adds batch of printings in one transaction. Every element is a dictionary with 'number', 'card_name' and optionally 'rarity' of the printing.
+        """
+        try:
+            if printings:
+                operations = self.__printing_operations__(printings)
+                self.__upsert_printings__(printings)
+                self.__journal__((), operations)
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def get_set_completion(self):
+        """
+        Counts printings of every set in one grouped query, which reads only the index on set code and owned copies, so its cost does not depend on size of the collection.
+        """
+        try:
+            statement = (select(Printing.set_code, func.count(), func.count(case((Printing.owned > 0, 1))), func.coalesce(func.sum(Printing.owned), 0))
+                         .group_by(Printing.set_code).order_by(Printing.set_code))
+            return list(map(SetCompletionRecord._make, self.session.execute(statement)))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_set_printings(self, set_code: str, missing: bool = False):
+        try:
+            statement = select(*PRINTING_COLUMNS).where(Printing.set_code == set_code).order_by(Printing.number)
+            if missing:
+                statement = statement.where(Printing.owned <= 0)
+            return list(map(PrintingRecord._make, self.session.execute(statement)))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_card_printings(self, name: str):
+        try:
+            return list(map(PrintingRecord._make, self.session.execute(select(*PRINTING_COLUMNS).where(Printing.card_name == name).order_by(Printing.number))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def __upsert_printings__(self, printings):
+        """
+        Upserts printings and counts their owned copies from stacks. Afterwards owned copies are kept up to date by triggers on CardStacks.
+        Known rarity of a printing is not replaced with unknown one, ex. when scrapper finds the number without rarity.
+        """
+        statement = sqlite_insert(Printing)
+        self.session.execute(statement.on_conflict_do_update(index_elements=[Printing.number], set_={
+            'set_code': statement.excluded.set_code, 'card_name': statement.excluded.card_name, 'rarity': func.coalesce(statement.excluded.rarity, Printing.rarity)}),
+            [{'number': printing['number'], 'set_code': printing['number'].rsplit('-', 1)[0], 'card_name': printing['card_name'],
+              'rarity': printing.get('rarity') or None, 'owned': 0} for printing in printings])
+        owned = (select(func.coalesce(func.sum(CardStack.quantity), 0))
+                 .where(CardStack.card_name == Printing.card_name, or_(Printing.rarity.is_(None), CardStack.rarity == Printing.rarity)).scalar_subquery())
+        self.session.execute(update(Printing).where(Printing.number.in_({printing['number'] for printing in printings})).values(owned=owned))
+
+    def __select_in__(self, statement, column, values, chunk_size: int = 10000):
+        """
+        Runs statement restricted to given values of column in chunks, because SQLite limits number of parameters of one statement.
+        """
+        values, rows = list(values), []
+        for start in range(0, len(values), chunk_size):
+            rows += self.session.execute(statement.where(column.in_(values[start:start + chunk_size]))).fetchall()
+        return rows
+
+    def __printing_operations__(self, printings):
+        """
+        Returns journal operations of printings which are not known yet or change card or rarity of known ones, so importing the same numbers again journals nothing.
+        It has to be called before printings are upserted.
+        """
+        known = {number: (card_name, rarity) for number, card_name, rarity in
+                 self.__select_in__(select(Printing.number, Printing.card_name, Printing.rarity), Printing.number, {printing['number'] for printing in printings})}
+        operations = []
+        for printing in printings:
+            rarity = printing.get('rarity') or None
+            if printing['number'] not in known or known[printing['number']] != (printing['card_name'], rarity or known[printing['number']][1]):
+                operations.append(['printing', printing['number'], printing['card_name'], rarity])
+        return operations
+
+    def add_wiki_pages(self, pages):
+        """
+        Adds batch of pages in one transaction. Every element is a dictionary with the same keys as columns of WikiPages.
+        """
+        try:
+            if pages:
+                statement = sqlite_insert(WikiPage)
+                self.session.execute(statement.on_conflict_do_update(index_elements=[WikiPage.title], set_={
+                    column: statement.excluded[column] for column in ('name_key', 'redirect', 'image', 'numbers')}), pages)
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def clear_wiki_pages(self):
+        try:
+            self.session.execute(delete(WikiPage))
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def get_wiki_pages(self, name_key: str):
+        try:
+            return list(map(WikiPageRecord._make, self.session.execute(select(*WIKI_PAGE_COLUMNS).where(WikiPage.name_key == name_key).order_by(WikiPage.title))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_wiki_page(self, title: str):
+        try:
+            row = self.session.execute(select(*WIKI_PAGE_COLUMNS).where(WikiPage.title == title)).first()
+            return WikiPageRecord._make(row) if row is not None else None
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def __stack_upsert__(self, replace: bool = False):
+        statement = sqlite_insert(CardStack)
+        return statement.on_conflict_do_update(index_elements=[CardStack.card_name, CardStack.rarity],
+                                               set_={'quantity': statement.excluded.quantity if replace else CardStack.quantity + statement.excluded.quantity})
+
+    def __trim_copies__(self):
+        """
+        Deletes copies with extra data which are over quantity of their stack, or whose stack is gone, newest first.
+        """
+        self.session.execute(text(
+            'DELETE FROM CardCopies WHERE id IN (SELECT c.id FROM CardCopies c LEFT JOIN CardStacks s ON s.card_name = c.card_name AND s.rarity = c.rarity '
+            'WHERE s.id IS NULL OR s.quantity < (SELECT COUNT(*) FROM CardCopies o WHERE o.card_name = c.card_name AND o.rarity = c.rarity AND o.id <= c.id))'))
+
+    def __add_copies__(self, name: str, rarity: str, quantity: int = 1):
+        """
+        Adds copies to the stack of given card and rarity, creating the stack if needed.
+
+        Returns:
+            int: id of the stack.
+        """
+        self.session.execute(self.__stack_upsert__(), [{'card_name': name, 'rarity': rarity, 'quantity': quantity}])
+        return self.session.execute(select(CardStack.id).where(CardStack.card_name == name, CardStack.rarity == rarity)).scalar()
+
+    def __take_copy__(self, stack, target=None):
+        """
+        Removes one copy from a stack, deleting the stack when it becomes empty. Copies without extra data are taken first,
+        otherwise the newest copy with extra data is moved to target (name, rarity) pair or deleted when there is no target.
+        """
+        details = self.session.query(func.count(CardCopy.id)).filter(CardCopy.card_name == stack.card_name, CardCopy.rarity == stack.rarity).scalar()
+        if details >= stack.quantity:
+            newest = self.session.query(func.max(CardCopy.id)).filter(CardCopy.card_name == stack.card_name, CardCopy.rarity == stack.rarity).scalar()
+            if target is None:
+                self.session.execute(delete(CardCopy).where(CardCopy.id == newest))
+            else:
+                self.session.execute(update(CardCopy).where(CardCopy.id == newest).values(card_name=target[0], rarity=target[1]))
+        if stack.quantity > 1:
+            self.session.execute(update(CardStack).where(CardStack.id == stack.id).values(quantity=CardStack.quantity - 1))
+        else:
+            self.session.execute(delete(CardStack).where(CardStack.id == stack.id))
+
     def update_card(self, instance_id: int, name: str, grade: int, power: int, critical: int, shield: int | None, clan_name: str, card_rarity: str):
+        """
+        Updates one copy from the stack with given id. If name or rarity changed the copy is moved into another stack.
+        """
         try:
-            if self.session.query(CardInstance).filter(CardInstance.id == instance_id).first() == None: return False
-            stmt = update(CardInstance).where(CardInstance.id == instance_id).values(card_name=name, rarity=card_rarity)
-            self.session.execute(stmt)
-            
-            if self.get_card_count(name) == 0:
+            instance_id = int(instance_id)
+            instance = self.session.execute(select(CardStack.id, CardStack.card_name, CardStack.rarity, CardStack.quantity).where(CardStack.id == instance_id)).first()
+            if instance == None: return False
+            old_card = self.__card_data__(instance.card_name)
+            events = []
+            card_exists = self.__card_data__(name) is not None
+            if not card_exists:
                 self.session.add(Card(name=name, grade=grade, power=power, critical=critical, shield=shield, clan_name=clan_name))
+                self.session.flush()
+                events.append(CardAdded(self.__card_data__(name)))
+
+            stack_id = instance.id
+            if (name, card_rarity) != (instance.card_name, instance.rarity):
+                stack_id = self.__add_copies__(name, card_rarity)
+                self.__take_copy__(instance, target=(name, card_rarity))
                 
-            elif self.get_card_count(name) == 1:
+            if card_exists and self.get_card_count(name) == 1:
+                previous = self.__card_data__(name)
                 stmt = update(Card).where(Card.name == name).values(grade=grade, power=power, critical=critical, shield=shield, clan_name=clan_name)
                 self.session.execute(stmt)
+                current = self.__card_data__(name)
+                if current != previous:
+                    events.append(CardUpdated(previous, current))
                 
-            self.__delete_cards__()
-            
-            return True
+            events.append(InstanceUpdated(stack_id, old_card, instance.rarity, self.__card_data__(name), card_rarity))
+            return self.__delete_cards__(events)
         except SQLAlchemyError:
             self.session.rollback()
             return False
         
     def delete_card(self, instance_id: int):
+        """
+        Deletes one copy from the stack with given id, copies without extra data are deleted first.
+        """
         try:
-            stmt = delete(CardInstance).where(CardInstance.id == instance_id)
-            self.session.execute(stmt)
-            self.__delete_cards__()
-            return True
+            events = []
+            instance = self.session.execute(select(CardStack.id, CardStack.card_name, CardStack.rarity, CardStack.quantity).where(CardStack.id == instance_id)).first()
+            if instance is not None:
+                events.append(InstanceDeleted(instance_id, self.__card_data__(instance.card_name), instance.rarity))
+                self.__take_copy__(instance)
+            return self.__delete_cards__(events)
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def add_card_copy(self, stack_id: int, note: str):
+        try:
+            stack = self.get_card_stack(stack_id)
+            if stack is None or len(self.get_card_copies(stack_id)) >= stack.quantity:
+                return None
+            copy_id = self.session.execute(insert(CardCopy).values(card_name=stack.card_name, rarity=stack.rarity, note=note)).inserted_primary_key[0]
+            self.session.commit()
+            return CopyRecord(copy_id, stack.card_name, stack.rarity, note)
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def get_card_copies(self, stack_id: int):
+        try:
+            statement = (select(*COPY_COLUMNS).join(CardStack, (CardStack.card_name == CardCopy.card_name) & (CardStack.rarity == CardCopy.rarity))
+                         .where(CardStack.id == stack_id).order_by(CardCopy.id))
+            return list(map(CopyRecord._make, self.session.execute(statement)))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def delete_card_copy(self, copy_id: int):
+        try:
+            copy = self.session.get(CardCopy, copy_id)
+            if copy is None:
+                return False
+            stack = self.session.execute(select(CardStack.id, CardStack.card_name, CardStack.rarity, CardStack.quantity)
+                                         .where(CardStack.card_name == copy.card_name, CardStack.rarity == copy.rarity)).first()
+            events = [InstanceDeleted(stack.id, self.__card_data__(stack.card_name), stack.rarity)]
+            self.session.delete(copy)
+            self.session.flush()
+            if stack.quantity > 1:
+                self.session.execute(update(CardStack).where(CardStack.id == stack.id).values(quantity=CardStack.quantity - 1))
+            else:
+                self.session.execute(delete(CardStack).where(CardStack.id == stack.id))
+            return self.__delete_cards__(events)
         except SQLAlchemyError:
             self.session.rollback()
             return False
         
-    def __delete_cards__(self):
+    def __delete_cards__(self, events=()):
+        """
+        Deletes cards without instances and commits the transaction, then publishes given events of the transaction followed by CardDeleted events.
+        """
         try:
-            subquery = select(CardInstance.card_name.distinct()).subquery()
+            events = list(events)
+            subquery = select(CardStack.card_name).distinct().subquery()
             query = select(Card.name).where(not_(Card.name.in_(select(subquery))))
             card_without_instances = self.session.execute(query).fetchall()
             
             for card in card_without_instances:
+                events.append(CardDeleted(self.__card_data__(card[0])))
                 stmt = delete(Card).where(Card.name == card[0])
                 self.session.execute(stmt)
                 
+            self.__journal__(events)
             self.session.commit()
+            self.events.publish_all(events)
             return True
         except SQLAlchemyError:
             self.session.rollback()
             return False
 
     def add_clan(self, name: str, imaginary_gift_name: str, nation: str):
-        session = sessionmaker(bind=engine)()
         try:
-            session.add(Clan(name=name, imaginary_gift_name=imaginary_gift_name, nation_name=nation))
-            session.commit()
+            self.session.add(Clan(name=name, imaginary_gift_name=imaginary_gift_name, nation_name=nation))
+            event = ClanAdded(name, imaginary_gift_name, nation)
+            self.__journal__([event])
+            self.session.commit()
+            self.events.publish(event)
             return True
         except SQLAlchemyError:
             self.session.rollback()
@@ -202,33 +835,397 @@ class DAO:
         
     def get_all_clans(self):
         try:
-            return self.session.query(Clan).all()
+            return list(map(ClanRecord._make, self.session.execute(select(*CLAN_COLUMNS))))
         except SQLAlchemyError:
             self.session.rollback()
             return []
         
     def get_clans_with_cards(self):
         try:
-            return self.session.query(Clan).join(Card).all()
+            return list(map(ClanRecord._make, self.session.execute(select(*CLAN_COLUMNS).where(Clan.name.in_(select(Card.clan_name))))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def add_deck(self, name: str, clan_name: str = None, nation_name: str = None):
+        try:
+            deck_id = self.session.execute(insert(Deck).values(name=name, clan_name=clan_name, nation_name=nation_name)).inserted_primary_key[0]
+            self.session.commit()
+            deck = DeckRecord(deck_id, name, clan_name, nation_name)
+            self.events.publish(DeckAdded(*deck))
+            return deck
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def get_all_decks(self):
+        try:
+            return list(map(DeckRecord._make, self.session.execute(select(*DECK_COLUMNS).order_by(Deck.name))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_deck_entries(self, deck_id: int):
+        try:
+            statement = select(*DECK_ENTRY_COLUMNS).where(DeckEntry.deck_id == deck_id).order_by(DeckEntry.card_name)
+            return list(map(DeckEntryRecord._make, self.session.execute(statement)))
         except SQLAlchemyError:
             self.session.rollback()
             return []
 
+    def get_all_deck_entries(self):
+        try:
+            return list(map(DeckEntryRecord._make, self.session.execute(select(*DECK_ENTRY_COLUMNS))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def set_deck_entry(self, deck_id: int, card_name: str, quantity: int):
+        try:
+            if self.session.execute(select(Deck.id).where(Deck.id == deck_id)).first() is None:
+                return False
+            quantity = max(int(quantity), 0)
+            if quantity == 0:
+                self.session.execute(delete(DeckEntry).where(DeckEntry.deck_id == deck_id, DeckEntry.card_name == card_name))
+            else:
+                statement = sqlite_insert(DeckEntry).values(deck_id=deck_id, card_name=card_name, quantity=quantity)
+                self.session.execute(statement.on_conflict_do_update(index_elements=[DeckEntry.deck_id, DeckEntry.card_name], set_={'quantity': quantity}))
+            self.session.commit()
+            self.events.publish(DeckEntryChanged(deck_id, card_name, quantity))
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def delete_deck(self, deck_id: int):
+        try:
+            self.session.execute(delete(DeckEntry).where(DeckEntry.deck_id == deck_id))
+            deleted = self.session.execute(delete(Deck).where(Deck.id == deck_id)).rowcount
+            self.session.commit()
+            if deleted:
+                self.events.publish(DeckDeleted(deck_id))
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
     def add_imaginary_gift(self, name: str):
-        session = sessionmaker(bind=engine)()
         try:
-            session.add(ImaginaryGift(name=name))
-            session.commit()
+            self.session.add(ImaginaryGift(name=name))
+            self.session.commit()
             return True
         except SQLAlchemyError:
             self.session.rollback()
             return False
 
     def add_nation(self, name: str):
-        session = sessionmaker(bind=engine)()
         try:
-            session.add(Nation(name=name))
-            session.commit()
+            self.session.add(Nation(name=name))
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def get_info(self, key: str):
+        try:
+            return self.session.query(DatabaseInfo.value).filter(DatabaseInfo.key == key).scalar()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def set_info(self, key: str, value):
+        try:
+            statement = sqlite_insert(DatabaseInfo).values(key=key, value=None if value is None else str(value))
+            self.session.execute(statement.on_conflict_do_update(index_elements=[DatabaseInfo.key], set_={'value': statement.excluded.value}))
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def get_replica_id(self):
+        replica_id = self.get_info('replica_id')
+        if replica_id is None:
+            replica_id = uuid.uuid4().hex
+            self.session.execute(sqlite_insert(DatabaseInfo).values(key='replica_id', value=replica_id).on_conflict_do_nothing())
+        return replica_id
+
+    def new_replica_id(self):
+        try:
+            replica_id = uuid.uuid4().hex
+            statement = sqlite_insert(DatabaseInfo).values(key='replica_id', value=replica_id)
+            self.session.execute(statement.on_conflict_do_update(index_elements=[DatabaseInfo.key], set_={'value': statement.excluded.value}))
+            self.session.commit()
+            return replica_id
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+
+    def get_last_seq(self):
+        try:
+            return self.session.execute(select(func.coalesce(func.max(JournalEntry.seq), 0))).scalar()
+        except SQLAlchemyError:
+            self.session.rollback()
+            return 0
+
+    def get_changes(self, since: int = 0, until: int = None, exclude_origin: str = None):
+        try:
+            statement = select(*JOURNAL_COLUMNS).where(JournalEntry.seq > since).order_by(JournalEntry.seq)
+            if until is not None:
+                statement = statement.where(JournalEntry.seq <= until)
+            if exclude_origin is not None:
+                statement = statement.where(JournalEntry.origin != exclude_origin)
+            return list(map(JournalRecord._make, self.session.execute(statement)))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_sync_states(self):
+        try:
+            return list(map(SyncStateRecord._make, self.session.execute(select(*SYNC_STATE_COLUMNS).order_by(SyncState.peer))))
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def set_sent_seq(self, peer: str, seq: int):
+        try:
+            statement = sqlite_insert(SyncState).values(peer=peer, sent_seq=seq, received_seq=0)
+            self.session.execute(statement.on_conflict_do_update(index_elements=[SyncState.peer], set_={'sent_seq': statement.excluded.sent_seq}))
+            self.session.commit()
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def apply_changes(self, origin: str, since: int, until: int, entries):
+        """
+        Applies journal entries exported by another database in one transaction, so synchronization costs only as much as number of changes.
+        Entries which are already in the journal (also when they come through another peer) or were made here are skipped. Entry is a conflict when any of its operations
+        does not fit current state of the collection, ex. card was changed here differently or copy which should be moved is not here. Conflicting entry is not applied at all
+        and changes are marked as received only up to the entry before it, so after the conflict is resolved applying the same delta file again applies it.
+
+        Args:
+            origin (str): replica id of exporting database.
+            since (int): sequence number after which entries were exported.
+            until (int): last sequence number of journal of exporting database.
+            entries (Iterable[JournalRecord]): exported entries in order of their sequence numbers.
+
+        Raises:
+            ValueError: when exporting database has the same replica id, or entries between last received and since are missing.
+
+        Returns:
+            Tuple[int, int, List[Tuple[JournalRecord, str]]]: number of applied and skipped entries and conflicting entries with reason, or None on database error.
+        """
+        try:
+            replica_id = self.get_replica_id()
+            if origin == replica_id:
+                raise ValueError('Changes come from database with the same replica id, one of the copies needs new replica id')
+            received = self.session.execute(select(SyncState.received_seq).where(SyncState.peer == origin)).scalar() or 0
+            if since > received:
+                raise ValueError(f'Only changes up to {received} were received from {origin}, changes after {since} would leave a gap. Export them again with --since {received}')
+            applied, skipped, conflicts = 0, 0, []
+            # Entries after first conflict are applied, but they stay unreceived until the conflict is applied, so they are skipped then
+            received_until = until
+            for entry in entries:
+                known = select(JournalEntry.seq).where(JournalEntry.origin == entry.origin, JournalEntry.origin_seq == entry.origin_seq)
+                if entry.origin == replica_id or self.session.execute(known).first() is not None:
+                    skipped += 1
+                    continue
+                reason = self.__check_operations__(entry.operations)
+                if reason is not None:
+                    conflicts.append((entry, reason))
+                    received_until = min(received_until, entry.seq - 1)
+                    continue
+                self.__apply_operations__(entry.operations)
+                self.session.execute(insert(JournalEntry).values(origin=entry.origin, origin_seq=entry.origin_seq, created_at=entry.created_at, operations=entry.operations))
+                applied += 1
+            statement = sqlite_insert(SyncState).values(peer=origin, sent_seq=0, received_seq=max(received, received_until))
+            self.session.execute(statement.on_conflict_do_update(index_elements=[SyncState.peer], set_={'received_seq': statement.excluded.received_seq}))
+            self.session.commit()
+            if applied:
+                self.events.publish(CollectionReloaded())
+            return applied, skipped, conflicts
+        except SQLAlchemyError:
+            self.session.rollback()
+            return None
+        except ValueError:
+            self.session.rollback()
+            raise
+
+    def __journal__(self, events, operations=()):
+        """
+        Appends change made by current transaction to change journal, without committing. Operations are derived from events of the transaction and added to given ones.
+        Nothing is journaled when transaction did not change cards, copies, printings or clans.
+        """
+        operations = list(operations)
+        for event in events:
+            if isinstance(event, CardAdded):
+                operations.append(['card_added', list(event.card)])
+            elif isinstance(event, CardUpdated):
+                operations.append(['card_updated', list(event.old), list(event.new)])
+            elif isinstance(event, CardDeleted):
+                operations.append(['card_deleted', list(event.card)])
+            elif isinstance(event, InstanceAdded):
+                operations.append(['copies', event.card.name, event.rarity, 1])
+            elif isinstance(event, InstanceDeleted):
+                operations.append(['copies', event.card.name, event.rarity, -1])
+            elif isinstance(event, InstanceUpdated) and (event.old_card.name, event.old_rarity) != (event.card.name, event.rarity):
+                operations += [['copies', event.old_card.name, event.old_rarity, -1], ['copies', event.card.name, event.rarity, 1]]
+            elif isinstance(event, ClanAdded):
+                operations.append(['clan', event.name, event.imaginary_gift_name, event.nation_name])
+        if operations:
+            seq = self.session.execute(select(func.coalesce(func.max(JournalEntry.seq), 0))).scalar() + 1
+            self.session.execute(insert(JournalEntry).values(seq=seq, origin=self.get_replica_id(), origin_seq=seq,
+                                                             created_at=datetime.now(timezone.utc).isoformat(timespec='seconds'), operations=operations))
+
+    def __check_operations__(self, operations):
+        """
+        Checks operations one by one against state of the collection changed by previous operations, without changing anything.
+        """
+        cards, quantities = {}, {}
+        def card(name):
+            if name not in cards:
+                cards[name] = self.__card_data__(name)
+            return cards[name]
+        def quantity(name, rarity):
+            if (name, rarity) not in quantities:
+                quantities[(name, rarity)] = self.session.execute(select(CardStack.quantity).where(CardStack.card_name == name, CardStack.rarity == rarity)).scalar() or 0
+            return quantities[(name, rarity)]
+
+        for operation in operations:
+            if operation[0] == 'card_added':
+                new = CardData(*operation[1])
+                if card(new.name) not in (None, new):
+                    return f'{new.name} already exists with different attributes'
+                cards[new.name] = new
+            elif operation[0] == 'card_updated':
+                old, new = CardData(*operation[1]), CardData(*operation[2])
+                if card(new.name) is None:
+                    return f'{new.name} does not exist'
+                if card(new.name) not in (old, new):
+                    return f'{new.name} was changed differently'
+                cards[new.name] = new
+            elif operation[0] == 'copies':
+                name, rarity, delta = operation[1:]
+                if card(name) is None:
+                    return f'{name} does not exist'
+                if quantity(name, rarity) + delta < 0:
+                    return f'Not enough copies of {name} ({rarity})'
+                quantities[(name, rarity)] += delta
+            elif operation[0] not in ('card_deleted', 'printing', 'clan'):
+                return f'Unknown operation {operation[0]}'
+        return None
+
+    def __apply_operations__(self, operations):
+        """
+        Applies checked operations. Card is deleted only when it has no copies left here.
+        """
+        for operation in operations:
+            if operation[0] == 'card_added':
+                self.session.execute(sqlite_insert(Card).values(**CardData(*operation[1])._asdict()).on_conflict_do_nothing())
+            elif operation[0] == 'card_updated':
+                card = CardData(*operation[2])
+                self.session.execute(update(Card).where(Card.name == card.name).values(**card._asdict()))
+            elif operation[0] == 'copies':
+                name, rarity, delta = operation[1:]
+                if delta > 0:
+                    self.__add_copies__(name, rarity, delta)
+                for _ in range(-delta):
+                    self.__take_copy__(self.session.execute(select(CardStack.id, CardStack.card_name, CardStack.rarity, CardStack.quantity)
+                                                            .where(CardStack.card_name == name, CardStack.rarity == rarity)).first())
+            elif operation[0] == 'card_deleted':
+                name = operation[1][0]
+                if self.session.execute(select(CardStack.id).where(CardStack.card_name == name).limit(1)).first() is None:
+                    self.session.execute(delete(Card).where(Card.name == name))
+            elif operation[0] == 'printing':
+                self.__upsert_printings__([{'number': operation[1], 'card_name': operation[2], 'rarity': operation[3]}])
+            elif operation[0] == 'clan':
+                self.__upsert_clans__([{'name': operation[1], 'imaginary_gift_name': operation[2], 'nation_name': operation[3]}])
+
+    def seed_reference_data(self, data: dict, force: bool = False):
+        """
+        Upserts reference data in one transaction. Existing clans get imaginary gift and nation from the data, nothing is deleted.
+
+        Args:
+            data (dict): 'version', list of 'nations', list of 'imaginary_gifts' and list of 'clans', each with 'name', 'imaginary_gift' and 'nation'.
+            force (bool): whether data should be applied even if its version was already applied.
+
+        Raises:
+            KeyError: if data misses version, any of the lists or any key of a clan. Nothing is written then.
+        """
+        # Data is read before anything is written, so incomplete data leaves nothing in the session
+        version = str(data['version'])
+        nations, gifts = data['nations'], data['imaginary_gifts']
+        clans = [(clan['name'], clan['imaginary_gift'], clan['nation']) for clan in data['clans']]
+        try:
+            if not force and self.get_info('reference_data_version') == version:
+                return True
+            if nations:
+                self.session.execute(sqlite_insert(Nation).on_conflict_do_nothing(), [{'name': name} for name in nations])
+            if gifts:
+                self.session.execute(sqlite_insert(ImaginaryGift).on_conflict_do_nothing(), [{'name': name} for name in gifts])
+            if clans:
+                # Only added and changed clans are journaled
+                current = {name: (gift, nation) for name, gift, nation in self.session.execute(select(Clan.name, Clan.imaginary_gift_name, Clan.nation_name))}
+                clans = [clan for clan in clans if current.get(clan[0]) != clan[1:]]
+                self.__upsert_clans__([{'name': name, 'imaginary_gift_name': gift, 'nation_name': nation} for name, gift, nation in clans])
+                self.__journal__((), [['clan', *clan] for clan in clans])
+            statement = sqlite_insert(DatabaseInfo).values(key='reference_data_version', value=version)
+            self.session.execute(statement.on_conflict_do_update(index_elements=[DatabaseInfo.key], set_={'value': statement.excluded.value}))
+            self.session.commit()
+            self.events.publish(CollectionReloaded())
+            return True
+        except SQLAlchemyError:
+            self.session.rollback()
+            return False
+
+    def __upsert_clans__(self, clans):
+        """
+        Upserts clans together with their nations and imaginary gifts, existing clans get imaginary gift and nation of the new ones.
+        """
+        if not clans:
+            return
+        self.session.execute(sqlite_insert(Nation).on_conflict_do_nothing(), [{'name': name} for name in {clan['nation_name'] for clan in clans}])
+        self.session.execute(sqlite_insert(ImaginaryGift).on_conflict_do_nothing(), [{'name': name} for name in {clan['imaginary_gift_name'] for clan in clans}])
+        statement = sqlite_insert(Clan)
+        self.session.execute(statement.on_conflict_do_update(index_elements=[Clan.name], set_={'imaginary_gift_name': statement.excluded.imaginary_gift_name,
+                                                                                               'nation_name': statement.excluded.nation_name}), clans)
+
+    def vacuum(self, auto_vacuum: str = None):
+        """
+        Rebuilds database file. Mode of auto_vacuum ('NONE', 'FULL' or 'INCREMENTAL') of existing database can be changed only together with rebuild.
+        """
+        return self.__run_outside_transaction__(*([f'PRAGMA auto_vacuum = {auto_vacuum}'] if auto_vacuum is not None else []), 'VACUUM')
+
+    def analyze(self, limit: int = None):
+        return self.__run_outside_transaction__(f'PRAGMA analysis_limit = {int(limit or 0)}', 'ANALYZE')
+
+    def incremental_vacuum(self, pages: int = 0):
+        """
+        Runs incremental vacuum as script, because sqlite3 module steps other statements only once, which would release one page.
+        """
+        try:
+            self.session.commit()
+            with self.session.get_bind().connect() as connection:
+                connection.connection.driver_connection.executescript(f'PRAGMA incremental_vacuum({int(pages)});')
+            return True
+        except (SQLAlchemyError, sqlite3.Error):
+            self.session.rollback()
+            return False
+
+    def optimize(self):
+        return self.__run_outside_transaction__('PRAGMA optimize')
+
+    def __run_outside_transaction__(self, *statements: str):
+        """
+        Runs statements which SQLite does not allow inside of a transaction, one after another on the same connection.
+        """
+        try:
+            self.session.commit()
+            with self.session.get_bind().connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                for statement in statements:
+                    connection.exec_driver_sql(statement)
             return True
         except SQLAlchemyError:
             self.session.rollback()
@@ -0,0 +1,176 @@
+"""
+    This module provides in-memory analytics over the card collection.
+    Cards and their instances are loaded once into columnar NumPy arrays and every question is answered with vectorized operations.
+"""
+import numpy as np
+from sqlalchemy import event
+from modules.DAO import DAO
+
+NO_SHIELD = -1
+SENTINEL = -2
+# Label of nation and imaginary gift of cards whose clan is not in Clans table
+UNKNOWN = 'Unknown'
+
+NUMERIC_COLUMNS = ('grade', 'power', 'critical', 'shield')
+CATEGORICAL_COLUMNS = ('clan', 'nation', 'imaginary_gift', 'rarity')
+
+def encode(values):
+    """
+    Encodes values as categorical column.
+
+    Args:
+        values (List[str]): values of the column, None is encoded as UNKNOWN.
+
+    Returns:
+        Tuple[ndarray, ndarray]: sorted distinct categories and code of every value.
+    """
+    # Columns have few distinct values, so they are coded through a dictionary instead of sorting all values as objects
+    values = [UNKNOWN if value is None else value for value in values]
+    categories = sorted(set(values))
+    index = {category: code for code, category in enumerate(categories)}
+    return np.array(categories, dtype=object), np.fromiter((index[value] for value in values), dtype=np.int16, count=len(values))
+
+def integer_value(value):
+    """
+    Returns value as int, or None if it is not an integer number, ex. text stored in grade column.
+    """
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def label_texts(name: str, labels):
+    """
+    Returns labels of column as text, codes of shield column are turned back into 'None' and 'Sentinel'.
+    """
+    if name == 'shield':
+        return ['None' if label == NO_SHIELD else 'Sentinel' if label == SENTINEL else str(label) for label in labels.tolist()]
+    return [str(label) for label in labels.tolist()]
+
+def shield_value(shield):
+    if shield is None or shield == '':
+        return NO_SHIELD
+    try:
+        return int(shield)
+    except (TypeError, ValueError):
+        return SENTINEL
+
+class CollectionAnalytics():
+    """
+    Class representing columnar in-memory view of the collection.
+    Card attributes are stored once per card, instances are stored as (card, rarity, count) groups read directly from stacks in database, so every aggregate is a weighted bincount.
+    Data is loaded lazily and dropped after every commit of observed DAO session. Cards whose grade, power or critical is not an integer are left out together with their copies.
+
+    Attributes:
+        dao (DAO): Database Access Object whose commits invalidate loaded data.
+        loaded (bool): whether columns are up to date.
+        names (ndarray): names of all cards.
+        cards (Dict[str, ndarray]): per card columns: grade, power, critical, shield and codes of clan, nation and imaginary gift.
+        categories (Dict[str, ndarray]): categories of clan, nation, imaginary gift and rarity columns.
+        group_card (ndarray): index of card for every group of instances.
+        group_rarity (ndarray): code of rarity for every group of instances.
+        group_count (ndarray): number of instances in every group.
+
+    Methods:
+        invalidate -- drops loaded columns, they will be reloaded on next question.\n
+        load -- loads all columns from database.\n
+        column (ndarray) -- returns values or codes of column for every group of instances.\n
+        total (int) -- returns number of all instances.\n
+        count_by (Tuple[ndarray, ndarray]) -- returns distinct values of column and number of instances for each of them.\n
+        histogram (Tuple[ndarray, ndarray]) -- returns histogram of numeric column, optionally for every value of another column.\n
+        crosstab (Tuple[ndarray, ndarray, ndarray]) -- returns number of instances for every pair of values of two columns.
+    """
+    def __init__(self, dao: DAO):
+        self.dao = dao
+        self.loaded = False
+        event.listen(self.dao.session, 'after_commit', self.invalidate)
+
+    def invalidate(self, *args):
+        self.loaded = False
+
+    def load(self):
+        attributes = [(row[0], *map(integer_value, row[1:4]), *row[4:]) for row in self.dao.get_card_attributes()]
+        attributes = [row for row in attributes if None not in row[1:4]]
+        self.names = np.array([row[0] for row in attributes], dtype=object)
+        count = len(attributes)
+        self.cards = {
+            'grade': np.fromiter((row[1] for row in attributes), dtype=np.int8, count=count),
+            'power': np.fromiter((row[2] for row in attributes), dtype=np.int32, count=count),
+            'critical': np.fromiter((row[3] for row in attributes), dtype=np.int8, count=count),
+            'shield': np.fromiter((shield_value(row[4]) for row in attributes), dtype=np.int32, count=count),
+        }
+        self.categories = {}
+        for column, position in (('clan', 5), ('nation', 6), ('imaginary_gift', 7)):
+            self.categories[column], self.cards[column] = encode([row[position] for row in attributes])
+
+        index = {name: i for i, name in enumerate(self.names)}
+        groups = [row for row in self.dao.get_card_rarity_count() if row[0] in index]
+        self.group_card = np.fromiter((index[row[0]] for row in groups), dtype=np.int32, count=len(groups))
+        self.categories['rarity'], self.group_rarity = encode([row[1] for row in groups])
+        self.group_count = np.fromiter((row[2] for row in groups), dtype=np.int64, count=len(groups))
+        self.loaded = True
+
+    def __ensure_loaded__(self):
+        if not self.loaded:
+            self.load()
+
+    def column(self, name: str):
+        self.__ensure_loaded__()
+        if name == 'rarity':
+            return self.group_rarity
+        if name not in self.cards:
+            raise KeyError(f'Unknown column: {name}')
+        return self.cards[name][self.group_card]
+
+    def __codes__(self, name: str):
+        """
+        Returns labels of column and code of label for every group of instances.
+        """
+        self.__ensure_loaded__()
+        if name in CATEGORICAL_COLUMNS:
+            return self.categories[name], self.column(name)
+        labels, codes = np.unique(self.column(name), return_inverse=True)
+        return labels, codes
+
+    def total(self):
+        self.__ensure_loaded__()
+        return int(self.group_count.sum())
+
+    def count_by(self, name: str):
+        labels, codes = self.__codes__(name)
+        counts = np.bincount(codes, weights=self.group_count, minlength=len(labels)).astype(np.int64)
+        return labels, counts
+
+    def histogram(self, name: str, bins=10, by: str = None):
+        """
+        Creates histogram of numeric column weighted by number of instances.
+
+        Args:
+            name (str): numeric column.
+            bins (int | Sequence[int]): number of bins or their edges, same as in numpy.histogram.
+            by (str): column by which histogram is split, one histogram per distinct value.
+
+        Returns:
+            Tuple[ndarray, ndarray]: bin edges and counts. With 'by' counts have one row per value of that column and labels are returned as first element.
+        """
+        if name not in NUMERIC_COLUMNS:
+            raise KeyError(f'Column {name} is not numeric')
+        values = self.column(name)
+        edges = np.histogram_bin_edges(values, bins=bins)
+        if by is None:
+            counts, _ = np.histogram(values, bins=edges, weights=self.group_count)
+            return edges, counts.astype(np.int64)
+        labels, codes = self.__codes__(by)
+        bin_index = np.clip(np.searchsorted(edges, values, side='right') - 1, 0, len(edges) - 2)
+        inside = (values >= edges[0]) & (values <= edges[-1])
+        bins_count = len(edges) - 1
+        counts = np.bincount(codes[inside] * bins_count + bin_index[inside], weights=self.group_count[inside],
+                             minlength=len(labels) * bins_count)
+        return labels, edges, counts.astype(np.int64).reshape(len(labels), bins_count)
+
+    def crosstab(self, rows: str, columns: str):
+        row_labels, row_codes = self.__codes__(rows)
+        column_labels, column_codes = self.__codes__(columns)
+        table = np.bincount(row_codes.astype(np.int64) * len(column_labels) + column_codes, weights=self.group_count,
+                            minlength=len(row_labels) * len(column_labels))
+        return row_labels, column_labels, table.astype(np.int64).reshape(len(row_labels), len(column_labels))
@@ -0,0 +1,67 @@
+"""
+    This module is a benchmark of in-memory analytics. Columns are loaded once from a collection and every question of QUESTIONS is asked many times,
+    so time of loading and latency of vectorized counts, histograms and crosstabs are reported separately.
+    By default a synthetic collection of 200 000 cards with about a million copies is generated by filterbench module.
+"""
+import os
+import time
+from modules.DAO import DAO
+from modules.analytics import CollectionAnalytics
+from modules.filterbench import create_collection
+from modules.loadtest import percentile
+from modules.orm import get_engine, create_schema
+
+QUESTIONS = {
+    'copies by clan': lambda analytics: analytics.count_by('clan'),
+    'copies by shield': lambda analytics: analytics.count_by('shield'),
+    'power histogram': lambda analytics: analytics.histogram('power', 20),
+    'power histogram per grade': lambda analytics: analytics.histogram('power', 20, by='grade'),
+    'shield mix per clan': lambda analytics: analytics.crosstab('clan', 'shield'),
+    'rarity spread per nation': lambda analytics: analytics.crosstab('nation', 'rarity'),
+}
+
+def run_benchmark(dao: DAO, repeat: int = 20):
+    """
+    Loads columns of the collection and asks every question from QUESTIONS.
+
+    Returns:
+        Tuple[int, float, List[Tuple[str, float, float]]]: number of copies, time of loading in seconds and name, median and maximal latency in milliseconds of every question.
+    """
+    analytics = CollectionAnalytics(dao)
+    start = time.perf_counter()
+    analytics.load()
+    load_seconds = time.perf_counter() - start
+    results = []
+    for name, question in QUESTIONS.items():
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            question(analytics)
+            latencies.append(time.perf_counter() - start)
+        results.append((name, percentile(latencies, 0.5) * 1000, max(latencies) * 1000))
+    return analytics.total(), load_seconds, results
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark of in-memory analytics.')
+    parser.add_argument('--db', help='existing collection, by default synthetic collection is generated')
+    parser.add_argument('--cards', type=int, default=200000, help='number of cards of generated collection, every card has five copies on average')
+    parser.add_argument('--output', default='analyticsbench.db', help='path of generated collection')
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    if args.db:
+        if not os.path.exists(args.db):
+            parser.error(f'no collection database at {args.db}')
+        db_engine = get_engine(args.db)
+        create_schema(db_engine)
+        dao = DAO(db_engine)
+    else:
+        start = time.perf_counter()
+        dao = create_collection(args.output, args.cards)
+        print(f'Generated {args.cards} cards in {time.perf_counter() - start:.1f}s')
+    copies, load_seconds, results = run_benchmark(dao, args.repeat)
+    print(f'{copies} copies loaded in {load_seconds:.2f}s')
+    for name, median, maximum in results:
+        print(f'{name:28} p50 {median:7.2f} ms  max {maximum:7.2f} ms')
@@ -0,0 +1,390 @@
+"""
+    This module provides local HTTP/JSON API server over the collection, so scripts and other people can query it next to the desktop application.
+    Reads are served concurrently from a pool of DAO sessions, all writes go one at a time through a single DAO and GET responses are cached and validated with ETags.
+"""
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qs, unquote, urlencode
+from modules.DAO import DAO
+from modules.orm import get_engine, create_schema
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+CACHE_SIZE = 1024
+
+class ApiError(Exception):
+    """
+    Exception turned into JSON error response with given HTTP status.
+    """
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(message)
+        self.status = status
+
+def card_to_dict(card):
+    return {'name': card.name, 'grade': card.grade, 'power': card.power, 'critical': card.critical, 'shield': card.shield, 'clan': card.clan_name}
+
+def card_detail(card, dao: DAO):
+    return {**card_to_dict(card), 'nation': card.nation_name, 'imaginary_gift': card.imaginary_gift_name,
+            'stacks': [{'id': stack.id, 'rarity': stack.rarity, 'quantity': stack.quantity} for stack in dao.get_card_stacks(card.name)]}
+
+def collection_stats(dao: DAO):
+    """
+    Returns number of cards and distributions of card copies on grades, clans, nations, imaginary gifts, power and shield.
+    """
+    grades = dao.get_cards_grades_count()
+    return {
+        'cards': len(dao.get_all_cards()),
+        'instances': sum(count for _, count in grades),
+        'grades': {str(grade): count for grade, count in grades},
+        'clans': dict(dao.get_cards_clan_count()),
+        'nations': dict(dao.get_cards_nation_count()),
+        'imaginary_gifts': dict(dao.get_cards_gift_count()),
+        'power': {str(power): count for power, count in dao.get_cards_power_count()},
+        'shield': {str(shield): count for shield, count in dao.get_cards_shield_count()},
+    }
+
+def integer_parameter(parameters: dict, name: str, default: int, minimum: int = 0, maximum: int = None):
+    value = parameters.get(name, [None])[0]
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' has to be an integer")
+    if value < minimum or (maximum is not None and value > maximum):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' has to be between {minimum} and {maximum}")
+    return value
+
+def integer_value(data: dict, name: str, default: int = None):
+    """
+    Returns integer value of JSON body, given as number or text of integer number. Booleans and fractions are rejected.
+    """
+    value = data.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)) or (isinstance(value, float) and not value.is_integer()):
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' has to be an integer")
+    try:
+        return int(value)
+    except ValueError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, f"'{name}' has to be an integer")
+
+def shield_value(data: dict, default=None):
+    """
+    Returns shield of JSON body, which is an integer, 'Sentinel' or null.
+    """
+    if data.get('shield', default) in (None, 'Sentinel'):
+        return data.get('shield', default)
+    try:
+        return integer_value(data, 'shield', default)
+    except ApiError:
+        raise ApiError(HTTPStatus.BAD_REQUEST, "'shield' has to be an integer, 'Sentinel' or null")
+
+class SessionPool():
+    """
+    Class representing fixed pool of DAO objects used only for reading. Each DAO has its own session, so requests do not share transactions.
+
+    Attributes:
+        sessions (Queue[DAO]): idle DAO objects.
+
+    Methods:
+        acquire (ContextManager[DAO]) -- waits for idle DAO and returns it into the pool after use.
+    """
+    def __init__(self, db_engine, size: int):
+        self.sessions = queue.Queue()
+        for _ in range(size):
+            self.sessions.put(DAO(db_engine))
+
+    @contextmanager
+    def acquire(self):
+        dao = self.sessions.get()
+        try:
+            yield dao
+        finally:
+            # Ending the read transaction releases connection and makes next request see newest data
+            dao.session.rollback()
+            self.sessions.put(dao)
+
+    def close(self):
+        while not self.sessions.empty():
+            self.sessions.get().session.close()
+
+class ResponseCache():
+    """
+    Class representing cache of serialized GET responses.
+    Entries are valid for one version of the database, which changes after every write done through the server and whenever the database file is modified by another process (ex. desktop application).
+
+    Attributes:
+        db_path (str): path to the database file.
+        generation (int): number of writes done through the server.
+        entries (OrderedDict[str, Tuple]): version, ETag and body of every cached response, least recently used first.
+        max_entries (int): maximal number of cached responses.
+        lock (Lock): lock guarding entries and generation.
+
+    Methods:
+        version (Tuple) -- returns current version of the database.\n
+        get (Tuple[str, bytes] | None) -- returns ETag and body of response if it is still valid.\n
+        put (str) -- caches response and returns its ETag.\n
+        invalidate -- drops all cached responses after write.
+    """
+    def __init__(self, db_path: str, max_entries: int = CACHE_SIZE):
+        self.db_path = db_path
+        self.generation = 0
+        self.entries = OrderedDict()
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def version(self):
+        try:
+            stat = os.stat(self.db_path)
+            return self.generation, stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return self.generation, None, None
+
+    def get(self, key: str, version):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key: str, version, body: bytes):
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        with self.lock:
+            # Response computed before a write finished belongs to an older version and must not be cached
+            if version[0] == self.generation:
+                self.entries[key] = (version, etag, body)
+                self.entries.move_to_end(key)
+                while len(self.entries) > self.max_entries:
+                    self.entries.popitem(last=False)
+        return etag
+
+    def invalidate(self):
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """
+    Class handling one HTTP connection. Routes are matched against ROUTES and answered with JSON documents.
+
+    Routes:
+        GET /cards -- page of cards, filtered by 'clan', 'grade' and part of name 'q', paginated with 'limit' and 'offset'.\n
+        GET /cards/{name} -- card with its nation, imaginary gift and stacks of copies of every rarity.\n
+        GET /search -- names of cards containing 'q', at most 'limit' of them.\n
+        GET /clans -- all clans with their nations and imaginary gifts.\n
+        GET /stats -- statistics of the collection.\n
+        GET /stacks/{id} -- stack of copies of a card with one rarity.\n
+        POST /stacks -- adds copy of a card into stack of its rarity.\n
+        PUT /stacks/{id} -- edits one copy from the stack, omitted values are kept.\n
+        DELETE /stacks/{id} -- deletes one copy from the stack.
+    """
+    server_version = 'VanguardAPI/1.0'
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, with Nagle's algorithm every response would wait for delayed ACK of the client
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ('GET', re.compile(r'^/cards$'), 'list_cards'),
+        ('GET', re.compile(r'^/cards/(?P<name>.+)$'), 'get_card'),
+        ('GET', re.compile(r'^/search$'), 'search'),
+        ('GET', re.compile(r'^/clans$'), 'list_clans'),
+        ('GET', re.compile(r'^/stats$'), 'stats'),
+        ('GET', re.compile(r'^/stacks/(?P<id>\d+)$'), 'get_stack'),
+        ('POST', re.compile(r'^/stacks$'), 'add_copy'),
+        ('PUT', re.compile(r'^/stacks/(?P<id>\d+)$'), 'edit_copy'),
+        ('DELETE', re.compile(r'^/stacks/(?P<id>\d+)$'), 'delete_copy'),
+    ]
+
+    def do_GET(self):
+        self.__dispatch__('GET')
+
+    def do_POST(self):
+        self.__dispatch__('POST')
+
+    def do_PUT(self):
+        self.__dispatch__('PUT')
+
+    def do_DELETE(self):
+        self.__dispatch__('DELETE')
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def __dispatch__(self, method: str):
+        url = urlsplit(self.path)
+        path = unquote(url.path).rstrip('/') or '/'
+        try:
+            # Body is read before routing, so connection stays usable even if the request is rejected
+            data = self.__read_body__() if method != 'GET' else None
+            allowed = False
+            for route_method, pattern, name in self.ROUTES:
+                match = pattern.match(path)
+                if match is None:
+                    continue
+                allowed = True
+                if route_method == method:
+                    break
+            else:
+                raise ApiError(HTTPStatus.METHOD_NOT_ALLOWED if allowed else HTTPStatus.NOT_FOUND, f'No route for {method} {path}')
+
+            parameters = parse_qs(url.query)
+            if method == 'GET':
+                self.__cached_get__(name, match.groupdict(), parameters)
+            else:
+                with self.server.write_lock:
+                    try:
+                        status, result = getattr(self, name)(self.server.write_dao, data, **match.groupdict())
+                    finally:
+                        self.server.write_dao.session.rollback()
+                        self.server.cache.invalidate()
+                self.__send__(status, json.dumps(result, ensure_ascii=False).encode('utf-8'))
+        except ApiError as error:
+            self.__send__(error.status, json.dumps({'error': str(error)}).encode('utf-8'))
+        except Exception as error:
+            self.__send__(HTTPStatus.INTERNAL_SERVER_ERROR, json.dumps({'error': f'{type(error).__name__}: {error}'}).encode('utf-8'))
+
+    def __cached_get__(self, name: str, arguments: dict, parameters: dict):
+        cache = self.server.cache
+        version = cache.version()
+        cached = cache.get(self.path, version)
+        if cached is None:
+            with self.server.readers.acquire() as dao:
+                result = getattr(self, name)(dao, parameters, **arguments)
+            body = json.dumps(result, ensure_ascii=False).encode('utf-8')
+            etag = cache.put(self.path, version, body)
+        else:
+            etag, body = cached
+        if etag in (tag.strip() for tag in self.headers.get('If-None-Match', '').split(',')):
+            self.__send__(HTTPStatus.NOT_MODIFIED, b'', etag)
+        else:
+            self.__send__(HTTPStatus.OK, body, etag)
+
+    def __read_body__(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length == 0:
+            return {}
+        try:
+            data = json.loads(self.rfile.read(length))
+        except ValueError:
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Body has to be a JSON object')
+        if not isinstance(data, dict):
+            raise ApiError(HTTPStatus.BAD_REQUEST, 'Body has to be a JSON object')
+        return data
+
+    def __send__(self, status: HTTPStatus, body: bytes, etag: str = None):
+        self.send_response(status)
+        if etag is not None:
+            self.send_header('ETag', etag)
+            self.send_header('Cache-Control', 'no-cache')
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.send_header('Content-Type', 'application/json; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if status != HTTPStatus.NOT_MODIFIED:
+            self.wfile.write(body)
+
+    def list_cards(self, dao: DAO, parameters: dict):
+        limit = integer_parameter(parameters, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        offset = integer_parameter(parameters, 'offset', 0)
+        clan = parameters.get('clan', ['All Clans'])[0]
+        grade = parameters.get('grade', ['All'])[0]
+        if grade != 'All' and not grade.isdigit():
+            raise ApiError(HTTPStatus.BAD_REQUEST, "'grade' has to be an integer")
+        total, cards = dao.get_cards_page(clan, grade, parameters.get('q', [None])[0], limit, offset)
+        following = None
+        if offset + limit < total:
+            following = '/cards?' + urlencode({**{key: values[0] for key, values in parameters.items()}, 'limit': limit, 'offset': offset + limit})
+        return {'total': total, 'limit': limit, 'offset': offset, 'next': following, 'items': [card_to_dict(card) for card in cards]}
+
+    def get_card(self, dao: DAO, parameters: dict, name: str):
+        card = dao.get_card(name)
+        if card is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f'No card named {name}')
+        return card_detail(card, dao)
+
+    def search(self, dao: DAO, parameters: dict):
+        phrase = parameters.get('q', [''])[0]
+        if not phrase:
+            raise ApiError(HTTPStatus.BAD_REQUEST, "'q' is required")
+        limit = integer_parameter(parameters, 'limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+        return {'names': [card.name for card in dao.search_cards(phrase, limit)]}
+
+    def list_clans(self, dao: DAO, parameters: dict):
+        return {'clans': [{'name': clan.name, 'nation': clan.nation_name, 'imaginary_gift': clan.imaginary_gift_name}
+                          for clan in sorted(dao.get_all_clans(), key=lambda clan: clan.name)]}
+
+    def stats(self, dao: DAO, parameters: dict):
+        return collection_stats(dao)
+
+    def get_stack(self, dao: DAO, parameters: dict, id: str):
+        stack = dao.get_card_stack(int(id))
+        if stack is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f'No card stack with id {id}')
+        return {'id': stack.id, 'rarity': stack.rarity, 'quantity': stack.quantity, 'card': card_to_dict(dao.get_card(stack.card_name))}
+
+    def add_copy(self, dao: DAO, data: dict):
+        missing = [key for key in ('name', 'grade', 'power', 'clan') if key not in data]
+        if missing:
+            raise ApiError(HTTPStatus.BAD_REQUEST, f"Missing values: {', '.join(missing)}")
+        grade, power, critical, shield = integer_value(data, 'grade'), integer_value(data, 'power'), integer_value(data, 'critical', 1), shield_value(data)
+        if not dao.add_card(data['name'], grade, power, critical, shield, data['clan'], data.get('rarity', 'C')):
+            raise ApiError(HTTPStatus.CONFLICT, 'Cannot add card')
+        return HTTPStatus.CREATED, card_detail(dao.get_card(data['name']), dao)
+
+    def edit_copy(self, dao: DAO, data: dict, id: str):
+        stack = dao.get_card_stack(int(id))
+        if stack is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f'No card stack with id {id}')
+        card = dao.get_card(stack.card_name)
+        name = data.get('name', card.name)
+        grade, power, critical = integer_value(data, 'grade', card.grade), integer_value(data, 'power', card.power), integer_value(data, 'critical', card.critical)
+        if not dao.update_card(stack.id, name, grade, power, critical, shield_value(data, card.shield), data.get('clan', card.clan_name), data.get('rarity', stack.rarity)):
+            raise ApiError(HTTPStatus.CONFLICT, 'Cannot edit card')
+        return HTTPStatus.OK, card_detail(dao.get_card(name), dao)
+
+    def delete_copy(self, dao: DAO, data: dict, id: str):
+        if dao.get_card_stack(int(id)) is None:
+            raise ApiError(HTTPStatus.NOT_FOUND, f'No card stack with id {id}')
+        if not dao.delete_card(int(id)):
+            raise ApiError(HTTPStatus.CONFLICT, 'Cannot delete card')
+        return HTTPStatus.OK, {'deleted': int(id)}
+
+class ApiServer(ThreadingHTTPServer):
+    """
+    Class representing the API server. Every connection is handled in its own thread.
+
+    Attributes:
+        db_engine (Engine): engine with one connection for every reader and one for the writer.
+        readers (SessionPool): DAO objects serving GET requests.
+        write_dao (DAO): the only DAO which changes the collection.
+        write_lock (Lock): lock serializing all writes.
+        cache (ResponseCache): cache of GET responses.
+        verbose (bool): whether every request should be logged.
+    """
+    daemon_threads = True
+    request_queue_size = 64
+
+    def __init__(self, address=('127.0.0.1', 8080), db_path: str = 'vanguard.db', readers: int = 4, verbose: bool = False):
+        self.db_engine = get_engine(db_path, pool_size=readers + 1)
+        create_schema(self.db_engine)
+        self.readers = SessionPool(self.db_engine, readers)
+        self.write_dao = DAO(self.db_engine)
+        self.write_lock = threading.Lock()
+        self.cache = ResponseCache(db_path)
+        self.verbose = verbose
+        super().__init__(address, ApiRequestHandler)
+
+    def server_close(self):
+        super().server_close()
+        self.readers.close()
+        self.write_dao.session.close()
+        self.db_engine.dispose()
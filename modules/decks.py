@@ -0,0 +1,190 @@
+"""
+    This module checks decks against deck building rules and the collection.
+    Attributes of every card, number of owned copies and number of copies used by all decks are kept in memory and updated from change events, so checking a deck touches only its own entries and runs no query.
+"""
+from collections import Counter
+from typing import NamedTuple
+from modules.DAO import DAO
+from modules.events import (EventBus, CardAdded, CardUpdated, CardDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted, ClanAdded, CollectionReloaded,
+                            DeckAdded, DeckEntryChanged, DeckDeleted)
+from modules.filters import SENTINEL
+from modules.models import DeckRecord
+
+# Grade 0 cards with at least this shield are triggers, weaker ones are starters
+TRIGGER_SHIELD = 10000
+
+class DeckRules(NamedTuple):
+    """
+    Deck building rules, grade_limits maps grade to maximal number of cards of that grade.
+    """
+    deck_size: int = 50
+    max_copies: int = 4
+    triggers: int = 16
+    max_sentinels: int = 4
+    grade_limits: dict = {}
+
+class CardTraits(NamedTuple):
+    """
+    Attributes of a card needed by deck building rules.
+    """
+    grade: int
+    shield: int
+    clan_name: str
+    nation_name: str
+    trigger: bool
+    sentinel: bool
+
+def card_traits(grade: int, shield, clan_name: str, nation_name: str):
+    sentinel = shield == SENTINEL
+    try:
+        value = int(shield) if shield is not None and not sentinel else 0
+    except (TypeError, ValueError):
+        value = 0
+    return CardTraits(int(grade), value, clan_name, nation_name, int(grade) == 0 and value >= TRIGGER_SHIELD, sentinel)
+
+class DeckReport(NamedTuple):
+    """
+    Result of checking a deck. Deck is valid when it has no problems, shared holds copies which are owned, but not in sufficient number to build all decks at once.
+    """
+    deck: DeckRecord
+    size: int
+    grades: dict
+    triggers: int
+    sentinels: int
+    shield_total: int
+    missing: dict
+    shared: dict
+    problems: list
+
+    def is_valid(self):
+        return not self.problems
+
+    def as_dict(self):
+        return {**self._asdict(), 'deck': self.deck.name, 'valid': self.is_valid()}
+
+class DeckValidator():
+    """
+    Class representing checker of decks with precomputed availability of cards.
+
+    Attributes:
+        dao (DAO): Database Access Object.
+        rules (DeckRules): checked deck building rules.
+        traits (Dict[str, CardTraits]): attributes of every card of the collection.
+        clans (Dict[str, str]): nation of every clan.
+        owned (Counter): number of owned copies of every card.
+        used (Counter): number of copies of every card used by all decks together.
+        decks (Dict[int, DeckRecord]): all decks.
+        entries (Dict[int, Dict[str, int]]): number of copies of every card in every deck.
+
+    Methods:
+        load -- loads cards, their copies and decks from database.\n
+        validate (DeckReport) -- checks deck with given id.\n
+        validate_all (List[DeckReport]) -- checks all decks.
+    """
+    def __init__(self, dao: DAO, rules: DeckRules = DeckRules(), events: EventBus = None):
+        self.dao = dao
+        self.rules = rules
+        self.load()
+        if events is not None:
+            events.subscribe(CardAdded, lambda event: self.__set_traits__(event.card))
+            events.subscribe(CardUpdated, self.__card_updated__)
+            events.subscribe(CardDeleted, self.__card_deleted__)
+            events.subscribe(InstanceAdded, lambda event: self.owned.update({event.card.name: 1}))
+            events.subscribe(InstanceUpdated, self.__instance_updated__)
+            events.subscribe(InstanceDeleted, lambda event: self.owned.subtract({event.card.name: 1}))
+            events.subscribe(ClanAdded, lambda event: self.clans.update({event.name: event.nation_name}))
+            events.subscribe(DeckAdded, self.__deck_added__)
+            events.subscribe(DeckEntryChanged, self.__deck_entry_changed__)
+            events.subscribe(DeckDeleted, self.__deck_deleted__)
+            events.subscribe(CollectionReloaded, lambda event: self.load())
+
+    def load(self):
+        self.traits = {card.name: card_traits(card.grade, card.shield, card.clan_name, card.nation_name) for card in self.dao.get_all_cards()}
+        self.clans = {clan.name: clan.nation_name for clan in self.dao.get_all_clans()}
+        self.owned = Counter(dict(self.dao.get_card_counts()))
+        self.decks = {deck.id: deck for deck in self.dao.get_all_decks()}
+        self.entries = {deck_id: {} for deck_id in self.decks}
+        self.used = Counter()
+        for entry in self.dao.get_all_deck_entries():
+            self.entries.setdefault(entry.deck_id, {})[entry.card_name] = entry.quantity
+            self.used[entry.card_name] += entry.quantity
+
+    def validate(self, deck_id: int):
+        """
+        Checks size of the deck, copies of every card, triggers, sentinels, grade limits, clan and nation of cards and whether enough copies are owned.
+
+        Returns:
+            DeckReport: result of the check, or None if there is no such deck.
+        """
+        deck = self.decks.get(deck_id)
+        if deck is None:
+            return None
+        rules = self.rules
+        grades, missing, shared, problems = Counter(), {}, {}, []
+        size = triggers = sentinels = shield_total = 0
+        for name, quantity in sorted(self.entries.get(deck_id, {}).items()):
+            size += quantity
+            if quantity > rules.max_copies:
+                problems.append(f'{quantity} copies of {name}, at most {rules.max_copies} allowed')
+            owned = max(self.owned.get(name, 0), 0)
+            if owned < quantity:
+                missing[name] = quantity - owned
+            elif owned < self.used[name]:
+                shared[name] = self.used[name] - owned
+            traits = self.traits.get(name)
+            if traits is None:
+                problems.append(f'{name} is not in the collection')
+                continue
+            grades[traits.grade] += quantity
+            triggers += quantity * traits.trigger
+            sentinels += quantity * traits.sentinel
+            shield_total += quantity * traits.shield
+            if deck.clan_name is not None and traits.clan_name != deck.clan_name:
+                problems.append(f'{name} is not from clan {deck.clan_name}')
+            elif deck.nation_name is not None and traits.nation_name != deck.nation_name:
+                problems.append(f'{name} is not from nation {deck.nation_name}')
+        if size != rules.deck_size:
+            problems.append(f'Deck has {size} cards, {rules.deck_size} required')
+        if triggers != rules.triggers:
+            problems.append(f'Deck has {triggers} triggers, {rules.triggers} required')
+        if sentinels > rules.max_sentinels:
+            problems.append(f'Deck has {sentinels} sentinels, at most {rules.max_sentinels} allowed')
+        for grade, limit in rules.grade_limits.items():
+            if grades[grade] > limit:
+                problems.append(f'Deck has {grades[grade]} cards of grade {grade}, at most {limit} allowed')
+        problems += [f'Missing {count} copies of {name}' for name, count in missing.items()]
+        return DeckReport(deck, size, dict(sorted(grades.items())), triggers, sentinels, shield_total, missing, shared, problems)
+
+    def validate_all(self):
+        return [self.validate(deck_id) for deck_id in sorted(self.decks, key=lambda deck_id: self.decks[deck_id].name)]
+
+    def __set_traits__(self, card):
+        self.traits[card.name] = card_traits(card.grade, card.shield, card.clan_name, self.clans.get(card.clan_name))
+
+    def __card_updated__(self, event: CardUpdated):
+        self.__set_traits__(event.new)
+
+    def __card_deleted__(self, event: CardDeleted):
+        self.traits.pop(event.card.name, None)
+        self.owned.pop(event.card.name, None)
+
+    def __instance_updated__(self, event: InstanceUpdated):
+        self.owned[event.old_card.name] -= 1
+        self.owned[event.card.name] += 1
+
+    def __deck_added__(self, event: DeckAdded):
+        self.decks[event.id] = DeckRecord(*event)
+        self.entries[event.id] = {}
+
+    def __deck_entry_changed__(self, event: DeckEntryChanged):
+        entries = self.entries.setdefault(event.deck_id, {})
+        self.used[event.card_name] += event.quantity - entries.get(event.card_name, 0)
+        if event.quantity > 0:
+            entries[event.card_name] = event.quantity
+        else:
+            entries.pop(event.card_name, None)
+
+    def __deck_deleted__(self, event: DeckDeleted):
+        self.decks.pop(event.id, None)
+        for name, quantity in self.entries.pop(event.id, {}).items():
+            self.used[name] -= quantity
@@ -0,0 +1,119 @@
+"""
+    This module provides publish/subscribe bus of typed change events.
+    DAO publishes events describing every committed change, GUI components subscribe to events they display and apply only the change instead of reloading everything.
+"""
+from collections import defaultdict
+from typing import Callable, NamedTuple, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from modules.filters import CardFilter
+
+class CardData(NamedTuple):
+    """
+    Snapshot of card attributes as stored in database, carried by events so subscribers don't have to query it again.
+    """
+    name: str
+    grade: int
+    power: int
+    critical: int
+    shield: int | str | None
+    clan_name: str
+
+class CardAdded(NamedTuple):
+    card: CardData
+
+class CardUpdated(NamedTuple):
+    old: CardData
+    new: CardData
+
+class CardDeleted(NamedTuple):
+    card: CardData
+
+# copy events carry id of the stack which received or lost the copy
+class InstanceAdded(NamedTuple):
+    id: int
+    card: CardData
+    rarity: str
+
+class InstanceUpdated(NamedTuple):
+    id: int
+    old_card: CardData
+    old_rarity: str
+    card: CardData
+    rarity: str
+
+class InstanceDeleted(NamedTuple):
+    id: int
+    card: CardData
+    rarity: str
+
+class ClanAdded(NamedTuple):
+    name: str
+    imaginary_gift_name: str
+    nation_name: str
+
+class DeckAdded(NamedTuple):
+    id: int
+    name: str
+    clan_name: str | None
+    nation_name: str | None
+
+class DeckEntryChanged(NamedTuple):
+    """
+    Number of copies of a card in a deck was set, quantity 0 means that card was removed from the deck.
+    """
+    deck_id: int
+    card_name: str
+    quantity: int
+
+class DeckDeleted(NamedTuple):
+    id: int
+
+class CollectionReloaded(NamedTuple):
+    """
+    Published after bulk changes (imports, synchronization, reference data), after which subscribers should load their state again.
+    """
+
+# GUI events, published by components themselves
+class CardSelected(NamedTuple):
+    name: str
+
+class PlotSelected(NamedTuple):
+    plot: str
+
+class FilterApplied(NamedTuple):
+    """
+    Published by filter panel, empty filter means that only selection of clan and grade applies.
+    """
+    card_filter: 'CardFilter'
+
+class EventBus():
+    """
+    Class representing synchronous event bus. Subscribers are called in order of subscription, inside of the thread which published the event.
+
+    Attributes:
+        subscribers (Dict[type, List[Callable]]): subscribers of every type of event.
+
+    Methods:
+        subscribe -- registers callback called with every published event of given type.\n
+        unsubscribe -- removes registered callback.\n
+        publish -- calls all subscribers of type of given event.\n
+        publish_all -- publishes events one by one in given order.
+    """
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+
+    def subscribe(self, event_type: type, callback: Callable):
+        self.subscribers[event_type].append(callback)
+
+    def unsubscribe(self, event_type: type, callback: Callable):
+        if callback in self.subscribers[event_type]:
+            self.subscribers[event_type].remove(callback)
+
+    def publish(self, event):
+        for callback in list(self.subscribers[type(event)]):
+            callback(event)
+
+    def publish_all(self, events):
+        for event in events:
+            self.publish(event)
@@ -0,0 +1,269 @@
+"""
+    This module is used for exchanging collections with other tools. Tables can be exported into and imported from CSV, JSON Lines and Parquet files.
+    All reads and writes are done in chunks, so size of the collection does not affect memory usage.
+"""
+import csv
+import json
+import os
+import time
+from collections import Counter
+from sqlalchemy import Integer
+from modules.DAO import DAO
+from modules.orm import Nation, ImaginaryGift, Clan, Card, CardStack, CardCopy, Printing
+from modules.loader import chunked
+
+# Tables in order in which they have to be imported
+TABLES = {
+    'Nations': Nation,
+    'ImaginaryGifts': ImaginaryGift,
+    'Clans': Clan,
+    'Cards': Card,
+    'CardStacks': CardStack,
+    'CardCopies': CardCopy,
+    'Printings': Printing,
+}
+# Tables exported by older versions -> table into which they are imported
+LEGACY_TABLES = {'CardInstances': 'CardStacks'}
+FORMATS = ('csv', 'jsonl', 'parquet')
+CHUNK_SIZE = 10000
+# Integer columns which can also hold text, shield of a card can be 'Sentinel'
+MIXED_COLUMNS = {'shield'}
+
+class TransferStats():
+    """
+    Class representing summary of export or import of one table.
+
+    Attributes:
+        table (str): name of the table.
+        path (str): path to the file.
+        rows (int): number of transferred rows.
+        seconds (float): duration of the transfer.
+
+    Methods:
+        rows_per_second (float) -- returns throughput of the transfer.\n
+        as_dict (dict) -- returns summary as dictionary.
+    """
+    def __init__(self, table: str, path: str):
+        self.table = table
+        self.path = path
+        self.rows = 0
+        self.seconds = 0.0
+
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def as_dict(self):
+        return {'table': self.table, 'path': self.path, 'rows': self.rows, 'seconds': round(self.seconds, 3),
+                'rows_per_second': round(self.rows_per_second(), 1)}
+
+    def __repr__(self):
+        return f'{self.table}: {self.rows} rows in {self.seconds:.2f}s ({self.rows_per_second():.0f} rows/s)'
+
+def table_path(directory: str, table: str, file_format: str):
+    return os.path.join(directory, f'{table}.{file_format}')
+
+def import_pyarrow():
+    """
+    Imports pyarrow, which is needed only for Parquet files.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError('Parquet files require pyarrow package: pip install pyarrow')
+    return pyarrow
+
+def converter(model, skip=()):
+    """
+    Creates function converting values read from files into types of table columns. Empty values become None.
+
+    Args:
+        model (Base): ORM class of the table.
+        skip (Tuple[str]): columns which are left out of converted rows.
+
+    Returns:
+        Callable[[dict], dict]: converting function.
+    """
+    columns = [(column.name, isinstance(column.type, Integer)) for column in model.__table__.columns if column.name not in skip]
+
+    def convert(row: dict):
+        converted = {}
+        for name, integer in columns:
+            value = row.get(name)
+            if value == '':
+                value = None
+            elif integer and value.__class__ is str:
+                try:
+                    value = int(value)
+                except ValueError:
+                    pass
+            converted[name] = value
+        return converted
+    return convert
+
+def write_csv(path: str, columns, chunks):
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(columns)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            yield len(chunk)
+
+def write_jsonl(path: str, columns, chunks):
+    with open(path, 'w', encoding='utf-8') as file:
+        for chunk in chunks:
+            file.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in chunk)
+            yield len(chunk)
+
+def write_parquet(path: str, columns, chunks, model):
+    pyarrow = import_pyarrow()
+    schema = pyarrow.schema([(column.name, pyarrow.int64() if isinstance(column.type, Integer) and column.name not in MIXED_COLUMNS else pyarrow.string())
+                             for column in model.__table__.columns])
+    mixed = [columns.index(column) for column in MIXED_COLUMNS if column in columns]
+    with pyarrow.parquet.ParquetWriter(path, schema) as writer:
+        for chunk in chunks:
+            if mixed:
+                chunk = [tuple(str(value) if i in mixed and value is not None else value for i, value in enumerate(row)) for row in chunk]
+            writer.write_table(pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in chunk], schema=schema))
+            yield len(chunk)
+
+def read_csv(path: str, chunk_size: int):
+    with open(path, encoding='utf-8', newline='') as file:
+        yield from chunked(csv.DictReader(file), chunk_size)
+
+def read_jsonl(path: str, chunk_size: int):
+    with open(path, encoding='utf-8') as file:
+        yield from chunked((json.loads(line) for line in file if line.strip()), chunk_size)
+
+def read_parquet(path: str, chunk_size: int):
+    pyarrow = import_pyarrow()
+    for batch in pyarrow.parquet.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+def export_table(dao: DAO, table: str, path: str, file_format: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Exports one table into a file, streaming rows from database in chunks.
+
+    Args:
+        dao (DAO): Database Access Object.
+        table (str): name of the table.
+        path (str): path to the file.
+        file_format (str): 'csv', 'jsonl' or 'parquet'.
+        chunk_size (int): number of rows read and written at once.
+
+    Returns:
+        TransferStats: summary of the export.
+    """
+    model = TABLES[table]
+    columns = [column.name for column in model.__table__.columns]
+    chunks = dao.stream_rows(model, chunk_size)
+    if file_format == 'csv':
+        written = write_csv(path, columns, chunks)
+    elif file_format == 'jsonl':
+        written = write_jsonl(path, columns, chunks)
+    elif file_format == 'parquet':
+        written = write_parquet(path, columns, chunks, model)
+    else:
+        raise ValueError(f'Unknown format: {file_format}')
+
+    stats = TransferStats(table, path)
+    start = time.perf_counter()
+    for rows in written:
+        stats.rows += rows
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def new_copies(rows, existing: Counter):
+    """
+    Returns copies which are not in collection yet. Every existing copy, counted by (card_name, rarity, note), matches one copy of the rows.
+    """
+    new = []
+    for row in rows:
+        key = (row['card_name'], row['rarity'], row['note'])
+        if existing[key] > 0:
+            existing[key] -= 1
+        else:
+            new.append(row)
+    return new
+
+def import_table(dao: DAO, table: str, path: str, file_format: str, chunk_size: int = CHUNK_SIZE, replace: bool = False):
+    """
+    Imports one table from a file in chunks, each chunk is saved in one transaction.
+    Rows whose primary key already exists are skipped. Stacks and copies always get new ids and quantities of already existing stacks are increased,
+    so they can be imported into non-empty collection. Importing the same export twice therefore doubles the copies, unless replace is True:
+    then every stack of the file gets quantity from the file, copies with extra data equal to already existing ones are skipped and other stacks are kept. CardInstances files of older versions are imported as stacks, one copy per row.
+    Owned copies of printings are counted again from stacks of the collection.
+
+    Args:
+        dao (DAO): Database Access Object.
+        table (str): name of the table.
+        path (str): path to the file.
+        file_format (str): 'csv', 'jsonl' or 'parquet'.
+        chunk_size (int): number of rows read and written at once.
+        replace (bool): whether quantities of existing stacks should be replaced by quantities from the file instead of increased.
+
+    Raises:
+        IOError: if chunk could not be saved to database.
+
+    Returns:
+        TransferStats: summary of the import.
+    """
+    model = TABLES[LEGACY_TABLES.get(table, table)]
+    if file_format == 'csv':
+        chunks = read_csv(path, chunk_size)
+    elif file_format == 'jsonl':
+        chunks = read_jsonl(path, chunk_size)
+    elif file_format == 'parquet':
+        chunks = read_parquet(path, chunk_size)
+    else:
+        raise ValueError(f'Unknown format: {file_format}')
+
+    convert = converter(model, skip=('id',) if model in (CardStack, CardCopy) else ('owned',) if model is Printing else ())
+    if table in LEGACY_TABLES:
+        convert = lambda row: {'card_name': row['card_name'], 'rarity': row['rarity'], 'quantity': 1}
+    # Stack can be spread over many chunks of legacy files, so replaced quantities are saved only when whole file was read
+    totals = Counter()
+    existing = Counter(row[1:] for rows in dao.stream_rows(CardCopy) for row in rows) if replace and model is CardCopy else Counter()
+    stats = TransferStats(table, path)
+    start = time.perf_counter()
+    for chunk in chunks:
+        rows = [convert(row) for row in chunk]
+        if existing:
+            rows = new_copies(rows, existing)
+        if replace and model is CardStack:
+            for row in rows:
+                totals[(row['card_name'], row['rarity'])] += int(row['quantity'])
+            saved = True
+        else:
+            saved = dao.add_stacks(rows) if model is CardStack else dao.add_printings(rows) if model is Printing else dao.insert_rows(model, rows)
+        if not saved:
+            raise IOError(f'Could not import rows {stats.rows + 1}-{stats.rows + len(rows)} of {path}')
+        stats.rows += len(rows)
+    if totals and not dao.add_stacks([{'card_name': name, 'rarity': rarity, 'quantity': quantity} for (name, rarity), quantity in totals.items()], replace=True):
+        raise IOError(f'Could not import stacks of {path}')
+    stats.seconds = time.perf_counter() - start
+    return stats
+
+def export_collection(dao: DAO, directory: str, file_format: str = 'csv', tables=TABLES, chunk_size: int = CHUNK_SIZE):
+    """
+    Exports tables into directory, one file per table named after the table.
+
+    Returns:
+        List[TransferStats]: summary of export of every table.
+    """
+    os.makedirs(directory, exist_ok=True)
+    return [export_table(dao, table, table_path(directory, table, file_format), file_format, chunk_size) for table in TABLES if table in tables]
+
+def import_collection(dao: DAO, directory: str, file_format: str = 'csv', tables=TABLES, chunk_size: int = CHUNK_SIZE, replace: bool = False):
+    """
+    Imports tables from files in directory created by export_collection. Tables whose file is missing are skipped.
+    Copies are added to the collection, unless replace is True, see import_table.
+
+    Returns:
+        List[TransferStats]: summary of import of every table.
+    """
+    found = [table for table in TABLES if table in tables and os.path.exists(table_path(directory, table, file_format))]
+    for legacy, table in LEGACY_TABLES.items():
+        if table in tables and table not in found and os.path.exists(table_path(directory, legacy, file_format)):
+            found.insert(found.index('CardCopies') if 'CardCopies' in found else len(found), legacy)
+    return [import_table(dao, table, table_path(directory, table, file_format), file_format, chunk_size, replace) for table in found]
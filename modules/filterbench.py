@@ -0,0 +1,122 @@
+"""
+    This module is a benchmark of filtering cards. Multi-predicate filters are run many times against a collection and latency percentiles together with query plans are reported.
+    By default a synthetic collection with given number of cards is generated, so results don't depend on size of one's own collection.
+"""
+import os
+import random
+import time
+from modules.DAO import DAO, CARD_COLUMNS
+from modules.filters import CardFilter, SENTINEL
+from modules.loader import Loader
+from modules.loadtest import percentile
+from modules.orm import Card, Clan, CardStack, get_engine, create_schema
+from sqlalchemy import select, func, text
+
+RARITIES = ('C', 'R', 'RR', 'RRR', 'VR', 'SP')
+SHIELDS = (None, 0, 5000, 10000, 15000, SENTINEL)
+# Filters typical for browsing a large collection
+QUERIES = {
+    'clan, grade': lambda: CardFilter().clan('Kagero').grade(3),
+    'clan, grade, power range': lambda: CardFilter().clan('Kagero').grade(2).power(9000, 11000),
+    'grade, power, sorted by power': lambda: CardFilter().grade(3).power(minimum=13000).order_by('power', True),
+    'sentinels of a nation': lambda: CardFilter().sentinel().nation('Dragon Empire'),
+    'shield, critical': lambda: CardFilter().shield(15000).critical(1),
+    'rarity, grade': lambda: CardFilter().rarity('SP').grade(3),
+    'imaginary gift, name': lambda: CardFilter().imaginary_gift('Force').name_contains('dragon'),
+    'first page sorted by nation': lambda: CardFilter().power(minimum=10000).order_by('nation'),
+}
+
+def create_collection(path: str, cards: int = 100000, seed: int = 0):
+    """
+    Creates database with reference data and given number of random cards, every card has one to three stacks of copies.
+
+    Returns:
+        DAO: object bound to created database.
+    """
+    if os.path.exists(path):
+        os.remove(path)
+    db_engine = get_engine(path)
+    create_schema(db_engine)
+    dao = DAO(db_engine)
+    if not Loader(dao).load_basic_data():
+        raise IOError('Could not seed reference data')
+    clans = [clan.name for clan in dao.get_all_clans()]
+    generator = random.Random(seed)
+    words = ['Dragon', 'Knight', 'Angel', 'Blaster', 'Wyvern', 'Sage', 'Maiden', 'Lord', 'Beast', 'Seraph', 'Blade', 'Star']
+    rows, stacks = [], []
+    for number in range(cards):
+        grade = generator.choice((0, 0, 1, 1, 2, 2, 3, 4))
+        name = f'{generator.choice(words)} {generator.choice(words)} {number}'
+        rows.append({'name': name, 'grade': grade, 'power': 5000 + 1000 * generator.randrange(grade * 2 + 1, grade * 2 + 9), 'critical': generator.choice((1, 1, 1, 2)),
+                     'shield': generator.choice(SHIELDS) if grade < 3 else None, 'clan_name': generator.choice(clans)})
+        stacks += [{'card_name': name, 'rarity': rarity, 'quantity': generator.randint(1, 4)} for rarity in generator.sample(RARITIES, generator.randint(1, 3))]
+    dao.insert_rows(Card, rows)
+    dao.add_stacks(stacks)
+    dao.analyze()
+    return dao
+
+def drop_indexes(dao: DAO):
+    """
+    Drops filtering indexes, so results can be compared with plain table scans. Indexes are created again by create_schema.
+    """
+    for table in (Card.__table__, CardStack.__table__):
+        for index in table.indexes:
+            dao.session.execute(text(f'DROP INDEX IF EXISTS {index.name}'))
+    dao.session.commit()
+
+def query_plan(dao: DAO, card_filter: CardFilter):
+    criteria, ordering = card_filter.compile()
+    statement = select(*CARD_COLUMNS).outerjoin(Clan, Card.clan_name == Clan.name).where(*criteria).order_by(*ordering)
+    compiled = statement.compile(dao.session.get_bind(), compile_kwargs={'literal_binds': True})
+    return [row[-1] for row in dao.session.connection().exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled}')]
+
+def run_benchmark(dao: DAO, repeat: int = 20, limit: int = 50):
+    """
+    Runs every query from QUERIES, counting all matching cards and loading first page of them, as filter panel does.
+
+    Returns:
+        List[Tuple[str, int, float, float, List[str]]]: name of query, number of matching cards, median and maximal latency in milliseconds and query plan.
+    """
+    results = []
+    for name, create_filter in QUERIES.items():
+        card_filter = create_filter()
+        latencies = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            total = dao.count_cards(card_filter)
+            dao.find_cards(card_filter, limit)
+            latencies.append(time.perf_counter() - start)
+        results.append((name, total, percentile(latencies, 0.5) * 1000, max(latencies) * 1000, query_plan(dao, card_filter)))
+    return results
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Benchmark of filtering cards.')
+    parser.add_argument('--db', help='existing collection, by default synthetic collection is generated')
+    parser.add_argument('--cards', type=int, default=100000, help='number of cards of generated collection')
+    parser.add_argument('--output', default='filterbench.db', help='path of generated collection')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--limit', type=int, default=50, help='size of loaded page of cards')
+    parser.add_argument('--without-indexes', action='store_true', help='drop filtering indexes first, they are created again on next start of the application')
+    parser.add_argument('--plans', action='store_true', help='print query plans')
+    args = parser.parse_args()
+
+    if args.db:
+        if not os.path.exists(args.db):
+            parser.error(f'no collection database at {args.db}')
+        db_engine = get_engine(args.db)
+        create_schema(db_engine)
+        dao = DAO(db_engine)
+    else:
+        start = time.perf_counter()
+        dao = create_collection(args.output, args.cards)
+        print(f'Generated {args.cards} cards in {time.perf_counter() - start:.1f}s')
+    if args.without_indexes:
+        drop_indexes(dao)
+    print(f'{dao.session.execute(select(func.count()).select_from(Card)).scalar()} cards')
+    for name, total, median, maximum, plan in run_benchmark(dao, args.repeat, args.limit):
+        print(f'{name:32} {total:7} cards  p50 {median:7.2f} ms  max {maximum:7.2f} ms')
+        if args.plans:
+            for step in plan:
+                print(f'    {step}')
@@ -0,0 +1,152 @@
+"""
+    This module provides composable filter of cards, which is compiled into predicates and sort orders of one SQL query.
+    Predicates on clans, grades and power are served by composite indexes of Cards table, rarity by index of CardStacks table.
+"""
+from modules.orm import Card, Clan, CardStack
+from sqlalchemy import select, exists, or_
+
+SENTINEL = 'Sentinel'
+SORT_COLUMNS = {'name': Card.name, 'grade': Card.grade, 'power': Card.power, 'critical': Card.critical, 'shield': Card.shield,
+                'clan': Card.clan_name, 'nation': Clan.nation_name, 'imaginary_gift': Clan.imaginary_gift_name}
+
+class CardFilter():
+    """
+    Class representing filter of cards. Every method restricting cards returns the filter itself, so calls can be chained, ex. CardFilter().grade(3).power(minimum=11000).order_by('power', True).
+    Different predicates are combined with AND, values given to one predicate with OR. Empty filter matches all cards.
+
+    Attributes:
+        phrase (str): part of name of card, ignoring case.
+        clans (Tuple[str]): allowed clans.
+        grades (Tuple[int]): allowed grades.
+        power_range (Tuple[int, int]): minimal and maximal power, None means no limit.
+        criticals (Tuple[int]): allowed critical values.
+        shields (Tuple[int | str | None]): allowed shield values, SENTINEL for sentinels and None for cards without shield.
+        rarities (Tuple[str]): rarities of which card must have at least one copy.
+        nations (Tuple[str]): allowed nations.
+        imaginary_gifts (Tuple[str]): allowed imaginary gifts.
+        ordering (List[Tuple[str, bool]]): names of sorted columns from SORT_COLUMNS and whether they are sorted descending.
+
+    Methods:
+        name_contains (CardFilter) -- keeps cards whose name contains given text.\n
+        clan (CardFilter) -- keeps cards of given clans.\n
+        grade (CardFilter) -- keeps cards of given grades.\n
+        power (CardFilter) -- keeps cards with power in given range, limits are inclusive.\n
+        critical (CardFilter) -- keeps cards with given critical values.\n
+        shield (CardFilter) -- keeps cards with given shield values.\n
+        sentinel (CardFilter) -- keeps sentinels.\n
+        rarity (CardFilter) -- keeps cards with at least one copy of given rarities.\n
+        nation (CardFilter) -- keeps cards of clans from given nations.\n
+        imaginary_gift (CardFilter) -- keeps cards of clans with given imaginary gifts.\n
+        order_by (CardFilter) -- adds sort order, cards with equal sorted values are sorted by name.\n
+        copy (CardFilter) -- returns independent copy of the filter.\n
+        is_empty (bool) -- returns whether filter has neither predicates nor sort orders.\n
+        compile (Tuple[List, List]) -- returns SQL predicates and sort orders of the filter.
+    """
+    def __init__(self):
+        self.phrase = None
+        self.clans = ()
+        self.grades = ()
+        self.power_range = (None, None)
+        self.criticals = ()
+        self.shields = ()
+        self.rarities = ()
+        self.nations = ()
+        self.imaginary_gifts = ()
+        self.ordering = []
+
+    def name_contains(self, phrase: str):
+        self.phrase = phrase or None
+        return self
+
+    def clan(self, *names: str):
+        self.clans = names
+        return self
+
+    def grade(self, *grades: int):
+        self.grades = tuple(int(grade) for grade in grades)
+        return self
+
+    def power(self, minimum: int = None, maximum: int = None):
+        self.power_range = (minimum, maximum)
+        return self
+
+    def critical(self, *values: int):
+        self.criticals = tuple(int(value) for value in values)
+        return self
+
+    def shield(self, *values):
+        self.shields = values
+        return self
+
+    def sentinel(self):
+        return self.shield(SENTINEL)
+
+    def rarity(self, *rarities: str):
+        self.rarities = rarities
+        return self
+
+    def nation(self, *names: str):
+        self.nations = names
+        return self
+
+    def imaginary_gift(self, *names: str):
+        self.imaginary_gifts = names
+        return self
+
+    def order_by(self, column: str, descending: bool = False):
+        if column not in SORT_COLUMNS:
+            raise ValueError(f'Cannot sort by {column}, use one of: {", ".join(SORT_COLUMNS)}')
+        self.ordering.append((column, descending))
+        return self
+
+    def copy(self):
+        card_filter = CardFilter()
+        card_filter.__dict__.update(self.__dict__)
+        card_filter.ordering = list(self.ordering)
+        return card_filter
+
+    def is_empty(self):
+        return not self.compile()[0] and not self.ordering
+
+    def compile(self):
+        """
+        Compiles the filter. Predicates use only columns of Cards table, so they can be used with or without joined Clans table, sort orders by nation and imaginary gift need it joined.
+
+        Returns:
+            Tuple[List[ColumnElement], List[ColumnElement]]: predicates and sort orders.
+        """
+        criteria = []
+        if self.phrase:
+            escaped = self.phrase.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            criteria.append(Card.name.ilike(f'%{escaped}%', escape='\\'))
+        if self.clans:
+            criteria.append(Card.clan_name.in_(self.clans))
+        if self.grades:
+            criteria.append(Card.grade.in_(self.grades))
+        minimum, maximum = self.power_range
+        if minimum is not None:
+            criteria.append(Card.power >= minimum)
+        if maximum is not None:
+            criteria.append(Card.power <= maximum)
+        if self.criticals:
+            criteria.append(Card.critical.in_(self.criticals))
+        if self.shields:
+            values = [value for value in self.shields if value is not None]
+            shields = [Card.shield.in_(values)] if values else []
+            if None in self.shields:
+                shields.append(Card.shield.is_(None))
+            criteria.append(or_(*shields))
+        if self.rarities:
+            # With indexed clan or grade predicate few cards are probed by unique index of stacks, otherwise cards are looked up from stacks of the rarity
+            if self.clans or self.grades:
+                criteria.append(exists().where(CardStack.card_name == Card.name, CardStack.rarity.in_(self.rarities)))
+            else:
+                criteria.append(Card.name.in_(select(CardStack.card_name).where(CardStack.rarity.in_(self.rarities))))
+        if self.nations:
+            criteria.append(Card.clan_name.in_(select(Clan.name).where(Clan.nation_name.in_(self.nations))))
+        if self.imaginary_gifts:
+            criteria.append(Card.clan_name.in_(select(Clan.name).where(Clan.imaginary_gift_name.in_(self.imaginary_gifts))))
+        ordering = [SORT_COLUMNS[column].desc() if descending else SORT_COLUMNS[column] for column, descending in self.ordering]
+        if self.ordering:
+            ordering.append(Card.name)
+        return criteria, ordering
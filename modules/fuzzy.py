@@ -0,0 +1,237 @@
+"""
+    This module finds card names which differ only by spelling, punctuation or quotes, ex. 'Avior of  Proposition' and 'Avior of Proposition'.
+    Names are normalized and split into trigrams kept in an inverted index in memory. A lookup reads only posting lists of the rarest trigrams of the name
+    (any similar name has to contain at least one of them), so suggestions take milliseconds. Duplicates of the whole collection are found with MinHash of the same trigrams,
+    without comparing every pair of names.
+"""
+import math
+import re
+import sys
+import unicodedata
+from itertools import combinations
+from typing import NamedTuple
+import numpy as np
+from modules.DAO import DAO
+from modules.events import EventBus, CardAdded, CardUpdated, CardDeleted, CollectionReloaded
+
+# Jaccard similarity of trigram sets from which names are suggested and from which they are reported as duplicates
+SIMILARITY = 0.5
+DUPLICATE_SIMILARITY = 0.7
+SUGGESTIONS = 5
+# MinHash signatures used for finding duplicates have BANDS * ROWS rows, seed makes reports repeatable
+BANDS = 30
+ROWS = 5
+MINHASH_SEED = 46
+# Typographic quotes and dashes are written as their ASCII counterparts, apostrophes are dropped, ex. "Ahsha’s" equals "Ahshas"
+PUNCTUATION = str.maketrans({'‘': "'", '’': "'", 'ʼ': "'", '`': "'", '´': "'", '“': '"', '”': '"', '–': '-', '—': '-'})
+SEPARATORS = re.compile(r'[\W_]+')
+
+def normalize_name(name: str):
+    """
+    Converts name into form in which differences of case, accents, quotes, punctuation and spacing disappear, ex. 'Preside Chief. Jomjael' becomes 'preside chief jomjael'.
+    """
+    name = ''.join(char for char in unicodedata.normalize('NFKD', name) if not unicodedata.combining(char))
+    return ' '.join(SEPARATORS.sub(' ', name.casefold().translate(PUNCTUATION).replace("'", '')).split())
+
+def trigrams(name: str, normalized: bool = False):
+    """
+    Returns set of trigrams of the name. Name is padded with two spaces in front and one at the end, so also its first letters and short names have trigrams.
+
+    Args:
+        name (str): name of the card.
+        normalized (bool): whether name is already normalized by normalize_name.
+    """
+    padded = f'  {name if normalized else normalize_name(name)} '
+    return {padded[index:index + 3] for index in range(len(padded) - 2)}
+
+def similarity(first: str, second: str):
+    """
+    Returns Jaccard similarity of trigram sets of two names, from 0.0 for names without common trigram to 1.0 for names equal after normalization.
+    """
+    first, second = trigrams(first), trigrams(second)
+    shared = len(first & second)
+    return shared / (len(first) + len(second) - shared)
+
+def best_match(name: str, candidates, threshold: float = SIMILARITY):
+    """
+    Returns the candidate most similar to the name together with the similarity, or None if no candidate is at least as similar as threshold.
+    """
+    scored = [(similarity(name, candidate), candidate) for candidate in candidates]
+    score, candidate = max(scored, key=lambda pair: pair[0], default=(0.0, None))
+    return (candidate, score) if candidate is not None and score >= threshold else None
+
+class DuplicateCluster(NamedTuple):
+    """
+    Names similar to each other, directly or through other names of the cluster, similarity is the lowest similarity of pairs which joined the cluster.
+    """
+    names: list
+    similarity: float
+
+    def as_dict(self):
+        return {'names': self.names, 'similarity': round(self.similarity, 3)}
+
+class TrigramIndex():
+    """
+    Class representing inverted index from trigrams to names containing them. Names get ids in order of adding, ids of removed names are not used again.
+
+    Attributes:
+        ids (Dict[str, int]): id of every indexed name.
+        names (List[str]): name with every id, None for removed names.
+        grams (List[tuple]): trigrams of name with every id.
+        postings (Dict[str, List[int]]): ids of names containing every trigram, in order of adding.
+
+    Methods:
+        add -- adds name to the index, nothing is done if it is already indexed.\n
+        remove -- removes name from the index.\n
+        clear -- removes all names.\n
+        similar (List[Tuple[str, float]]) -- returns indexed names most similar to given name, with their similarity, most similar first. Name itself is left out.\n
+        duplicate_clusters (List[DuplicateCluster]) -- returns groups of indexed names similar to each other.\n
+        __prefix__ (List[str]) -- returns the rarest trigrams of a set, which every similar enough name has to share at least one of.\n
+        __score__ (float) -- returns similarity of trigram set to indexed name, or None if it is lower than threshold.
+    """
+    def __init__(self, names=()):
+        self.clear()
+        for name in names:
+            self.add(name)
+
+    def add(self, name: str):
+        if name in self.ids:
+            return
+        name_id = len(self.names)
+        # Interned trigrams are shared by all names, so trigrams of a name take only references
+        grams = tuple(sys.intern(gram) for gram in trigrams(name))
+        for gram in grams:
+            self.postings.setdefault(gram, []).append(name_id)
+        self.ids[name] = name_id
+        self.names.append(name)
+        self.grams.append(grams)
+
+    def remove(self, name: str):
+        name_id = self.ids.pop(name, None)
+        if name_id is None:
+            return
+        for gram in self.grams[name_id]:
+            posting = self.postings[gram]
+            posting.remove(name_id)
+            if not posting:
+                del self.postings[gram]
+        self.names[name_id], self.grams[name_id] = None, ()
+
+    def clear(self):
+        self.ids = {}
+        self.names = []
+        self.grams = []
+        self.postings = {}
+
+    def similar(self, name: str, limit: int = SUGGESTIONS, threshold: float = SIMILARITY):
+        grams = trigrams(name)
+        candidates = set()
+        for gram in self.__prefix__(grams, threshold):
+            candidates.update(self.postings.get(gram, ()))
+        matches = []
+        for name_id in candidates:
+            score = self.__score__(grams, name_id, threshold)
+            if score is not None and self.names[name_id] != name:
+                matches.append((self.names[name_id], score))
+        return sorted(matches, key=lambda match: (-match[1], match[0]))[:limit]
+
+    def duplicate_clusters(self, threshold: float = DUPLICATE_SIMILARITY):
+        """
+        Groups indexed names whose similarity is at least threshold. Names are built from only few thousands of distinct trigrams, so even pairs sharing their rarest trigrams
+        are too many in a big collection. Instead every name gets MinHash signature of its trigrams computed with numpy and only names whose signatures agree on all rows
+        of some band are compared. Pair with similarity 0.7 is found with probability 99.6%, more similar pairs almost surely and names equal after normalization always.
+
+        Returns:
+            List[DuplicateCluster]: clusters of at least two names ordered by their first name, names of a cluster are ordered too.
+        """
+        name_ids = list(self.ids.values())
+        if len(name_ids) < 2:
+            return []
+        gram_numbers = {gram: number for number, gram in enumerate(self.postings)}
+        lengths = np.fromiter((len(self.grams[name_id]) for name_id in name_ids), dtype=np.int64, count=len(name_ids))
+        grams = np.fromiter((gram_numbers[gram] for name_id in name_ids for gram in self.grams[name_id]), dtype=np.int64, count=int(lengths.sum()))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        # Random value of every trigram in every row of signature, minimum over trigrams of a name is its MinHash
+        values = np.random.default_rng(MINHASH_SEED).integers(0, 2 ** 32, size=(BANDS * ROWS, len(gram_numbers)), dtype=np.uint64)
+        parents, lowest = {}, {}
+
+        def root(index):
+            while parents.get(index, index) != index:
+                parents[index] = index = parents.get(parents[index], parents[index])
+            return index
+
+        for band in range(BANDS):
+            keys = np.zeros(len(name_ids), dtype=np.uint64)
+            for row in range(band * ROWS, (band + 1) * ROWS):
+                keys = keys * np.uint64(0x100000001B3) + np.minimum.reduceat(values[row][grams], offsets)
+            order = np.argsort(keys, kind='stable')
+            ordered = keys[order]
+            # Buckets are runs of equal keys, only runs longer than one name give candidates
+            starts = np.flatnonzero(np.concatenate(([True], ordered[1:] != ordered[:-1])))
+            ends = np.append(starts[1:], len(ordered))
+            for start, end in zip(starts[ends - starts > 1].tolist(), ends[ends - starts > 1].tolist()):
+                for first, second in combinations(sorted(order[start:end].tolist()), 2):
+                    # Names already in one cluster are not compared again
+                    if root(first) == root(second):
+                        continue
+                    score = self.__score__(set(self.grams[name_ids[first]]), name_ids[second], threshold)
+                    if score is None:
+                        continue
+                    first, second = root(first), root(second)
+                    parents[second] = first
+                    lowest[first] = min(score, lowest.get(first, 1.0), lowest.pop(second, 1.0))
+        clusters = {}
+        for index in parents:
+            cluster = root(index)
+            clusters.setdefault(cluster, {cluster}).add(index)
+        return sorted((DuplicateCluster(sorted(self.names[name_ids[index]] for index in members), lowest[cluster]) for cluster, members in clusters.items()),
+                      key=lambda cluster: cluster.names[0])
+
+    def __prefix__(self, grams: set, threshold: float):
+        """
+        Names with Jaccard similarity at least threshold share at least ceil(threshold * len(grams)) trigrams,
+        so each of them contains one of any len(grams) - ceil(threshold * len(grams)) + 1 trigrams of the set. The rarest ones are chosen, so their posting lists are short.
+        """
+        size = len(grams)
+        ordered = sorted(grams, key=lambda gram: (len(self.postings.get(gram, ())), gram))
+        return ordered[:size - math.ceil(threshold * size - 1e-9) + 1]
+
+    def __score__(self, grams: set, name_id: int, threshold: float):
+        other = self.grams[name_id]
+        # Sets of very different sizes cannot reach the threshold
+        if not threshold * len(grams) <= len(other) <= len(grams) / threshold:
+            return None
+        shared = len(grams.intersection(other))
+        score = shared / (len(grams) + len(other) - shared)
+        return score if score >= threshold else None
+
+class CardNameIndex(TrigramIndex):
+    """
+    Class representing trigram index of names of all cards of the collection, kept up to date by change events.
+
+    Attributes:
+        dao (DAO): Database Access Object.
+
+    Methods:
+        load -- indexes names of all cards again.\n
+        __card_updated__ -- replaces old name of renamed card with the new one.
+    """
+    def __init__(self, dao: DAO, events: EventBus = None):
+        super().__init__()
+        self.dao = dao
+        self.load()
+        if events is not None:
+            events.subscribe(CardAdded, lambda event: self.add(event.card.name))
+            events.subscribe(CardUpdated, self.__card_updated__)
+            events.subscribe(CardDeleted, lambda event: self.remove(event.card.name))
+            events.subscribe(CollectionReloaded, lambda event: self.load())
+
+    def load(self):
+        self.clear()
+        for name in self.dao.get_card_names():
+            self.add(name)
+
+    def __card_updated__(self, event: CardUpdated):
+        if event.old.name != event.new.name:
+            self.remove(event.old.name)
+            self.add(event.new.name)
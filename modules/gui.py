@@ -4,109 +4,169 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 from modules.scrapper import Scrapper
+from modules.imagestore import ImageStore
 from modules.DAO import DAO
-from modules.loader import save_backup
-from modules.handler import Handler
-from modules.orm import Card
-import modules.plots as plots
+from modules.loader import save_backup, CARD_NAME_PATTERN
+from modules.events import (EventBus, CardData, CardAdded, CardUpdated, CardDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted,
+                            ClanAdded, CollectionReloaded, CardSelected, PlotSelected, FilterApplied, DeckAdded, DeckEntryChanged, DeckDeleted)
+from modules.models import CardRecord
+from modules.filters import CardFilter, SORT_COLUMNS
+from modules.decks import DeckValidator
+from modules.fuzzy import CardNameIndex
+from modules.sets import set_completion
+from collections import Counter
 from PIL import Image, ImageTk
-import os
-from urllib.parse import quote
-import re
+import io
 from abc import ABC
 
 IMG_SIZE = {'width': 412, 'height': 600}
 BTN_WIDTH = 20
+RARITIES = ['C', 'R', 'RR', 'RRR', 'VR', 'SVR', 'SP', 'OR', 'IMR', 'Re', 'GR', 'SGR']
+SHIELDS = ['None', 'Sentinel'] + [str(shield) for shield in range(0, 30001, 1000)]
+# Changes after which report of deck is displayed again
+DECK_EVENTS = (DeckAdded, DeckEntryChanged, DeckDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted, CardUpdated, CardDeleted, CollectionReloaded)
+# Changes after which completion of sets is displayed again, selected card can get printings found by scrapper together with its image
+SET_EVENTS = (InstanceAdded, InstanceUpdated, InstanceDeleted, CollectionReloaded, CardSelected)
 
 class CardImageLabel(tk.Label):
     """
-    Class representing tkinter Label specifically designed to display image of currently selected card.
+    Class representing tkinter Label specifically designed to display image of currently selected card. Image changes on every CardSelected event.
+    Loose images saved by older versions are copied into the image store on first start.
     Inherits from tk.Label
     
     Attributes:
-        scrapper (Scrapper): scrapper object which will be used to download card image from the wiki.
+        image_store (ImageStore): store holding images of all cards.
+        scrapper (Scrapper): scrapper object which will be used to download card image from the wiki, card numbers found with the image are saved as printings of the card.
         card_image (PhotoImage): image object holding an image of specific card.
         
     Methods:
-        update_image -- updates image to the new one based on path to image file.\n
-        load_image (Image) -- loads image object for specific path, if image file doesn't exist it will be downloaded from wiki using scrapper object. If no image was found the default image will be loaded.
+        update_image -- updates image to the new one based on name of the card.\n
+        load_image (Image) -- loads image object for specific card, if image is not in the image store it will be downloaded from wiki using scrapper object. If no image was found or no card is given the default image will be loaded.
     """
-    def __init__(self, parent, image_path):
+    def __init__(self, parent, card_name, events: EventBus = None, dao: DAO = None):
         super().__init__(parent)
-        self.scrapper = Scrapper()
-        resized_image = self.load_image(image_path).resize((IMG_SIZE['width'], IMG_SIZE['height']), Image.LANCZOS)
+        self.image_store = ImageStore()
+        self.image_store.migrate_legacy()
+        self.scrapper = Scrapper(self.image_store, dao)
+        resized_image = self.load_image(card_name).resize((IMG_SIZE['width'], IMG_SIZE['height']), Image.LANCZOS)
         self.card_image = ImageTk.PhotoImage(resized_image)
         self.configure(image=self.card_image)
+        if events is not None:
+            events.subscribe(CardSelected, lambda event: self.update_image(event.name))
 
-    def update_image(self, path: str):
-        new_image = ImageTk.PhotoImage(self.load_image(path).resize((IMG_SIZE['width'], IMG_SIZE['height']), Image.LANCZOS))
+    def update_image(self, card_name: str):
+        new_image = ImageTk.PhotoImage(self.load_image(card_name).resize((IMG_SIZE['width'], IMG_SIZE['height']), Image.LANCZOS))
         self.configure(image=new_image)
         self.image = new_image
 
-    def load_image(self, path: str):
+    def load_image(self, card_name: str):
         """
-        Loads image object for specific path, if image file doesn't exist it will be downloaded from wiki using scrapper object. If no image was found the default image will be loaded.
+        Loads image object for specific card, if image is not in the image store it will be downloaded from wiki using scrapper object. If no image was found the default image will be loaded.
         
         Args:
-            path (str): path to image file
+            card_name (str): name of the card, None when collection has no cards
             
         Returns:
-            Image: image corresponding to given path, or default image
+            Image: image of given card, or default image
         """
-        image_path = path.replace('"', quote('"'))
-        if not os.path.exists(image_path):
-            scrapped = self.scrapper.extract_image(image_path.replace('.jpg', '').replace('images/', ''))
-            if not scrapped:
-                image_path = 'images/vanguardsleevelogo.png'
-        return Image.open(image_path)
+        data = self.image_store.get(card_name) if card_name is not None else None
+        if data is None and card_name is not None and self.scrapper.extract_image(card_name):
+            data = self.image_store.get(card_name)
+        if data is None:
+            return Image.open('images/vanguardsleevelogo.png')
+        return Image.open(io.BytesIO(data))
 
 class OperationFrame(tk.Frame):
     """
-    Class representing tkinter Frame specifically designed to allow user to perform operations, like adding, editing, deleting cards. Also creating plots and backup.
+    Class representing tkinter Frame specifically designed to allow user to perform operations, like adding, editing, deleting cards. Also building decks, tracking completion of sets, creating plots and backup.
     Inherits from tk.Frame
     
     Attributes:
         dao (DAO): Database Access Object
-        handler (Handler): handler object holding references to main three components of GUI of Application
-        current_card (Card): card object representing currently selected card  
+        events (EventBus): bus on which selection of plot is published and from which selection of card is received
+        current_card (CardRecord): record of currently selected card, None when collection has no cards  
+        deck_validator (DeckValidator): checker of decks, created when decks are opened for the first time
+        name_index (CardNameIndex): index of card names suggesting similar cards, created when card is added or edited for the first time
    """
-    def __init__(self, parent, width=..., height=..., dao: DAO = None, current_card: Card = None, handler: Handler = None):
+    def __init__(self, parent, width=..., height=..., dao: DAO = None, current_card: CardRecord = None, events: EventBus = None):
         super().__init__(parent, width=width, height=height, borderwidth=2)
         self.dao = dao
-        self.handler = handler
+        self.events = events
         self.current_card = current_card
+        self.deck_validator = None
+        self.name_index = None
         card_add_button = tk.Button(self, text="Add new card", width=BTN_WIDTH)
         card_edit_button = tk.Button(self, text="Edit current card", width=BTN_WIDTH)
         card_delete_button = tk.Button(self, text="Delete current card", width=BTN_WIDTH)
+        decks_button = tk.Button(self, text="Decks", width=BTN_WIDTH)
+        sets_button = tk.Button(self, text="Sets", width=BTN_WIDTH)
         db_backup_button = tk.Button(self, text="Backup", width=BTN_WIDTH, background='#FFF3B0', foreground='#335C67')
         card_grade_count_button = tk.Button(self, text="Card Grades Distribution", width=BTN_WIDTH)
         card_clan_count_button = tk.Button(self, text="Card Clans Distribution", width=BTN_WIDTH)
         card_add_button.pack(side=tk.TOP)
         card_edit_button.pack(side=tk.TOP, pady=2)
         card_delete_button.pack(side=tk.TOP, pady=2)
+        decks_button.pack(side=tk.TOP, pady=2)
+        sets_button.pack(side=tk.TOP, pady=2)
         card_grade_count_button.pack(side=tk.TOP, pady=2)
         card_clan_count_button.pack(side=tk.TOP, pady=2)
         db_backup_button.pack(side=tk.TOP, pady=2)
 
+        def get_name_index():
+            if self.name_index is None:
+                self.name_index = CardNameIndex(dao, self.events)
+            return self.name_index
+
         def open_add_card_window():
-            AddNewCardWindow(self.master, width, 250, dao, handler)
+            AddNewCardWindow(self.master, width, 270, dao, get_name_index())
+
+        def no_card_selected():
+            if self.current_card is None:
+                messagebox.showinfo("No card", "Collection has no cards yet, add a new card first.")
+                return True
+            return False
 
         def open_edit_card_window():
-            EditCurrentCardWindow(self.master, width, 275,dao, self.current_card, handler)
+            if no_card_selected():
+                return
+            EditCurrentCardWindow(self.master, width, 295,dao, self.current_card, get_name_index())
 
         def open_delete_card_window():
-            DeleteCardWindow(self.master, width, 80, dao, self.current_card, handler)
+            if no_card_selected():
+                return
+            DeleteCardWindow(self.master, width, 80, dao, self.current_card)
+
+        def open_decks_window():
+            if self.deck_validator is None:
+                self.deck_validator = DeckValidator(dao, events=self.events)
+            DeckWindow(self.master, 420, 560, dao, self.events, self.deck_validator, self.current_card.name if self.current_card else None)
+
+        def open_sets_window():
+            SetsWindow(self.master, 420, 560, dao, self.events)
 
         def card_grade_distribution():
-            plots.card_grade_distribution(self.dao)
+            self.events.publish(PlotSelected('grades'))
 
         def card_clan_distribution():
-            plots.card_clan_distribution(self.dao)
+            self.events.publish(PlotSelected('clans'))
+
+        def card_selected(event):
+            self.current_card = self.dao.get_card(event.name)
+
+        def card_deleted(event):
+            # Another card is selected afterwards unless the last one was deleted
+            if self.current_card is not None and event.card.name == self.current_card.name:
+                self.current_card = None
+
+        self.events.subscribe(CardSelected, card_selected)
+        self.events.subscribe(CardDeleted, card_deleted)
 
         card_add_button.configure(command=open_add_card_window)
         card_edit_button.configure(command=open_edit_card_window)
         card_delete_button.configure(command=open_delete_card_window)
-        db_backup_button.configure(command=save_backup)
+        decks_button.configure(command=open_decks_window)
+        sets_button.configure(command=open_sets_window)
+        db_backup_button.configure(command=lambda: save_backup(self.dao.session.get_bind().url.database))
         card_grade_count_button.configure(command=card_grade_distribution)
         card_clan_count_button.configure(command=card_clan_distribution)
 
@@ -116,8 +176,7 @@ class AddEditCardWindow(tk.Toplevel, ABC):
     Inherits from tk.Toplevel and ABC
     
     Attributes:
-        dao (DAO): Database Access Object.
-        handler (Handler): handler object holding references to main three components of GUI of Application.
+        dao (DAO): Database Access Object, which notifies other components about changes.
         main_frame (tk.Frame): frame holding content of the window.
         name_entry (tk.Entry): allows to input card's name, that name will be validated.
         grade_spinbox (tk.Spinbox): allows to select grade of a card from 0 to 5.
@@ -128,12 +187,17 @@ class AddEditCardWindow(tk.Toplevel, ABC):
         rarity_combobox (ttk.Combobox): allows to select rarity of a card.
         action_card_button (tk.Button): button created as a 'pocket' to be programmed by inheriting classes. Disabled by default.
         error_label (tk.Label): label used for diplaying an error message.
+        name_index (CardNameIndex): index of card names, or None if similar cards are not suggested.
+        suggestion_label (tk.Label): label displaying existing cards with name similar to entered one.
     There are also labels provided for above input components for tkinter.
+
+    Methods:
+        similar_names (List[str]) -- returns names of other cards similar to given name and displays them below the form.
     """
-    def __init__(self, parent, width=..., height=..., dao: DAO = ..., handler: Handler = ...):
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., name_index: CardNameIndex = None):
         super().__init__(parent, width=width, height=height)
         self.dao = dao
-        self.handler = handler
+        self.name_index = name_index
         self.geometry(f"{width}x{height}")
         self.main_frame = tk.Frame(self, width=width, height=height)
         self.main_frame.pack()
@@ -180,7 +244,7 @@ class AddEditCardWindow(tk.Toplevel, ABC):
         # Rarity combobox and label
         self.rarity_label = tk.Label(self.main_frame, text='Rarity:')
         self.rarity_label.grid(row=6, column=0, sticky='E', pady=3)
-        self.rarity_combobox = ttk.Combobox(self.main_frame, values=['C', 'R', 'RR', 'RRR', 'VR', 'SVR', 'SP', 'OR', 'IMR', 'Re', 'GR', 'SP', 'SGR'])
+        self.rarity_combobox = ttk.Combobox(self.main_frame, values=RARITIES)
         self.rarity_combobox.current(0)
         self.rarity_combobox.grid(row=6, column=1, pady=3)
 
@@ -189,6 +253,8 @@ class AddEditCardWindow(tk.Toplevel, ABC):
 
         self.error_label = tk.Label(self.main_frame, fg="#8B0000")
         self.error_label.grid(row=9, column=0, pady=3)
+        self.suggestion_label = tk.Label(self.main_frame, fg="#9C6500", wraplength=width - 20, justify=tk.LEFT)
+        self.suggestion_label.grid(row=10, column=0, columnspan=2, pady=3)
 
         def validate_card_name():
             """
@@ -198,17 +264,24 @@ class AddEditCardWindow(tk.Toplevel, ABC):
             card_name = self.name_entry.get().strip()
 
             # Perform the validation using the regular expression
-            pattern = r'^[\w\s"\',-]+$'
-            if not re.match(pattern, card_name):
+            if not CARD_NAME_PATTERN.match(card_name):
                 self.action_card_button.config(state='disabled')
                 return False
 
+            self.similar_names(card_name)
             self.action_card_button.config(state='normal')
             return True
 
         validate_cmd = self.main_frame.register(validate_card_name)
         self.name_entry.configure(validate='focusout', validatecommand=validate_cmd)
 
+    def similar_names(self, card_name: str):
+        if self.name_index is None:
+            return []
+        names = [name for name, _ in self.name_index.similar(card_name)]
+        self.suggestion_label.configure(text=f"Did you mean: {', '.join(names)}?" if names else '')
+        return names
+
 class AddNewCardWindow(AddEditCardWindow):
     """
     Class representing tkinter TopLevel specifically designed to enable adding of a new card
@@ -219,8 +292,8 @@ class AddNewCardWindow(AddEditCardWindow):
         action_card_button (tk.Button): button inherited from AddEditCardWindow class, configured to perform adding of a card on click.
         clear_card_button (tk.Button): allows to clean input components.
     """
-    def __init__(self, parent, width=..., height=..., dao: DAO = ..., handler: Handler = ...):
-        super().__init__(parent, width=width, height=height, dao=dao, handler=handler)
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., name_index: CardNameIndex = None):
+        super().__init__(parent, width=width, height=height, dao=dao, name_index=name_index)
 
         self.title('Add New Card')
         self.action_card_button.configure(text="Add new card")
@@ -240,14 +313,17 @@ class AddNewCardWindow(AddEditCardWindow):
             self.clan_combobox.set(self.dao.get_all_clans()[0].name)
             self.rarity_combobox.set('C')
             self.action_card_button.configure(state='disabled')
+            self.suggestion_label.configure(text='')
 
         def add_card():
+            name = self.name_entry.get()
+            # New card whose name differs from existing ones only by a typo or punctuation is added only after confirmation
+            similar = self.similar_names(name.strip()) if self.dao.get_card(name) is None else []
+            if similar and not messagebox.askyesno("Similar cards", f"Cards with similar names already exist: {', '.join(similar)}.\nAdd '{name}' as a new card anyway?", icon="warning"):
+                return
             shield = None if self.shield_spinbox.get() == "None" else self.shield_spinbox.get()
-            added = self.dao.add_card(self.name_entry.get(), self.grade_spinbox.get(), self.power_spinbox.get(), self.critical_spinbox.get(), shield, self.clan_combobox.get(), self.rarity_combobox.get())
+            added = self.dao.add_card(name, self.grade_spinbox.get(), self.power_spinbox.get(), self.critical_spinbox.get(), shield, self.clan_combobox.get(), self.rarity_combobox.get())
             if added:
-                self.handler.center_frame.update_clans()
-                self.handler.center_frame.update_cards()
-                self.handler.center_frame.update_grades()
                 self.destroy()
             else:
                 self.error_label.configure(text='Cannot add card')
@@ -262,11 +338,11 @@ class EditCurrentCardWindow(AddEditCardWindow):
     
     Attributes:
         Inherited from parent class.
-        current_card (Card): currently selected card.
+        current_card (CardRecord): currently selected card.
         action_card_button (tk.Button): button inherited from AddEditCardWindow class, configured to perform editing of a card on click.
     """
-    def __init__(self, parent, width=..., height=..., dao: DAO = ..., current_card: Card = None, handler: Handler = ...):
-        super().__init__(parent, width=width, height=height, dao=dao, handler=handler)
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., current_card: CardRecord = None, name_index: CardNameIndex = None):
+        super().__init__(parent, width=width, height=height, dao=dao, name_index=name_index)
 
         self.current_card = current_card
         self.title(f'Edit: {self.current_card.name}')
@@ -281,14 +357,14 @@ class EditCurrentCardWindow(AddEditCardWindow):
         self.critical_spinbox.insert(0, self.current_card.critical)
         self.shield_spinbox.delete(0, tk.END)
         self.shield_spinbox.insert(0, "None" if self.current_card.shield == None else self.current_card.shield)
-        self.clan_combobox.set(self.current_card.clan.name)
-        instances = self.dao.get_card_instances(self.current_card.name)
+        self.clan_combobox.set(self.current_card.clan_name)
+        stacks = self.dao.get_card_stacks(self.current_card.name)
         copy_label = tk.Label(self.main_frame, text='Copy:')
         copy_label.grid(row=6, column=0, sticky='E', pady=3)
-        copy_combobox = ttk.Combobox(self.main_frame, values=[f"ID: {instance.id}|{instance.rarity}" for instance in instances])
+        copy_combobox = ttk.Combobox(self.main_frame, values=[f"ID: {stack.id}|{stack.rarity}|x{stack.quantity}" for stack in stacks])
         copy_combobox.current(0)
         copy_combobox.grid(row=6, column=1, pady=3)
-        current_rarity = copy_combobox.get().split('|', 1)[1]
+        current_rarity = copy_combobox.get().split('|')[1]
         self.rarity_label.grid_forget()
         self.rarity_combobox.grid_forget()
         self.action_card_button.grid_forget()
@@ -297,7 +373,7 @@ class EditCurrentCardWindow(AddEditCardWindow):
         self.rarity_combobox.set(current_rarity)
 
         def update_rarity(event):
-            current_rarity = copy_combobox.get().split('|', 1)[1]
+            current_rarity = copy_combobox.get().split('|')[1]
             self.rarity_combobox.set(current_rarity)
 
         def edit_card():
@@ -305,9 +381,6 @@ class EditCurrentCardWindow(AddEditCardWindow):
             shield = None if self.shield_spinbox.get() == "None" else self.shield_spinbox.get()
             edited = self.dao.update_card(id, self.name_entry.get(), self.grade_spinbox.get(), self.power_spinbox.get(), self.critical_spinbox.get(), shield, self.clan_combobox.get(), self.rarity_combobox.get())
             if edited:
-                self.handler.center_frame.update_clans()
-                self.handler.center_frame.update_cards()
-                self.handler.center_frame.update_grades()
                 self.destroy()
             else:
                 self.error_label.configure(text='Cannot edit card')
@@ -318,37 +391,35 @@ class EditCurrentCardWindow(AddEditCardWindow):
 
 class DeleteCardWindow(tk.Toplevel):
     """
-    Class representing tkinter TopLevel specifically designed to allow deleting exact instance of a card
+    Class representing tkinter TopLevel specifically designed to allow deleting one copy of a card
     Inherits from tk.Toplevel
     
     Attributes:
-        dao (DAO): Database Access Object
-        handler (Handler): handler object holding references to main three components of GUI of Application.
-        current_card (Card): currently selected card
-        copy_combobox (ttk.Combobox): allows for selection of exact instance of a current card
-        action_card_button (tk.Button): deletes card instance on click
+        dao (DAO): Database Access Object, which notifies other components about deleted copy
+        current_card (CardRecord): currently selected card
+        copy_combobox (ttk.Combobox): allows for selection of stack of copies of a current card with one rarity
+        action_card_button (tk.Button): deletes one copy from selected stack on click
         cancel_button (tk.Button): closes  this window
     """
-    def __init__(self, parent, width=..., height=..., dao: DAO = ..., current_card: Card = None, handler: Handler = ...):
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., current_card: CardRecord = None):
         super().__init__(parent, width=width, height=height)
         self.title('Delete Card')
         self.resizable(False, False)
         self.dao = dao
-        self.handler = handler
         self.current_card = current_card
         self.geometry(f"{width}x{height}")
         main_frame = tk.Frame(self, width=width, height=height)
         main_frame.pack()
 
-        name_label = tk.Label(main_frame, text=f'Name: {self.current_card}')
+        name_label = tk.Label(main_frame, text=f'Name: {self.current_card.name}')
         name_label.pack(side=tk.TOP)
         copy_frame = tk.Frame(main_frame)
         copy_frame.pack(side=tk.TOP)
 
-        instances = self.dao.get_card_instances(self.current_card.name)
+        stacks = self.dao.get_card_stacks(self.current_card.name)
         copy_label = tk.Label(copy_frame, text='Copy:')
         copy_label.grid(row=0, column=0, sticky='E', pady=3)
-        copy_combobox = ttk.Combobox(copy_frame, values=[f"ID: {instance.id}|{instance.rarity}" for instance in instances])
+        copy_combobox = ttk.Combobox(copy_frame, values=[f"ID: {stack.id}|{stack.rarity}|x{stack.quantity}" for stack in stacks])
         copy_combobox.current(0)
         copy_combobox.grid(row=0, column=1, pady=3)
 
@@ -366,34 +437,359 @@ class DeleteCardWindow(tk.Toplevel):
 
         def show_confirmation():
             result = messagebox.askyesno(
-                "Confirmation", "Are you sure you want to delete this card instance?", icon="warning")
+                "Confirmation", "Are you sure you want to delete one copy of this card?", icon="warning")
             if result == True:
                 id = copy_combobox.get().split('|', 1)[0].replace('ID: ', '')
                 self.dao.delete_card(int(id))
-                self.handler.center_frame.update_clans()
-                self.handler.center_frame.update_cards()
-                self.handler.center_frame.update_grades()
                 close()
 
         action_card_button.configure(command=show_confirmation)
         cancel_button.configure(command=close)
 
+class FilterWindow(tk.Toplevel):
+    """
+    Class representing tkinter TopLevel specifically designed to filter and sort cards by any combination of their attributes, together with clan and grade selected in CenterFrame.
+    Inherits from tk.Toplevel
+    
+    Attributes:
+        dao (DAO): Database Access Object.
+        events (EventBus): bus on which applied filter is published.
+        name_entry (tk.Entry): allows to input part of name of a card.
+        power_from_spinbox (tk.Spinbox): allows to select minimal power, 'Any' means no limit.
+        power_to_spinbox (tk.Spinbox): allows to select maximal power, 'Any' means no limit.
+        critical_combobox (ttk.Combobox): allows to select critical.
+        shield_combobox (ttk.Combobox): allows to select shield, including 'None' and 'Sentinel'.
+        rarity_combobox (ttk.Combobox): allows to select rarity of which card must have a copy.
+        nation_combobox (ttk.Combobox): allows to select nation.
+        gift_combobox (ttk.Combobox): allows to select imaginary gift.
+        sort_combobox (ttk.Combobox): allows to select by which attribute are cards sorted.
+        descending (tk.BooleanVar): whether cards are sorted descending.
+        error_label (tk.Label): label used for diplaying an error message.
+    """
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., events: EventBus = ..., card_filter: CardFilter = None):
+        super().__init__(parent, width=width, height=height)
+        self.dao = dao
+        self.events = events
+        card_filter = card_filter or CardFilter()
+        self.title('Filter cards')
+        self.geometry(f"{width}x{height}")
+        self.resizable(False, False)
+        main_frame = tk.Frame(self, width=width, height=height)
+        main_frame.pack()
+        clans = self.dao.get_all_clans()
+
+        def add_row(row: int, text: str, widget):
+            tk.Label(main_frame, text=text).grid(row=row, column=0, sticky='E', pady=3)
+            widget.grid(row=row, column=1, columnspan=2, sticky='W', pady=3)
+            return widget
+
+        def add_combobox(row: int, text: str, values, selected):
+            combobox = add_row(row, text, ttk.Combobox(main_frame, values=['Any'] + list(values), state='readonly'))
+            combobox.set(str(selected[0]) if selected else 'Any')
+            return combobox
+
+        self.name_entry = add_row(0, 'Name contains:', tk.Entry(main_frame))
+        self.name_entry.insert(0, card_filter.phrase or '')
+
+        power_frame = add_row(1, 'Power:', tk.Frame(main_frame))
+        self.power_from_spinbox = tk.Spinbox(power_frame, values=('Any',) + tuple(range(0, 50001, 1000)), width=7)
+        self.power_to_spinbox = tk.Spinbox(power_frame, values=('Any',) + tuple(range(0, 50001, 1000)), width=7)
+        for spinbox, value in zip((self.power_from_spinbox, self.power_to_spinbox), card_filter.power_range):
+            spinbox.delete(0, 'end')
+            spinbox.insert(0, 'Any' if value is None else value)
+        self.power_from_spinbox.pack(side=tk.LEFT)
+        tk.Label(power_frame, text='to').pack(side=tk.LEFT, padx=3)
+        self.power_to_spinbox.pack(side=tk.LEFT)
+
+        self.critical_combobox = add_combobox(2, 'Critical:', range(1, 7), card_filter.criticals)
+        self.shield_combobox = add_combobox(3, 'Shield:', SHIELDS, ['None' if shield is None else shield for shield in card_filter.shields])
+        self.rarity_combobox = add_combobox(4, 'Rarity:', RARITIES, card_filter.rarities)
+        self.nation_combobox = add_combobox(5, 'Nation:', sorted({clan.nation_name for clan in clans}), card_filter.nations)
+        self.gift_combobox = add_combobox(6, 'Imaginary Gift:', sorted({clan.imaginary_gift_name for clan in clans}), card_filter.imaginary_gifts)
+
+        sort_frame = add_row(7, 'Sort by:', tk.Frame(main_frame))
+        self.sort_combobox = ttk.Combobox(sort_frame, values=list(SORT_COLUMNS), state='readonly', width=14)
+        self.sort_combobox.set(card_filter.ordering[0][0] if card_filter.ordering else 'name')
+        self.descending = tk.BooleanVar(value=bool(card_filter.ordering) and card_filter.ordering[0][1])
+        self.sort_combobox.pack(side=tk.LEFT)
+        tk.Checkbutton(sort_frame, text='Descending', variable=self.descending).pack(side=tk.LEFT)
+
+        apply_button = tk.Button(main_frame, text='Apply', width=BTN_WIDTH)
+        apply_button.grid(row=8, column=0, pady=3)
+        clear_button = tk.Button(main_frame, text='Clear', width=BTN_WIDTH)
+        clear_button.grid(row=8, column=1, pady=3)
+        self.error_label = tk.Label(main_frame, fg="#8B0000")
+        self.error_label.grid(row=9, column=0, columnspan=3, pady=3)
+
+        def selected(combobox):
+            return () if combobox.get() == 'Any' else (combobox.get(),)
+
+        def apply_filter():
+            try:
+                power_range = [None if spinbox.get() == 'Any' else int(spinbox.get()) for spinbox in (self.power_from_spinbox, self.power_to_spinbox)]
+            except ValueError:
+                self.error_label.configure(text='Power must be a number')
+                return
+            shields = [None if shield == 'None' else shield if shield == 'Sentinel' else int(shield) for shield in selected(self.shield_combobox)]
+            card_filter = (CardFilter().name_contains(self.name_entry.get().strip()).power(*power_range).critical(*selected(self.critical_combobox))
+                           .shield(*shields).rarity(*selected(self.rarity_combobox)).nation(*selected(self.nation_combobox))
+                           .imaginary_gift(*selected(self.gift_combobox)).order_by(self.sort_combobox.get(), self.descending.get()))
+            self.events.publish(FilterApplied(card_filter))
+            self.destroy()
+
+        def clear_filter():
+            self.events.publish(FilterApplied(CardFilter()))
+            self.destroy()
+
+        apply_button.configure(command=apply_filter)
+        clear_button.configure(command=clear_filter)
+
+class DeckWindow(tk.Toplevel):
+    """
+    Class representing tkinter TopLevel specifically designed to build decks from cards of the collection and check them against deck building rules.
+    Inherits from tk.Toplevel
+    
+    Attributes:
+        dao (DAO): Database Access Object.
+        events (EventBus): bus from which changes of cards, copies and decks and selection of card are received.
+        validator (DeckValidator): checker of decks, kept up to date by events.
+        current_card_name (str): name of currently selected card, which is added to the deck. None when collection has no cards.
+        deck_ids (List[int]): ids of decks in order of deck_combobox values.
+        entry_names (List[str]): names of cards in order of entries_listbox rows.
+        deck_combobox (ttk.Combobox): allows to select edited deck.
+        name_entry (tk.Entry): allows to input name of a new deck.
+        nation_combobox (ttk.Combobox): allows to restrict new deck to one nation.
+        entries_listbox (tk.Listbox): displays cards of selected deck.
+        summary_label (tk.Label): displays size, grades, triggers, sentinels and shield total of selected deck.
+        problems_label (tk.Label): displays problems of selected deck.
+    
+    Methods:
+        selected_deck (int) -- returns id of selected deck or None.\n
+        refresh -- displays decks, cards and report of selected deck again.
+    """
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., events: EventBus = ..., validator: DeckValidator = ..., current_card_name: str = ...):
+        super().__init__(parent, width=width, height=height)
+        self.dao = dao
+        self.events = events
+        self.validator = validator
+        self.current_card_name = current_card_name
+        self.deck_ids = []
+        self.entry_names = []
+        self.title('Decks')
+        self.geometry(f"{width}x{height}")
+        self.resizable(False, False)
+        main_frame = tk.Frame(self, width=width, height=height)
+        main_frame.pack()
+
+        tk.Label(main_frame, text='Deck:').grid(row=0, column=0, sticky='E', pady=3)
+        self.deck_combobox = ttk.Combobox(main_frame, width=30, state='readonly')
+        self.deck_combobox.grid(row=0, column=1, columnspan=2, sticky='W', pady=3)
+
+        tk.Label(main_frame, text='New deck:').grid(row=1, column=0, sticky='E', pady=3)
+        self.name_entry = tk.Entry(main_frame)
+        self.name_entry.grid(row=1, column=1, sticky='W', pady=3)
+        self.nation_combobox = ttk.Combobox(main_frame, width=15, state='readonly', values=['Any nation'] + sorted({clan.nation_name for clan in self.dao.get_all_clans()}))
+        self.nation_combobox.current(0)
+        self.nation_combobox.grid(row=1, column=2, sticky='W', pady=3)
+        create_button = tk.Button(main_frame, text='Create deck', width=BTN_WIDTH)
+        create_button.grid(row=2, column=1, sticky='W', pady=3)
+
+        self.entries_listbox = tk.Listbox(main_frame, width=50, height=14)
+        self.entries_listbox.grid(row=3, column=0, columnspan=3, pady=3)
+
+        buttons_frame = tk.Frame(main_frame)
+        buttons_frame.grid(row=4, column=0, columnspan=3, pady=3)
+        add_button = tk.Button(buttons_frame, text='Add current card')
+        remove_button = tk.Button(buttons_frame, text='Remove one copy')
+        delete_button = tk.Button(buttons_frame, text='Delete deck', background='#FFF3B0', foreground='#335C67')
+        for button in (add_button, remove_button, delete_button):
+            button.pack(side=tk.LEFT, padx=2)
+
+        self.summary_label = tk.Label(main_frame, justify=tk.LEFT, anchor='w')
+        self.summary_label.grid(row=5, column=0, columnspan=3, sticky='W', pady=3)
+        self.problems_label = tk.Label(main_frame, fg="#8B0000", justify=tk.LEFT, anchor='w', wraplength=width - 20)
+        self.problems_label.grid(row=6, column=0, columnspan=3, sticky='W', pady=3)
+
+        def create_deck():
+            name = self.name_entry.get().strip()
+            nation = self.nation_combobox.get()
+            deck = self.dao.add_deck(name, nation_name=None if nation == 'Any nation' else nation) if name else None
+            if deck is None:
+                self.problems_label.configure(text='Cannot create deck, name must be unique and not empty')
+                return
+            self.name_entry.delete(0, 'end')
+            self.refresh(deck.id)
+
+        def add_card():
+            deck_id = self.selected_deck()
+            if deck_id is not None and self.current_card_name is not None:
+                quantity = self.validator.entries.get(deck_id, {}).get(self.current_card_name, 0)
+                self.dao.set_deck_entry(deck_id, self.current_card_name, quantity + 1)
+
+        def remove_card():
+            deck_id = self.selected_deck()
+            selection = self.entries_listbox.curselection()
+            if deck_id is not None and selection:
+                name = self.entry_names[selection[0]]
+                self.dao.set_deck_entry(deck_id, name, self.validator.entries[deck_id][name] - 1)
+
+        def delete_deck():
+            deck_id = self.selected_deck()
+            if deck_id is not None and messagebox.askyesno("Confirmation", f"Are you sure you want to delete deck {self.validator.decks[deck_id].name}?", icon="warning"):
+                self.dao.delete_deck(deck_id)
+
+        def card_selected(event):
+            self.current_card_name = event.name
+
+        def changed(event):
+            self.refresh()
+
+        def closed(event):
+            if event.widget is self:
+                self.events.unsubscribe(CardSelected, card_selected)
+                for event_type in DECK_EVENTS:
+                    self.events.unsubscribe(event_type, changed)
+
+        create_button.configure(command=create_deck)
+        add_button.configure(command=add_card)
+        remove_button.configure(command=remove_card)
+        delete_button.configure(command=delete_deck)
+        self.deck_combobox.bind("<<ComboboxSelected>>", changed)
+        self.bind("<Destroy>", closed)
+        self.events.subscribe(CardSelected, card_selected)
+        for event_type in DECK_EVENTS:
+            self.events.subscribe(event_type, changed)
+        self.refresh()
+
+    def selected_deck(self):
+        index = self.deck_combobox.current()
+        return self.deck_ids[index] if 0 <= index < len(self.deck_ids) else None
+
+    def refresh(self, deck_id: int = None):
+        deck_id = deck_id if deck_id is not None else self.selected_deck()
+        decks = sorted(self.validator.decks.values(), key=lambda deck: deck.name)
+        self.deck_ids = [deck.id for deck in decks]
+        self.deck_combobox.configure(values=[deck.name if deck.nation_name is None else f'{deck.name} ({deck.nation_name})' for deck in decks])
+        if deck_id not in self.deck_ids:
+            deck_id = self.deck_ids[0] if self.deck_ids else None
+        self.entries_listbox.delete(0, 'end')
+        self.entry_names = []
+        if deck_id is None:
+            self.deck_combobox.set('')
+            self.summary_label.configure(text='No decks')
+            self.problems_label.configure(text='')
+            return
+        self.deck_combobox.current(self.deck_ids.index(deck_id))
+        report = self.validator.validate(deck_id)
+        for name, quantity in sorted(self.validator.entries.get(deck_id, {}).items()):
+            self.entry_names.append(name)
+            lacking = f'  (missing {report.missing[name]})' if name in report.missing else ''
+            self.entries_listbox.insert('end', f'{quantity}x {name}{lacking}')
+        grades = ', '.join(f'G{grade}: {count}' for grade, count in report.grades.items())
+        self.summary_label.configure(text=f'Cards: {report.size}/{self.validator.rules.deck_size}   Triggers: {report.triggers}/{self.validator.rules.triggers}   '
+                                          f'Sentinels: {report.sentinels}\nGrades: {grades}\nShield total: {report.shield_total}')
+        self.problems_label.configure(text='\n'.join(report.problems) if report.problems else 'Deck is valid')
+
+class SetsWindow(tk.Toplevel):
+    """
+    Class representing tkinter TopLevel specifically designed to display completion of all sets and cards missing from selected set.
+    Inherits from tk.Toplevel
+
+    Attributes:
+        dao (DAO): Database Access Object.
+        events (EventBus): bus from which changes of copies are received.
+        set_codes (List[str]): codes of sets in order of sets_listbox rows.
+        sets_listbox (tk.Listbox): displays completion of every set.
+        missing_listbox (tk.Listbox): displays cards missing from selected set.
+        summary_label (tk.Label): displays completion of selected set.
+
+    Methods:
+        selected_set (str) -- returns code of selected set or None.\n
+        refresh -- displays completion of sets and missing cards of selected set again.
+    """
+    def __init__(self, parent, width=..., height=..., dao: DAO = ..., events: EventBus = ...):
+        super().__init__(parent, width=width, height=height)
+        self.dao = dao
+        self.events = events
+        self.set_codes = []
+        self.title('Sets')
+        self.geometry(f"{width}x{height}")
+        self.resizable(False, False)
+        main_frame = tk.Frame(self, width=width, height=height)
+        main_frame.pack()
+
+        tk.Label(main_frame, text='Sets:').grid(row=0, column=0, sticky='W', pady=3)
+        self.sets_listbox = tk.Listbox(main_frame, width=50, height=12, exportselection=False, font='TkFixedFont')
+        self.sets_listbox.grid(row=1, column=0, pady=3)
+        self.summary_label = tk.Label(main_frame, justify=tk.LEFT, anchor='w')
+        self.summary_label.grid(row=2, column=0, sticky='W', pady=3)
+        self.missing_listbox = tk.Listbox(main_frame, width=50, height=12, font='TkFixedFont')
+        self.missing_listbox.grid(row=3, column=0, pady=3)
+
+        def changed(event):
+            self.refresh()
+
+        def closed(event):
+            if event.widget is self:
+                for event_type in SET_EVENTS:
+                    self.events.unsubscribe(event_type, changed)
+
+        self.sets_listbox.bind('<<ListboxSelect>>', changed)
+        self.bind("<Destroy>", closed)
+        for event_type in SET_EVENTS:
+            self.events.subscribe(event_type, changed)
+        self.refresh()
+
+    def selected_set(self):
+        selection = self.sets_listbox.curselection()
+        return self.set_codes[selection[0]] if selection and selection[0] < len(self.set_codes) else None
+
+    def refresh(self):
+        set_code = self.selected_set()
+        sets = set_completion(self.dao)
+        self.set_codes = [entry.set_code for entry in sets]
+        self.sets_listbox.delete(0, 'end')
+        for entry in sets:
+            self.sets_listbox.insert('end', f'{entry.set_code:<12}{entry.owned_cards:>5}/{entry.cards:<5}{entry.percent:6.1f}%')
+        self.missing_listbox.delete(0, 'end')
+        if set_code not in self.set_codes:
+            set_code = self.set_codes[0] if self.set_codes else None
+        if set_code is None:
+            self.summary_label.configure(text='No sets, load set list or import cards with card numbers')
+            return
+        index = self.set_codes.index(set_code)
+        self.sets_listbox.selection_set(index)
+        self.sets_listbox.see(index)
+        entry = sets[index]
+        missing = self.dao.get_set_printings(set_code, missing=True)
+        for printing in missing:
+            self.missing_listbox.insert('end', f"{printing.number:<16}{printing.card_name} [{printing.rarity or 'any'}]")
+        self.summary_label.configure(text=f'{set_code}: {entry.owned_cards} of {entry.cards} cards ({entry.percent:.1f}%), {entry.copies} copies\n'
+                                          f'Missing {len(missing)} cards:')
+
 class CenterFrame(tk.Frame):
     """
     Class representing tkinter Frame specifically designed to hold all details and filering options of the card. Also allows to select card from list of all cards
+    Cards, their copies and clans are loaded once, afterwards every change event published by DAO is applied only to the affected card.
     Inherits from tk.Frame
     
     Attributes:
         width (int): width of the frame.
         height (int): height of the frame.
         dao (DAO): Database Access Object.
-        handler (Handler): handler object holding references to main three components of GUI of Application.
-        current_card (Card): currently selected card.
-        current_clan (Clan): currently selected clan or all clans.
+        events (EventBus): bus from which changes are received and on which selection of card is published.
+        cards (Dict[str, CardData]): all cards in order in which they were added.
+        rarities (Dict[str, Counter]): number of copies of every rarity for every card.
+        clans (Dict[str, Tuple[str, str]]): imaginary gift and nation of every clan.
+        filtered (List[str]): names of cards matching current clan, grade and card_filter, displayed in card_combobox.
+        card_filter (CardFilter): filter applied in filter panel. When it is empty cards are filtered in memory, otherwise by database query.
+        current_card (CardData): currently selected card, None when collection has no cards.
+        current_clan (str): currently selected clan or all clans.
         current_grade (str): currently selected grade or all grades.
         card_combobox (ttk.Combobox): allows to select current_card value.
         clan_combobox (ttk.Combobox): allows to select by which clan will card_combobox values filtered.
         grade_combobox (ttk.Combobox): allows to select by which grade will card_combobox values filtered.
+        filter_button (tk.Button): opens filter panel.
         card_name_label (tk.Label): holds current card name value.
         card_grade_label (tk.Label): holds current card grade value.
         card_gift_frame (tk.Frame): holds current card imaginary gift value. Displayed only if card is grade 3.
@@ -405,91 +801,83 @@ class CenterFrame(tk.Frame):
         card_rarity_label (tk.Label): holds all rarities of all copies of current card
         
     Methods:
-        update_cards -- updates currently selected card to the one from card_combobox. Performes updates onto all tkinter components holding values about card and changes the image to the new card.\n
+        load -- loads cards, their copies and clans from database.\n
+        select_card -- makes card with given name current one, updates all tkinter components holding values about card and publishes CardSelected event.\n
+        update_cards -- updates currently selected card to the one from card_combobox.\n
         update_clans -- updates currently selected clan to the one from clan_combobox. Changes values of card_combobox to display only cards from current_clan.\n
-        update_grades -- updates currently selected grade to the one from grade_combobox. Changes values of card_combobox to display only cards of specified grade. Also works with clan filtering.
+        update_grades -- updates currently selected grade to the one from grade_combobox. Changes values of card_combobox to display only cards of specified grade. Also works with clan filtering.\n
+        open_filter_window -- opens filter panel with current filter.
     """
-    def __init__(self, parent, width: int = ..., height: int = ..., dao: DAO = ..., current_card: Card = ..., current_clan: str = ..., handler: Handler = ...):
+    def __init__(self, parent, width: int = ..., height: int = ..., dao: DAO = ..., current_card: CardRecord = ..., current_clan: str = ..., events: EventBus = ...):
         super().__init__(parent)
         self.width = width
         self.height = height
         self.dao = dao
-        self.current_card = current_card
+        self.events = events
         self.current_clan = current_clan
         self.current_grade = 'All'
-        self.handler = handler
+        self.card_filter = CardFilter()
+        self.load()
+        self.current_card = self.cards[current_card.name] if current_card is not None else None
+        self.filtered = list(self.cards)
         # Selection of card
-        cards = self.dao.get_all_cards()
-        self.card_combobox = ttk.Combobox(self, width=40, state="readonly", values=[card.name for card in cards])
+        self.card_combobox = ttk.Combobox(self, width=40, state="readonly", values=self.filtered)
         self.card_combobox.pack(side=tk.TOP)
-        self.card_combobox.current(0)
+        if self.current_card is not None:
+            self.card_combobox.set(self.current_card.name)
 
         self.clan_grade_frame = tk.Frame(self, width=40)
         self.clan_grade_frame.pack(side=tk.TOP, pady=3)
 
         # Selection of clans
-        clans = ['All Clans'] + [clan.name for clan in self.dao.get_clans_with_cards()]
-        self.clan_combobox = ttk.Combobox(self.clan_grade_frame, width=30, state="readonly", values=clans)
+        self.clan_combobox = ttk.Combobox(self.clan_grade_frame, width=30, state="readonly")
         self.clan_combobox.pack(side=tk.LEFT)
-        self.clan_combobox.current(0)
         
         # Selection of grade
-        grades = ['All'] + [grade[0] for grade in self.dao.get_card_grades()]
-        self.grade_combobox = ttk.Combobox(self.clan_grade_frame, width=6, state='readonly', values=grades)
+        self.grade_combobox = ttk.Combobox(self.clan_grade_frame, width=6, state='readonly')
         self.grade_combobox.pack(side=tk.LEFT, padx=1)
-        self.grade_combobox.current(0)
+
+        # Filter panel
+        self.filter_button = tk.Button(self.clan_grade_frame, text='Filters', command=self.open_filter_window)
+        self.filter_button.pack(side=tk.LEFT, padx=1)
+        self.__update_filters__()
         
         # Name
-        self.card_name_label = tk.Label(self, text=f"Name: {self.current_card.name}")
+        self.card_name_label = tk.Label(self)
         # Grade
-        self.card_grade_label = tk.Label(self, text=f"Grade: {self.current_card.grade}")
+        self.card_grade_label = tk.Label(self)
         # Imaginary gift
         self.card_gift_frame = tk.Frame(self)
         general_gift_icon = ImageTk.PhotoImage(Image.open("icons/gifts/Gift-icon.webp").resize((13,14)))
         self.general_gift_label = tk.Label(self.card_gift_frame, image=general_gift_icon)
         self.general_gift_label.image = general_gift_icon
-        card_gift_icon = ImageTk.PhotoImage(file=f"icons/gifts/{self.current_card.clan.imaginary_gift.name}_icon.webp")
-        self.card_gift_label = tk.Label(self.card_gift_frame, text=f"Imaginary Gift: ", compound=tk.RIGHT, image=card_gift_icon)
-        self.card_gift_label.image = card_gift_icon
+        self.card_gift_label = tk.Label(self.card_gift_frame, text="Imaginary Gift: ", compound=tk.RIGHT)
+        self.general_gift_label.pack(side=tk.LEFT, anchor='w')
+        self.card_gift_label.pack(side=tk.LEFT, anchor='w')
         # Power
         card_power_icon = ImageTk.PhotoImage(file="icons/Power_icon.webp")
-        self.card_power_label = tk.Label(self, text=f"Power: {self.current_card.power}", compound=tk.LEFT, image=card_power_icon)
+        self.card_power_label = tk.Label(self, compound=tk.LEFT, image=card_power_icon)
         self.card_power_label.image = card_power_icon
         # Critical
         card_critical_icon = ImageTk.PhotoImage(file="icons/Critical_icon.webp")
-        self.card_critical_label = tk.Label(self, text=f"Critical: {self.current_card.critical}", compound=tk.LEFT, image=card_critical_icon)
+        self.card_critical_label = tk.Label(self, compound=tk.LEFT, image=card_critical_icon)
         self.card_critical_label.image = card_critical_icon
         # Shield
         card_shield_icon = ImageTk.PhotoImage(file="icons/Shield_icon.webp")
-        self.card_shield_label = tk.Label(self, text=f"Shield: {self.current_card.shield}", compound=tk.LEFT, image=card_shield_icon)
+        self.card_shield_label = tk.Label(self, compound=tk.LEFT, image=card_shield_icon)
         self.card_shield_label.image = card_shield_icon
         # Clan
-        card_clan_icon = ImageTk.PhotoImage(Image.open(f"icons/clans/Icon_{self.current_card.clan.name.replace(' ','')}.webp").resize((14, 14), Image.LANCZOS))
-        self.card_clan_label = tk.Label(self, text=f"Clan: {self.current_card.clan.name}", compound=tk.LEFT, image=card_clan_icon)
-        self.card_clan_label.image = card_clan_icon
+        self.card_clan_label = tk.Label(self, compound=tk.LEFT)
         # Nation
-        card_nation_icon = ImageTk.PhotoImage(file=f"icons/nations/{self.current_card.clan.nation.name}.webp")
-        self.card_nation_label = tk.Label(self, text=f"Nation: {self.current_card.clan.nation.name}  ", compound=tk.RIGHT, image=card_nation_icon)
-        self.card_nation_label.image = card_nation_icon
+        self.card_nation_label = tk.Label(self, compound=tk.RIGHT)
         # Quantity
-        self.card_quanitiy_label = tk.Label(self, text=f"Quantity: {self.dao.get_card_count(self.current_card.name)}")
+        self.card_quanitiy_label = tk.Label(self)
         # Rarity
-        self.card_rarity_label = tk.Label(self, text=f"Rairties: {self.dao.get_card_rarities(self.current_card.name)}")
+        self.card_rarity_label = tk.Label(self)
 
         self.card_name_label.pack(side=tk.TOP, anchor='w')
         self.card_grade_label.pack(side=tk.TOP, anchor='w')
-        if self.current_card.grade == 3:
-            self.card_gift_frame.pack(side=tk.TOP, anchor='w')
-            self.general_gift_label.pack(side=tk.LEFT, anchor='w')
-            self.card_gift_label.pack(side=tk.LEFT, anchor='w')
-        self.card_power_label.pack(side=tk.TOP, anchor='w')
-        self.card_critical_label.pack(side=tk.TOP, anchor='w')
-        if self.current_card.shield is not None:
-            self.card_shield_label.pack(side=tk.TOP, anchor='w')
-        self.card_clan_label.pack(side=tk.TOP, anchor='w')
-        self.card_nation_label.pack(side=tk.TOP, anchor='w')
-        self.card_quanitiy_label.pack(side=tk.TOP, anchor='w')
-        self.card_rarity_label.pack(side=tk.TOP, anchor='w')
+        self.__show_card__()
         
         def card_selection(event):
             self.update_cards()
@@ -503,79 +891,225 @@ class CenterFrame(tk.Frame):
         self.card_combobox.bind("<<ComboboxSelected>>", card_selection)
         self.clan_combobox.bind("<<ComboboxSelected>>", clan_selection)
         self.grade_combobox.bind("<<ComboboxSelected>>", grade_selection)
-        
+
+        self.events.subscribe(CardAdded, self.__card_added__)
+        self.events.subscribe(CardUpdated, self.__card_updated__)
+        self.events.subscribe(CardDeleted, self.__card_deleted__)
+        self.events.subscribe(InstanceAdded, self.__instance_added__)
+        self.events.subscribe(InstanceUpdated, self.__instance_updated__)
+        self.events.subscribe(InstanceDeleted, self.__instance_deleted__)
+        self.events.subscribe(ClanAdded, self.__clan_added__)
+        self.events.subscribe(CollectionReloaded, self.__collection_reloaded__)
+        self.events.subscribe(FilterApplied, self.__filter_applied__)
+
+    def load(self):
+        self.cards = {card.name: CardData(card.name, card.grade, card.power, card.critical, card.shield, card.clan_name) for card in self.dao.get_all_cards()}
+        self.rarities = {name: Counter() for name in self.cards}
+        for name, rarity, count in self.dao.get_card_rarity_count():
+            self.rarities.setdefault(name, Counter())[rarity] = count
+        self.clans = {clan.name: (clan.imaginary_gift_name, clan.nation_name) for clan in self.dao.get_all_clans()}
+
+    def select_card(self, name: str):
+        self.current_card = self.cards[name]
+        self.card_combobox.set(name)
+        self.__show_card__()
+        self.events.publish(CardSelected(name))
+
     def update_cards(self):
-        cards = self.dao.get_clan_grade_cards(self.current_clan, self.current_grade)
-        self.card_combobox.configure(values=[card.name for card in cards])
         selected_index = self.card_combobox.current()
-        self.current_card = cards[selected_index]
-        self.handler.right_frame.current_card = self.current_card
+        if selected_index >= 0:
+            self.select_card(self.filtered[selected_index])
+
+    def update_clans(self):
+        self.current_clan = self.clan_combobox.get()
+        self.__apply_filter__()
+        
+    def update_grades(self):
+        self.current_grade = self.grade_combobox.get()
+        self.__apply_filter__()
+
+    def open_filter_window(self):
+        FilterWindow(self.master, 330, 330, self.dao, self.events, self.card_filter)
+
+    def __matches__(self, card: CardData):
+        return ((self.current_clan == 'All Clans' or card.clan_name == self.current_clan)
+                and (self.current_grade == 'All' or str(card.grade) == self.current_grade))
 
-        new_image_path = f"images/{self.current_card.name}.jpg"
-        self.handler.card_image_label.update_image(new_image_path)
+    def __apply_filter__(self):
+        if self.card_filter.is_empty():
+            self.filtered = [name for name, card in self.cards.items() if self.__matches__(card)]
+        else:
+            card_filter = self.card_filter.copy()
+            if self.current_clan != 'All Clans':
+                card_filter.clan(self.current_clan)
+            if self.current_grade != 'All':
+                card_filter.grade(self.current_grade)
+            self.filtered = [card.name for card in self.dao.find_cards(card_filter)]
+        self.card_combobox.configure(values=self.filtered)
+        self.filter_button.configure(text='Filters' if self.card_filter.is_empty() else 'Filters *')
 
-        self.card_name_label.configure(
-            text=f"Name: {self.current_card.name}")
-        self.card_grade_label.configure(
-            text=f"Grade: {self.current_card.grade}")
+    def __update_filters__(self):
+        """
+        Recomputes clans and grades which can be selected, resetting selection whose last card is gone.
+        """
+        clans = ['All Clans'] + sorted({card.clan_name for card in self.cards.values()})
+        grades = ['All'] + [str(grade) for grade in sorted({card.grade for card in self.cards.values()})]
+        self.clan_combobox.configure(values=clans)
+        self.grade_combobox.configure(values=grades)
+        if self.current_clan not in clans or self.current_grade not in grades:
+            self.current_clan = self.current_clan if self.current_clan in clans else 'All Clans'
+            self.current_grade = self.current_grade if self.current_grade in grades else 'All'
+            self.__apply_filter__()
+        self.clan_combobox.set(self.current_clan)
+        self.grade_combobox.set(self.current_grade)
 
-        new_card_gift_icon = ImageTk.PhotoImage(file=f"icons/gifts/{self.current_card.clan.imaginary_gift.name}_icon.webp")
+    def __show_card__(self):
+        card = self.current_card
+        if card is None:
+            self.__show_no_card__()
+            return
+        imaginary_gift, nation = self.clans[card.clan_name]
+        self.card_name_label.configure(text=f"Name: {card.name}")
+        self.card_grade_label.configure(text=f"Grade: {card.grade}")
+
+        new_card_gift_icon = ImageTk.PhotoImage(file=f"icons/gifts/{imaginary_gift}_icon.webp")
         self.card_gift_label.configure(image=new_card_gift_icon)
         self.card_gift_label.image = new_card_gift_icon
-        if self.current_card.grade != 3:
+        if card.grade != 3:
             self.card_gift_frame.pack_forget()
         else:
             self.card_gift_frame.pack(side=tk.TOP, anchor='w')
 
-        self.card_power_label.configure(text=f"Power: {self.current_card.power}")
+        self.card_power_label.configure(text=f"Power: {card.power}")
         self.card_power_label.pack_forget()
         self.card_power_label.pack(side=tk.TOP, anchor='w')
 
-        self.card_critical_label.configure(text=f"Critical: {self.current_card.critical}")
+        self.card_critical_label.configure(text=f"Critical: {card.critical}")
         self.card_critical_label.pack_forget()
         self.card_critical_label.pack(side=tk.TOP, anchor='w')
 
-        self.card_shield_label.configure(text=f"Shield: {self.current_card.shield}")
-        if self.current_card.shield is not None:
+        self.card_shield_label.configure(text=f"Shield: {card.shield}")
+        if card.shield is not None:
             self.card_shield_label.pack_forget()
             self.card_shield_label.pack(side=tk.TOP, anchor='w')
         else:
             self.card_shield_label.pack_forget()
 
-        new_card_clan_icon = ImageTk.PhotoImage(Image.open(f"icons/clans/Icon_{self.current_card.clan.name.replace(' ','')}.webp").resize((14, 14), Image.LANCZOS))
-        self.card_clan_label.configure(text=f"Clan: {self.current_card.clan.name}", image=new_card_clan_icon)
+        new_card_clan_icon = ImageTk.PhotoImage(Image.open(f"icons/clans/Icon_{card.clan_name.replace(' ','')}.webp").resize((14, 14), Image.LANCZOS))
+        self.card_clan_label.configure(text=f"Clan: {card.clan_name}", image=new_card_clan_icon)
         self.card_clan_label.image = new_card_clan_icon
 
         self.card_clan_label.pack_forget()
         self.card_clan_label.pack(side=tk.TOP, anchor='w')
 
-        new_card_nation_icon = ImageTk.PhotoImage(file=f"icons/nations/{self.current_card.clan.nation.name}.webp")
-        self.card_nation_label.configure(text=f"Nation: {self.current_card.clan.nation.name}  ", image=new_card_nation_icon)
+        new_card_nation_icon = ImageTk.PhotoImage(file=f"icons/nations/{nation}.webp")
+        self.card_nation_label.configure(text=f"Nation: {nation}  ", image=new_card_nation_icon)
         self.card_nation_label.image = new_card_nation_icon
 
         self.card_nation_label.pack_forget()
         self.card_nation_label.pack(side=tk.TOP, anchor='w')
 
-        self.card_quanitiy_label.configure(text=f"Quantity: {self.dao.get_card_count(self.current_card.name)}")
         self.card_quanitiy_label.pack_forget()
         self.card_quanitiy_label.pack(side=tk.TOP, anchor='w')
-
-        self.card_rarity_label.configure(text=f"Rairties: {self.dao.get_card_rarities(self.current_card.name)}")
         self.card_rarity_label.pack_forget()
         self.card_rarity_label.pack(side=tk.TOP, anchor='w')
+        self.__show_copies__()
 
-    def update_clans(self):
-        clans = ['All Clans'] + [clan.name for clan in self.dao.get_clans_with_cards()]
-        self.clan_combobox.configure(values=clans)
-        selected_index = self.clan_combobox.current()
-        self.current_clan = clans[selected_index]
-        cards = self.dao.get_clan_grade_cards(self.current_clan, self.current_grade)
-        self.card_combobox.configure(values=[card.name for card in cards])
-        
-    def update_grades(self):
-        grades = ['All'] + [grade[0] for grade in self.dao.get_card_grades()]
-        self.grade_combobox.configure(values=grades)
-        selected_index = self.grade_combobox.current()
-        self.current_grade = grades[selected_index]
-        cards = self.dao.get_clan_grade_cards(self.current_clan, self.current_grade)
-        self.card_combobox.configure(values=[card.name for card in cards])
\ No newline at end of file
+    def __show_no_card__(self):
+        self.card_combobox.set('')
+        self.card_name_label.configure(text="Name: ")
+        self.card_grade_label.configure(text="Grade: ")
+        for label in (self.card_gift_frame, self.card_power_label, self.card_critical_label, self.card_shield_label,
+                      self.card_clan_label, self.card_nation_label, self.card_quanitiy_label, self.card_rarity_label):
+            label.pack_forget()
+
+    def __show_copies__(self):
+        rarities = self.rarities.get(self.current_card.name, Counter())
+        self.card_quanitiy_label.configure(text=f"Quantity: {sum(rarities.values())}")
+        self.card_rarity_label.configure(text=f"Rairties: {', '.join(rarities)}")
+
+    def __change_copies__(self, card: CardData, rarity: str, delta: int):
+        rarities = self.rarities.setdefault(card.name, Counter())
+        rarities[rarity] += delta
+        if rarities[rarity] <= 0:
+            del rarities[rarity]
+        if self.current_card is not None and card.name == self.current_card.name:
+            self.__show_copies__()
+
+    def __card_added__(self, event: CardAdded):
+        self.cards[event.card.name] = event.card
+        self.rarities.setdefault(event.card.name, Counter())
+        if not self.card_filter.is_empty():
+            self.__apply_filter__()
+        elif self.__matches__(event.card):
+            self.filtered.append(event.card.name)
+            self.card_combobox.configure(values=self.filtered)
+        self.__update_filters__()
+        # First card added to empty collection becomes selected
+        if self.current_card is None:
+            self.select_card(event.card.name)
+
+    def __card_updated__(self, event: CardUpdated):
+        self.cards[event.new.name] = event.new
+        if not self.card_filter.is_empty() or self.__matches__(event.old) != self.__matches__(event.new):
+            self.__apply_filter__()
+        self.__update_filters__()
+        if self.current_card is not None and event.new.name == self.current_card.name:
+            self.current_card = event.new
+            self.__show_card__()
+
+    def __card_deleted__(self, event: CardDeleted):
+        name = event.card.name
+        self.cards.pop(name, None)
+        self.rarities.pop(name, None)
+        if name in self.filtered:
+            self.filtered.remove(name)
+            self.card_combobox.configure(values=self.filtered)
+        self.__update_filters__()
+        if self.current_card is not None and name == self.current_card.name:
+            if self.cards:
+                self.select_card(self.filtered[0] if self.filtered else next(iter(self.cards)))
+            else:
+                self.current_card = None
+                self.__show_card__()
+
+    def __instance_added__(self, event: InstanceAdded):
+        self.__change_copies__(event.card, event.rarity, 1)
+        self.__copies_changed__()
+
+    def __instance_updated__(self, event: InstanceUpdated):
+        self.__change_copies__(event.old_card, event.old_rarity, -1)
+        self.__change_copies__(event.card, event.rarity, 1)
+        # Edited copy of current card was renamed, selection follows it
+        if self.current_card is not None and event.old_card.name == self.current_card.name and event.card.name != event.old_card.name:
+            self.select_card(event.card.name)
+        self.__copies_changed__()
+
+    def __instance_deleted__(self, event: InstanceDeleted):
+        self.__change_copies__(event.card, event.rarity, -1)
+        self.__copies_changed__()
+
+    def __copies_changed__(self):
+        # Only filter by rarity depends on copies of cards
+        if self.card_filter.rarities:
+            self.__apply_filter__()
+
+    def __clan_added__(self, event: ClanAdded):
+        self.clans[event.name] = (event.imaginary_gift_name, event.nation_name)
+
+    def __collection_reloaded__(self, event: CollectionReloaded):
+        self.load()
+        self.__apply_filter__()
+        self.__update_filters__()
+        if self.current_card is not None and self.current_card.name in self.cards:
+            self.current_card = self.cards[self.current_card.name]
+            self.__show_card__()
+        elif self.cards:
+            self.select_card(self.filtered[0] if self.filtered else next(iter(self.cards)))
+        else:
+            self.current_card = None
+            self.__show_card__()
+
+    def __filter_applied__(self, event: FilterApplied):
+        self.card_filter = event.card_filter
+        self.__apply_filter__()
@@ -0,0 +1,195 @@
+"""
+    This module provides content-addressed storage of card images packed into append-only pack files.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+from urllib.parse import unquote
+
+STORE_DIR = 'images/store'
+# Older versions saved every image as loose file in this directory
+LEGACY_DIR = 'images'
+PACK_SIZE_LIMIT = 64 * 1024 * 1024 # bytes
+DEFAULT_IMAGE = 'vanguardsleevelogo.png'
+
+class ImageStore():
+    """
+    Class representing a content-addressed image store.
+    Every distinct image is stored once (keyed by its sha256 hash) and appended into one of the pack files.
+    An index database maps card name -> hash -> (pack, offset, length). Reads are served from memory-mapped packs.
+
+    Attributes:
+        directory (str): directory holding index and pack files.
+        pack_size_limit (int): size in bytes after which new blobs are appended into a new pack file.
+        index (sqlite3.Connection): connection to the index database.
+
+    Methods:
+        put (str) -- stores image bytes under card name and returns hash of the content. Content already present in store is not written again.\n
+        get (bytes) -- returns image of a card read from memory-mapped pack, or None if there is no such image. Bytes are copied out of the map, so maps can be replaced or closed while caller holds the image.\n
+        contains (bool) -- checks whether image for a card name is present in store.\n
+        missing (List[str]) -- returns names from given iterable which have no image in store.\n
+        remove (bool) -- removes name from index. Blob stays in pack until compaction.\n
+        migrate_directory (int) -- moves loose image files from a directory into the store and returns number of migrated files.\n
+        migrate_legacy (int) -- copies loose images of older versions into the store when the store is still empty, returns number of migrated files.\n
+        compact (Tuple[int, int]) -- rewrites packs keeping only referenced blobs, returns number of bytes before and after compaction.\n
+        close -- closes index connection and all memory maps.
+    """
+    def __init__(self, directory: str = STORE_DIR, pack_size_limit: int = PACK_SIZE_LIMIT):
+        self.directory = directory
+        self.pack_size_limit = pack_size_limit
+        os.makedirs(self.directory, exist_ok=True)
+        self.index = sqlite3.connect(os.path.join(self.directory, 'index.db'))
+        self.index.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (hash TEXT PRIMARY KEY, pack INTEGER NOT NULL, offset INTEGER NOT NULL, length INTEGER NOT NULL);
+            CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, hash TEXT NOT NULL REFERENCES blobs(hash));
+            CREATE INDEX IF NOT EXISTS ix_names_hash ON names(hash);
+        """)
+        self._maps = {}
+
+    def _pack_path(self, pack: int):
+        return os.path.join(self.directory, f'pack-{pack:05d}.pack')
+
+    def _current_pack(self):
+        last = self.index.execute('SELECT MAX(pack) FROM blobs').fetchone()[0]
+        if last is None:
+            return 0
+        if os.path.getsize(self._pack_path(last)) >= self.pack_size_limit:
+            return last + 1
+        return last
+
+    def _map(self, pack: int, end: int):
+        """
+        Returns memory map of a pack which covers at least 'end' bytes. Map is recreated if pack was appended to after it was mapped.
+        """
+        mapped = self._maps.get(pack)
+        if mapped is None or len(mapped) < end:
+            if mapped is not None:
+                mapped.close()
+            with open(self._pack_path(pack), 'rb') as file:
+                mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[pack] = mapped
+        return mapped
+
+    def _unmap(self):
+        for mapped in self._maps.values():
+            mapped.close()
+        self._maps = {}
+
+    def put(self, name: str, data: bytes):
+        digest = hashlib.sha256(data).hexdigest()
+        with self.index:
+            if self.index.execute('SELECT 1 FROM blobs WHERE hash = ?', (digest,)).fetchone() is None:
+                pack = self._current_pack()
+                with open(self._pack_path(pack), 'ab') as file:
+                    offset = file.tell()
+                    file.write(data)
+                    file.flush()
+                    os.fsync(file.fileno())
+                self.index.execute('INSERT INTO blobs (hash, pack, offset, length) VALUES (?, ?, ?, ?)', (digest, pack, offset, len(data)))
+            self.index.execute('INSERT OR REPLACE INTO names (name, hash) VALUES (?, ?)', (name, digest))
+        return digest
+
+    def get(self, name: str):
+        row = self.index.execute(
+            'SELECT b.pack, b.offset, b.length FROM names n JOIN blobs b ON b.hash = n.hash WHERE n.name = ?', (name,)).fetchone()
+        if row is None:
+            return None
+        pack, offset, length = row
+        if length == 0:
+            return b''
+        return self._map(pack, offset + length)[offset:offset + length]
+
+    def contains(self, name: str):
+        return self.index.execute('SELECT 1 FROM names WHERE name = ?', (name,)).fetchone() is not None
+
+    def missing(self, names):
+        stored = {row[0] for row in self.index.execute('SELECT name FROM names')}
+        return [name for name in names if name not in stored]
+
+    def remove(self, name: str):
+        with self.index:
+            return self.index.execute('DELETE FROM names WHERE name = ?', (name,)).rowcount > 0
+
+    def migrate_directory(self, path: str = LEGACY_DIR, remove: bool = False):
+        """
+        Moves loose image files from a directory into the store. Card name is recovered from file name, quotes escaped by older versions are unescaped.
+
+        Args:
+            path (str): directory with loose images.
+            remove (bool): whether migrated files should be deleted.
+
+        Returns:
+            int: number of migrated files.
+        """
+        migrated = 0
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            if not entry.is_file() or entry.name == DEFAULT_IMAGE:
+                continue
+            name, extension = os.path.splitext(entry.name)
+            if extension.lower() not in ('.jpg', '.jpeg', '.png', '.webp'):
+                continue
+            with open(entry.path, 'rb') as file:
+                self.put(unquote(name), file.read())
+            if remove:
+                os.remove(entry.path)
+            migrated += 1
+        return migrated
+
+    def migrate_legacy(self, path: str = LEGACY_DIR):
+        """
+        Copies loose images saved by older versions into the store on first start, so they are not downloaded again. Loose files are kept.
+        Nothing is done once the store holds any image.
+
+        Returns:
+            int: number of migrated files.
+        """
+        if not os.path.isdir(path) or self.index.execute('SELECT 1 FROM names LIMIT 1').fetchone() is not None:
+            return 0
+        return self.migrate_directory(path)
+
+    def compact(self):
+        """
+        Rewrites packs so that only blobs referenced by some name are kept.
+
+        Returns:
+            Tuple[int, int]: size of all packs in bytes before and after compaction.
+        """
+        old_packs = [row[0] for row in self.index.execute('SELECT DISTINCT pack FROM blobs ORDER BY pack')]
+        size_before = sum(os.path.getsize(self._pack_path(pack)) for pack in old_packs)
+        live = self.index.execute(
+            'SELECT hash, pack, offset, length FROM blobs WHERE hash IN (SELECT hash FROM names) ORDER BY pack, offset').fetchall()
+
+        pack = (old_packs[-1] + 1) if old_packs else 0
+        new_packs = []
+        relocated = []
+        output = None
+        try:
+            for digest, old_pack, offset, length in live:
+                if output is None or output.tell() >= self.pack_size_limit:
+                    if output is not None:
+                        output.close()
+                        pack += 1
+                    output = open(self._pack_path(pack), 'wb')
+                    new_packs.append(pack)
+                data = self._map(old_pack, offset + length)[offset:offset + length] if length else b''
+                relocated.append((pack, output.tell(), digest))
+                output.write(data)
+        finally:
+            if output is not None:
+                output.flush()
+                os.fsync(output.fileno())
+                output.close()
+
+        with self.index:
+            self.index.execute('DELETE FROM blobs WHERE hash NOT IN (SELECT hash FROM names)')
+            self.index.executemany('UPDATE blobs SET pack = ?, offset = ? WHERE hash = ?', relocated)
+        self._unmap()
+        for old_pack in old_packs:
+            os.remove(self._pack_path(old_pack))
+        size_after = sum(os.path.getsize(self._pack_path(new_pack)) for new_pack in new_packs)
+        return size_before, size_after
+
+    def close(self):
+        self._unmap()
+        self.index.close()
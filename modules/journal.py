@@ -0,0 +1,81 @@
+"""
+    This module moves changes between copies of the collection, ex. laptop and shop terminal, using change journal kept by DAO.
+    Only journal entries after the last sequence number seen by the peer are exported into a delta file (JSON Lines, first line is a header), so synchronization costs as much as number of changes, not size of the database.
+"""
+import json
+from typing import NamedTuple
+from modules.DAO import DAO
+from modules.models import JournalRecord
+
+class ExportSummary(NamedTuple):
+    origin: str
+    peer: str | None
+    since: int
+    until: int
+    entries: int
+
+    def as_dict(self):
+        return self._asdict()
+
+class ApplySummary(NamedTuple):
+    """
+    Result of applying a delta file, conflicts hold entries which were not applied together with the reason.
+    """
+    origin: str
+    since: int
+    until: int
+    applied: int
+    skipped: int
+    conflicts: list
+
+    def as_dict(self):
+        return {**self._asdict(), 'conflicts': [{'origin': entry.origin, 'origin_seq': entry.origin_seq, 'created_at': entry.created_at, 'reason': reason,
+                                                 'operations': entry.operations} for entry, reason in self.conflicts]}
+
+def export_changes(dao: DAO, path: str, peer: str = None, since: int = None):
+    """
+    Writes journal entries into delta file. Entries made by the peer itself are left out.
+
+    Args:
+        dao (DAO): Database Access Object of exporting collection.
+        path (str): path of the delta file.
+        peer (str): replica id of receiving database, its last exported sequence number is used and updated.
+        since (int): sequence number after which entries are exported, overrides the one recorded for the peer. By default 0 for unknown peer.
+
+    Returns:
+        ExportSummary: summary of the export.
+    """
+    if since is None:
+        since = next((state.sent_seq for state in dao.get_sync_states() if state.peer == peer), 0)
+    origin = dao.get_replica_id()
+    until = dao.get_last_seq()
+    entries = dao.get_changes(since, until, exclude_origin=peer)
+    dao.session.commit()
+    with open(path, 'w', encoding='utf-8') as file:
+        file.write(json.dumps({'origin': origin, 'since': since, 'until': until}) + '\n')
+        for entry in entries:
+            file.write(json.dumps(entry._asdict(), ensure_ascii=False) + '\n')
+    if peer is not None:
+        dao.set_sent_seq(peer, until)
+    return ExportSummary(origin, peer, since, until, len(entries))
+
+def apply_changes(dao: DAO, path: str):
+    """
+    Applies delta file written by export_changes in one transaction. Applying the same file again changes nothing.
+
+    Raises:
+        ValueError: when file is not a delta file, comes from this database or does not continue changes received before.
+        IOError: on database error, nothing was changed.
+
+    Returns:
+        ApplySummary: summary of applied, skipped and conflicting entries.
+    """
+    with open(path, encoding='utf-8') as file:
+        header = json.loads(file.readline() or '{}')
+        if not {'origin', 'since', 'until'} <= header.keys():
+            raise ValueError(f'{path} is not a delta file')
+        entries = [JournalRecord(**json.loads(line)) for line in file if line.strip()]
+    result = dao.apply_changes(header['origin'], header['since'], header['until'], entries)
+    if result is None:
+        raise IOError('Database error, nothing was changed')
+    return ApplySummary(header['origin'], header['since'], header['until'], *result)
@@ -1,10 +1,191 @@
 """
     This module is used for loading data from specified xlsx file, filling db with necessary data, and for loading and saving backups.
 """
-import pandas as pd
+from itertools import islice
+from openpyxl import load_workbook
+import csv
+import json
+import re
 import shutil
 import os
 
+SHEET_NAME = 'Wszystkie karty'
+REFERENCE_DATA = os.path.join(os.path.dirname(__file__), '..', 'data', 'reference.json')
+CHUNK_SIZE = 500
+# Card names can contain letters, digits, spaces and punctuation used by official names, ex. 'Preside Chief. Jomjael'
+CARD_NAME_PATTERN = re.compile(r'^[\w\s"\'.,!?&:()-]+$')
+# Card number is code of the set followed by number of the card in it, ex. 'V-BT05-001EN' or 'D-PR-0012'. It can be part of longer text, ex. name of image file
+CARD_NUMBER_PATTERN = re.compile(r'(?<![A-Za-z0-9])[VD]-[A-Z0-9]{2,5}-[A-Z0-9]{3,6}(?![A-Za-z0-9])', re.IGNORECASE)
+
+def read_xlsx_rows(path: str, sheet_name: str = SHEET_NAME):
+    """
+    Lazily reads rows of a sheet. Workbook is opened in read-only mode, so rows are parsed one at a time.
+
+    Args:
+        path (str): path to xlsx file.
+        sheet_name (str): name of the sheet.
+
+    Yields:
+        Tuple[int, Dict[str, object]]: number of row in the sheet and its values keyed by header.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook[sheet_name].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        for number, values in enumerate(rows, start=2):
+            if values and any(value is not None for value in values):
+                yield number, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+def read_csv_rows(path: str):
+    """
+    Lazily reads rows of csv file with the same header as the xlsx sheet. Both ',' and ';' delimiters are accepted.
+
+    Args:
+        path (str): path to csv file.
+
+    Yields:
+        Tuple[int, Dict[str, object]]: number of line in the file and its values keyed by header.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        delimiter = ';' if ';' in file.readline() else ','
+        file.seek(0)
+        for number, row in enumerate(csv.DictReader(file, delimiter=delimiter), start=2):
+            if any(value not in (None, '') for value in row.values()):
+                yield number, {key.strip(): value for key, value in row.items() if key is not None}
+
+def to_int(value):
+    if isinstance(value, str):
+        value = value.strip()
+    return int(float(value))
+
+def card_number(text):
+    """
+    Returns first card number found in text in upper case, or None if there is none.
+    """
+    match = CARD_NUMBER_PATTERN.search(str(text))
+    return match.group(0).upper() if match is not None else None
+
+def normalize_row(row: dict):
+    """
+    Validates row of the sheet and converts it into arguments of DAO.add_card.
+
+    Args:
+        row (Dict[str, object]): values of the row keyed by header.
+
+    Raises:
+        ValueError: if row has no name, grade or power, or they are not valid. Card number in optional 'Numer' column has to be valid too.
+
+    Returns:
+        Dict[str, object]: normalized card.
+    """
+    name = '' if row.get('Nazwa') is None else str(row['Nazwa']).strip()
+    if not name:
+        raise ValueError('missing Nazwa')
+    if not CARD_NAME_PATTERN.match(name):
+        raise ValueError('invalid characters in Nazwa')
+    if row.get('Grade') in (None, '') or row.get('Power') in (None, ''):
+        raise ValueError('missing Grade or Power')
+    try:
+        grade, power = to_int(row['Grade']), to_int(row['Power'])
+    except (TypeError, ValueError):
+        raise ValueError('Grade and Power must be numbers')
+    shield = row.get('Defence')
+    if shield is None or (isinstance(shield, str) and not shield.strip()):
+        shield = None
+    else:
+        try:
+            shield = to_int(shield)
+        except (TypeError, ValueError):
+            shield = str(shield).strip()
+    number = None
+    if row.get('Numer') not in (None, ''):
+        number = card_number(row['Numer'])
+        if number is None:
+            raise ValueError('invalid Numer')
+    return {'name': name, 'grade': grade, 'power': power, 'critical': 1, 'shield': shield,
+            'clan_name': '' if row.get('Klan') is None else str(row['Klan']).strip(),
+            'card_rarity': '' if row.get('Rarity') is None else str(row['Rarity']).strip(), 'number': number}
+
+def normalize_rows(rows, reject=None):
+    """
+    Normalizes stream of rows, invalid rows are skipped.
+
+    Args:
+        rows (Iterable[Tuple[int, Dict[str, object]]]): numbered rows.
+        reject (Callable[[int, str, dict], None]): if given, it is called with number, reason and values of every skipped row.
+
+    Yields:
+        Dict[str, object]: normalized card.
+    """
+    for number, row in rows:
+        try:
+            yield normalize_row(row)
+        except ValueError as error:
+            if reject is not None:
+                reject(number, str(error), row)
+
+def chunked(iterable, size: int = CHUNK_SIZE):
+    """
+    Groups stream into lists of at most 'size' elements.
+    """
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+class RejectedRows():
+    """
+    Class representing counter of rows rejected during import, which optionally writes them into csv report as they come.
+
+    Attributes:
+        count (int): number of rejected rows.
+        file (TextIO): opened report file or None if report was not requested.
+        writer (csv.writer): writer of the report.
+
+    Methods:
+        __call__ -- records rejected row.\n
+        close -- closes report file.
+    """
+    COLUMNS = ('Nazwa', 'Klan', 'Grade', 'Power', 'Defence', 'Rarity', 'Numer')
+
+    def __init__(self, path: str = None):
+        self.count = 0
+        self.file = None
+        self.writer = None
+        if path is not None:
+            self.file = open(path, 'w', encoding='utf-8', newline='')
+            self.writer = csv.writer(self.file, delimiter=';')
+            self.writer.writerow(('Row', 'Reason') + self.COLUMNS)
+
+    def __call__(self, number: int, reason: str, row: dict):
+        self.count += 1
+        if self.writer is not None:
+            self.writer.writerow([number, reason] + [row.get(column) for column in self.COLUMNS])
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+def format_diff(diff: dict):
+    """
+    Creates human readable report of difference returned by DAO.sync_cards.
+
+    Args:
+        diff (dict): difference between collection and imported data.
+
+    Returns:
+        str: report listing every change.
+    """
+    lines = [f"Cards: +{len(diff['cards_added'])} ~{len(diff['cards_updated'])} -{len(diff['cards_deleted'])}, "
+             f"instances: +{sum(row[2] for row in diff['instances_added'])} -{sum(row[2] for row in diff['instances_deleted'])}"]
+    lines += [f'+ card {row[0]} (grade {row[1]}, power {row[2]}, shield {row[4]}, {row[5]})' for row in diff['cards_added']]
+    lines += [f'~ card {row[0]} (grade {row[1]}, power {row[2]}, shield {row[4]}, {row[5]})' for row in diff['cards_updated']]
+    lines += [f'- card {name}' for name in diff['cards_deleted']]
+    lines += [f'+ {quantity}x {name} [{rarity}]' for name, rarity, quantity in diff['instances_added']]
+    lines += [f'- {quantity}x {name} [{rarity}]' for name, rarity, quantity in diff['instances_deleted']]
+    return '\n'.join(lines)
+
 class Loader():
     """
         Class responsible for loading data from specified xlsx file and filling db with necessary data
@@ -13,66 +194,98 @@ class Loader():
             dao (DAO): Database Access Object.
             
         Methods:
-            load_cards_from_xlsx -- saves cards loaded from xlsx file using pandas dataframe to database using DAO object.\n
-            load_basic_data (bool) -- saves to database predefined values necessary for any card from 'Cardfight!! Vanguard'
+            load_cards_from_xlsx (Tuple[int, int]) -- streams rows of xlsx file, validates them and saves cards to database in chunks using DAO object. Returns number of imported and rejected rows.\n
+            sync_cards_from_xlsx (dict) -- makes collection equal to content of xlsx file, applying only the difference. Can be run without applying anything to see the difference.\n
+            load_basic_data (bool) -- saves to database values necessary for any card from 'Cardfight!! Vanguard' (nations, imaginary gifts and clans) read from versioned data file
     """
     def __init__(self, dao):
         self.dao = dao
         
-    def load_cards_from_xlsx(self, path):
-        df = pd.read_excel(path, sheet_name='Wszystkie karty')
-        df = df.dropna(subset=['Grade', 'Power'])
-        df.fillna('', inplace=True)
-        with open('c.csv', 'w', encoding='utf-8') as file:
-            for v, card in df.iterrows():
-                print(f"{card['Nazwa']};{card['Klan']};{int(card['Grade'])};{int(card['Power'])};{card['Defence']};{card['Rarity']}", file=file)
-                if card['Defence'] == '': shield = None
-                else: shield = card['Defence']
-                self.dao.add_card(name=card['Nazwa'], power=int(card['Power']), critical=1, grade=int(card['Grade']), clan_name=card['Klan'], card_rarity=card['Rarity'], shield=shield)
-                
-        pass
-        
-    def load_basic_data(self):
+    def load_cards_from_xlsx(self, path: str, rejected_path: str = None, chunk_size: int = CHUNK_SIZE):
+        """
+        Streams rows of the sheet, so memory usage does not depend on size of the file.
+
+        Args:
+            path (str): path to xlsx file.
+            rejected_path (str): if given, csv report of rows which were not imported is written there.
+            chunk_size (int): number of rows saved in one transaction.
+
+        Returns:
+            Tuple[int, int]: number of imported and rejected rows.
+        """
+        rejected = RejectedRows(rejected_path)
+        imported = 0
+        try:
+            for chunk in chunked(normalize_rows(read_xlsx_rows(path), rejected), chunk_size):
+                if self.dao.add_cards(chunk):
+                    imported += len(chunk)
+                else:
+                    for card in chunk:
+                        rejected(None, 'database error', {'Nazwa': card['name'], 'Klan': card['clan_name'], 'Grade': card['grade'],
+                                                          'Power': card['power'], 'Defence': card['shield'], 'Rarity': card['card_rarity'],
+                                                          'Numer': card['number']})
+        finally:
+            rejected.close()
+        return imported, rejected.count
+
+    def sync_cards_from_xlsx(self, path: str, dry_run: bool = False, delete_missing: bool = True, rejected_path: str = None):
+        """
+        Upserts content of the sheet. Re-importing unchanged sheet does not change the collection.
+
+        Args:
+            path (str): path to xlsx file.
+            dry_run (bool): whether difference should only be computed, without changing the collection.
+            delete_missing (bool): whether cards and copies missing in the sheet should be deleted.
+            rejected_path (str): if given, csv report of rows which were not imported is written there.
+
+        Returns:
+            dict: difference as returned by DAO.sync_cards, None if it could not be applied.
+        """
+        rejected = RejectedRows(rejected_path)
         try:
-            [self.dao.add_nation(nation) for nation in ['United Sanctuary', 'Dragon Empire', 'Dark Zone', 'Star Gate', 'Magallanica', 'Zoo']]
-            [self.dao.add_imaginary_gift(gift) for gift in ['Accel', 'Protect', 'Force']]
-            self.dao.add_clan('Royal Paladin', 'Force', 'United Sanctuary')
-            self.dao.add_clan('Oracle Think Tank', 'Protect', 'United Sanctuary')
-            self.dao.add_clan('Angel Feather', 'Protect', 'United Sanctuary')
-            self.dao.add_clan('Shadow Paladin', 'Force', 'United Sanctuary')
-            self.dao.add_clan('Gold Paladin', 'Accel', 'United Sanctuary')
-            self.dao.add_clan('Genesis', 'Force', 'United Sanctuary')
-            self.dao.add_clan('Kagero', 'Force', 'Dragon Empire')
-            self.dao.add_clan('Nubatama', 'Protect', 'Dragon Empire')
-            self.dao.add_clan('Tachikaze', 'Accel', 'Dragon Empire')
-            self.dao.add_clan('Murakumo', 'Accel', 'Dragon Empire')
-            self.dao.add_clan('Narukami', 'Accel', 'Dragon Empire')
-            self.dao.add_clan('Nova Grappler', 'Accel', 'Star Gate')
-            self.dao.add_clan('Dimension Police', 'Force', 'Star Gate')
-            self.dao.add_clan('Link Joker', 'Force', 'Star Gate')
-            self.dao.add_clan('Spike Brothers', 'Force', 'Dark Zone')
-            self.dao.add_clan('Dark Irregulars', 'Protect', 'Dark Zone')
-            self.dao.add_clan('Pale Moon', 'Accel', 'Dark Zone')
-            self.dao.add_clan('Gear Chronicle', 'Force', 'Dark Zone')
-            self.dao.add_clan('Granblue', 'Protect', 'Magallanica')
-            self.dao.add_clan('Bermuda Triangle', 'Force', 'Magallanica')
-            self.dao.add_clan('Aqua Force', 'Accel', 'Magallanica')
-            self.dao.add_clan('Megacolony', 'Protect', 'Zoo')
-            self.dao.add_clan('Great Nature', 'Accel', 'Zoo')
-            self.dao.add_clan('Neo Nectar', 'Force', 'Zoo')
-            return True
-        except:
-            return False
+            return self.dao.sync_cards(normalize_rows(read_xlsx_rows(path), rejected), delete_missing=delete_missing, dry_run=dry_run)
+        finally:
+            rejected.close()
         
-def save_backup():
+    def load_basic_data(self, path: str = REFERENCE_DATA, force: bool = False):
+        """
+        Seeds nations, imaginary gifts and clans from versioned data file. Seeding the same version again does nothing.
+
+        Args:
+            path (str): path to JSON file with reference data.
+            force (bool): whether data should be applied even if its version was already applied.
+
+        Raises:
+            OSError: if data file cannot be read.
+            ValueError: if data file is not valid JSON.
+            KeyError: if data file misses version or any of the lists.
+
+        Returns:
+            bool: True if data is in database, False if it could not be saved.
+        """
+        with open(path, encoding='utf-8') as file:
+            data = json.load(file)
+        return self.dao.seed_reference_data(data, force)
+        
+def default_backup_path(db_path: str):
+    """
+    Returns path of backup file of given database, ex. 'vanguard_bk.db' for 'vanguard.db', so every collection has its own backup.
+    """
+    root, extension = os.path.splitext(db_path)
+    return f'{root}_bk{extension or ".db"}'
+
+def save_backup(db_path: str = 'vanguard.db', backup_path: str = None):
     """
     This method is used for performing backup of database.
     """
-    shutil.copyfile('vanguard.db', 'vanguard_bk.db')
+    shutil.copyfile(db_path, backup_path or default_backup_path(db_path))
     
-def load_backup():
+def load_backup(db_path: str = 'vanguard.db', backup_path: str = None):
     """
     This method is used for loading backup of database.
     """
-    if os.path.exists('vanguard_bk.db'):
-        shutil.copyfile('vanguard_bk.db', 'vanguard.db')
\ No newline at end of file
+    backup_path = backup_path or default_backup_path(db_path)
+    if os.path.exists(backup_path):
+        shutil.copyfile(backup_path, db_path)
+        return True
+    return False
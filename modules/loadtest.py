@@ -0,0 +1,151 @@
+"""
+    This module is a load test of the local API server. Many client threads send requests over kept-alive connections and throughput and latency percentiles are reported.
+    Server can be started inside of the test, so one command measures the whole stack.
+"""
+import http.client
+import itertools
+import json
+import threading
+import time
+from urllib.parse import urlsplit, quote
+
+def default_paths(base_url: str):
+    """
+    Creates mix of typical requests: pages of cards, filtering, search, card details and statistics.
+    """
+    connection = http.client.HTTPConnection(urlsplit(base_url).netloc, timeout=30)
+    try:
+        connection.request('GET', '/cards?limit=20')
+        names = [card['name'] for card in json.loads(connection.getresponse().read())['items']]
+        connection.request('GET', '/clans')
+        clans = [clan['name'] for clan in json.loads(connection.getresponse().read())['clans']][:5]
+    finally:
+        connection.close()
+    paths = ['/cards', '/cards?offset=50', '/cards?grade=3', '/stats', '/search?q=a', '/clans']
+    paths += [f'/cards?clan={quote(clan)}' for clan in clans]
+    paths += [f'/cards/{quote(name)}' for name in names]
+    return paths
+
+def percentile(values, fraction: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+class LoadTestReport():
+    """
+    Class representing result of the load test.
+
+    Attributes:
+        latencies (List[float]): duration of every request in seconds.
+        statuses (Dict[int, int]): number of responses with every status.
+        errors (int): number of requests which failed without response.
+        seconds (float): duration of the whole test.
+
+    Methods:
+        requests_per_second (float) -- returns throughput of the server.\n
+        latency (float) -- returns given percentile of latency in milliseconds.
+    """
+    def __init__(self):
+        self.latencies = []
+        self.statuses = {}
+        self.errors = 0
+        self.seconds = 0.0
+
+    def requests_per_second(self):
+        return len(self.latencies) / self.seconds if self.seconds > 0 else 0.0
+
+    def latency(self, fraction: float):
+        return percentile(self.latencies, fraction) * 1000
+
+    def __repr__(self):
+        statuses = ', '.join(f'{status}: {count}' for status, count in sorted(self.statuses.items()))
+        return (f'{len(self.latencies)} requests in {self.seconds:.2f}s, {self.requests_per_second():.0f} requests/s\n'
+                f'latency p50 {self.latency(0.5):.2f} ms, p90 {self.latency(0.9):.2f} ms, p99 {self.latency(0.99):.2f} ms, max {self.latency(1):.2f} ms\n'
+                f'statuses {statuses}, errors {self.errors}')
+
+def run_client(base_url: str, paths, counter, total: int, revalidate: bool, report: LoadTestReport, lock):
+    """
+    Sends requests until 'total' requests were taken from shared counter. With revalidation ETags of earlier responses are sent back in If-None-Match.
+    """
+    netloc = urlsplit(base_url).netloc
+    connection = http.client.HTTPConnection(netloc, timeout=30)
+    etags = {}
+    latencies, statuses, errors = [], {}, 0
+    while (number := next(counter)) < total:
+        path = paths[number % len(paths)]
+        headers = {'If-None-Match': etags[path]} if revalidate and path in etags else {}
+        start = time.perf_counter()
+        try:
+            connection.request('GET', path, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(netloc, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+        statuses[response.status] = statuses.get(response.status, 0) + 1
+        if response.getheader('ETag'):
+            etags[path] = response.getheader('ETag')
+    connection.close()
+    with lock:
+        report.latencies.extend(latencies)
+        for status, count in statuses.items():
+            report.statuses[status] = report.statuses.get(status, 0) + count
+        report.errors += errors
+
+def run_load_test(base_url: str, paths=None, requests: int = 5000, concurrency: int = 16, revalidate: bool = False):
+    """
+    Runs the load test against running server.
+
+    Args:
+        base_url (str): address of the server, ex. 'http://127.0.0.1:8080'.
+        paths (List[str]): requested paths, used in round robin. By default mix returned by default_paths.
+        requests (int): number of all requests.
+        concurrency (int): number of client threads, each with its own connection.
+        revalidate (bool): whether clients should send ETags of earlier responses, as caching clients do.
+
+    Returns:
+        LoadTestReport: result of the test.
+    """
+    paths = paths or default_paths(base_url)
+    report = LoadTestReport()
+    counter = itertools.count()
+    lock = threading.Lock()
+    clients = [threading.Thread(target=run_client, args=(base_url, paths, counter, requests, revalidate, report, lock)) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    report.seconds = time.perf_counter() - start
+    return report
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Load test of the local API server.')
+    parser.add_argument('--url', help='address of running server, by default server is started for --db on free port')
+    parser.add_argument('--db', default='vanguard.db')
+    parser.add_argument('--readers', type=int, default=4)
+    parser.add_argument('-n', '--requests', type=int, default=5000)
+    parser.add_argument('-c', '--concurrency', type=int, default=16)
+    parser.add_argument('--revalidate', action='store_true', help='send If-None-Match with ETags of earlier responses')
+    parser.add_argument('--path', action='append', dest='paths', help='requested path, can be repeated')
+    args = parser.parse_args()
+
+    server = None
+    url = args.url
+    if url is None:
+        from modules.api import ApiServer
+        server = ApiServer(('127.0.0.1', 0), args.db, args.readers)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        print(run_load_test(url, args.paths, args.requests, args.concurrency, args.revalidate))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
@@ -0,0 +1,247 @@
+"""
+    This module keeps the database healthy over months of use. Rows written since last ANALYZE are counted, planner statistics are refreshed when enough of them changed,
+    free pages left by deleted rows are given back by incremental vacuum and integrity of tables is checked with quick_check.
+    Every task is split into small steps, which the GUI runs only when user is idle, and all tasks can be also run at once from command line.
+"""
+import time
+from datetime import datetime, timedelta
+from typing import NamedTuple
+from sqlalchemy import event, text
+from modules.DAO import DAO
+
+# Rows written since last ANALYZE after which statistics are refreshed
+ANALYZE_WRITES = 1000
+# Relative change of number of rows of a table since last ANALYZE after which statistics are refreshed
+STAT_DRIFT = 0.1
+# Tables smaller than this are left out of the drift, their statistics hardly change plans
+DRIFT_ROWS = 1000
+# Rows of every index examined by ANALYZE run in the background, so it takes milliseconds also on big tables
+ANALYSIS_LIMIT = 1000
+# Free pages after which incremental vacuum runs, and pages released by one step
+FREE_PAGES = 256
+VACUUM_STEP = 128
+CHECK_DAYS = 7
+# Larger databases are switched to incremental auto_vacuum only on demand, because switching rebuilds whole file (about 250 ms for 32 MB)
+CONVERT_SIZE = 16 * 1024 * 1024
+AUTO_VACUUM_MODES = {0: 'none', 1: 'full', 2: 'incremental'}
+# Seconds without input after which GUI runs maintenance, interval of checks and time budget of one tick
+IDLE_SECONDS = 5
+TICK_MS = 1000
+BUDGET_SECONDS = 0.05
+PLAN_SECONDS = 60
+
+class MaintenanceStatus(NamedTuple):
+    """
+    State of the database relevant for maintenance, tasks are names of tasks which are due.
+    """
+    writes: int
+    analyzed_at: str | None
+    stat_drift: float | None
+    auto_vacuum: str
+    size: int
+    free_pages: int
+    checked_at: str | None
+    check_result: str | None
+    tasks: list
+
+    def as_dict(self):
+        return self._asdict()
+
+class Maintenance():
+    """
+    Class representing maintenance of one database. Rows written through the engine of the DAO are counted while the object exists and saved into database info on every step.
+
+    Attributes:
+        dao (DAO): Database Access Object of maintained database.
+        pending_writes (int): rows written since writes were last saved.
+        plan (List[str]): due tasks which are not finished yet.
+        planned_at (float): time of last planning.
+        check_queue (List[str]): tables not checked yet by running integrity check.
+        check_errors (List[str]): errors found by running integrity check.
+
+    Methods:
+        status (MaintenanceStatus) -- returns state of the database and due tasks.\n
+        due_tasks (List[str]) -- returns names of due tasks in order in which they run: 'analyze', 'convert', 'vacuum' and 'check'.\n
+        step (Tuple[str, bool]) -- runs one small step of first due task, returns its name and whether task is finished (None when it failed and was dropped from plan), or None when nothing is due.\n
+        run (List[Tuple[str, str]]) -- runs due tasks (all of them with full=True) to the end, returns task names and results, 'failed' for tasks which database refused to run.\n
+        flush_writes -- adds counted writes to the number saved in database.\n
+        __count_writes__ -- counts rows changed by executed statement.\n
+        __run_task__ (bool) -- runs one step of given task, returns whether task is finished, or None when the step failed.\n
+        __pragma__ -- returns value of a pragma.
+    """
+    def __init__(self, dao: DAO):
+        self.dao = dao
+        self.pending_writes = 0
+        self.plan = []
+        self.planned_at = None
+        self.check_queue = None
+        self.check_errors = []
+        event.listen(dao.session.get_bind(), 'after_cursor_execute', self.__count_writes__)
+
+    def status(self):
+        size = self.__pragma__('page_count') * self.__pragma__('page_size')
+        return MaintenanceStatus(self.__writes__(), self.dao.get_info('maintenance_analyzed_at'), self.__stat_drift__(),
+                                 AUTO_VACUUM_MODES.get(self.__pragma__('auto_vacuum'), 'none'), size, self.__pragma__('freelist_count'),
+                                 self.dao.get_info('maintenance_checked_at'), self.dao.get_info('maintenance_check_result'), self.due_tasks())
+
+    def due_tasks(self, full: bool = False):
+        if full:
+            return ['analyze', 'convert' if self.__pragma__('auto_vacuum') != 2 else 'vacuum', 'check']
+        tasks = []
+        drift = self.__stat_drift__()
+        if drift is None or drift >= STAT_DRIFT or self.__writes__() >= ANALYZE_WRITES:
+            tasks.append('analyze')
+        free_pages = self.__pragma__('freelist_count')
+        if free_pages >= FREE_PAGES:
+            if self.__pragma__('auto_vacuum') == 2:
+                tasks.append('vacuum')
+            elif self.__pragma__('page_count') * self.__pragma__('page_size') <= CONVERT_SIZE:
+                tasks.append('convert')
+        checked_at = self.dao.get_info('maintenance_checked_at')
+        if self.check_queue is not None or checked_at is None or datetime.fromisoformat(checked_at) < datetime.now() - timedelta(days=CHECK_DAYS):
+            tasks.append('check')
+        return tasks
+
+    def step(self):
+        self.flush_writes()
+        if not self.plan:
+            if self.planned_at is not None and time.monotonic() - self.planned_at < PLAN_SECONDS:
+                return None
+            self.plan, self.planned_at = self.due_tasks(), time.monotonic()
+            if not self.plan:
+                return None
+        task = self.plan[0]
+        finished = self.__run_task__(task)
+        # Failed task is tried again only when it is planned next time
+        if finished is None or finished:
+            self.plan.pop(0)
+        return task, finished
+
+    def run(self, full: bool = False):
+        self.flush_writes()
+        results = []
+        for task in self.due_tasks(full):
+            finished = False
+            while finished is False:
+                finished = self.__run_task__(task, full)
+            if finished is None:
+                results.append((task, 'failed'))
+            else:
+                results.append((task, self.dao.get_info('maintenance_check_result') if task == 'check' else 'done'))
+        self.plan, self.planned_at = [], time.monotonic()
+        return results
+
+    def flush_writes(self):
+        if self.pending_writes:
+            writes, self.pending_writes = self.__writes__(), 0
+            self.dao.set_info('maintenance_writes', writes)
+
+    def __count_writes__(self, connection, cursor, statement, parameters, context, executemany):
+        # Saved counters and results of maintenance itself are not counted
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE') and cursor.rowcount > 0 and 'DatabaseInfo' not in statement:
+            self.pending_writes += cursor.rowcount
+
+    def __run_task__(self, task: str, full: bool = False):
+        if task == 'analyze':
+            if not self.dao.analyze(None if full else ANALYSIS_LIMIT):
+                return None
+            self.pending_writes = 0
+            self.dao.set_info('maintenance_writes', 0)
+            self.dao.set_info('maintenance_analyzed_at', datetime.now().isoformat(timespec='seconds'))
+            return True
+        if task == 'convert':
+            return True if self.dao.vacuum('INCREMENTAL') else None
+        if task == 'vacuum':
+            if not self.dao.incremental_vacuum(0 if full else VACUUM_STEP):
+                return None
+            return full or self.__pragma__('freelist_count') < VACUUM_STEP
+        if task == 'check':
+            if self.check_queue is None:
+                self.check_queue = [name for (name,) in self.dao.session.execute(text(
+                    "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"))]
+                self.check_errors = []
+            if self.check_queue:
+                table = self.check_queue.pop(0)
+                rows = [row[0] for row in self.dao.session.execute(text(f'PRAGMA quick_check("{table}")'))]
+                self.check_errors += [f'{table}: {row}' for row in rows if row != 'ok']
+                self.dao.session.commit()
+            if self.check_queue:
+                return False
+            self.check_queue = None
+            self.dao.set_info('maintenance_check_result', '; '.join(self.check_errors) or 'ok')
+            self.dao.set_info('maintenance_checked_at', datetime.now().isoformat(timespec='seconds'))
+            return True
+        raise ValueError(f'Unknown maintenance task {task}')
+
+    def __writes__(self):
+        return int(self.dao.get_info('maintenance_writes') or 0) + self.pending_writes
+
+    def __stat_drift__(self):
+        """
+        Returns largest relative change of number of rows of a table since statistics were gathered, or None if there are no statistics.
+        """
+        try:
+            analyzed = dict(self.dao.session.execute(text(
+                "SELECT tbl, MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl NOT LIKE 'sqlite_%' GROUP BY tbl")).fetchall())
+        except Exception:
+            self.dao.session.rollback()
+            return None
+        if not analyzed:
+            return None
+        drift = 0.0
+        for table, rows in analyzed.items():
+            current = self.dao.session.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar()
+            if max(current, rows) >= DRIFT_ROWS:
+                drift = max(drift, abs(current - rows) / max(rows, 1))
+        self.dao.session.commit()
+        return drift
+
+    def __pragma__(self, name: str):
+        value = self.dao.session.execute(text(f'PRAGMA {name}')).scalar()
+        self.dao.session.commit()
+        return value
+
+class MaintenanceScheduler():
+    """
+    Class representing scheduler running maintenance steps inside of tkinter event loop. Steps run only after user was idle for a while and every tick does only as many steps as fit into time budget, so the window never freezes.
+
+    Attributes:
+        maintenance (Maintenance): maintenance of the database.
+        window (tk.Tk): window whose event loop runs the steps.
+        last_input (float): time of last key press or mouse click.
+        running (bool): whether scheduler was not stopped.
+
+    Methods:
+        start -- starts watching input and schedules first tick.\n
+        stop -- stops scheduling and lets SQLite optimize the database before it is closed.\n
+        __touch__ -- records time of user input.\n
+        __tick__ -- runs steps if user is idle and schedules next tick.
+    """
+    def __init__(self, maintenance: Maintenance, window):
+        self.maintenance = maintenance
+        self.window = window
+        self.last_input = time.monotonic()
+        self.running = False
+
+    def start(self):
+        self.running = True
+        self.window.bind_all('<Any-KeyPress>', self.__touch__, add='+')
+        self.window.bind_all('<Any-ButtonPress>', self.__touch__, add='+')
+        self.window.after(TICK_MS, self.__tick__)
+
+    def stop(self):
+        self.running = False
+        self.maintenance.flush_writes()
+        self.maintenance.dao.optimize()
+
+    def __touch__(self, event=None):
+        self.last_input = time.monotonic()
+
+    def __tick__(self):
+        if not self.running:
+            return
+        if time.monotonic() - self.last_input >= IDLE_SECONDS:
+            deadline = time.perf_counter() + BUDGET_SECONDS
+            while time.perf_counter() < deadline and self.maintenance.step() is not None:
+                pass
+        self.window.after(TICK_MS, self.__tick__)
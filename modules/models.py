@@ -0,0 +1,93 @@
+"""
+    This module provides read models returned by DAO read paths.
+    Records are immutable named tuples built straight from result rows, so they are not tied to database session, take little memory and never run lazy queries when GUI touches their attributes.
+"""
+from typing import NamedTuple
+
+class CardRecord(NamedTuple):
+    """
+    Card together with nation and imaginary gift of its clan.
+    """
+    name: str
+    grade: int
+    power: int
+    critical: int
+    shield: int | str | None
+    clan_name: str
+    nation_name: str
+    imaginary_gift_name: str
+
+class StackRecord(NamedTuple):
+    """
+    Stack of copies of a card with one rarity.
+    """
+    id: int
+    card_name: str
+    rarity: str
+    quantity: int
+
+class CopyRecord(NamedTuple):
+    """
+    One copy from a stack which has extra data.
+    """
+    id: int
+    card_name: str
+    rarity: str
+    note: str | None
+
+class DeckRecord(NamedTuple):
+    id: int
+    name: str
+    clan_name: str | None
+    nation_name: str | None
+
+class DeckEntryRecord(NamedTuple):
+    deck_id: int
+    card_name: str
+    quantity: int
+
+class JournalRecord(NamedTuple):
+    """
+    Entry of change journal, operations are lists of plain values, so record can be written to and read from JSON as it is.
+    """
+    seq: int
+    origin: str
+    origin_seq: int
+    created_at: str
+    operations: list
+
+class SyncStateRecord(NamedTuple):
+    peer: str
+    sent_seq: int
+    received_seq: int
+
+class ClanRecord(NamedTuple):
+    name: str
+    imaginary_gift_name: str
+    nation_name: str
+
+class PrintingRecord(NamedTuple):
+    """
+    Printing of a card in a set together with number of owned copies.
+    """
+    number: str
+    set_code: str
+    card_name: str
+    rarity: str | None
+    owned: int
+
+class SetCompletionRecord(NamedTuple):
+    """
+    Completion of one set, owned_cards is number of printings of the set with at least one owned copy.
+    """
+    set_code: str
+    cards: int
+    owned_cards: int
+    copies: int
+
+class WikiPageRecord(NamedTuple):
+    title: str
+    name_key: str
+    redirect: str | None
+    image: str | None
+    numbers: str | None
@@ -0,0 +1,121 @@
+"""
+    This module opens several collection databases at once, ex. collections of different people or store locations.
+    Other collections are attached to every connection of the main one with SQLite ATTACH, so totals and differences between collections are computed by single SQL queries and no collection is loaded into Python.
+"""
+import os
+import re
+from sqlalchemy import create_engine, event, select, func, case, literal, exists, union_all, table, column
+from sqlalchemy.exc import SQLAlchemyError
+from modules.DAO import DAO
+from modules.events import EventBus
+from modules.orm import create_schema, check_schema, database_uri
+
+MAIN = 'main'
+# SQLite attaches at most 10 databases to one connection unless compiled otherwise
+MAX_ATTACHED = 10
+
+def collection_alias(path: str, taken=()):
+    """
+    Creates schema name of attached collection from name of its file, ex. 'store-2.db' becomes 'store_2'.
+
+    Args:
+        path (str): path to the database file.
+        taken (Iterable[str]): already used names, suffix is added to the name if it is among them.
+
+    Returns:
+        str: valid SQL identifier.
+    """
+    name = re.sub(r'\W', '_', os.path.splitext(os.path.basename(path))[0]).lower() or 'collection'
+    if name[0].isdigit():
+        name = f'c_{name}'
+    alias, suffix = name, 1
+    while alias in taken or alias in (MAIN, 'temp'):
+        suffix += 1
+        alias = f'{name}_{suffix}'
+    return alias
+
+def stacks_table(alias: str):
+    return table('CardStacks', column('card_name'), column('rarity'), column('quantity'), schema=alias)
+
+class MultiCollectionDAO(DAO):
+    """
+    Class representing Database Access Object of main collection with other collections attached. All methods of DAO work with the main collection.
+
+    Attributes:
+        collections (Dict[str, str]): path of every collection by its schema name, main collection is first and named 'main'.
+
+    Methods:
+        get_collection_totals (List[Tuple[str, int, int]]) -- returns schema name, number of distinct cards and number of copies of every collection.\n
+        get_combined_counts (List[Tuple]) -- returns card name, number of copies in all collections and number of copies in every collection (in order of collections) for every card.\n
+        get_missing_cards (List[Tuple[str, int]]) -- returns cards which have copies in any of source collections, but none in target collection, with number of copies in sources.\n
+        __union__ (Subquery) -- returns stacks of given collections as one subquery with schema name of collection in every row.
+    """
+    def __init__(self, main_path: str, other_paths=(), events: EventBus = None):
+        if len(other_paths) > MAX_ATTACHED:
+            raise ValueError(f'At most {MAX_ATTACHED} collections can be attached')
+        self.collections = {MAIN: main_path}
+        for path in other_paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f'No collection database at {path}')
+            # Other collections are only read, so they are never migrated here and have to be up to date already
+            check_schema(path, ('CardStacks',))
+            self.collections[collection_alias(path, self.collections)] = path
+        # Main collection is opened by URI, so that other collections can be attached read-only
+        db_engine = create_engine(f'sqlite:///{database_uri(main_path)}?uri=true')
+        create_schema(db_engine)
+
+        @event.listens_for(db_engine, 'connect')
+        def attach_collections(dbapi_connection, connection_record):
+            for alias, path in list(self.collections.items())[1:]:
+                dbapi_connection.execute(f'ATTACH DATABASE ? AS "{alias}"', (database_uri(path, read_only=True),))
+
+        db_engine.dispose()
+        super().__init__(db_engine, events)
+
+    def get_collection_totals(self):
+        try:
+            statements = [select(literal(alias), func.count(func.distinct(stacks.c.card_name)), func.coalesce(func.sum(stacks.c.quantity), 0))
+                          for alias, stacks in ((alias, stacks_table(alias)) for alias in self.collections)]
+            return [tuple(row) for row in self.session.execute(union_all(*statements))]
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_combined_counts(self, limit: int = None, offset: int = None):
+        try:
+            stacks = self.__union__(self.collections)
+            statement = (select(stacks.c.card_name, func.sum(stacks.c.quantity),
+                                *[func.sum(case((stacks.c.collection == alias, stacks.c.quantity), else_=0)) for alias in self.collections])
+                         .group_by(stacks.c.card_name).order_by(stacks.c.card_name).limit(limit).offset(offset))
+            return [tuple(row) for row in self.session.execute(statement)]
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def get_missing_cards(self, target: str = MAIN, sources=None, limit: int = None):
+        """
+        Finds cards missing in target collection. Every card of sources is probed by unique index of target stacks, so target is never scanned.
+
+        Args:
+            target (str): schema name of collection in which cards are missing.
+            sources (Iterable[str]): schema names of collections having the cards, by default all collections except target.
+        """
+        sources = [alias for alias in self.collections if alias != target] if sources is None else list(sources)
+        for alias in (target, *sources):
+            if alias not in self.collections:
+                raise KeyError(f'No collection named {alias}, use one of: {", ".join(self.collections)}')
+        if not sources:
+            return []
+        try:
+            stacks, target_stacks = self.__union__(sources), stacks_table(target)
+            statement = (select(stacks.c.card_name, func.sum(stacks.c.quantity))
+                         .where(~exists().where(target_stacks.c.card_name == stacks.c.card_name))
+                         .group_by(stacks.c.card_name).order_by(stacks.c.card_name).limit(limit))
+            return [tuple(row) for row in self.session.execute(statement)]
+        except SQLAlchemyError:
+            self.session.rollback()
+            return []
+
+    def __union__(self, aliases):
+        return union_all(*[select(stacks.c.card_name, stacks.c.quantity, literal(alias).label('collection'))
+                           for alias, stacks in ((alias, stacks_table(alias)) for alias in aliases)]).subquery()
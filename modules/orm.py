@@ -2,11 +2,45 @@
     This module provides implementation of ORM technology for database interactions.
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey
+from pathlib import Path
+from urllib.parse import quote
+from sqlalchemy import create_engine, Column, Integer, String, JSON, ForeignKey, ForeignKeyConstraint, Index, UniqueConstraint, inspect, text
 from sqlalchemy.orm import declarative_base, relationship
 
+def get_engine(path: str, **options):
+    """
+    Creates connection to database stored in specified file.
+
+    Args:
+        path (str): path to the database file.
+        options: additional arguments of sqlalchemy.create_engine, ex. pool_size.
+
+    Returns:
+        Engine: engine bound to given database.
+    """
+    return create_engine(f'sqlite:///{path}', **options)
+
+def database_uri(path: str, read_only: bool = False):
+    """
+    Returns SQLite URI of database file, read only database can be neither changed nor created.
+    """
+    return f"file:{quote(Path(path).absolute().as_posix(), safe='/:')}{'?mode=ro' if read_only else ''}"
+
+def get_read_only_engine(path: str, **options):
+    """
+    Creates connection to existing database which cannot change it, ex. collection of other person read by batch job.
+
+    Args:
+        path (str): path to the database file.
+        options: additional arguments of sqlalchemy.create_engine.
+
+    Returns:
+        Engine: engine bound to given database.
+    """
+    return create_engine(f'sqlite:///{database_uri(path, read_only=True)}&uri=true', **options)
+
 # Creating connection to database
-engine = create_engine('sqlite:///vanguard.db')
+engine = get_engine('vanguard.db')
 
 Base = declarative_base()
 
@@ -16,14 +50,15 @@ class Card(Base):
 
     Attributes:
         __tablename__ (str): Name of the database table.
-        __table_args__ (dict): Parameters of the database table.
+        __table_args__ (tuple): Indexes and parameters of the database table. Composite indexes serve filtering by clan, grade and power.
         name (str): Name of the character.
 
     Methods:
         __repr__ -- returns string representation of object. In this case only name attribute.
     """
     __tablename__ = 'Cards'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (Index('ix_cards_clan_name_grade_power', 'clan_name', 'grade', 'power'), Index('ix_cards_grade_power', 'grade', 'power'),
+                      Index('ix_cards_shield', 'shield'), {'extend_existing': True})
 
     name = Column(String(255), primary_key=True, nullable=False)
     grade = Column(Integer, nullable=False)
@@ -76,28 +111,52 @@ class ImaginaryGift(Base):
 
     name = Column(String(50), primary_key=True, nullable=False)
     
-class CardInstance(Base):
+class CardStack(Base):
     """
-    Class representing a 'Cardfight!! Vanguard' Card instance inside of database.
+    Class representing all copies of a 'Cardfight!! Vanguard' Card with the same rarity inside of database.
     
     Attributes:
         __tablename__ (str): Name of the database table.
-        __table_args__ (dict): Parameters of the database table.
-        id (int): auto-incremented id for identifying exact copy of card.
-        card_name (str): Name of the card associated with exact card instance.
-        rarity (str): Rarity of card instance.
-        card (Relationship): Relationship between Card class and CardInstance class.
+        __table_args__ (tuple): Constraints, indexes and parameters of the database table. Index on rarity serves filtering cards by rarity.
+        id (int): auto-incremented id for identifying the stack of copies.
+        card_name (str): Name of the card associated with the stack.
+        rarity (str): Rarity of all copies in the stack.
+        quantity (int): Number of copies in the stack, including copies with extra data.
+        card (Relationship): Relationship between Card class and CardStack class.
     """
-    __tablename__ = 'CardInstances'
-    __table_args__ = {'extend_existing': True}
+    __tablename__ = 'CardStacks'
+    __table_args__ = (UniqueConstraint('card_name', 'rarity', name='uq_card_stacks_card_name_rarity'), Index('ix_card_stacks_rarity_card_name', 'rarity', 'card_name'),
+                      {'extend_existing': True})
 
     id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
     card_name = Column(String(255), ForeignKey('Cards.name'), nullable=False)
     rarity = Column(String(3), nullable=False)
-    card = relationship('Card', backref='instances')
+    quantity = Column(Integer, nullable=False, default=1)
+    card = relationship('Card', backref='stacks')
     
     def __repr__(self):
-        return f'{self.card_id};{self.rarity}'
+        return f'{self.card_name};{self.rarity};{self.quantity}'
+
+class CardCopy(Base):
+    """
+    Class representing single copy of a 'Cardfight!! Vanguard' Card which carries extra data. Only such copies have own rows, all others exist only as quantity of their stack.
+    
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (tuple): Constraints, indexes and parameters of the database table.
+        id (int): auto-incremented id for identifying exact copy of card.
+        card_name (str): Name of the card.
+        rarity (str): Rarity of the copy, together with card_name identifies stack holding the copy.
+        note (str): Extra data of the copy, ex. its condition or signature.
+    """
+    __tablename__ = 'CardCopies'
+    __table_args__ = (ForeignKeyConstraint(['card_name', 'rarity'], ['CardStacks.card_name', 'CardStacks.rarity']),
+                      Index('ix_card_copies_card_name_rarity', 'card_name', 'rarity'), {'extend_existing': True})
+
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    card_name = Column(String(255), nullable=False)
+    rarity = Column(String(3), nullable=False)
+    note = Column(String(255))
     
 class Nation(Base):
     """
@@ -111,4 +170,220 @@ class Nation(Base):
     __tablename__ = 'Nations'
     __table_args__ = {'extend_existing': True}
     
-    name = Column(String(50), primary_key=True, nullable=False)
\ No newline at end of file
+    name = Column(String(50), primary_key=True, nullable=False)
+
+class DatabaseInfo(Base):
+    """
+    Class representing a key-value entry describing state of the database itself, ex. version of reference data.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (dict): Parameters of the database table.
+        key (str): Name of the entry.
+        value (str): Value of the entry.
+    """
+    __tablename__ = 'DatabaseInfo'
+    __table_args__ = {'extend_existing': True}
+
+    key = Column(String(50), primary_key=True, nullable=False)
+    value = Column(String(255))
+
+class Deck(Base):
+    """
+    Class representing a deck built from cards of the collection.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (dict): Parameters of the database table.
+        id (int): auto-incremented id of the deck.
+        name (str): Unique name of the deck.
+        clan_name (str): Clan to which cards of the deck are restricted, or None.
+        nation_name (str): Nation to which cards of the deck are restricted, or None.
+    """
+    __tablename__ = 'Decks'
+    __table_args__ = {'extend_existing': True}
+
+    id = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    name = Column(String(100), unique=True, nullable=False)
+    clan_name = Column(String(50), ForeignKey('Clans.name'))
+    nation_name = Column(String(50), ForeignKey('Nations.name'))
+
+class DeckEntry(Base):
+    """
+    Class representing number of copies of one card in a deck. Card name is not a foreign key, so deck can hold cards which are not (or no longer) in the collection.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (dict): Parameters of the database table.
+        deck_id (int): Id of the deck.
+        card_name (str): Name of the card.
+        quantity (int): Number of copies of the card in the deck.
+    """
+    __tablename__ = 'DeckEntries'
+    __table_args__ = {'extend_existing': True}
+
+    deck_id = Column(Integer, ForeignKey('Decks.id'), primary_key=True, nullable=False)
+    card_name = Column(String(255), primary_key=True, nullable=False)
+    quantity = Column(Integer, nullable=False)
+
+class JournalEntry(Base):
+    """
+    Class representing one committed change of the collection in append-only change journal. Entries made here and entries received from other databases are journaled alike,
+    origin and origin_seq identify the entry in every database, so it is applied only once even when it comes through several peers.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (tuple): Constraints and parameters of the database table.
+        seq (int): auto-incremented sequence number of the entry in this database.
+        origin (str): Replica id of database in which the change was made.
+        origin_seq (int): Sequence number of the entry in origin database.
+        created_at (str): UTC time of the change in ISO format.
+        operations (list): Operations of the change in order, ex. ['copies', card name, rarity, quantity delta], ['card_updated', old card data, new card data],
+            ['printing', card number, card name, rarity] or ['clan', name, imaginary gift, nation].
+    """
+    __tablename__ = 'ChangeJournal'
+    __table_args__ = (UniqueConstraint('origin', 'origin_seq', name='uq_change_journal_origin_origin_seq'), {'extend_existing': True})
+
+    seq = Column(Integer, primary_key=True, nullable=False, autoincrement=True)
+    origin = Column(String(32), nullable=False)
+    origin_seq = Column(Integer, nullable=False)
+    created_at = Column(String(32), nullable=False)
+    operations = Column(JSON, nullable=False)
+
+class SyncState(Base):
+    """
+    Class representing progress of synchronization with another database.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (dict): Parameters of the database table.
+        peer (str): Replica id of the other database.
+        sent_seq (int): Last sequence number of this journal exported for the peer.
+        received_seq (int): Last sequence number of peer's journal applied here.
+    """
+    __tablename__ = 'SyncStates'
+    __table_args__ = {'extend_existing': True}
+
+    peer = Column(String(32), primary_key=True, nullable=False)
+    sent_seq = Column(Integer, nullable=False, default=0)
+    received_seq = Column(Integer, nullable=False, default=0)
+
+class Printing(Base):
+    """
+    Class representing one printing of a 'Cardfight!! Vanguard' Card in a set, identified by its card number, ex. 'V-BT05-001EN' of set 'V-BT05'.
+    Printings are a catalog of sets, so card name is not a foreign key and set can hold cards which are not in the collection.
+    Owned copies are kept up to date by triggers on CardStacks, so completion of all sets is read from this table alone.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (tuple): Indexes and parameters of the database table. Index on set code and owned copies covers completion of sets, index on card name serves the triggers.
+        number (str): Card number of the printing.
+        set_code (str): Code of the set, card number without its last part.
+        card_name (str): Name of the card.
+        rarity (str): Rarity of the printing, None if it is not known. Copies of every rarity of the card are then counted.
+        owned (int): Number of copies of the card (with the rarity) in the collection.
+    """
+    __tablename__ = 'Printings'
+    __table_args__ = (Index('ix_printings_set_code_owned', 'set_code', 'owned'), Index('ix_printings_card_name_rarity', 'card_name', 'rarity'), {'extend_existing': True})
+
+    number = Column(String(20), primary_key=True, nullable=False)
+    set_code = Column(String(20), nullable=False)
+    card_name = Column(String(255), nullable=False)
+    rarity = Column(String(3))
+    owned = Column(Integer, nullable=False, default=0)
+
+class WikiPage(Base):
+    """
+    Class representing page of the wiki read from offline dump, which tells scrapper which image belongs to a card without fetching the page.
+
+    Attributes:
+        __tablename__ (str): Name of the database table.
+        __table_args__ (tuple): Indexes and parameters of the database table. Index on name key serves looking up pages of a card.
+        title (str): Title of the page, ex. 'Blaster Blade (V Series)'.
+        name_key (str): Title without series in parentheses, normalized the same way as names compared by fuzzy module.
+        redirect (str): Title of page to which this page redirects, or None.
+        image (str): File name of the first image of the page with card number, or None.
+        numbers (str): Card numbers present in names of images of the page, separated by spaces.
+    """
+    __tablename__ = 'WikiPages'
+    __table_args__ = (Index('ix_wiki_pages_name_key', 'name_key'), {'extend_existing': True})
+
+    title = Column(String(255), primary_key=True, nullable=False)
+    name_key = Column(String(255), nullable=False)
+    redirect = Column(String(255))
+    image = Column(String(255))
+    numbers = Column(String(255))
+
+# Every change of quantity, name or rarity of a stack is applied to owned copies of matching printings in the same statement
+PRINTING_TRIGGERS = (
+    'CREATE TRIGGER IF NOT EXISTS tr_card_stacks_insert_printings AFTER INSERT ON CardStacks BEGIN '
+    'UPDATE Printings SET owned = owned + NEW.quantity WHERE card_name = NEW.card_name AND (rarity IS NULL OR rarity = NEW.rarity); END',
+    'CREATE TRIGGER IF NOT EXISTS tr_card_stacks_delete_printings AFTER DELETE ON CardStacks BEGIN '
+    'UPDATE Printings SET owned = owned - OLD.quantity WHERE card_name = OLD.card_name AND (rarity IS NULL OR rarity = OLD.rarity); END',
+    'CREATE TRIGGER IF NOT EXISTS tr_card_stacks_update_printings AFTER UPDATE OF card_name, rarity, quantity ON CardStacks BEGIN '
+    'UPDATE Printings SET owned = owned - OLD.quantity WHERE card_name = OLD.card_name AND (rarity IS NULL OR rarity = OLD.rarity); '
+    'UPDATE Printings SET owned = owned + NEW.quantity WHERE card_name = NEW.card_name AND (rarity IS NULL OR rarity = NEW.rarity); END',
+)
+
+def create_schema(db_engine=engine):
+    """
+    Creates all tables, indexes and triggers which are missing in database. Indexes are created also for already existing tables. New database is created with incremental auto_vacuum.
+
+    Args:
+        db_engine (Engine): engine bound to the database.
+    """
+    with db_engine.begin() as connection:
+        if not inspect(connection).get_table_names():
+            # New databases give free pages back in small steps of incremental vacuum instead of rebuilding whole file
+            connection.exec_driver_sql('PRAGMA auto_vacuum = INCREMENTAL')
+        Base.metadata.create_all(connection)
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(db_engine, checkfirst=True)
+    migrate_card_instances(db_engine)
+    with db_engine.begin() as connection:
+        for trigger in PRINTING_TRIGGERS:
+            connection.execute(text(trigger))
+
+def check_schema(path: str, tables=None):
+    """
+    Checks that database has schema of current version, without changing it. Databases which are only read are never migrated implicitly.
+
+    Args:
+        path (str): path to the database file.
+        tables (Iterable[str]): required tables, by default all tables.
+
+    Raises:
+        ValueError: if any of tables is missing or database still has to be migrated.
+    """
+    db_engine = get_read_only_engine(path)
+    try:
+        with db_engine.connect() as connection:
+            existing = set(inspect(connection).get_table_names())
+    finally:
+        db_engine.dispose()
+    missing = [table for table in (tables or Base.metadata.tables) if table not in existing]
+    if missing or 'CardInstances' in existing:
+        problem = f"misses tables {', '.join(missing)}" if missing else 'holds copies in CardInstances table of older versions'
+        raise ValueError(f"Collection {path} {problem}, it has to be migrated first by opening it with the program or 'cli.py --db {path} stats'")
+
+def migrate_card_instances(db_engine=engine):
+    """
+    Moves copies from CardInstances table of older versions, which held one row per copy, into CardStacks and drops the old table.
+    Stacks are created in order of their first copy and everything is done in one transaction.
+
+    Args:
+        db_engine (Engine): engine bound to the database.
+
+    Returns:
+        bool: whether there was anything to migrate.
+    """
+    with db_engine.begin() as connection:
+        if not inspect(connection).has_table('CardInstances'):
+            return False
+        connection.execute(text(
+            'INSERT INTO CardStacks (card_name, rarity, quantity) '
+            'SELECT card_name, rarity, COUNT(*) FROM CardInstances WHERE true GROUP BY card_name, rarity ORDER BY MIN(id) '
+            'ON CONFLICT (card_name, rarity) DO UPDATE SET quantity = quantity + excluded.quantity'))
+        connection.execute(text('DROP TABLE CardInstances'))
+    return True
\ No newline at end of file
@@ -0,0 +1,224 @@
+"""
+    This module provides parallel import pipeline for many sheets or files.
+    Readers and validators run in process pools, validated batches are passed through bounded queue to a single thread writing into database.
+    Batches are written in order of sources and rows inside of them, so the result is the same as importing the sources one by one.
+"""
+import multiprocessing
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from modules.DAO import DAO
+from modules.loader import SHEET_NAME, CHUNK_SIZE, read_xlsx_rows, read_csv_rows, normalize_row, chunked
+
+# Seconds of waiting for next chunk after which readers are checked for failures
+POLL_INTERVAL = 1.0
+
+class ImportReport():
+    """
+    Class representing result of the pipeline.
+
+    Attributes:
+        imported (int): number of saved rows.
+        errors (List[Tuple[str, int, str]]): source, row number and reason of every rejected row, sorted by order of sources and rows.
+        seconds (float): duration of the import.
+
+    Methods:
+        rows_per_second (float) -- returns throughput of the import.
+    """
+    def __init__(self):
+        self.imported = 0
+        self.errors = []
+        self.seconds = 0.0
+
+    def rows_per_second(self):
+        return self.imported / self.seconds if self.seconds > 0 else float(self.imported)
+
+    def __repr__(self):
+        return f'Imported {self.imported} rows ({self.rows_per_second():.0f} rows/s), rejected {len(self.errors)} rows'
+
+def source_name(source):
+    path, sheet_name = source
+    return path if sheet_name is None else f'{path}#{sheet_name}'
+
+def read_source(index: int, source, raw_queue, chunk_size: int):
+    """
+    Reader stage, runs in a worker process. Puts (index, chunk number, rows) into the queue, which blocks when validators are behind.
+    Last message of every source is (index, None, error or None).
+    """
+    path, sheet_name = source
+    error = None
+    try:
+        rows = read_csv_rows(path) if path.lower().endswith('.csv') else read_xlsx_rows(path, sheet_name or SHEET_NAME)
+        for number, chunk in enumerate(chunked(rows, chunk_size)):
+            raw_queue.put((index, number, chunk))
+    except Exception as exception:
+        error = f'{type(exception).__name__}: {exception}'
+    raw_queue.put((index, None, error))
+
+def validate_chunk(chunk):
+    """
+    Validator stage, runs in a worker process.
+
+    Args:
+        chunk (List[Tuple[int, dict]]): numbered rows.
+
+    Returns:
+        Tuple[List[dict], List[Tuple[int, str]]]: normalized cards and (row number, reason) of rejected rows.
+    """
+    cards, errors = [], []
+    for number, row in chunk:
+        try:
+            cards.append(normalize_row(row))
+        except ValueError as error:
+            errors.append((number, str(error)))
+    return cards, errors
+
+class WriteOrder():
+    """
+    Class restoring order of validated chunks, which are finished by validators in any order.
+    Card present in many sources is therefore always saved with values of the first source, as when sources are imported one by one.
+
+    Attributes:
+        sources (int): number of sources.
+        ready (Dict[Tuple[int, int], List[dict]]): validated chunks waiting for earlier ones, keyed by index of source and number of chunk.
+        totals (Dict[int, int]): number of chunks of every source which was read completely.
+        next_source (int): index of source of the next released chunk.
+        next_number (int): number of the next released chunk inside of its source.
+
+    Methods:
+        add -- stores validated chunk.\n
+        finish -- stores number of chunks of completely read source.\n
+        released (Iterator[Tuple[int, List[dict]]]) -- yields index of source and cards of every chunk whose all predecessors were released.
+    """
+    def __init__(self, sources: int):
+        self.sources = sources
+        self.ready = {}
+        self.totals = {}
+        self.next_source = 0
+        self.next_number = 0
+
+    def add(self, index: int, number: int, cards):
+        self.ready[(index, number)] = cards
+
+    def finish(self, index: int, chunks: int):
+        self.totals[index] = chunks
+
+    def released(self):
+        while self.next_source < self.sources:
+            if (self.next_source, self.next_number) in self.ready:
+                yield self.next_source, self.ready.pop((self.next_source, self.next_number))
+                self.next_number += 1
+            elif self.totals.get(self.next_source) == self.next_number:
+                self.next_source, self.next_number = self.next_source + 1, 0
+            else:
+                return
+
+def write_batches(dao: DAO, write_queue, report: ImportReport, failed: list):
+    """
+    Writer stage, the only one touching database. Stops after receiving None.
+    """
+    while (item := write_queue.get()) is not None:
+        index, cards = item
+        try:
+            saved = dao.add_cards(cards)
+        except Exception:
+            saved = False
+        if saved:
+            report.imported += len(cards)
+        else:
+            failed.append((index, len(cards)))
+
+def pass_on(item, order: WriteOrder, write_queue, report: ImportReport):
+    index, number, future = item
+    cards, errors = future.result()
+    report.errors.extend((index, row, reason) for row, reason in errors)
+    order.add(index, number, cards)
+    for index, cards in order.released():
+        if cards:
+            write_queue.put((index, cards))
+
+def next_chunk(raw_queue, reading):
+    """
+    Waits for next message of readers. Failure of a reader which could not report it through the queue (ex. killed worker process) is raised.
+    """
+    while True:
+        try:
+            return raw_queue.get(timeout=POLL_INTERVAL)
+        except queue.Empty:
+            for future in reading:
+                if future.done() and future.exception() is not None:
+                    raise future.exception()
+
+def run_pipeline(dao: DAO, sources, workers: int = None, chunk_size: int = CHUNK_SIZE, queue_size: int = None):
+    """
+    Imports cards from many sources in parallel.
+
+    Args:
+        dao (DAO): Database Access Object used by the writer.
+        sources (List[Tuple[str, str]]): (path, sheet name) of every source. Sheet name is ignored for csv files and None means default sheet.
+        workers (int): number of validator processes, by default number of processors.
+        chunk_size (int): number of rows in one chunk.
+        queue_size (int): maximal number of chunks waiting between stages, by default twice the number of workers.
+            Chunks validated ahead of a slower earlier source wait for it in memory, outside of this limit.
+
+    Raises:
+        Exception: failure of reader or validator process, chunks saved before it stay in database.
+
+    Returns:
+        ImportReport: summary of the import.
+    """
+    workers = workers or multiprocessing.cpu_count()
+    queue_size = queue_size or 2 * workers
+    report = ImportReport()
+    failed = []
+    start = time.perf_counter()
+
+    write_queue = queue.Queue(maxsize=queue_size)
+    writer = threading.Thread(target=write_batches, args=(dao, write_queue, report, failed), daemon=True)
+    writer.start()
+
+    with multiprocessing.Manager() as manager, \
+         ProcessPoolExecutor(max_workers=min(len(sources), workers) or 1) as readers, \
+         ProcessPoolExecutor(max_workers=workers) as validators:
+        raw_queue = manager.Queue(maxsize=queue_size)
+        reading = [readers.submit(read_source, index, source, raw_queue, chunk_size) for index, source in enumerate(sources)]
+
+        order = WriteOrder(len(sources))
+        pending = deque()
+        chunks = [0] * len(sources)
+        finished = 0
+        try:
+            while finished < len(sources):
+                index, number, payload = next_chunk(raw_queue, reading)
+                if number is None:
+                    finished += 1
+                    # Every reader puts its chunks in order, so all of them were received before the last message
+                    order.finish(index, chunks[index])
+                    if payload is not None:
+                        report.errors.append((index, 0, payload))
+                    continue
+                chunks[index] += 1
+                pending.append((index, number, validators.submit(validate_chunk, payload)))
+                # Backpressure: at most queue_size chunks are validated at once, writer queue blocks when database is behind
+                while len(pending) >= queue_size:
+                    pass_on(pending.popleft(), order, write_queue, report)
+            while pending:
+                pass_on(pending.popleft(), order, write_queue, report)
+            # Chunks waiting for the last message of an earlier source are released when all sources ended
+            for index, cards in order.released():
+                if cards:
+                    write_queue.put((index, cards))
+        except BaseException:
+            # Readers blocked on full queue would never finish, closing the queue lets them fail
+            manager.shutdown()
+            raise
+        finally:
+            write_queue.put(None)
+            writer.join()
+    for index, count in failed:
+        report.errors.append((index, 0, f'database error, {count} rows were not saved'))
+    report.errors = [(source_name(sources[index]), number, reason) for index, number, reason in sorted(report.errors)]
+    report.seconds = time.perf_counter() - start
+    return report
@@ -1,59 +1,177 @@
 """
     This module is responsible for creation of graphs
 """
-import seaborn as sns
+import tkinter as tk
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.ticker import MultipleLocator
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from modules.DAO import DAO
-import pandas as pd
-import matplotlib.pyplot as plt
+from modules.events import EventBus, CardData, InstanceAdded, InstanceUpdated, InstanceDeleted, CollectionReloaded, PlotSelected
 
-def card_grade_distribution(dao: DAO):
+def to_arrays(results):
     """
-    Creates graph of card distribution among grades
+    Converts aggregate rows of (label, count) straight into arrays.
 
     Args:
-        dao (DAO): Database Access Object.
+        results (List[Tuple]): rows returned by one of DAO count queries.
+
+    Returns:
+        Tuple[ndarray, ndarray]: labels and counts.
     """
-    plt.close()
-    results = dao.get_cards_grades_count()
-    grades = []
-    counts = []
-    for group in results:
-        grades.append(group[0])
-        counts.append(group[1])
-        
-    data = {'Grade':grades, 'Count':counts}
-    df = pd.DataFrame(data)
-    ax = sns.barplot(data=df, x='Grade', y='Count')
-    
-    for p in ax.patches:
-        ax.annotate(format(p.get_height(), '.0f'), (p.get_x() + p.get_width() / 2, p.get_height()), ha='center', va='bottom')
-
-    plt.xlabel('Grade')
-    plt.ylabel('Count')
-    plt.title('Distribution of cards on Grade')
-    plt.show()
-
-def card_clan_distribution(dao: DAO):
+    labels = np.array([row[0] for row in results], dtype=object)
+    counts = np.fromiter((row[1] for row in results), dtype=np.int64, count=len(results))
+    return labels, counts
+
+class PlotFrame(tk.Frame):
     """
-    Creates graph of card distribution among clans
+    Class representing tkinter Frame with embedded matplotlib canvas displaying card distributions.
+    The figure and its bars are created once. Counts are loaded when distribution is selected, afterwards every added, edited or deleted copy of a card
+    only adjusts the affected bar, unless set of grades or clans changed.
+    Inherits from tk.Frame
 
-    Args:
+    Attributes:
         dao (DAO): Database Access Object.
+        events (EventBus): bus from which changes and selection of plot are received.
+        counts (Dict): number of copies of cards for every grade or clan.
+        figure (Figure): matplotlib figure displayed in the frame.
+        axes (Axes): axes holding the bars.
+        canvas (FigureCanvasTkAgg): canvas embedding figure into tkinter.
+        current_plot (str): name of displayed distribution, either 'grades' or 'clans'.
+        bars (BarContainer): bars currently drawn on axes.
+        bar_labels (List[Text]): annotations with counts above the bars.
+        labels (ndarray): grades or clans for which bars are drawn.
+
+    Methods:
+        show_grade_distribution -- displays distribution of cards among grades.\n
+        show_clan_distribution -- displays distribution of cards among clans.\n
+        refresh -- reloads counts of displayed distribution and updates bars in place.\n
+        change_count -- adds given number of copies to the bar of grade or clan of given card.
     """
-    plt.close()
-    results = dao.get_cards_clan_count()
-    clans = []
-    counts = []
-    for group in results:
-        clans.append(group[0])
-        counts.append(group[1])
-        
-    data = {'Clans':clans, 'Count':counts}
-    df = pd.DataFrame(data)
-    ax = sns.barplot(data=df, y='Clans', x='Count')
-    ax.xaxis.set_major_locator(plt.MultipleLocator(10))
-
-    plt.ylabel('Clan')
-    plt.xlabel('Count')
-    plt.title('Distribution of cards on Clans')
-    plt.show()
\ No newline at end of file
+    def __init__(self, parent, width: int = ..., height: int = ..., dao: DAO = ..., events: EventBus = None):
+        super().__init__(parent, width=width, height=height)
+        self.dao = dao
+        self.events = events
+        self.counts = {}
+        self.figure = Figure(figsize=(width / 100, height / 100), dpi=100)
+        self.axes = self.figure.add_subplot()
+        self.canvas = FigureCanvasTkAgg(self.figure, master=self)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.current_plot = None
+        self.bars = None
+        self.bar_labels = []
+        self.labels = None
+        self.show_grade_distribution()
+        if self.events is not None:
+            self.events.subscribe(InstanceAdded, lambda event: self.change_count(event.card, 1))
+            self.events.subscribe(InstanceDeleted, lambda event: self.change_count(event.card, -1))
+            self.events.subscribe(InstanceUpdated, self.__instance_updated__)
+            self.events.subscribe(CollectionReloaded, lambda event: self.refresh())
+            self.events.subscribe(PlotSelected, self.__plot_selected__)
+
+    def show_grade_distribution(self):
+        self.current_plot = 'grades'
+        self.labels = None
+        self.refresh()
+
+    def show_clan_distribution(self):
+        self.current_plot = 'clans'
+        self.labels = None
+        self.refresh()
+
+    def refresh(self):
+        if self.current_plot == 'grades':
+            labels, counts = to_arrays(self.dao.get_cards_grades_count())
+        else:
+            labels, counts = to_arrays(self.dao.get_cards_clan_count())
+        self.counts = dict(zip(labels, counts.tolist()))
+
+        if self.labels is None or not np.array_equal(self.labels, labels):
+            self.labels = labels
+            self.__draw__(counts)
+        else:
+            self.__update__(counts)
+        self.canvas.draw_idle()
+
+    def __label__(self, card: CardData):
+        return card.grade if self.current_plot == 'grades' else card.clan_name
+
+    def change_count(self, card: CardData, delta: int):
+        label = self.__label__(card)
+        count = self.counts.get(label, 0) + delta
+        if count > 0:
+            self.counts[label] = count
+        else:
+            self.counts.pop(label, None)
+
+        if label in self.labels and count > 0:
+            position = int(np.flatnonzero(self.labels == label)[0])
+            self.__set_bar__(position, count)
+            self.__rescale__(np.fromiter(self.counts.values(), dtype=np.int64, count=len(self.counts)))
+        else:
+            # Bar appeared or disappeared, whole chart is drawn again from counts already in memory
+            self.labels = np.array(sorted(self.counts), dtype=object)
+            self.__draw__(np.fromiter((self.counts[label] for label in self.labels), dtype=np.int64, count=len(self.labels)))
+        self.canvas.draw_idle()
+
+    def __instance_updated__(self, event: InstanceUpdated):
+        if self.__label__(event.old_card) == self.__label__(event.card):
+            return
+        self.change_count(event.old_card, -1)
+        self.change_count(event.card, 1)
+
+    def __plot_selected__(self, event: PlotSelected):
+        if event.plot == 'grades':
+            self.show_grade_distribution()
+        else:
+            self.show_clan_distribution()
+
+    def __draw__(self, counts):
+        """
+        Creates bars from scratch, used when set of grades or clans changed.
+        """
+        self.axes.clear()
+        positions = np.arange(len(self.labels))
+        if self.current_plot == 'grades':
+            self.bars = self.axes.bar(positions, counts, color='#335C67')
+            self.axes.set_xticks(positions, [str(label) for label in self.labels])
+            self.axes.set_xlabel('Grade')
+            self.axes.set_ylabel('Count')
+            self.axes.set_title('Distribution of cards on Grade')
+            self.bar_labels = [self.axes.annotate(f'{count:.0f}', (bar.get_x() + bar.get_width() / 2, bar.get_height()), ha='center', va='bottom')
+                               for bar, count in zip(self.bars, counts)]
+        else:
+            self.bars = self.axes.barh(positions, counts, color='#335C67')
+            self.axes.set_yticks(positions, list(self.labels), fontsize=7)
+            self.axes.invert_yaxis()
+            self.axes.xaxis.set_major_locator(MultipleLocator(10))
+            self.axes.set_xlabel('Count')
+            self.axes.set_ylabel('Clan')
+            self.axes.set_title('Distribution of cards on Clans')
+            self.bar_labels = []
+        self.__rescale__(counts)
+        self.figure.tight_layout()
+
+    def __update__(self, counts):
+        """
+        Updates sizes of already existing bars and their annotations.
+        """
+        for position, count in enumerate(counts):
+            self.__set_bar__(position, count)
+        self.__rescale__(counts)
+
+    def __set_bar__(self, position: int, count: int):
+        bar = self.bars[position]
+        if self.current_plot == 'grades':
+            bar.set_height(count)
+            self.bar_labels[position].set_text(f'{count:.0f}')
+            self.bar_labels[position].xy = (bar.get_x() + bar.get_width() / 2, bar.get_height())
+        else:
+            bar.set_width(count)
+
+    def __rescale__(self, counts):
+        top = max(int(counts.max()) if len(counts) else 0, 1) * 1.1
+        if self.current_plot == 'grades':
+            self.axes.set_ylim(0, top)
+        else:
+            self.axes.set_xlim(0, top)
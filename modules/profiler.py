@@ -0,0 +1,243 @@
+"""
+    This module provides opt-in profiler of the GUI, enabled with 'python3 main.py --profile'.
+    Every command and event handler registered in tkinter is wrapped with timing, time spent in DAO, scrapper and image work is attributed to the running interaction,
+    lag of the event loop is measured with periodic heartbeat and memory growth (traced allocations, live PhotoImages, ORM objects held by session) is sampled.
+    At the end of the session report of the slowest interactions is written as JSON file.
+"""
+import json
+import os
+import sys
+import time
+import tkinter as tk
+import tracemalloc
+import weakref
+from collections import defaultdict
+from datetime import datetime
+from modules.loadtest import percentile
+
+HEARTBEAT_MS = 50
+# Heartbeat later than expected by this many milliseconds means that the window was frozen
+STALL_MS = 100
+SAMPLE_SECONDS = 5.0
+SLOWEST = 20
+CATEGORIES = ('dao', 'scrapper', 'image')
+# Files whose memory growth is reported, PhotoImages and ORM objects are allocated by PIL and sqlalchemy
+TRACKED_FILES = ('PIL', 'sqlalchemy', 'modules')
+
+def callback_name(function):
+    code = getattr(function, '__code__', None)
+    name = getattr(function, '__qualname__', repr(function)).replace('.<locals>.', ':')
+    return f'{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})' if code is not None else name
+
+class TkProfiler():
+    """
+    Class representing profiler of one session of the GUI. Only callbacks registered after start are wrapped, so it has to be started before widgets are created.
+    Time of an interaction is split exclusively between categories, ex. image work done by scrapper counts only as image.
+
+    Attributes:
+        directory (str): directory in which report is written.
+        heartbeat_ms (int): interval of heartbeat in milliseconds.
+        window (tk.Tk): profiled window.
+        dao (DAO): Database Access Object whose session is sampled for ORM objects.
+        started (float): time of start.
+        interactions (List[dict]): every finished interaction with its duration, time spent in categories and traced memory change.
+        lags (List[float]): lag of every heartbeat in milliseconds.
+        samples (List[dict]): periodic samples of memory.
+        photo_images (WeakSet): PhotoImages which are alive.
+        patched (List[Tuple[object, str, object]]): patched attributes with their original values.
+        stack (List[List]): category and start of every measured call inside of running interaction, outer calls first.
+        spent (Dict[str, float]): seconds spent in every category by running interaction, None when no interaction runs.
+        baseline (Snapshot): tracemalloc snapshot taken at start.
+        original_after (Callable): tkinter after, used by heartbeat so that it is not measured as interaction.
+
+    Methods:
+        start -- patches tkinter, DAO, scrapper and image functions, starts tracemalloc and heartbeat.\n
+        stop (str) -- restores patched functions and writes report, returns its path.\n
+        wrap (Callable) -- returns callback measured as one interaction.\n
+        measure (Callable) -- returns function whose time is attributed to given category of running interaction.\n
+        instrument -- measures all methods of a class as given category.\n
+        report (dict) -- returns report of the session.\n
+        __patch__ -- replaces attribute, remembering the original value.\n
+        __heartbeat__ -- records lag of the event loop and schedules next heartbeat.\n
+        __sample__ -- records traced memory, number of live PhotoImages and ORM objects.
+    """
+    def __init__(self, directory: str = 'profiles', heartbeat_ms: int = HEARTBEAT_MS):
+        self.directory = directory
+        self.heartbeat_ms = heartbeat_ms
+        self.window = None
+        self.dao = None
+        self.started = None
+        self.interactions = []
+        self.lags = []
+        self.samples = []
+        self.photo_images = weakref.WeakSet()
+        self.patched = []
+        self.stack = []
+        self.spent = None
+        self.baseline = None
+        self.original_after = tk.Misc.after
+
+    def start(self, window: tk.Tk, dao=None):
+        from PIL import Image, ImageTk
+        from modules.DAO import DAO
+        from modules.scrapper import Scrapper
+        from modules.imagestore import ImageStore
+
+        self.window, self.dao = window, dao
+        self.started = time.perf_counter()
+        tracemalloc.start()
+        self.baseline = tracemalloc.take_snapshot()
+        profiler = self
+        original_register, original_after = tk.Misc._register, tk.Misc.after
+
+        def register(widget, function, *args, **kwargs):
+            # Callbacks of after are wrapped in after itself, where the real function is known
+            if not getattr(function, '__qualname__', '').endswith('after.<locals>.callit'):
+                function = profiler.wrap(function)
+            return original_register(widget, function, *args, **kwargs)
+
+        def after(widget, ms, function=None, *args):
+            return original_after(widget, ms, profiler.wrap(function) if function is not None else None, *args)
+
+        self.__patch__(tk.Misc, '_register', register)
+        self.__patch__(tk.Misc, 'after', after)
+        self.instrument(DAO, 'dao')
+        self.instrument(Scrapper, 'scrapper')
+        self.instrument(ImageStore, 'image')
+        self.__patch__(Image, 'open', self.measure(Image.open, 'image'))
+        self.__patch__(Image.Image, 'resize', self.measure(Image.Image.resize, 'image'))
+        original_photo_image = ImageTk.PhotoImage.__init__
+
+        def photo_image(image, *args, **kwargs):
+            original_photo_image(image, *args, **kwargs)
+            profiler.photo_images.add(image)
+
+        self.__patch__(ImageTk.PhotoImage, '__init__', self.measure(photo_image, 'image'))
+        self.__sample__()
+        self.original_after(window, self.heartbeat_ms, self.__heartbeat__, time.perf_counter() + self.heartbeat_ms / 1000)
+
+    def stop(self):
+        self.__sample__()
+        for owner, name, original in reversed(self.patched):
+            setattr(owner, name, original)
+        self.patched = []
+        report = self.report()
+        tracemalloc.stop()
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'profile-{datetime.now().strftime("%Y%m%d-%H%M%S")}.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        return path
+
+    def wrap(self, callback, name: str = None):
+        if getattr(callback, '__profiled__', False):
+            return callback
+        name = name or callback_name(callback)
+        profiler = self
+
+        def profiled(*args, **kwargs):
+            # Callbacks run by other callbacks, ex. event subscribers, are part of the outer interaction
+            if profiler.spent is not None:
+                return callback(*args, **kwargs)
+            profiler.spent = defaultdict(float)
+            memory = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+            start = time.perf_counter()
+            try:
+                return callback(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+                spent, profiler.spent, profiler.stack = profiler.spent, None, []
+                profiler.interactions.append({'name': name, 'at': round(start - profiler.started, 3), 'ms': seconds * 1000,
+                                              'breakdown_ms': {**{category: spent[category] * 1000 for category in CATEGORIES},
+                                                               'other': (seconds - sum(spent.values())) * 1000},
+                                              'memory_kb': ((tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0) - memory) / 1024})
+
+        profiled.__profiled__ = True
+        return profiled
+
+    def measure(self, function, category: str):
+        profiler = self
+
+        def measured(*args, **kwargs):
+            if profiler.spent is None:
+                return function(*args, **kwargs)
+            now = time.perf_counter()
+            if profiler.stack:
+                outer = profiler.stack[-1]
+                profiler.spent[outer[0]] += now - outer[1]
+            profiler.stack.append([category, now])
+            try:
+                return function(*args, **kwargs)
+            finally:
+                now = time.perf_counter()
+                if profiler.stack:
+                    profiler.spent[category] += now - profiler.stack.pop()[1]
+                if profiler.stack:
+                    profiler.stack[-1][1] = now
+
+        return measured
+
+    def instrument(self, owner: type, category: str):
+        for name, value in list(vars(owner).items()):
+            if callable(value) and name != '__init__':
+                self.__patch__(owner, name, self.measure(value, category))
+
+    def report(self):
+        by_name = defaultdict(list)
+        for interaction in self.interactions:
+            by_name[interaction['name']].append(interaction['ms'])
+        slowest = sorted(self.interactions, key=lambda interaction: interaction['ms'], reverse=True)[:SLOWEST]
+        growth = []
+        if tracemalloc.is_tracing():
+            differences = tracemalloc.take_snapshot().compare_to(self.baseline, 'filename')
+            growth = [{'file': difference.traceback[0].filename, 'size_kb': round(difference.size_diff / 1024, 1), 'count': difference.count_diff}
+                      for difference in differences if difference.size_diff > 0 and any(part in difference.traceback[0].filename for part in TRACKED_FILES)][:SLOWEST]
+        return {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'seconds': round(time.perf_counter() - self.started, 3),
+            'event_loop': {'heartbeat_ms': self.heartbeat_ms, 'heartbeats': len(self.lags), 'lag_p50_ms': round(percentile(self.lags, 0.5), 2),
+                           'lag_p99_ms': round(percentile(self.lags, 0.99), 2), 'lag_max_ms': round(max(self.lags, default=0.0), 2),
+                           'stalls': sum(lag >= STALL_MS for lag in self.lags)},
+            'slowest': [{**interaction, 'ms': round(interaction['ms'], 2), 'memory_kb': round(interaction['memory_kb'], 1),
+                         'breakdown_ms': {category: round(ms, 2) for category, ms in interaction['breakdown_ms'].items()}} for interaction in slowest],
+            'callbacks': sorted(({'name': name, 'calls': len(times), 'total_ms': round(sum(times), 2), 'p90_ms': round(percentile(times, 0.9), 2),
+                                  'max_ms': round(max(times), 2)} for name, times in by_name.items()), key=lambda callback: callback['total_ms'], reverse=True),
+            'memory': {'samples': self.samples, 'growth': growth},
+        }
+
+    def __patch__(self, owner, name: str, value):
+        self.patched.append((owner, name, vars(owner)[name]))
+        setattr(owner, name, value)
+
+    def __heartbeat__(self, expected: float):
+        if not self.patched:
+            return
+        now = time.perf_counter()
+        self.lags.append(max(now - expected, 0.0) * 1000)
+        if not self.samples or now - self.started - self.samples[-1]['at'] >= SAMPLE_SECONDS:
+            self.__sample__()
+        self.original_after(self.window, self.heartbeat_ms, self.__heartbeat__, now + self.heartbeat_ms / 1000)
+
+    def __sample__(self):
+        session = getattr(self.dao, 'session', None)
+        self.samples.append({'at': round(time.perf_counter() - self.started, 3),
+                             'traced_kb': round(tracemalloc.get_traced_memory()[0] / 1024, 1) if tracemalloc.is_tracing() else None,
+                             'photo_images': len(self.photo_images),
+                             'orm_objects': len(session.identity_map) if session is not None else None})
+
+def print_summary(path: str, file=sys.stderr):
+    with open(path, encoding='utf-8') as report_file:
+        report = json.load(report_file)
+    loop = report['event_loop']
+    print(f"Profile written to {path}: lag p50 {loop['lag_p50_ms']} ms, p99 {loop['lag_p99_ms']} ms, max {loop['lag_max_ms']} ms, {loop['stalls']} stalls", file=file)
+    for interaction in report['slowest'][:5]:
+        breakdown = ', '.join(f'{category} {ms}' for category, ms in interaction['breakdown_ms'].items() if ms)
+        print(f"    {interaction['ms']:9.2f} ms  {interaction['name']}  ({breakdown})", file=file)
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print summary of profile written by main.py --profile.')
+    parser.add_argument('path')
+    args = parser.parse_args()
+    print_summary(args.path, sys.stdout)
@@ -0,0 +1,175 @@
+"""
+    This module is responsible for headless export of collection statistics into image files and JSON data file.
+    Figures are rendered off-screen with Agg canvas, so neither tkinter nor display is needed.
+"""
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from modules.DAO import DAO
+from modules.orm import get_read_only_engine, check_schema
+
+FORMATS = ('png', 'svg')
+
+def bar_chart(rows, title: str, xlabel: str, ylabel: str = 'Count', horizontal: bool = False):
+    """
+    Creates bar chart for aggregate rows of (label, count).
+
+    Args:
+        rows (List[Tuple]): rows returned by one of DAO count queries.
+        title (str): title of the chart.
+        xlabel (str): label of category axis.
+        ylabel (str): label of count axis.
+        horizontal (bool): whether bars should be drawn horizontally.
+
+    Returns:
+        Figure: rendered figure.
+    """
+    labels = ['None' if row[0] is None else str(row[0]) for row in rows]
+    counts = np.fromiter((row[1] for row in rows), dtype=np.int64, count=len(rows))
+    positions = np.arange(len(rows))
+    figure = Figure(figsize=(8, max(4, len(rows) * 0.3) if horizontal else 5))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    if horizontal:
+        axes.barh(positions, counts, color='#335C67')
+        axes.set_yticks(positions, labels)
+        axes.invert_yaxis()
+        axes.set_xlabel(ylabel)
+        axes.set_ylabel(xlabel)
+    else:
+        bars = axes.bar(positions, counts, color='#335C67')
+        axes.set_xticks(positions, labels, rotation=45 if len(rows) > 8 else 0)
+        axes.bar_label(bars)
+        axes.set_xlabel(xlabel)
+        axes.set_ylabel(ylabel)
+    axes.set_title(title)
+    figure.tight_layout()
+    return figure
+
+def stacked_chart(rows, title: str):
+    """
+    Creates horizontal stacked bar chart for aggregate rows of (clan, rarity, count).
+
+    Args:
+        rows (List[Tuple]): rows returned by DAO.get_cards_clan_rarity_count.
+        title (str): title of the chart.
+
+    Returns:
+        Figure: rendered figure.
+    """
+    clans = sorted({row[0] for row in rows})
+    rarities = sorted({row[1] for row in rows})
+    table = np.zeros((len(clans), len(rarities)), dtype=np.int64)
+    clan_index = {clan: i for i, clan in enumerate(clans)}
+    rarity_index = {rarity: i for i, rarity in enumerate(rarities)}
+    for clan, rarity, count in rows:
+        table[clan_index[clan], rarity_index[rarity]] = count
+
+    figure = Figure(figsize=(8, max(4, len(clans) * 0.3)))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    positions = np.arange(len(clans))
+    left = np.zeros(len(clans), dtype=np.int64)
+    for i, rarity in enumerate(rarities):
+        axes.barh(positions, table[:, i], left=left, label=rarity)
+        left += table[:, i]
+    axes.set_yticks(positions, clans)
+    axes.invert_yaxis()
+    axes.set_xlabel('Count')
+    axes.set_ylabel('Clan')
+    axes.set_title(title)
+    axes.legend(title='Rarity', loc='upper left', bbox_to_anchor=(1.01, 1))
+    figure.tight_layout()
+    return figure
+
+# name of the view -> (DAO query, function creating figure from rows of the query, columns of the rows)
+VIEWS = {
+    'grade_distribution': (DAO.get_cards_grades_count, lambda rows: bar_chart(rows, 'Distribution of cards on Grade', 'Grade'), ('grade', 'count')),
+    'clan_distribution': (DAO.get_cards_clan_count, lambda rows: bar_chart(rows, 'Distribution of cards on Clans', 'Clan', horizontal=True), ('clan', 'count')),
+    'clan_rarity_distribution': (DAO.get_cards_clan_rarity_count, lambda rows: stacked_chart(rows, 'Distribution of rarities on Clans'), ('clan', 'rarity', 'count')),
+    'power_histogram': (DAO.get_cards_power_count, lambda rows: bar_chart(rows, 'Distribution of cards on Power', 'Power'), ('power', 'count')),
+    'shield_histogram': (DAO.get_cards_shield_count, lambda rows: bar_chart(rows, 'Distribution of cards on Shield', 'Shield'), ('shield', 'count')),
+    'nation_distribution': (DAO.get_cards_nation_count, lambda rows: bar_chart(rows, 'Distribution of cards on Nations', 'Nation'), ('nation', 'count')),
+    'gift_distribution': (DAO.get_cards_gift_count, lambda rows: bar_chart(rows, 'Distribution of cards on Imaginary Gifts', 'Imaginary Gift'), ('imaginary_gift', 'count')),
+}
+
+def render_report(db_path: str, output_dir: str, formats=FORMATS):
+    """
+    Renders all views for one collection database into image files and writes data of all views into 'data.json'.
+
+    Args:
+        db_path (str): path to the collection database.
+        output_dir (str): directory into which report is written.
+        formats (Tuple[str]): image formats into which views are rendered.
+
+    Raises:
+        FileNotFoundError: if there is no database at given path, empty database is never created.
+        ValueError: if database has to be migrated first, database is opened read-only and never changed.
+
+    Returns:
+        List[str]: paths of all written files.
+    """
+    if not os.path.exists(db_path):
+        raise FileNotFoundError(f'No collection database at {db_path}')
+    check_schema(db_path)
+    os.makedirs(output_dir, exist_ok=True)
+    db_engine = get_read_only_engine(db_path)
+    dao = DAO(db_engine)
+    written = []
+    data = {'database': os.path.abspath(db_path), 'views': {}}
+    try:
+        for name, (query, create_figure, columns) in VIEWS.items():
+            rows = [tuple(row) for row in query(dao)]
+            data['views'][name] = {'columns': columns, 'rows': rows}
+            figure = create_figure(rows)
+            for image_format in formats:
+                path = os.path.join(output_dir, f'{name}.{image_format}')
+                figure.savefig(path, format=image_format)
+                written.append(path)
+    finally:
+        dao.session.close()
+        db_engine.dispose()
+
+    path = os.path.join(output_dir, 'data.json')
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(data, file, indent=2)
+    written.append(path)
+    return written
+
+def render_reports(db_paths, output_dir: str, formats=FORMATS, workers: int = None):
+    """
+    Renders reports for many collection databases in parallel, each one inside of own process.
+    Report of database 'x/name.db' is written into '<output_dir>/name'.
+
+    Args:
+        db_paths (List[str]): paths to collection databases.
+        output_dir (str): directory into which reports are written.
+        formats (Tuple[str]): image formats into which views are rendered.
+        workers (int): number of processes, by default number of processors.
+
+    Raises:
+        FileNotFoundError: if any of databases does not exist, nothing is rendered then.
+        ValueError: if any of databases has to be migrated first.
+
+    Returns:
+        Dict[str, List[str]]: paths of written files for every database.
+    """
+    missing = [db_path for db_path in db_paths if not os.path.exists(db_path)]
+    if missing:
+        raise FileNotFoundError(f"No collection database at {', '.join(missing)}")
+    targets = {}
+    for db_path in db_paths:
+        name = os.path.splitext(os.path.basename(db_path))[0]
+        target, suffix = name, 1
+        while target in targets.values():
+            suffix += 1
+            target = f'{name}_{suffix}'
+        targets[db_path] = target
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {db_path: executor.submit(render_report, db_path, os.path.join(output_dir, target), formats)
+                   for db_path, target in targets.items()}
+        return {db_path: future.result() for db_path, future in futures.items()}
@@ -3,7 +3,21 @@
 """
 import requests
 from bs4 import BeautifulSoup
+import os
 import re
+from urllib.parse import quote
+from modules.imagestore import ImageStore
+from modules.DAO import DAO
+from modules.fuzzy import best_match, normalize_name
+from modules.loader import CARD_NUMBER_PATTERN
+
+# Titles of pages of reprints end with series, ex. 'Blaster Blade (V Series)'
+SERIES_SUFFIX = re.compile(r'\s*\([^)]*\)$')
+SEARCH_LIMIT = 10
+# Pages of offline wiki dump are preferred in the same order as pages are tried online, other series come last
+SERIES_ORDER = {' (V Series)': 0, ' (V Series Start Deck)': 1, '': 2}
+# Database info entry holding directory with local copy of images of the wiki
+IMAGE_MIRROR_INFO = 'wiki_image_mirror'
 
 class Scrapper():
     """
@@ -11,51 +25,140 @@ class Scrapper():
     
     Attributes:
         card_url (str): url to the wiki website.
+        api_url (str): url of MediaWiki API of the wiki, used for searching pages.
+        pattern (Pattern): pattern of card number, present in the image of the card.
+        image_store (ImageStore): store into which downloaded images are saved.
+        file_url (str): url from which image of given file name is downloaded.
+        dao (DAO): if given, pages of offline wiki dump are consulted first and card numbers found on the page of the card are saved as its printings.
         
     Methods:
         extract_image -- performs web scrapping for image of the card on the website.
+        If page of the card was read from offline wiki dump, only its image is downloaded (or read from local copy of images) and no page is fetched.
         First it searches in the link with suffix "_(V_Series)", since card can be a reprint from original series.
         If image is not found it repeats above process for link with suffix "_(V_Series_Start_Deck)".
         Otherwise it searches for image inside of pure link without any suffixes.
-        Returns True if image was found, otherwise False.
+        If none of the pages has the image, the wiki is searched for the name and the most similar title is tried the same way.
+        Returns True if image was found, otherwise False.\n
+        resolve_title (str) -- returns title of wiki page most similar to the name of the card, or None.\n
+        card_numbers (List[str]) -- returns distinct card numbers present in images of a page, in upper case.\n
+        local_page (WikiPageRecord) -- returns page of the card with image from offline wiki dump, preferring reprints like pages fetched online, or None.\n
+        __extract_local__ (bool) -- saves image of the card found through offline wiki dump, returns whether it was found.\n
+        __image_data__ (bytes) -- returns content of image file from local copy of images or from the wiki, or None.\n
+        __page_images__ (List[Tag]) -- returns images of the page of given title, trying the suffixes described above.
     """
     card_url = 'https://cardfight.fandom.com/wiki/'
+    api_url = 'https://cardfight.fandom.com/api.php'
+    file_url = 'https://cardfight.fandom.com/wiki/Special:FilePath/'
+    pattern = re.compile(r'(V|D)-[a-zA-Z0-9]{2,4}-[a-zA-Z0-9]{4,5}(-\w+|\s+\(Sample\))*')
+
+    def __init__(self, image_store: ImageStore = None, dao: DAO = None):
+        self.image_store = image_store if image_store is not None else ImageStore()
+        self.dao = dao
 
     def extract_image(self, name: str):
-        url = self.card_url + name.replace(' ', '_') + "_(V_Series)"
-        pattern = re.compile(r'(V|D)-[a-zA-Z0-9]{2,4}-[a-zA-Z0-9]{4,5}(-\w+|\s+\(Sample\))*')
+        if self.dao is not None and self.__extract_local__(name):
+            return True
+
+        images = self.__page_images__(name)
+
+        if not any(self.pattern.findall(str(img)) for img in images):
+            # Name in the collection can be spelled differently than title of the page, ex. with other quotes or punctuation
+            title = self.resolve_title(name)
+            if title is not None and title != name:
+                images = self.__page_images__(title)
+
+        if len(images) >= 2:
+            # Look for the image of the card with a link to the higher resolution image
+            if any(self.pattern.findall(str(img)) for img in images):
+                image_highres_link = images[1].find_previous('a')
+
+                if image_highres_link and image_highres_link.has_attr('href'):
+                    image_highres_url = image_highres_link['href']
+                    image_highres = requests.get(image_highres_url)
+
+                    self.image_store.put(name, image_highres.content)
+                    if self.dao is not None:
+                        # Rarity is not part of the number, so printings found on the wiki count copies of every rarity
+                        self.dao.add_printings([{'number': number, 'card_name': name} for number in self.card_numbers(images)])
+
+                    return True
+
+        return False
+
+    def resolve_title(self, name: str):
+        """
+        Searches the wiki for the name and compares found titles with it by trigram similarity, series in parentheses are left out of titles.
+
+        Returns:
+            str: the most similar title, or None if search failed or no title is similar enough.
+        """
+        try:
+            response = requests.get(self.api_url, params={'action': 'query', 'list': 'search', 'srsearch': name, 'srlimit': SEARCH_LIMIT, 'format': 'json'})
+            titles = {SERIES_SUFFIX.sub('', result['title']) for result in response.json()['query']['search']}
+        except (requests.RequestException, ValueError, KeyError):
+            return None
+        match = best_match(name, titles)
+        return match[0] if match is not None else None
+
+    def card_numbers(self, images):
+        return list(dict.fromkeys(number.upper() for img in images for number in CARD_NUMBER_PATTERN.findall(str(img))))
+
+    def local_page(self, name: str):
+        pages = []
+        for page in self.dao.get_wiki_pages(normalize_name(name)):
+            if page.redirect is not None:
+                page = self.dao.get_wiki_page(page.redirect)
+            if page is not None and page.image is not None:
+                match = SERIES_SUFFIX.search(page.title)
+                pages.append((SERIES_ORDER.get(match.group(0) if match else '', len(SERIES_ORDER)), page.title, page))
+        return min(pages)[2] if pages else None
+
+    def __extract_local__(self, name: str):
+        page = self.local_page(name)
+        if page is None:
+            return False
+        data = self.__image_data__(page.image)
+        if data is None:
+            return False
+        self.image_store.put(name, data)
+        if page.numbers:
+            self.dao.add_printings([{'number': number, 'card_name': name} for number in page.numbers.split()])
+        return True
+
+    def __image_data__(self, file_name: str):
+        mirror = self.dao.get_info(IMAGE_MIRROR_INFO)
+        if mirror is not None:
+            # Dumps of images name files with underscores instead of spaces, like titles in urls
+            for candidate in (file_name, file_name.replace(' ', '_')):
+                path = os.path.join(mirror, candidate)
+                if os.path.isfile(path):
+                    with open(path, 'rb') as file:
+                        return file.read()
+        try:
+            response = requests.get(self.file_url + quote(file_name.replace(' ', '_')))
+        except requests.RequestException:
+            return None
+        return response.content if response.ok and response.content else None
+
+    def __page_images__(self, title: str):
+        url = self.card_url + title.replace(' ', '_') + "_(V_Series)"
 
         page = requests.get(url)
         soup = BeautifulSoup(page.content, 'html.parser')
         images = soup.find_all('img')  # Get all images on the website
 
-        if not any(pattern.findall(str(img)) for img in images):
+        if not any(self.pattern.findall(str(img)) for img in images):
             # Retry with "_(V_Series_Start_Deck)" if desired card image is not a reprint
-            url = self.card_url + name.replace(' ', '_') + "_(V_Series_Start_Deck)"
+            url = self.card_url + title.replace(' ', '_') + "_(V_Series_Start_Deck)"
             page = requests.get(url)
             soup = BeautifulSoup(page.content, 'html.parser')
             images = soup.find_all('img')
 
-            if not any(pattern.findall(str(img)) for img in images):
+            if not any(self.pattern.findall(str(img)) for img in images):
                 # Retry without any suffix if desired card image is not a reprint
-                url = self.card_url + name.replace(' ', '_')
+                url = self.card_url + title.replace(' ', '_')
                 page = requests.get(url)
                 soup = BeautifulSoup(page.content, 'html.parser')
                 images = soup.find_all('img')
 
-        if len(images) >= 2:
-            # Look for the image of the card with a link to the higher resolution image
-            if any(pattern.findall(str(img)) for img in images):
-                image_highres_link = images[1].find_previous('a')
-
-                if image_highres_link and image_highres_link.has_attr('href'):
-                    image_highres_url = image_highres_link['href']
-                    image_highres = requests.get(image_highres_url)
-
-                    file_path = f'images/{name}.jpg'
-                    with open(file_path, 'wb') as image_file:
-                        image_file.write(image_highres.content)
-
-                    return True
-
-        return False
\ No newline at end of file
+        return images
\ No newline at end of file
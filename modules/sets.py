@@ -0,0 +1,82 @@
+"""
+    This module tracks completion of sets of 'Cardfight!! Vanguard'. Printings of cards (card number, name and rarity) come from set lists, imported sheets with 'Numer' column and pages of the wiki.
+    Owned copies of every printing are kept up to date by triggers of the database, so completion of all sets is computed by one grouped query over a small index.
+"""
+from typing import NamedTuple
+from modules.DAO import DAO
+from modules.models import SetCompletionRecord
+from modules.loader import SHEET_NAME, CHUNK_SIZE, CARD_NAME_PATTERN, read_xlsx_rows, read_csv_rows, card_number, chunked, RejectedRows
+
+class SetCompletion(NamedTuple):
+    """
+    Completion of one set, percent is part of printings of the set with at least one owned copy.
+    """
+    set_code: str
+    cards: int
+    owned_cards: int
+    copies: int
+    percent: float
+
+    def as_dict(self):
+        return {**self._asdict(), 'percent': round(self.percent, 1)}
+
+def completion(record: SetCompletionRecord):
+    return SetCompletion(*record, 100.0 * record.owned_cards / record.cards if record.cards else 0.0)
+
+def set_completion(dao: DAO):
+    """
+    Returns:
+        List[SetCompletion]: completion of every known set ordered by set code.
+    """
+    return [completion(record) for record in dao.get_set_completion()]
+
+def normalize_printing(row: dict):
+    """
+    Validates row of set list and converts it into printing accepted by DAO.add_printings. Set list has the same headers as collection sheet, only 'Numer' and 'Nazwa' are required.
+
+    Raises:
+        ValueError: if row has no valid card number or name.
+    """
+    number = card_number(row['Numer']) if row.get('Numer') not in (None, '') else None
+    if number is None:
+        raise ValueError('missing or invalid Numer')
+    name = '' if row.get('Nazwa') is None else str(row['Nazwa']).strip()
+    if not name or not CARD_NAME_PATTERN.match(name):
+        raise ValueError('missing or invalid Nazwa')
+    return {'number': number, 'card_name': name, 'rarity': '' if row.get('Rarity') is None else str(row['Rarity']).strip()}
+
+def load_set_list(dao: DAO, path: str, sheet_name: str = SHEET_NAME, rejected_path: str = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Streams set list from xlsx or csv file into printings, each chunk in one transaction. Loading the same list again only updates the printings.
+
+    Args:
+        dao (DAO): Database Access Object.
+        path (str): path to xlsx or csv file.
+        sheet_name (str): name of the sheet of xlsx file.
+        rejected_path (str): if given, csv report of rows which were not loaded is written there.
+        chunk_size (int): number of rows saved in one transaction.
+
+    Returns:
+        Tuple[int, int]: number of loaded and rejected rows.
+    """
+    rows = read_csv_rows(path) if path.lower().endswith('.csv') else read_xlsx_rows(path, sheet_name)
+    rejected = RejectedRows(rejected_path)
+    loaded = 0
+
+    def printings():
+        for number, row in rows:
+            try:
+                yield normalize_printing(row)
+            except ValueError as error:
+                rejected(number, str(error), row)
+
+    try:
+        for chunk in chunked(printings(), chunk_size):
+            if dao.add_printings(chunk):
+                loaded += len(chunk)
+            else:
+                for printing in chunk:
+                    rejected(None, 'database error', {'Numer': printing['number'], 'Nazwa': printing['card_name'], 'Rarity': printing['rarity']})
+    finally:
+        rejected.close()
+    return loaded, rejected.count
@@ -0,0 +1,135 @@
+"""
+    This module reads offline dump of the 'Cardfight!! Vanguard' wiki (MediaWiki XML export, optionally compressed with bz2 or gzip) into WikiPages table,
+    so scrapper knows image and card numbers of a card without fetching its page. The dump is parsed incrementally and every page is dropped as soon as it is read,
+    so memory usage does not depend on size of the dump.
+"""
+import bz2
+import gzip
+import re
+import time
+import xml.etree.ElementTree as ElementTree
+from typing import NamedTuple
+from modules.DAO import DAO
+from modules.fuzzy import normalize_name
+from modules.loader import CHUNK_SIZE, card_number, chunked, CARD_NUMBER_PATTERN
+from modules.scrapper import SERIES_SUFFIX, IMAGE_MIRROR_INFO
+
+# Image file names are values of template parameters, links and lines of galleries, ex. '| image = V-BT01-001EN-VR.png' or '[[File:V-BT01-001EN.png|200px]]'
+FIELD_SEPARATORS = re.compile(r'[|=\[\]{}<>\n]')
+FILE_PREFIXES = ('file', 'image')
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.gif', '.webp')
+# Main namespace of the wiki, other namespaces hold talk, user and template pages
+ARTICLE_NAMESPACE = '0'
+
+class IngestSummary(NamedTuple):
+    """
+    Result of reading a dump, pages are all pages of main namespace, of which card pages have image with card number.
+    """
+    pages: int
+    card_pages: int
+    redirects: int
+    printings: int
+    seconds: float
+
+    def as_dict(self):
+        return {**self._asdict(), 'seconds': round(self.seconds, 3)}
+
+def open_dump(path: str):
+    if path.endswith('.bz2'):
+        return bz2.open(path, 'rb')
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def page_images(text: str):
+    """
+    Returns distinct file names of images with card number found in wikitext of a page, in order of appearance.
+    """
+    images = []
+    for field in FIELD_SEPARATORS.split(text or ''):
+        field = field.strip()
+        prefix, _, rest = field.partition(':')
+        if rest and prefix.strip().lower() in FILE_PREFIXES:
+            field = rest.strip()
+        if field.lower().endswith(IMAGE_EXTENSIONS) and card_number(field) is not None:
+            images.append(field)
+    return list(dict.fromkeys(images))
+
+def read_pages(path: str):
+    """
+    Lazily reads pages of main namespace from the dump. Text of the last revision of every page is used.
+
+    Yields:
+        Tuple[str, str, str]: title, title of redirect target or None and wikitext of every page.
+    """
+    with open_dump(path) as file:
+        events = ElementTree.iterparse(file, events=('start', 'end'))
+        _, root = next(events)
+        # Tags are qualified with namespace of export format, which differs between versions of MediaWiki
+        namespace = root.tag[:root.tag.index('}') + 1] if root.tag.startswith('{') else ''
+        for event, element in events:
+            if event != 'end' or element.tag != f'{namespace}page':
+                continue
+            if element.findtext(f'{namespace}ns', ARTICLE_NAMESPACE) == ARTICLE_NAMESPACE:
+                redirect = element.find(f'{namespace}redirect')
+                revisions = element.findall(f'{namespace}revision')
+                text = revisions[-1].findtext(f'{namespace}text') if revisions else None
+                yield element.findtext(f'{namespace}title'), redirect.get('title') if redirect is not None else None, text or ''
+            # Finished pages are removed from the tree, so it never holds more than one page
+            root.clear()
+
+def page_row(title: str, redirect: str, text: str):
+    """
+    Converts page into row of WikiPages table, or None if page is neither card page nor redirect.
+    """
+    images = page_images(text) if redirect is None else []
+    if redirect is None and not images:
+        return None
+    numbers = dict.fromkeys(number.upper() for image in images for number in CARD_NUMBER_PATTERN.findall(image))
+    return {'title': title, 'name_key': normalize_name(SERIES_SUFFIX.sub('', title)), 'redirect': redirect,
+            'image': images[0] if images else None, 'numbers': ' '.join(numbers) or None}
+
+def ingest_dump(dao: DAO, path: str, replace: bool = False, printings: bool = False, image_mirror: str = None, chunk_size: int = CHUNK_SIZE):
+    """
+    Reads the dump into WikiPages table in chunks, each chunk in one transaction. Reading the same dump again only replaces the pages.
+
+    Args:
+        dao (DAO): Database Access Object.
+        path (str): path to the XML dump, '.bz2' and '.gz' files are decompressed while reading.
+        replace (bool): whether pages read from earlier dumps should be deleted first.
+        printings (bool): whether card numbers of all card pages should be added as printings, which gives complete lists of sets.
+        image_mirror (str): directory with local copy of images of the wiki, remembered in database for scrapper.
+        chunk_size (int): number of pages saved in one transaction.
+
+    Raises:
+        IOError: if chunk could not be saved to database.
+
+    Returns:
+        IngestSummary: summary of the dump.
+    """
+    start = time.perf_counter()
+    if replace and not dao.clear_wiki_pages():
+        raise IOError('Could not delete pages of earlier dumps')
+    if image_mirror is not None:
+        dao.set_info(IMAGE_MIRROR_INFO, image_mirror)
+    counts = {'pages': 0, 'card_pages': 0, 'redirects': 0, 'printings': 0}
+
+    def rows():
+        for title, redirect, text in read_pages(path):
+            counts['pages'] += 1
+            row = page_row(title, redirect, text)
+            if row is not None:
+                yield row
+
+    for chunk in chunked(rows(), chunk_size):
+        if not dao.add_wiki_pages(chunk):
+            raise IOError(f'Could not save pages {chunk[0]["title"]} - {chunk[-1]["title"]}')
+        cards = [row for row in chunk if row['redirect'] is None]
+        counts['card_pages'] += len(cards)
+        counts['redirects'] += len(chunk) - len(cards)
+        if printings:
+            found = [{'number': number, 'card_name': SERIES_SUFFIX.sub('', row['title'])} for row in cards for number in (row['numbers'] or '').split()]
+            if not dao.add_printings(found):
+                raise IOError(f'Could not save printings of pages {chunk[0]["title"]} - {chunk[-1]["title"]}')
+            counts['printings'] += len(found)
+    return IngestSummary(**counts, seconds=time.perf_counter() - start)
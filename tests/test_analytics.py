@@ -0,0 +1,130 @@
+"""
+    Tests of in-memory analytics over the collection: grouped counts, histograms and crosstabs weighted by copies, invalidation after changes made through DAO
+    and latency of questions over a million copies.
+"""
+import os
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.analytics import CollectionAnalytics, label_texts, encode, UNKNOWN
+
+CARDS = [
+    ('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', ['C', 'C', 'R']),
+    ('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', ['RRR']),
+    ('Sentinel Avior of Proposition', 1, 6000, 1, 'Sentinel', 'Royal Paladin', ['C', 'C']),
+    ('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', ['RRR', 'SP']),
+    ('Wyvern Strike, Tejas', 0, 5000, 1, 10000, 'Kagero', ['C']),
+]
+
+class AnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'analytics.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        for name, grade, power, critical, shield, clan, rarities in CARDS:
+            for rarity in rarities:
+                self.dao.add_card(name, grade, power, critical, shield, clan, rarity)
+        self.analytics = CollectionAnalytics(self.dao)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def counts(self, name: str):
+        labels, counts = self.analytics.count_by(name)
+        return dict(zip(label_texts(name, labels), counts.tolist()))
+
+    def test_count_by(self):
+        self.assertEqual(self.analytics.total(), 9)
+        self.assertEqual(self.counts('grade'), {'0': 1, '1': 5, '2': 1, '3': 2})
+        self.assertEqual(self.counts('clan'), {'Kagero': 3, 'Royal Paladin': 6})
+        self.assertEqual(self.counts('nation'), {'Dragon Empire': 3, 'United Sanctuary': 6})
+        self.assertEqual(self.counts('rarity'), {'C': 5, 'R': 1, 'RRR': 2, 'SP': 1})
+        self.assertEqual(self.counts('shield'), {'Sentinel': 2, 'None': 2, '5000': 4, '10000': 1})
+
+    def test_crosstab(self):
+        rows, columns, table = self.analytics.crosstab('clan', 'rarity')
+        self.assertEqual((rows.tolist(), columns.tolist()), (['Kagero', 'Royal Paladin'], ['C', 'R', 'RRR', 'SP']))
+        self.assertEqual(table.tolist(), [[1, 0, 1, 1], [4, 1, 1, 0]])
+
+    def test_histogram(self):
+        edges, counts = self.analytics.histogram('power', [5000, 8000, 11000, 14000])
+        self.assertEqual(edges.tolist(), [5000, 8000, 11000, 14000])
+        self.assertEqual(counts.tolist(), [3, 4, 2])
+        labels, edges, counts = self.analytics.histogram('power', [5000, 8000, 11000, 14000], by='grade')
+        self.assertEqual(labels.tolist(), [0, 1, 2, 3])
+        self.assertEqual(counts.tolist(), [[1, 0, 0], [2, 3, 0], [0, 1, 0], [0, 0, 2]])
+        with self.assertRaises(KeyError):
+            self.analytics.histogram('clan')
+
+    def test_invalidated_after_commit(self):
+        self.assertEqual(self.analytics.total(), 9)
+        self.assertTrue(self.analytics.loaded)
+        stack = self.dao.get_card_stacks('Dragonic Overlord')[1]
+        self.assertTrue(self.dao.delete_card(stack.id))
+        self.assertFalse(self.analytics.loaded)
+        self.assertEqual(self.counts('rarity'), {'C': 5, 'R': 1, 'RRR': 2})
+        self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'SP')
+        self.assertEqual(self.counts('clan'), {'Kagero': 2, 'Royal Paladin': 7})
+
+    def test_card_with_unknown_clan(self):
+        self.dao.add_card('Stray', 1, 7000, 1, 5000, 'No Such Clan', 'C')
+        self.assertEqual(self.counts('nation')[UNKNOWN], 1)
+
+    def test_encode(self):
+        categories, codes = encode(['b', None, 'a', 'b'])
+        self.assertEqual(categories.tolist(), ['Unknown', 'a', 'b'])
+        self.assertEqual(codes.tolist(), [2, 0, 1, 2])
+
+class AnalyticsBenchmarkTest(unittest.TestCase):
+    """
+    Questions over a million copies, one per group as in the worst case, have to be answered well under a second. Columns are generated in memory,
+    time of loading them from database is measured by analyticsbench module.
+    """
+    COPIES = 1000000
+
+    def setUp(self):
+        generator = np.random.default_rng(0)
+        cards = 200000
+        self.analytics = CollectionAnalytics.__new__(CollectionAnalytics)
+        self.analytics.names = np.array([f'Card {number}' for number in range(cards)], dtype=object)
+        grade = generator.integers(0, 5, cards).astype(np.int8)
+        self.analytics.cards = {
+            'grade': grade,
+            'power': (5000 + 1000 * (grade * 2 + generator.integers(1, 9, cards))).astype(np.int32),
+            'critical': generator.integers(1, 3, cards).astype(np.int8),
+            'shield': generator.choice(np.array([-2, -1, 0, 5000, 10000, 15000], dtype=np.int32), cards),
+            'clan': generator.integers(0, 24, cards).astype(np.int16),
+            'nation': generator.integers(0, 6, cards).astype(np.int16),
+            'imaginary_gift': generator.integers(0, 3, cards).astype(np.int16),
+        }
+        self.analytics.categories = {'clan': np.array([f'Clan {code}' for code in range(24)], dtype=object),
+                                     'nation': np.array([f'Nation {code}' for code in range(6)], dtype=object),
+                                     'imaginary_gift': np.array(['Accel', 'Force', 'Protect'], dtype=object),
+                                     'rarity': np.array(['C', 'R', 'RR', 'RRR', 'SP', 'VR'], dtype=object)}
+        self.analytics.group_card = generator.integers(0, cards, self.COPIES).astype(np.int32)
+        self.analytics.group_rarity = generator.integers(0, 6, self.COPIES).astype(np.int16)
+        self.analytics.group_count = np.ones(self.COPIES, dtype=np.int64)
+        self.analytics.loaded = True
+
+    def assertFast(self, question):
+        start = time.perf_counter()
+        question()
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_million_copies(self):
+        self.assertEqual(self.analytics.total(), self.COPIES)
+        self.assertFast(lambda: self.analytics.count_by('clan'))
+        self.assertFast(lambda: self.analytics.count_by('power'))
+        self.assertFast(lambda: self.analytics.histogram('power', 20, by='grade'))
+        self.assertFast(lambda: self.analytics.crosstab('clan', 'shield'))
+        self.assertFast(lambda: self.analytics.crosstab('nation', 'rarity'))
+        self.assertEqual(int(self.analytics.crosstab('nation', 'rarity')[2].sum()), self.COPIES)
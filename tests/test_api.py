@@ -0,0 +1,83 @@
+"""
+    Tests of local HTTP/JSON API. Server runs in a thread on a free port, requests are sent over real connections.
+"""
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.api import ApiServer
+
+class ApiTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        db_path = os.path.join(self.directory, 'api.db')
+        db_engine = get_engine(db_path)
+        create_schema(db_engine)
+        dao = DAO(db_engine)
+        Loader(dao).load_basic_data()
+        for number in range(5):
+            dao.add_card(f'Wingal {number}', 1, 8000, 1, 5000, 'Royal Paladin', 'C')
+        dao.add_card('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 'RRR')
+        dao.session.close()
+        db_engine.dispose()
+        self.server = ApiServer(('127.0.0.1', 0), db_path, readers=2)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.directory)
+
+    def request(self, method: str, path: str, body: dict = None, headers: dict = None):
+        connection = http.client.HTTPConnection(*self.server.server_address, timeout=10)
+        try:
+            connection.request(method, path, json.dumps(body) if body is not None else None, headers or {})
+            response = connection.getresponse()
+            data = response.read()
+            return response.status, json.loads(data) if data else None, response.getheader('ETag')
+        finally:
+            connection.close()
+
+    def test_pages_of_cards(self):
+        status, page, _ = self.request('GET', '/cards?clan=Royal+Paladin&limit=2&offset=2')
+        self.assertEqual((status, page['total'], [card['name'] for card in page['items']]), (200, 5, ['Wingal 2', 'Wingal 3']))
+        status, page, _ = self.request('GET', page['next'])
+        self.assertEqual(([card['name'] for card in page['items']], page['next']), (['Wingal 4'], None))
+        status, card, _ = self.request('GET', '/cards/Dragonic%20Overlord')
+        self.assertEqual((card['nation'], card['shield'], card['stacks'][0]['rarity']), ('Dragon Empire', None, 'RRR'))
+
+    def test_invalid_requests(self):
+        self.assertEqual(self.request('GET', '/cards?limit=0')[0], 400)
+        self.assertEqual(self.request('GET', '/cards/Blaster%20Blade')[0], 404)
+        self.assertEqual(self.request('DELETE', '/cards')[0], 405)
+        self.assertEqual(self.request('POST', '/stacks', {'name': 'Wingal', 'grade': True, 'power': 1, 'clan': 'Royal Paladin'})[0], 400)
+        self.assertEqual(self.request('POST', '/stacks', {'name': 'Wingal'})[1], {'error': 'Missing values: grade, power, clan'})
+
+    def test_writes_invalidate_cached_reads(self):
+        status, stats, etag = self.request('GET', '/stats')
+        self.assertEqual((status, stats['instances']), (200, 6))
+        self.assertEqual(self.request('GET', '/stats', headers={'If-None-Match': etag})[0], 304)
+        status, card, _ = self.request('POST', '/stacks', {'name': 'Wingal 0', 'grade': 1, 'power': 8000, 'clan': 'Royal Paladin', 'rarity': 'R'})
+        self.assertEqual((status, [stack['rarity'] for stack in card['stacks']]), (201, ['C', 'R']))
+        status, stats, new_etag = self.request('GET', '/stats', headers={'If-None-Match': etag})
+        self.assertEqual((status, stats['instances']), (200, 7))
+        self.assertNotEqual(new_etag, etag)
+        stack = card['stacks'][1]['id']
+        status, card, _ = self.request('PUT', f'/stacks/{stack}', {'rarity': 'RR'})
+        self.assertEqual([stack['rarity'] for stack in card['stacks']], ['C', 'RR'])
+        self.assertEqual(self.request('DELETE', f"/stacks/{card['stacks'][1]['id']}")[1], {'deleted': card['stacks'][1]['id']})
+        self.assertEqual(self.request('GET', f"/stacks/{card['stacks'][1]['id']}")[0], 404)
+
+    def test_concurrent_reads(self):
+        with ThreadPoolExecutor(8) as executor:
+            results = list(executor.map(lambda number: self.request('GET', f'/search?q=Wingal&limit={number % 5 + 1}'), range(40)))
+        self.assertEqual([len(body['names']) for _, body, _ in results], [number % 5 + 1 for number in range(40)])
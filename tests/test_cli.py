@@ -0,0 +1,61 @@
+"""
+    Tests of headless command-line interface. Every command prints JSON and failures are reported as JSON error with non-zero exit code.
+"""
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import cli
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'cli.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, *argv, code: int = 0):
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            self.assertEqual(cli.main(['--db', self.db_path, *argv]), code)
+        return json.loads(output.getvalue())
+
+    def add_wingal(self, rarity: str = 'C'):
+        return self.run_cli('add', 'Wingal', '--grade', '1', '--power', '8000', '--shield', '5000', '--clan', 'Royal Paladin', '--rarity', rarity)
+
+    def test_new_database_is_seeded(self):
+        self.assertEqual(self.run_cli('stats')['instances'], 0)
+        self.assertEqual(self.run_cli('seed')['reference_data_version'], '1')
+
+    def test_add_edit_delete(self):
+        card = self.add_wingal()['card']
+        card = self.run_cli('edit', str(card['stacks'][0]['id']), '--power', '9000', '--shield', 'None')['card']
+        self.assertEqual((card['power'], card['shield']), (9000, None))
+        card = self.add_wingal('R')['card']
+        self.assertEqual([(stack['rarity'], stack['quantity']) for stack in card['stacks']], [('C', 1), ('R', 1)])
+        self.assertEqual(self.run_cli('search', 'wing')['cards'], [card])
+        stack = card['stacks'][0]['id']
+        self.assertEqual(self.run_cli('delete', str(stack)), {'deleted': stack})
+        self.assertIn('LookupError', self.run_cli('delete', '999', code=1)['error'])
+
+    def test_stats(self):
+        self.add_wingal()
+        self.add_wingal()
+        self.run_cli('add', 'Dragonic Overlord', '--grade', '3', '--power', '13000', '--clan', 'Kagero', '--rarity', 'RRR')
+        self.assertEqual(self.run_cli('stats', '--count-by', 'clan')['count_by']['counts'], {'Kagero': 1, 'Royal Paladin': 2})
+        crosstab = self.run_cli('stats', '--crosstab', 'grade', 'rarity')['crosstab']['table']
+        self.assertEqual(crosstab, {'1': {'C': 2, 'RRR': 0}, '3': {'C': 0, 'RRR': 1}})
+
+    def test_import_csv(self):
+        path = os.path.join(self.directory, 'cards.csv')
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write('Nazwa;Klan;Grade;Power;Defence;Rarity\nWingal;Royal Paladin;1;8000;5000;C\nBroken;Royal Paladin;;8000;5000;C\n')
+        self.run_cli('import', path)
+        self.assertEqual([card['name'] for card in self.run_cli('search', 'Wingal')['cards']], ['Wingal'])
+        # Failure of one source is reported next to rows rejected by validation
+        errors = self.run_cli('import', path, os.path.join(self.directory, 'missing.csv'))['errors']
+        self.assertEqual([(os.path.basename(error['source']), error['row']) for error in errors], [('cards.csv', 3), ('missing.csv', 0)])
@@ -0,0 +1,86 @@
+"""
+    Tests of checking decks against deck building rules and the collection. Validator kept up to date by change events has to report the same as freshly loaded one.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.decks import DeckValidator, DeckRules, card_traits
+
+RULES = DeckRules(deck_size=8, max_copies=4, triggers=2, max_sentinels=1, grade_limits={3: 2})
+CARDS = [
+    ('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 4),
+    ('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 1),
+    ('Sentinel Avior of Proposition', 1, 6000, 1, 'Sentinel', 'Royal Paladin', 2),
+    ('Alfred Early', 3, 13000, 1, None, 'Royal Paladin', 2),
+    ('Flash Shield, Iseult', 0, 5000, 1, 15000, 'Royal Paladin', 2),
+    ('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 1),
+]
+
+class DeckTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'decks.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        for *card, copies in CARDS:
+            for _ in range(copies):
+                self.dao.add_card(*card, 'C')
+        self.validator = DeckValidator(self.dao, RULES, self.dao.events)
+        self.deck = self.dao.add_deck('Royals', clan_name='Royal Paladin')
+        for name, quantity in (('Wingal', 3), ('Blaster Blade', 1), ('Alfred Early', 2), ('Flash Shield, Iseult', 2)):
+            self.dao.set_deck_entry(self.deck.id, name, quantity)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def validate(self):
+        report = self.validator.validate(self.deck.id)
+        # Incremental updates give the same result as loading everything again
+        self.assertEqual(report, DeckValidator(self.dao, RULES).validate(self.deck.id))
+        return report
+
+    def test_card_traits(self):
+        self.assertTrue(card_traits(0, 10000, 'Kagero', 'Dragon Empire').trigger)
+        self.assertFalse(card_traits(0, 5000, 'Kagero', 'Dragon Empire').trigger)
+        self.assertEqual(card_traits(1, 'Sentinel', 'Kagero', 'Dragon Empire')[1:], (0, 'Kagero', 'Dragon Empire', False, True))
+
+    def test_valid_deck(self):
+        report = self.validate()
+        self.assertTrue(report.is_valid(), report.problems)
+        self.assertEqual((report.size, report.grades, report.triggers, report.shield_total), (8, {0: 2, 1: 3, 2: 1, 3: 2}, 2, 50000))
+        self.assertEqual(report.as_dict()['deck'], 'Royals')
+
+    def test_broken_rules(self):
+        self.dao.set_deck_entry(self.deck.id, 'Wingal', 5)
+        self.dao.set_deck_entry(self.deck.id, 'Sentinel Avior of Proposition', 2)
+        self.dao.set_deck_entry(self.deck.id, 'Dragonic Overlord', 1)
+        self.dao.set_deck_entry(self.deck.id, 'Flash Shield, Iseult', 0)
+        report = self.validate()
+        self.assertEqual(report.problems, ['Dragonic Overlord is not from clan Royal Paladin', '5 copies of Wingal, at most 4 allowed',
+                                           'Deck has 11 cards, 8 required', 'Deck has 0 triggers, 2 required', 'Deck has 2 sentinels, at most 1 allowed',
+                                           'Deck has 3 cards of grade 3, at most 2 allowed', 'Missing 1 copies of Wingal'])
+
+    def test_changes_of_collection(self):
+        self.dao.delete_card(self.dao.get_card_stacks('Blaster Blade')[0].id)
+        self.assertEqual(self.validate().problems, ['Blaster Blade is not in the collection', 'Missing 1 copies of Blaster Blade'])
+        self.dao.add_card('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR')
+        self.assertTrue(self.validate().is_valid())
+        stack = self.dao.get_card_stacks('Flash Shield, Iseult')[0]
+        self.dao.update_card(stack.id, 'Flash Shield, Iseult', 0, 5000, 1, 15000, 'Royal Paladin', 'R')
+        self.assertTrue(self.validate().is_valid())
+
+    def test_copies_shared_by_decks(self):
+        other = self.dao.add_deck('Second', nation_name='United Sanctuary')
+        self.dao.set_deck_entry(other.id, 'Wingal', 2)
+        self.assertEqual(self.validate().shared, {'Wingal': 1})
+        self.dao.delete_deck(other.id)
+        self.assertEqual(self.validate().shared, {})
+        self.assertEqual([report.deck.name for report in self.validator.validate_all()], ['Royals'])
+        self.assertIsNone(self.validator.validate(other.id))
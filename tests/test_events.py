@@ -0,0 +1,79 @@
+"""
+    Tests of event bus and of events published by DAO after every committed change, from which GUI components update themselves.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.events import (EventBus, CardData, CardAdded, CardUpdated, CardDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted, ClanAdded,
+                            CollectionReloaded, CardSelected)
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+
+WINGAL = CardData('Wingal', 1, 8000, 1, 5000, 'Royal Paladin')
+
+class EventBusTest(unittest.TestCase):
+    def test_subscribers(self):
+        bus, received = EventBus(), []
+        first = lambda event: received.append(('first', event))
+        bus.subscribe(CardSelected, first)
+        bus.subscribe(CardSelected, lambda event: received.append(('second', event)))
+        bus.publish_all([CardSelected('Wingal'), CardAdded(WINGAL)])
+        self.assertEqual(received, [('first', CardSelected('Wingal')), ('second', CardSelected('Wingal'))])
+        bus.unsubscribe(CardSelected, first)
+        bus.unsubscribe(CardSelected, first)
+        bus.publish(CardSelected('Blaster Blade'))
+        self.assertEqual(received[-1], ('second', CardSelected('Blaster Blade')))
+        self.assertEqual(len(received), 3)
+
+    def test_unsubscribe_while_publishing(self):
+        bus, received = EventBus(), []
+
+        def once(event):
+            received.append(event)
+            bus.unsubscribe(CardSelected, once)
+
+        bus.subscribe(CardSelected, once)
+        bus.subscribe(CardSelected, received.append)
+        bus.publish(CardSelected('Wingal'))
+        self.assertEqual(len(received), 2)
+
+class PublishedEventsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'events.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        self.events = []
+        for event_type in (CardAdded, CardUpdated, CardDeleted, InstanceAdded, InstanceUpdated, InstanceDeleted, ClanAdded, CollectionReloaded):
+            self.dao.events.subscribe(event_type, self.events.append)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_changes_of_copies(self):
+        self.dao.add_card(*WINGAL, 'C')
+        stack = self.dao.get_card_stacks('Wingal')[0].id
+        self.assertEqual(self.events, [CardAdded(WINGAL), InstanceAdded(stack, WINGAL, 'C')])
+        self.events.clear()
+        self.dao.update_card(stack, *WINGAL._replace(power=9000), 'R')
+        changed = WINGAL._replace(power=9000)
+        rare = self.dao.get_card_stacks('Wingal')[0].id
+        self.assertEqual(self.events, [CardUpdated(WINGAL, changed), InstanceUpdated(rare, WINGAL, 'C', changed, 'R')])
+        self.events.clear()
+        self.dao.delete_card(rare)
+        self.assertEqual(self.events, [InstanceDeleted(rare, changed, 'R'), CardDeleted(changed)])
+
+    def test_bulk_changes_reload(self):
+        self.dao.add_clan('Touken Ranbu', 'Force', 'Zoo')
+        self.dao.sync_cards([{**WINGAL._asdict(), 'card_rarity': 'C'}])
+        self.assertEqual(self.events, [ClanAdded('Touken Ranbu', 'Force', 'Zoo'), CollectionReloaded()])
+
+    def test_failed_change_publishes_nothing(self):
+        self.assertFalse(self.dao.update_card(999, *WINGAL, 'C'))
+        self.assertFalse(self.dao.add_clan('Royal Paladin', 'Force', 'United Sanctuary'))
+        self.assertEqual(self.events, [])
@@ -0,0 +1,88 @@
+"""
+    Tests of exchanging collections through CSV, JSON Lines and Parquet files: round trip of every table, adding and replacing copies on repeated import
+    and import of exports of older versions.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.exchange import export_collection, import_collection, FORMATS
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+class ExchangeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engines, self.daos = [], []
+        self.source = self.collection('source.db')
+        for rarity in ('C', 'C', 'R'):
+            self.source.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', rarity)
+        self.source.add_card('Sentinel Avior of Proposition', 1, 6000, 1, 'Sentinel', 'Royal Paladin', 'C')
+        self.source.add_printings([{'number': 'V-BT01-010EN', 'card_name': 'Wingal', 'rarity': 'C'}])
+        self.source.add_card_copy(self.source.get_card_stacks('Wingal')[0].id, 'signed')
+
+    def tearDown(self):
+        for dao, db_engine in zip(self.daos, self.engines):
+            dao.session.close()
+            db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def collection(self, name: str):
+        db_engine = get_engine(os.path.join(self.directory, name))
+        create_schema(db_engine)
+        dao = DAO(db_engine)
+        Loader(dao).load_basic_data()
+        self.engines.append(db_engine)
+        self.daos.append(dao)
+        return dao
+
+    def stacks(self, dao: DAO):
+        return [(stack.rarity, stack.quantity) for stack in dao.get_card_stacks('Wingal')]
+
+    def notes(self, dao: DAO):
+        return [copy.note for copy in dao.get_card_copies(dao.get_card_stacks('Wingal')[0].id)]
+
+    def test_round_trip(self):
+        for file_format in FORMATS:
+            if file_format == 'parquet' and pyarrow is None:
+                continue
+            with self.subTest(file_format=file_format):
+                directory = os.path.join(self.directory, file_format)
+                exported = {stats.table: stats.rows for stats in export_collection(self.source, directory, file_format)}
+                self.assertEqual((exported['Cards'], exported['CardStacks'], exported['CardCopies']), (2, 3, 1))
+                target = self.collection(f'{file_format}.db')
+                import_collection(target, directory, file_format)
+                self.assertEqual(target.get_card('Sentinel Avior of Proposition'), self.source.get_card('Sentinel Avior of Proposition'))
+                self.assertEqual((self.stacks(target), self.notes(target)), ([('C', 2), ('R', 1)], ['signed']))
+                self.assertEqual([(printing.number, printing.owned) for printing in target.get_card_printings('Wingal')], [('V-BT01-010EN', 2)])
+
+    def test_repeated_import(self):
+        directory = os.path.join(self.directory, 'csv')
+        export_collection(self.source, directory)
+        target = self.collection('target.db')
+        import_collection(target, directory)
+        # Replacing keeps the collection equal to the export
+        import_collection(target, directory, replace=True)
+        self.assertEqual((self.stacks(target), self.notes(target)), ([('C', 2), ('R', 1)], ['signed']))
+        import_collection(target, directory)
+        self.assertEqual((self.stacks(target), self.notes(target)), ([('C', 4), ('R', 2)], ['signed', 'signed']))
+        self.assertEqual(target.get_card_printings('Wingal')[0].owned, 4)
+
+    def test_legacy_instances(self):
+        directory = os.path.join(self.directory, 'legacy')
+        export_collection(self.source, directory, tables=('Nations', 'ImaginaryGifts', 'Clans', 'Cards'))
+        with open(os.path.join(directory, 'CardInstances.csv'), 'w', encoding='utf-8', newline='') as file:
+            file.write('id,card_name,rarity\n1,Wingal,C\n2,Wingal,C\n3,Wingal,R\n')
+        target = self.collection('target.db')
+        self.assertEqual([stats.table for stats in import_collection(target, directory)], ['Nations', 'ImaginaryGifts', 'Clans', 'Cards', 'CardInstances'])
+        self.assertEqual(self.stacks(target), [('C', 2), ('R', 1)])
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export_collection(self.source, self.directory, 'xml')
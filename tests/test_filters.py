@@ -0,0 +1,78 @@
+"""
+    Tests of composable card filter compiled into one SQL query, and of use of composite indexes by its predicates.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import select
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema, Card
+from modules.filters import CardFilter
+
+CARDS = [
+    ('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'C'),
+    ('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'R'),
+    ('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR'),
+    ('Sentinel Avior of Proposition', 1, 6000, 1, 'Sentinel', 'Royal Paladin', 'C'),
+    ('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 'RRR'),
+    ('Wyvern Strike, Tejas', 0, 5000, 1, 10000, 'Kagero', 'C'),
+    ('100%_Burst', 3, 11000, 2, None, 'Kagero', 'SP'),
+]
+
+class FilterTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'filters.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        for card in CARDS:
+            self.dao.add_card(*card)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def names(self, card_filter: CardFilter):
+        self.assertEqual(self.dao.count_cards(card_filter), len(self.dao.find_cards(card_filter)))
+        return [card.name for card in self.dao.find_cards(card_filter)]
+
+    def test_empty_filter_matches_all_cards(self):
+        self.assertTrue(CardFilter().is_empty())
+        self.assertEqual(len(self.names(CardFilter())), 6)
+
+    def test_predicates(self):
+        self.assertEqual(self.names(CardFilter().clan('Kagero').grade(3).order_by('power', True)), ['Dragonic Overlord', '100%_Burst'])
+        self.assertEqual(self.names(CardFilter().power(8000, 11000).order_by('power')), ['Wingal', 'Blaster Blade', '100%_Burst'])
+        self.assertEqual(self.names(CardFilter().sentinel()), ['Sentinel Avior of Proposition'])
+        self.assertEqual(self.names(CardFilter().shield(None, 10000).order_by('name')), ['100%_Burst', 'Dragonic Overlord', 'Wyvern Strike, Tejas'])
+        self.assertEqual(self.names(CardFilter().rarity('RRR').order_by('grade')), ['Blaster Blade', 'Dragonic Overlord'])
+        self.assertEqual(self.names(CardFilter().clan('Royal Paladin').rarity('R', 'SP')), ['Wingal'])
+        self.assertEqual(self.names(CardFilter().nation('Dragon Empire').critical(2)), ['100%_Burst'])
+        self.assertEqual(self.names(CardFilter().imaginary_gift('Force').grade(2)), ['Blaster Blade'])
+
+    def test_name_is_matched_literally(self):
+        self.assertEqual(self.names(CardFilter().name_contains('%_')), ['100%_Burst'])
+        self.assertEqual(self.names(CardFilter().name_contains('WING')), ['Wingal'])
+
+    def test_order_by_nation(self):
+        self.assertEqual(self.names(CardFilter().grade(1, 3).order_by('nation', True))[:2], ['Sentinel Avior of Proposition', 'Wingal'])
+        with self.assertRaises(ValueError):
+            CardFilter().order_by('rarity')
+
+    def test_copy_is_independent(self):
+        card_filter = CardFilter().clan('Kagero').order_by('power')
+        copy = card_filter.copy().grade(0).order_by('name')
+        self.assertEqual((card_filter.grades, len(card_filter.ordering)), ((), 1))
+        self.assertEqual(self.names(copy), ['Wyvern Strike, Tejas'])
+
+    def test_predicates_use_indexes(self):
+        criteria, _ = CardFilter().clan('Kagero').grade(3).power(minimum=12000).compile()
+        statement = select(Card.name).where(*criteria).compile(self.db_engine, compile_kwargs={'literal_binds': True})
+        with self.db_engine.connect() as connection:
+            plan = ' '.join(row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}'))
+        self.assertIn('USING INDEX', plan)
+        self.assertNotIn('SCAN Cards', plan)
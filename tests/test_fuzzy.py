@@ -0,0 +1,74 @@
+"""
+    Tests of fuzzy matching of card names: normalization, lookups through trigram index compared with checking every name, duplicate clusters and updates from change events.
+"""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.fuzzy import TrigramIndex, CardNameIndex, normalize_name, similarity, best_match, SIMILARITY
+
+NAMES = ['Sentinel Avior of Proposition', 'Sentinel Avior of  Proposition', 'Preside Chief. Jomjael', 'Preside Chief Jomjael',
+         'Blaster Blade', 'Blaster Dark', 'Dragonic Overlord', 'Dragonic Overlord the End', "Ahsha’s Sprout", 'Ahshas Sprout', 'Wingal']
+
+class FuzzyTest(unittest.TestCase):
+    def test_normalize_name(self):
+        self.assertEqual(normalize_name('  Preside Chief. Jomjael'), 'preside chief jomjael')
+        self.assertEqual(normalize_name('Ahsha’s Sprout'), normalize_name('ahshas sprout'))
+        self.assertEqual(normalize_name('Éclair—Knight'), 'eclair knight')
+
+    def test_similarity(self):
+        self.assertEqual(similarity('Blaster Blade', 'blaster  blade'), 1.0)
+        self.assertEqual(similarity('Wingal', 'Dragonic Overlord'), 0.0)
+        self.assertEqual(best_match('Blaster Blad', NAMES)[0], 'Blaster Blade')
+        self.assertIsNone(best_match('Wingal Brave', ['Dragonic Overlord']))
+
+    def test_similar_equals_checking_every_name(self):
+        generator = random.Random(0)
+        names = [''.join(generator.choice('abcde ') for _ in range(generator.randint(3, 12))) for _ in range(300)]
+        index = TrigramIndex(names)
+        for name in names[:50]:
+            expected = sorted(((other, similarity(name, other)) for other in set(names) if other != name and similarity(name, other) >= SIMILARITY),
+                              key=lambda match: (-match[1], match[0]))
+            self.assertEqual(index.similar(name, limit=len(names)), expected)
+
+    def test_remove(self):
+        index = TrigramIndex(NAMES)
+        index.remove('Blaster Dark')
+        index.remove('Blaster Dark')
+        self.assertEqual([name for name, _ in index.similar('Blaster Dark')], [])
+        self.assertNotIn('ark ', index.postings)
+
+    def test_duplicate_clusters(self):
+        clusters = TrigramIndex(NAMES).duplicate_clusters()
+        self.assertEqual([cluster.names for cluster in clusters], [['Ahshas Sprout', "Ahsha’s Sprout"], ['Preside Chief Jomjael', 'Preside Chief. Jomjael'],
+                                                                   ['Sentinel Avior of  Proposition', 'Sentinel Avior of Proposition']])
+        self.assertEqual({cluster.similarity for cluster in clusters}, {1.0})
+        self.assertEqual(TrigramIndex(['Wingal']).duplicate_clusters(), [])
+
+class CardNameIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'fuzzy.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        self.dao.add_card('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR')
+        self.index = CardNameIndex(self.dao, self.dao.events)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_index_follows_collection(self):
+        self.dao.add_card('Blaster Dark', 2, 10000, 1, 5000, 'Shadow Paladin', 'RRR')
+        self.assertEqual([name for name, _ in self.index.similar('Blaster Blad')], ['Blaster Blade', 'Blaster Dark'])
+        stack = self.dao.get_card_stacks('Blaster Blade')[0]
+        self.dao.update_card(stack.id, 'Blaster Blade Liberator', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR')
+        self.assertEqual(sorted(self.index.ids), ['Blaster Blade Liberator', 'Blaster Dark'])
+        self.dao.delete_card(self.dao.get_card_stacks('Blaster Dark')[0].id)
+        self.assertEqual(list(self.index.ids), ['Blaster Blade Liberator'])
@@ -0,0 +1,79 @@
+"""
+    Tests of content-addressed image store: deduplication of blobs, rolling over to new packs, compaction and migration of loose images of older versions.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.imagestore import ImageStore, DEFAULT_IMAGE
+
+class ImageStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = ImageStore(os.path.join(self.directory, 'store'), pack_size_limit=16)
+
+    def tearDown(self):
+        self.store.close()
+        shutil.rmtree(self.directory)
+
+    def packs(self):
+        return sorted(name for name in os.listdir(self.store.directory) if name.endswith('.pack'))
+
+    def test_same_content_is_stored_once(self):
+        self.assertEqual(self.store.put('Wingal', b'image'), self.store.put('Wingal Brave', b'image'))
+        self.assertEqual(self.store.index.execute('SELECT COUNT(*) FROM blobs').fetchone()[0], 1)
+        self.assertEqual((self.store.get('Wingal'), self.store.get('Wingal Brave')), (b'image', b'image'))
+        self.assertIsNone(self.store.get('Blaster Blade'))
+
+    def test_replaced_image(self):
+        self.store.put('Wingal', b'old image')
+        self.store.put('Wingal', b'new image')
+        self.assertEqual(self.store.get('Wingal'), b'new image')
+
+    def test_packs_roll_over(self):
+        for number in range(4):
+            self.store.put(f'Card {number}', bytes([number]) * 10)
+        # Blob is appended to the last pack until it reaches the limit
+        self.assertEqual(self.packs(), ['pack-00000.pack', 'pack-00001.pack'])
+        self.assertEqual([self.store.get(f'Card {number}') for number in range(4)], [bytes([number]) * 10 for number in range(4)])
+
+    def test_missing_and_remove(self):
+        self.store.put('Wingal', b'image')
+        self.assertEqual(self.store.missing(['Wingal', 'Blaster Blade']), ['Blaster Blade'])
+        self.assertTrue(self.store.remove('Wingal'))
+        self.assertFalse(self.store.remove('Wingal'))
+        self.assertFalse(self.store.contains('Wingal'))
+
+    def test_compact_keeps_referenced_blobs(self):
+        for number in range(4):
+            self.store.put(f'Card {number}', bytes([number]) * 10)
+        image = self.store.get('Card 3')
+        self.store.remove('Card 0')
+        self.store.remove('Card 2')
+        self.assertEqual(self.store.compact(), (40, 20))
+        self.assertEqual((self.store.get('Card 1'), self.store.get('Card 3')), (bytes([1]) * 10, bytes([3]) * 10))
+        self.assertEqual(image, bytes([3]) * 10)
+        self.assertEqual(self.store.index.execute('SELECT COUNT(*) FROM blobs').fetchone()[0], 2)
+
+    def test_migrate_legacy_images(self):
+        legacy = os.path.join(self.directory, 'images')
+        os.makedirs(legacy)
+        for name, data in (('Wingal.jpg', b'wingal'), ('Blaster%22Blade%22.png', b'blade'), (DEFAULT_IMAGE, b'sleeve'), ('notes.txt', b'text')):
+            with open(os.path.join(legacy, name), 'wb') as file:
+                file.write(data)
+        self.assertEqual(self.store.migrate_legacy(legacy), 2)
+        self.assertEqual((self.store.get('Wingal'), self.store.get('Blaster"Blade"')), (b'wingal', b'blade'))
+        self.assertFalse(self.store.contains('vanguardsleevelogo'))
+        # Loose files are kept and migration runs only into empty store
+        self.assertTrue(os.path.exists(os.path.join(legacy, 'Wingal.jpg')))
+        self.assertEqual(self.store.migrate_legacy(legacy), 0)
+        self.assertEqual(self.store.migrate_legacy(os.path.join(self.directory, 'missing')), 0)
+
+    def test_migrate_directory_removes_files(self):
+        loose = os.path.join(self.directory, 'loose')
+        os.makedirs(loose)
+        with open(os.path.join(loose, 'Wingal.webp'), 'wb') as file:
+            file.write(b'wingal')
+        self.assertEqual(self.store.migrate_directory(loose, remove=True), 1)
+        self.assertEqual(os.listdir(loose), [])
+        self.assertEqual(self.store.get('Wingal'), b'wingal')
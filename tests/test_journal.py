@@ -0,0 +1,106 @@
+"""
+    Tests of synchronization of two copies of the collection through change journal. Every way of changing cards and copies has to be journaled,
+    otherwise later changes conflict on the peer.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema, Card
+from modules.journal import export_changes, apply_changes
+
+WINGAL = {'name': 'Wingal', 'grade': 1, 'power': 8000, 'critical': 1, 'shield': 5000, 'clan_name': 'Royal Paladin', 'card_rarity': 'C'}
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.engines, self.daos = [], []
+        for name in ('a.db', 'b.db'):
+            db_engine = get_engine(os.path.join(self.directory, name))
+            create_schema(db_engine)
+            dao = DAO(db_engine)
+            Loader(dao).load_basic_data()
+            self.engines.append(db_engine)
+            self.daos.append(dao)
+        self.a, self.b = self.daos
+
+    def tearDown(self):
+        for dao, db_engine in zip(self.daos, self.engines):
+            dao.session.close()
+            db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def sync(self, source: DAO, target: DAO):
+        path = os.path.join(self.directory, 'changes.jsonl')
+        export_changes(source, path, peer=target.get_replica_id())
+        return apply_changes(target, path)
+
+    def stacks(self, dao: DAO, name: str = 'Wingal'):
+        return [(stack.rarity, stack.quantity) for stack in dao.get_card_stacks(name)]
+
+    def test_synced_cards_are_journaled(self):
+        self.assertIsNotNone(self.a.sync_cards([WINGAL, WINGAL, {**WINGAL, 'card_rarity': 'R', 'number': 'V-BT01-010EN'}]))
+        summary = self.sync(self.a, self.b)
+        self.assertEqual(summary.conflicts, [])
+        self.assertEqual(self.stacks(self.b), [('C', 2), ('R', 1)])
+        self.assertEqual([printing.number for printing in self.b.get_card_printings('Wingal')], ['V-BT01-010EN'])
+        # Deleting a copy which came by sync does not conflict on the peer
+        self.assertTrue(self.a.delete_card(self.a.get_card_stacks('Wingal')[1].id))
+        summary = self.sync(self.a, self.b)
+        self.assertEqual((summary.applied, summary.conflicts), (1, []))
+        self.assertEqual(self.stacks(self.b), [('C', 2)])
+
+    def test_sync_changes_and_deletes(self):
+        self.a.sync_cards([WINGAL, WINGAL])
+        self.sync(self.a, self.b)
+        self.a.sync_cards([{**WINGAL, 'power': 9000}])
+        self.assertEqual(self.sync(self.a, self.b).conflicts, [])
+        self.assertEqual((self.b.get_card('Wingal').power, self.stacks(self.b)), (9000, [('C', 1)]))
+        self.a.sync_cards([])
+        self.assertEqual(self.sync(self.a, self.b).conflicts, [])
+        self.assertIsNone(self.b.get_card('Wingal'))
+
+    def test_imported_rows_are_journaled(self):
+        self.assertTrue(self.a.insert_rows(Card, [{key: value for key, value in WINGAL.items() if key != 'card_rarity'}]))
+        self.assertTrue(self.a.add_stacks([{'card_name': 'Wingal', 'rarity': 'C', 'quantity': 3}]))
+        self.assertTrue(self.a.add_stacks([{'card_name': 'Wingal', 'rarity': 'C', 'quantity': 2}], replace=True))
+        self.assertTrue(self.a.add_printings([{'number': 'V-BT01-010EN', 'card_name': 'Wingal', 'rarity': 'C'}]))
+        self.assertEqual(self.sync(self.a, self.b).conflicts, [])
+        self.assertEqual(self.stacks(self.b), [('C', 2)])
+        self.assertEqual([(printing.number, printing.owned) for printing in self.b.get_card_printings('Wingal')], [('V-BT01-010EN', 2)])
+        self.assertTrue(self.a.delete_card(self.a.get_card_stacks('Wingal')[0].id))
+        self.assertEqual(self.sync(self.a, self.b).conflicts, [])
+        self.assertEqual(self.stacks(self.b), [('C', 1)])
+
+    def test_clans_are_journaled(self):
+        self.assertTrue(self.a.add_clan('Touken Ranbu', 'Force', 'Zoo'))
+        self.assertTrue(self.a.add_card(**{**WINGAL, 'clan_name': 'Touken Ranbu'}))
+        self.assertEqual(self.sync(self.a, self.b).conflicts, [])
+        self.assertIn(('Touken Ranbu', 'Force', 'Zoo'), [tuple(clan) for clan in self.b.get_all_clans()])
+        self.assertEqual(self.b.get_card('Wingal').clan_name, 'Touken Ranbu')
+
+    def test_seeding_same_data_journals_nothing(self):
+        last_seq = self.a.get_last_seq()
+        self.assertTrue(Loader(self.a).load_basic_data(force=True))
+        self.assertEqual(self.a.get_last_seq(), last_seq)
+
+    def test_conflict_is_received_again(self):
+        self.a.add_card(**WINGAL)
+        self.sync(self.a, self.b)
+        self.a.update_card(self.a.get_card_stacks('Wingal')[0].id, **{**WINGAL, 'power': 9000})
+        self.a.add_card(**{**WINGAL, 'name': 'Blaster Blade', 'grade': 2, 'power': 10000})
+        self.b.update_card(self.b.get_card_stacks('Wingal')[0].id, **{**WINGAL, 'power': 7000})
+        path = os.path.join(self.directory, 'changes.jsonl')
+        export_changes(self.a, path, peer=self.b.get_replica_id())
+        summary = apply_changes(self.b, path)
+        self.assertEqual((summary.applied, len(summary.conflicts)), (1, 1))
+        self.assertEqual(self.b.get_card_count('Blaster Blade'), 1)
+        # Conflicting entry stays unreceived, so the same file applies it once the card is changed back
+        self.b.update_card(self.b.get_card_stacks('Wingal')[0].id, **WINGAL)
+        summary = apply_changes(self.b, path)
+        self.assertEqual((summary.applied, summary.skipped, summary.conflicts), (1, 1, []))
+        self.assertEqual(self.b.get_card('Wingal').power, 9000)
+        self.assertEqual(self.b.get_card_count('Blaster Blade'), 1)
+        self.assertEqual(apply_changes(self.b, path).applied, 0)
@@ -0,0 +1,190 @@
+"""
+    Tests of streaming import of cards: reading rows of csv files, their validation and report of rejected rows,
+    and synchronization of the collection with a sheet, which applies only the difference.
+"""
+import csv
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from openpyxl import Workbook
+from modules.DAO import DAO
+from modules.loader import read_csv_rows, normalize_row, normalize_rows, chunked, card_number, format_diff, RejectedRows, Loader, SHEET_NAME, REFERENCE_DATA
+from modules.orm import get_engine, create_schema, Nation
+
+HEADER = ['Nazwa', 'Klan', 'Grade', 'Power', 'Defence', 'Rarity', 'Numer']
+
+class ReadingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, rows, delimiter: str = ';'):
+        path = os.path.join(self.directory, 'cards.csv')
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter=delimiter)
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def test_read_csv_rows(self):
+        for delimiter in (';', ','):
+            path = self.write_csv([['Wingal', 'Royal Paladin', '1', '8000', '5000', 'C', ''], [''] * 7,
+                                   ['Blaster Blade', 'Royal Paladin', '2', '10000', '5000', 'RRR', 'V-BT01-001EN']], delimiter)
+            rows = list(read_csv_rows(path))
+            # Empty lines are skipped, but still counted
+            self.assertEqual([number for number, _ in rows], [2, 4])
+            self.assertEqual(rows[1][1]['Numer'], 'V-BT01-001EN')
+
+    def test_normalize_row(self):
+        card = normalize_row({'Nazwa': ' Wingal ', 'Klan': 'Royal Paladin', 'Grade': '1', 'Power': 8000.0, 'Defence': 'Sentinel', 'Rarity': 'C',
+                              'Numer': 'images/v-bt01-010en.png'})
+        self.assertEqual(card, {'name': 'Wingal', 'grade': 1, 'power': 8000, 'critical': 1, 'shield': 'Sentinel', 'clan_name': 'Royal Paladin',
+                                'card_rarity': 'C', 'number': 'V-BT01-010EN'})
+        self.assertIsNone(normalize_row({'Nazwa': 'Wingal', 'Grade': 1, 'Power': 8000, 'Defence': ' '})['shield'])
+
+    def test_invalid_rows(self):
+        for row, reason in (({'Grade': 1, 'Power': 8000}, 'missing Nazwa'),
+                            ({'Nazwa': 'Wingal<script>', 'Grade': 1, 'Power': 8000}, 'invalid characters in Nazwa'),
+                            ({'Nazwa': 'Wingal', 'Grade': 1}, 'missing Grade or Power'),
+                            ({'Nazwa': 'Wingal', 'Grade': 'one', 'Power': 8000}, 'Grade and Power must be numbers'),
+                            ({'Nazwa': 'Wingal', 'Grade': 1, 'Power': 8000, 'Numer': 'BT01'}, 'invalid Numer')):
+            with self.assertRaisesRegex(ValueError, reason):
+                normalize_row(row)
+
+    def test_rejected_rows_are_reported(self):
+        report = os.path.join(self.directory, 'rejected.csv')
+        rejected = RejectedRows(report)
+        rows = [(2, {'Nazwa': 'Wingal', 'Grade': 1, 'Power': 8000}), (3, {'Nazwa': 'Wingal', 'Grade': 1}), (4, {'Nazwa': '', 'Grade': 1, 'Power': 1})]
+        self.assertEqual([card['name'] for card in normalize_rows(rows, rejected)], ['Wingal'])
+        rejected.close()
+        self.assertEqual(rejected.count, 2)
+        with open(report, encoding='utf-8', newline='') as file:
+            lines = list(csv.reader(file, delimiter=';'))
+        self.assertEqual(lines[0], ['Row', 'Reason'] + HEADER)
+        self.assertEqual([line[:3] for line in lines[1:]], [['3', 'missing Grade or Power', 'Wingal'], ['4', 'missing Nazwa', '']])
+
+    def test_chunked(self):
+        self.assertEqual(list(chunked(iter(range(5)), 2)), [[0, 1], [2, 3], [4]])
+        self.assertEqual(list(chunked([], 2)), [])
+
+    def test_card_number(self):
+        self.assertEqual(card_number('D-PR-0012'), 'D-PR-0012')
+        self.assertIsNone(card_number('XV-BT01-001EN'))
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'sync.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        self.loader = Loader(self.dao)
+        self.loader.load_basic_data()
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def write_xlsx(self, rows):
+        path = os.path.join(self.directory, 'cards.xlsx')
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.title = SHEET_NAME
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+        return path
+
+    def stacks(self, name: str):
+        return [(stack.rarity, stack.quantity) for stack in self.dao.get_card_stacks(name)]
+
+    def test_dry_run_changes_nothing(self):
+        path = self.write_xlsx([['Wingal', 'Royal Paladin', 1, 8000, 5000, 'C', None]] * 2)
+        diff = self.loader.sync_cards_from_xlsx(path, dry_run=True)
+        self.assertEqual((diff['cards_added'], diff['instances_added']), ([('Wingal', 1, 8000, 1, 5000, 'Royal Paladin')], [('Wingal', 'C', 2)]))
+        self.assertIsNone(self.dao.get_card('Wingal'))
+        self.assertEqual(format_diff(diff).splitlines(), ['Cards: +1 ~0 -0, instances: +2 -0',
+                                                          '+ card Wingal (grade 1, power 8000, shield 5000, Royal Paladin)', '+ 2x Wingal [C]'])
+
+    def test_sync_is_idempotent(self):
+        rows = [['Wingal', 'Royal Paladin', 1, 8000, 5000, 'C', None], ['Wingal', 'Royal Paladin', 1, 8000, 5000, 'R', None],
+                ['Blaster Blade', 'Royal Paladin', 2, 10000, 5000, 'RRR', 'V-BT01-001EN'], ['Broken', 'Royal Paladin', None, 8000, 5000, 'C', None]]
+        rejected = os.path.join(self.directory, 'rejected.csv')
+        self.assertEqual(len(self.loader.sync_cards_from_xlsx(self.write_xlsx(rows), rejected_path=rejected)['cards_added']), 2)
+        self.assertTrue(os.path.exists(rejected))
+        last_seq = self.dao.get_last_seq()
+        diff = self.loader.sync_cards_from_xlsx(self.write_xlsx(rows))
+        self.assertFalse(any(diff.values()))
+        self.assertEqual(self.dao.get_last_seq(), last_seq)
+        self.assertEqual(self.stacks('Wingal'), [('C', 1), ('R', 1)])
+
+    def test_sync_updates_and_deletes(self):
+        self.loader.sync_cards_from_xlsx(self.write_xlsx([['Wingal', 'Royal Paladin', 1, 8000, 5000, 'C', None]] * 2
+                                                         + [['Blaster Blade', 'Royal Paladin', 2, 10000, 5000, 'RRR', None]]))
+        path = self.write_xlsx([['Wingal', 'Royal Paladin', 1, 9000, 5000, 'C', None]])
+        # Without deleting, missing cards and copies are kept
+        diff = self.loader.sync_cards_from_xlsx(path, delete_missing=False)
+        self.assertEqual((diff['cards_updated'], diff['cards_deleted'], diff['instances_deleted']), ([('Wingal', 1, 9000, 1, 5000, 'Royal Paladin')], [], []))
+        self.assertEqual(self.stacks('Wingal'), [('C', 2)])
+        diff = self.loader.sync_cards_from_xlsx(path)
+        self.assertEqual((diff['cards_deleted'], sorted(diff['instances_deleted'])), (['Blaster Blade'], [('Blaster Blade', 'RRR', 1), ('Wingal', 'C', 1)]))
+        self.assertIsNone(self.dao.get_card('Blaster Blade'))
+        self.assertEqual((self.dao.get_card('Wingal').power, self.stacks('Wingal')), (9000, [('C', 1)]))
+
+class SeedingTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'seed.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        self.loader = Loader(self.dao)
+        with open(REFERENCE_DATA, encoding='utf-8') as file:
+            self.data = json.load(file)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def write_data(self, data):
+        path = os.path.join(self.directory, 'reference.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        return path
+
+    def clans(self):
+        return {name: (gift, nation) for name, gift, nation in self.dao.get_all_clans()}
+
+    def test_seeding(self):
+        self.assertTrue(self.loader.load_basic_data())
+        self.assertEqual(len(self.clans()), len(self.data['clans']))
+        self.assertEqual(self.clans()['Royal Paladin'], ('Force', 'United Sanctuary'))
+        self.assertEqual(self.dao.get_info('reference_data_version'), str(self.data['version']))
+
+    def test_same_version_is_seeded_once(self):
+        self.loader.load_basic_data()
+        changed = {**self.data, 'clans': [{**clan, 'imaginary_gift': 'Accel'} if clan['name'] == 'Royal Paladin' else clan for clan in self.data['clans']]}
+        path = self.write_data(changed)
+        self.assertTrue(self.loader.load_basic_data(path))
+        self.assertEqual(self.clans()['Royal Paladin'], ('Force', 'United Sanctuary'))
+        self.assertTrue(self.loader.load_basic_data(path, force=True))
+        self.assertEqual(self.clans()['Royal Paladin'], ('Accel', 'United Sanctuary'))
+        # New version is applied without forcing, clans missing in data are kept
+        self.assertTrue(self.loader.load_basic_data(self.write_data({**self.data, 'version': 2, 'clans': self.data['clans'][1:]})))
+        self.assertEqual(self.clans()['Royal Paladin'], ('Accel', 'United Sanctuary'))
+        self.assertEqual(self.clans()[self.data['clans'][1]['name']], (self.data['clans'][1]['imaginary_gift'], self.data['clans'][1]['nation']))
+        self.assertEqual(self.dao.get_info('reference_data_version'), '2')
+
+    def test_invalid_data_changes_nothing(self):
+        broken = {**self.data, 'clans': self.data['clans'] + [{'name': 'Touken Ranbu', 'imaginary_gift': 'Force'}]}
+        with self.assertRaises(KeyError):
+            self.loader.load_basic_data(self.write_data(broken))
+        self.dao.session.commit()
+        self.assertEqual(self.dao.session.query(Nation).count(), 0)
+        self.assertEqual(self.clans(), {})
+        self.assertIsNone(self.dao.get_info('reference_data_version'))
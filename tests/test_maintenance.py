@@ -0,0 +1,48 @@
+"""
+    Tests of database maintenance. Tasks which the database refuses to run must not be retried forever.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from modules.DAO import DAO
+from modules.orm import get_engine, create_schema
+from modules.maintenance import Maintenance
+
+class MaintenanceTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'maintenance.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        self.maintenance = Maintenance(self.dao)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_full_run(self):
+        results = dict(self.maintenance.run(full=True))
+        self.assertEqual(results, {'analyze': 'done', 'vacuum': 'done', 'check': 'ok'})
+        self.assertIsNotNone(self.dao.get_info('maintenance_analyzed_at'))
+        self.assertNotIn('check', self.maintenance.due_tasks())
+
+    def test_failed_vacuum_stops(self):
+        with mock.patch.object(self.dao, 'incremental_vacuum', return_value=False) as vacuum:
+            results = dict(self.maintenance.run(full=True))
+        vacuum.assert_called_once_with(0)
+        self.assertEqual(results, {'analyze': 'done', 'vacuum': 'failed', 'check': 'ok'})
+
+    def test_failed_step_is_dropped_from_plan(self):
+        self.maintenance.plan, self.maintenance.planned_at = ['vacuum', 'check'], 0.0
+        with mock.patch.object(self.dao, 'incremental_vacuum', return_value=False):
+            self.assertEqual(self.maintenance.step(), ('vacuum', None))
+        self.assertEqual(self.maintenance.plan, ['check'])
+
+    def test_failed_analyze(self):
+        with mock.patch.object(self.dao, 'analyze', return_value=False):
+            results = dict(self.maintenance.run(full=True))
+        self.assertEqual(results['analyze'], 'failed')
+        self.assertIsNone(self.dao.get_info('maintenance_analyzed_at'))
@@ -0,0 +1,47 @@
+"""
+    Tests of read models. Read paths of DAO return immutable records built from result rows, so no ORM object is held by the session after reading.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.filters import CardFilter
+from modules.loader import Loader
+from modules.models import CardRecord, StackRecord, ClanRecord
+from modules.orm import get_engine, create_schema
+
+class ReadModelTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'models.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        for number in range(20):
+            self.dao.add_card(f'Wingal {number}', 1, 8000, 1, 5000, 'Royal Paladin', 'C')
+        self.dao.session.expunge_all()
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def test_reads_return_records(self):
+        cards = self.dao.get_all_cards()
+        self.assertEqual(len(cards), 20)
+        self.assertIsInstance(cards[0], CardRecord)
+        self.assertEqual((cards[0].nation_name, cards[0].imaginary_gift_name), ('United Sanctuary', 'Force'))
+        self.assertIsInstance(self.dao.get_card_stacks('Wingal 0')[0], StackRecord)
+        self.assertIsInstance(self.dao.get_all_clans()[0], ClanRecord)
+        self.dao.find_cards(CardFilter().grade(1))
+        self.dao.get_cards_page('Royal Paladin', '1', 'Wingal', 5, 5)
+        self.assertEqual(len(self.dao.session.identity_map), 0)
+
+    def test_records_outlive_session(self):
+        card = self.dao.get_card('Wingal 3')
+        self.dao.session.close()
+        self.assertEqual((card.name, card.power), ('Wingal 3', 8000))
+        with self.assertRaises(AttributeError):
+            card.power = 9000
+        self.assertFalse(hasattr(card, '__dict__'))
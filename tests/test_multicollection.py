@@ -0,0 +1,82 @@
+"""
+    Tests of combining collection with other collection databases attached read-only: totals, combined counts and missing cards computed by SQL.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.multicollection import MultiCollectionDAO, collection_alias, MAIN
+
+COLLECTIONS = {
+    'main.db': [('Wingal', 'C'), ('Wingal', 'C'), ('Blaster Blade', 'RRR')],
+    'store-2.db': [('Wingal', 'R'), ('Dragonic Overlord', 'RRR')],
+    '2nd.db': [('Dragonic Overlord', 'SP'), ('Dragonic Overlord', 'RRR'), ('Wyvern Strike, Tejas', 'C')],
+}
+
+class MultiCollectionTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.paths = {}
+        for name, copies in COLLECTIONS.items():
+            self.paths[name] = os.path.join(self.directory, name)
+            db_engine = get_engine(self.paths[name])
+            create_schema(db_engine)
+            dao = DAO(db_engine)
+            Loader(dao).load_basic_data()
+            for card_name, rarity in copies:
+                dao.add_card(card_name, 1, 8000, 1, 5000, 'Royal Paladin', rarity)
+            dao.session.close()
+            db_engine.dispose()
+        self.dao = MultiCollectionDAO(self.paths['main.db'], [self.paths['store-2.db'], self.paths['2nd.db']])
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.dao.session.get_bind().dispose()
+        shutil.rmtree(self.directory)
+
+    def checksum(self, name: str):
+        with open(self.paths[name], 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def test_collection_alias(self):
+        self.assertEqual(list(self.dao.collections), [MAIN, 'store_2', 'c_2nd'])
+        self.assertEqual(collection_alias('other/store-2.db', self.dao.collections), 'store_2_2')
+        self.assertEqual(collection_alias('main.db'), 'main_2')
+
+    def test_totals_and_combined_counts(self):
+        self.assertEqual(self.dao.get_collection_totals(), [(MAIN, 2, 3), ('store_2', 2, 2), ('c_2nd', 2, 3)])
+        self.assertEqual(self.dao.get_combined_counts(), [('Blaster Blade', 1, 1, 0, 0), ('Dragonic Overlord', 3, 0, 1, 2),
+                                                          ('Wingal', 3, 2, 1, 0), ('Wyvern Strike, Tejas', 1, 0, 0, 1)])
+        self.assertEqual(self.dao.get_combined_counts(limit=1, offset=1), [('Dragonic Overlord', 3, 0, 1, 2)])
+
+    def test_missing_cards(self):
+        self.assertEqual(self.dao.get_missing_cards(), [('Dragonic Overlord', 3), ('Wyvern Strike, Tejas', 1)])
+        self.assertEqual(self.dao.get_missing_cards('store_2', [MAIN]), [('Blaster Blade', 1)])
+        with self.assertRaises(KeyError):
+            self.dao.get_missing_cards('other')
+
+    def test_other_collections_are_read_only(self):
+        before = self.checksum('store-2.db')
+        self.assertTrue(self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'R'))
+        with self.assertRaises(OperationalError):
+            self.dao.session.execute(text('DELETE FROM store_2.CardStacks'))
+        self.dao.session.rollback()
+        self.assertEqual(self.dao.get_collection_totals()[0], (MAIN, 2, 4))
+        self.assertEqual(self.checksum('store-2.db'), before)
+
+    def test_invalid_collections(self):
+        with self.assertRaises(FileNotFoundError):
+            MultiCollectionDAO(self.paths['main.db'], [os.path.join(self.directory, 'missing.db')])
+        old = os.path.join(self.directory, 'old.db')
+        db_engine = get_engine(old)
+        with db_engine.begin() as connection:
+            connection.execute(text('CREATE TABLE CardInstances (id INTEGER PRIMARY KEY, card_name VARCHAR(255), rarity VARCHAR(3))'))
+        db_engine.dispose()
+        with self.assertRaises(ValueError):
+            MultiCollectionDAO(self.paths['main.db'], [old])
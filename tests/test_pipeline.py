@@ -0,0 +1,62 @@
+"""
+    Tests of parallel import pipeline. Chunks validated in any order have to be written in order of sources and rows, as when sources are imported one by one.
+"""
+import csv
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.pipeline import run_pipeline, WriteOrder
+
+HEADER = ['Nazwa', 'Klan', 'Grade', 'Power', 'Defence', 'Rarity', 'Numer']
+
+class WriteOrderTest(unittest.TestCase):
+    def test_chunks_are_released_in_order(self):
+        order = WriteOrder(2)
+        order.add(1, 0, ['b0'])
+        order.add(0, 1, ['a1'])
+        self.assertEqual(list(order.released()), [])
+        order.add(0, 0, ['a0'])
+        self.assertEqual(list(order.released()), [(0, ['a0']), (0, ['a1'])])
+        # Chunks of the next source wait until the previous one is read completely
+        order.finish(0, 2)
+        self.assertEqual(list(order.released()), [(1, ['b0'])])
+
+class PipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'pipeline.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def write_csv(self, name: str, rows):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.writer(file, delimiter=';')
+            writer.writerow(HEADER)
+            writer.writerows(rows)
+        return path
+
+    def test_pipeline(self):
+        first = self.write_csv('first.csv', [['Wingal', 'Royal Paladin', 1, 8000, 5000, 'C', '']] * 5
+                               + [['Broken', 'Royal Paladin', '', 8000, 5000, 'C', '']])
+        second = self.write_csv('second.csv', [['Wingal', 'Royal Paladin', 1, 9000, 5000, 'R', '']]
+                                + [[f'Card {number}', 'Kagero', 2, 10000, 5000, 'C', ''] for number in range(7)])
+        missing = os.path.join(self.directory, 'missing.csv')
+        report = run_pipeline(self.dao, [(first, None), (second, None), (missing, None)], workers=2, chunk_size=2, queue_size=2)
+        self.assertEqual(report.imported, 13)
+        self.assertEqual([(source, number) for source, number, _ in report.errors], [(first, 7), (missing, 0)])
+        self.assertIn('FileNotFoundError', report.errors[1][2])
+        # Card from both sources keeps values of the first one
+        self.assertEqual(self.dao.get_card('Wingal').power, 8000)
+        self.assertEqual([(stack.rarity, stack.quantity) for stack in self.dao.get_card_stacks('Wingal')], [('C', 5), ('R', 1)])
+        self.assertEqual(len(self.dao.get_all_cards()), 8)
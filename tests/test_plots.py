@@ -0,0 +1,72 @@
+"""
+    Tests of plot panel updated in place from change events. Tk frame and canvas are replaced with Agg canvas, so the panel is drawn without display.
+"""
+import os
+import shutil
+import tempfile
+import tkinter as tk
+import unittest
+from unittest import mock
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from modules.DAO import DAO
+from modules.events import PlotSelected
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.plots import PlotFrame, to_arrays
+
+class Canvas(FigureCanvasAgg):
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+
+    def get_tk_widget(self):
+        return mock.Mock()
+
+class PlotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'plots.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'C')
+        self.dao.add_card('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR')
+        with mock.patch.object(tk.Frame, '__init__', lambda self, *args, **kwargs: None), mock.patch('modules.plots.FigureCanvasTkAgg', Canvas):
+            self.frame = PlotFrame(None, 400, 300, self.dao, self.dao.events)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def bars(self):
+        sizes = [bar.get_height() if self.frame.current_plot == 'grades' else bar.get_width() for bar in self.frame.bars]
+        return dict(zip(self.frame.labels.tolist(), sizes))
+
+    def expected(self):
+        labels, counts = to_arrays(self.dao.get_cards_grades_count() if self.frame.current_plot == 'grades' else self.dao.get_cards_clan_count())
+        return dict(zip(labels.tolist(), counts.tolist()))
+
+    def test_to_arrays(self):
+        labels, counts = to_arrays([('Kagero', 2), ('Royal Paladin', 5)])
+        self.assertEqual((labels.tolist(), counts.tolist()), (['Kagero', 'Royal Paladin'], [2, 5]))
+        self.assertEqual(len(to_arrays([])[1]), 0)
+
+    def test_bars_follow_changes(self):
+        self.assertEqual(self.bars(), {1: 1, 2: 1})
+        bars = self.frame.bars
+        self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'R')
+        # Changed count only resizes existing bar
+        self.assertIs(self.frame.bars, bars)
+        self.assertEqual(self.bars(), {1: 2, 2: 1})
+        self.dao.add_card('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 'RRR')
+        self.dao.delete_card(self.dao.get_card_stacks('Blaster Blade')[0].id)
+        self.assertEqual(self.bars(), self.expected())
+        self.assertEqual(self.bars(), {1: 2, 3: 1})
+
+    def test_clan_distribution(self):
+        self.dao.events.publish(PlotSelected('clans'))
+        self.assertEqual(self.bars(), {'Royal Paladin': 2})
+        stack = self.dao.get_card_stacks('Blaster Blade')[0]
+        self.dao.update_card(stack.id, 'Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 'RRR')
+        self.assertEqual(self.bars(), self.expected())
+        self.assertEqual(self.bars(), {'Kagero': 1, 'Royal Paladin': 1})
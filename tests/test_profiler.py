@@ -0,0 +1,72 @@
+"""
+    Tests of GUI profiler: interactions measured by wrapped callbacks, time attributed exclusively to categories and written report. Callbacks are called directly, without window.
+"""
+import io
+import json
+import shutil
+import tempfile
+import time
+import unittest
+from modules.profiler import TkProfiler, callback_name, print_summary
+
+class Work():
+    def query(self, seconds: float):
+        time.sleep(seconds)
+        return 'rows'
+
+class ProfilerTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.profiler = TkProfiler(self.directory)
+        self.profiler.started = time.perf_counter()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_time_is_split_between_categories(self):
+        self.profiler.instrument(Work, 'dao')
+        image = self.profiler.measure(lambda: (Work().query(0.02), time.sleep(0.02)), 'image')
+
+        def click():
+            image()
+            Work().query(0.03)
+            time.sleep(0.01)
+
+        callback = self.profiler.wrap(click, 'click')
+        self.assertIs(self.profiler.wrap(callback), callback)
+        callback()
+        interaction = self.profiler.interactions[0]
+        breakdown = interaction['breakdown_ms']
+        self.assertEqual(interaction['name'], 'click')
+        # Query run by image work counts as dao, rest of it as image
+        self.assertGreaterEqual(breakdown['dao'], 50)
+        self.assertGreaterEqual(breakdown['image'], 20)
+        self.assertLess(breakdown['image'], breakdown['dao'])
+        self.assertGreaterEqual(breakdown['other'], 10)
+        self.assertAlmostEqual(sum(breakdown.values()), interaction['ms'], places=6)
+        # Measured functions called outside of interaction are not recorded
+        self.assertEqual(Work().query(0), 'rows')
+        self.assertEqual(len(self.profiler.interactions), 1)
+
+    def test_nested_callbacks_are_one_interaction(self):
+        inner = self.profiler.wrap(lambda: None, 'inner')
+        self.profiler.wrap(lambda: inner(), 'outer')()
+        self.assertEqual([interaction['name'] for interaction in self.profiler.interactions], ['outer'])
+
+    def test_report(self):
+        self.profiler.instrument(Work, 'dao')
+        for seconds in (0.001, 0.005):
+            self.profiler.wrap(lambda: Work().query(seconds), 'query')()
+        self.profiler.lags = [1.0, 2.0, 150.0]
+        path = self.profiler.stop()
+        # Patched methods are restored
+        self.assertNotIn('measured', callback_name(Work.query))
+        with open(path, encoding='utf-8') as file:
+            report = json.load(file)
+        self.assertEqual(report['event_loop']['stalls'], 1)
+        self.assertEqual([(callback['name'], callback['calls']) for callback in report['callbacks']], [('query', 2)])
+        self.assertGreaterEqual(report['slowest'][0]['ms'], 5)
+        output = io.StringIO()
+        print_summary(path, output)
+        self.assertIn('1 stalls', output.getvalue())
+        self.assertIn('query', output.getvalue())
@@ -0,0 +1,61 @@
+"""
+    Tests of headless report of a collection. Report is rendered from database opened read-only, so the database file is never changed.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import text
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.report import render_report, VIEWS
+
+class ReportTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'report.db')
+        db_engine = get_engine(self.db_path)
+        create_schema(db_engine)
+        dao = DAO(db_engine)
+        Loader(dao).load_basic_data()
+        for rarity in ('C', 'C', 'RR'):
+            dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', rarity)
+        dao.add_card('Dragonic Overlord', 3, 13000, 1, None, 'Kagero', 'RRR')
+        dao.session.close()
+        db_engine.dispose()
+        self.output = os.path.join(self.directory, 'report')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def checksum(self):
+        with open(self.db_path, 'rb') as file:
+            return hashlib.sha256(file.read()).hexdigest()
+
+    def test_report(self):
+        before = self.checksum()
+        written = render_report(self.db_path, self.output, formats=('png',))
+        self.assertEqual(sorted(os.path.basename(path) for path in written), sorted([f'{name}.png' for name in VIEWS] + ['data.json']))
+        with open(os.path.join(self.output, 'data.json'), encoding='utf-8') as file:
+            views = json.load(file)['views']
+        self.assertEqual(views['grade_distribution']['rows'], [[1, 3], [3, 1]])
+        self.assertEqual(views['clan_rarity_distribution']['rows'], [['Kagero', 'RRR', 1], ['Royal Paladin', 'C', 2], ['Royal Paladin', 'RR', 1]])
+        self.assertEqual(self.checksum(), before)
+
+    def test_missing_database(self):
+        with self.assertRaises(FileNotFoundError):
+            render_report(os.path.join(self.directory, 'missing.db'), self.output)
+        self.assertFalse(os.path.exists(os.path.join(self.directory, 'missing.db')))
+
+    def test_database_of_older_version(self):
+        db_engine = get_engine(self.db_path)
+        with db_engine.begin() as connection:
+            connection.execute(text('CREATE TABLE CardInstances (id INTEGER PRIMARY KEY, card_name VARCHAR(255), rarity VARCHAR(3))'))
+        db_engine.dispose()
+        before = self.checksum()
+        with self.assertRaises(ValueError):
+            render_report(self.db_path, self.output)
+        self.assertEqual(self.checksum(), before)
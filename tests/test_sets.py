@@ -0,0 +1,66 @@
+"""
+    Tests of set completion. Owned copies of printings are counted by triggers of the database, so completion follows every change of copies.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema
+from modules.sets import load_set_list, set_completion, normalize_printing
+
+SET_LIST = '''Numer;Nazwa;Rarity
+V-BT01-001EN;Blaster Blade;RRR
+V-BT01-010EN;Wingal;R
+V-BT01-011EN;Wingal;C
+V-BT02-001EN;Dragonic Overlord;RRR
+BT01;Broken;C
+V-BT02-002EN;<script>;C
+'''
+
+class SetsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'sets.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'C')
+        self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'C')
+        self.path = os.path.join(self.directory, 'sets.csv')
+        with open(self.path, 'w', encoding='utf-8') as file:
+            file.write(SET_LIST)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def completion(self):
+        return [entry.as_dict() for entry in set_completion(self.dao)]
+
+    def test_normalize_printing(self):
+        self.assertEqual(normalize_printing({'Numer': 'v-bt01-010en.png', 'Nazwa': ' Wingal '}), {'number': 'V-BT01-010EN', 'card_name': 'Wingal', 'rarity': ''})
+        with self.assertRaises(ValueError):
+            normalize_printing({'Nazwa': 'Wingal'})
+
+    def test_completion(self):
+        rejected = os.path.join(self.directory, 'rejected.csv')
+        self.assertEqual(load_set_list(self.dao, self.path, rejected_path=rejected, chunk_size=2), (4, 2))
+        self.assertEqual(self.completion(), [{'set_code': 'V-BT01', 'cards': 3, 'owned_cards': 1, 'copies': 2, 'percent': 33.3},
+                                             {'set_code': 'V-BT02', 'cards': 1, 'owned_cards': 0, 'copies': 0, 'percent': 0.0}])
+        self.assertEqual([printing.number for printing in self.dao.get_set_printings('V-BT01', missing=True)], ['V-BT01-001EN', 'V-BT01-010EN'])
+        # Loading the list again only updates the printings
+        self.assertEqual(load_set_list(self.dao, self.path), (4, 2))
+        self.assertEqual(self.completion()[0]['cards'], 3)
+
+    def test_owned_copies_follow_collection(self):
+        load_set_list(self.dao, self.path)
+        self.dao.add_card('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin', 'RRR')
+        stack = self.dao.get_card_stacks('Wingal')[0]
+        self.dao.update_card(stack.id, 'Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'R')
+        self.assertEqual(self.completion()[0], {'set_code': 'V-BT01', 'cards': 3, 'owned_cards': 3, 'copies': 3, 'percent': 100.0})
+        self.dao.delete_card(self.dao.get_card_stacks('Blaster Blade')[0].id)
+        self.assertEqual([(printing.number, printing.owned) for printing in self.dao.get_set_printings('V-BT01')],
+                         [('V-BT01-001EN', 0), ('V-BT01-010EN', 1), ('V-BT01-011EN', 1)])
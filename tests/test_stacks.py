@@ -0,0 +1,114 @@
+"""
+    Tests of copies stored as stacks of (card, rarity) with quantity: migration from one row per copy, and editing and deleting single copies of a stack
+    together with copies which have extra data.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from sqlalchemy import text
+from modules.DAO import DAO
+from modules.loader import Loader
+from modules.orm import get_engine, create_schema, migrate_card_instances
+
+class StacksTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_engine = get_engine(os.path.join(self.directory, 'stacks.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        Loader(self.dao).load_basic_data()
+        for rarity in ('C', 'C', 'C', 'RR'):
+            self.dao.add_card('Wingal', 1, 8000, 1, 5000, 'Royal Paladin', rarity)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def stacks(self, name: str = 'Wingal'):
+        return [(stack.rarity, stack.quantity) for stack in self.dao.get_card_stacks(name)]
+
+    def stack(self, rarity: str, name: str = 'Wingal'):
+        return next(stack for stack in self.dao.get_card_stacks(name) if stack.rarity == rarity)
+
+    def notes(self, rarity: str, name: str = 'Wingal'):
+        stack = self.stack(rarity, name)
+        return [copy.note for copy in self.dao.get_card_copies(stack.id)]
+
+    def test_migrate_card_instances(self):
+        with self.db_engine.begin() as connection:
+            connection.execute(text('CREATE TABLE CardInstances (id INTEGER PRIMARY KEY, card_name VARCHAR(255), rarity VARCHAR(3))'))
+            connection.execute(text("INSERT INTO CardInstances (card_name, rarity) VALUES ('Blaster Blade', 'RRR'), ('Wingal', 'R'), ('Blaster Blade', 'RRR'), "
+                                    "('Wingal', 'C'), ('Blaster Blade', 'SP')"))
+        self.dao.session.execute(text("INSERT INTO Cards VALUES ('Blaster Blade', 2, 10000, 1, 5000, 'Royal Paladin')"))
+        self.dao.session.commit()
+        self.assertTrue(migrate_card_instances(self.db_engine))
+        # Copies of existing stack are added to it, new stacks follow in order of their first copy
+        self.assertEqual(self.stacks(), [('C', 4), ('RR', 1), ('R', 1)])
+        self.assertEqual(self.stacks('Blaster Blade'), [('RRR', 2), ('SP', 1)])
+        self.assertEqual(self.dao.get_stack_count(), 5)
+        self.assertEqual(self.dao.get_card_count('Wingal'), 6)
+        self.assertFalse(migrate_card_instances(self.db_engine))
+
+    def test_copies_are_stacked(self):
+        self.assertEqual(self.stacks(), [('C', 3), ('RR', 1)])
+        self.assertEqual(self.dao.get_card_count('Wingal'), 4)
+
+    def test_delete_takes_plain_copy_first(self):
+        stack = self.stack('C')
+        self.dao.add_card_copy(stack.id, 'signed')
+        self.assertTrue(self.dao.delete_card(stack.id))
+        self.assertTrue(self.dao.delete_card(stack.id))
+        self.assertEqual(self.notes('C'), ['signed'])
+        self.assertTrue(self.dao.delete_card(stack.id))
+        self.assertEqual(self.stacks(), [('RR', 1)])
+        self.assertEqual(self.dao.session.execute(text('SELECT COUNT(*) FROM CardCopies')).scalar(), 0)
+
+    def test_emptied_card_is_deleted(self):
+        for stack in self.dao.get_card_stacks('Wingal'):
+            for _ in range(stack.quantity):
+                self.assertTrue(self.dao.delete_card(stack.id))
+        self.assertEqual(self.stacks(), [])
+        self.assertIsNone(self.dao.get_card('Wingal'))
+
+    def test_update_splits_stack(self):
+        stack = self.stack('C')
+        self.assertTrue(self.dao.update_card(stack.id, 'Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'R'))
+        self.assertEqual(self.stacks(), [('C', 2), ('RR', 1), ('R', 1)])
+
+    def test_update_moves_copy_with_extra_data(self):
+        stack = self.stack('RR')
+        self.dao.add_card_copy(stack.id, 'foil')
+        self.assertTrue(self.dao.update_card(stack.id, 'Wingal', 1, 8000, 1, 5000, 'Royal Paladin', 'C'))
+        self.assertEqual(self.stacks(), [('C', 4)])
+        self.assertEqual(self.notes('C'), ['foil'])
+
+    def test_update_of_one_copy_keeps_shared_card(self):
+        # Attributes of a card are changed only by editing its last copy, other copies keep the card as it is
+        stack = self.stack('C')
+        self.assertTrue(self.dao.update_card(stack.id, 'Wingal', 1, 9000, 1, 5000, 'Royal Paladin', 'C'))
+        self.assertEqual(self.dao.get_card('Wingal').power, 8000)
+        self.assertEqual(self.stacks(), [('C', 3), ('RR', 1)])
+
+    def test_update_renames_last_copy(self):
+        self.dao.add_card('Wingal Brave', 1, 8000, 1, 5000, 'Royal Paladin', 'R')
+        stack = self.stack('R', 'Wingal Brave')
+        self.assertTrue(self.dao.update_card(stack.id, 'Wingal Liberator', 1, 8000, 1, 5000, 'Royal Paladin', 'R'))
+        self.assertIsNone(self.dao.get_card('Wingal Brave'))
+        self.assertEqual(self.stacks('Wingal Liberator'), [('R', 1)])
+
+    def test_replaced_quantity_trims_copies(self):
+        stack = self.stack('C')
+        for note in ('first', 'second', 'third'):
+            self.dao.add_card_copy(stack.id, note)
+        self.assertTrue(self.dao.add_stacks([{'card_name': 'Wingal', 'rarity': 'C', 'quantity': 1}], replace=True))
+        self.assertEqual(self.stacks(), [('C', 1), ('RR', 1)])
+        self.assertEqual(self.notes('C'), ['first'])
+
+    def test_added_quantity_keeps_copies(self):
+        stack = self.stack('C')
+        self.dao.add_card_copy(stack.id, 'signed')
+        self.assertTrue(self.dao.add_stacks([{'card_name': 'Wingal', 'rarity': 'C', 'quantity': 1}]))
+        self.assertEqual(self.stacks(), [('C', 4), ('RR', 1)])
+        self.assertEqual(self.notes('C'), ['signed'])
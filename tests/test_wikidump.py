@@ -0,0 +1,74 @@
+"""
+    Tests of reading offline dump of the wiki. The fixture is a bz2-compressed MediaWiki export of a few pages: card pages with several images,
+    page with older revision, redirect to a card page, clan page, card page without card number and talk page, which is outside of main namespace.
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from modules.DAO import DAO
+from modules.orm import get_engine, create_schema
+from modules.scrapper import Scrapper
+from modules.wikidump import ingest_dump
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'wiki_dump.xml.bz2')
+
+class WikiDumpTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.mirror = os.path.join(self.directory, 'images')
+        os.makedirs(self.mirror)
+        self.db_engine = get_engine(os.path.join(self.directory, 'wiki.db'))
+        create_schema(self.db_engine)
+        self.dao = DAO(self.db_engine)
+        self.summary = ingest_dump(self.dao, FIXTURE, printings=True, image_mirror=self.mirror)
+
+    def tearDown(self):
+        self.dao.session.close()
+        self.db_engine.dispose()
+        shutil.rmtree(self.directory)
+
+    def numbers(self, name: str):
+        return [printing.number for printing in self.dao.get_card_printings(name)]
+
+    def test_summary(self):
+        # Talk page is skipped, clan page and page without card number are read but not saved
+        self.assertEqual((self.summary.pages, self.summary.card_pages, self.summary.redirects, self.summary.printings), (6, 3, 1, 5))
+
+    def test_printings_of_all_images(self):
+        self.assertEqual(self.numbers('Blaster Blade'), ['D-PR-0012', 'V-BT01-001EN', 'V-SD01-003EN'])
+        self.assertEqual(self.numbers('Sentinel Avior of Proposition'), ['D-BT03-045EN'])
+        self.assertEqual(self.dao.get_set_printings('V-BT09'), [])
+
+    def test_last_revision(self):
+        self.assertEqual(self.numbers('Wingal'), ['V-BT01-010EN'])
+        self.assertEqual(self.dao.get_wiki_page('Wingal (V Series)').image, 'V-BT01-010EN.png')
+
+    def test_page_without_card_number(self):
+        self.assertIsNone(self.dao.get_wiki_page('Blaster Blade'))
+        self.assertIsNone(self.dao.get_wiki_page('Royal Paladin'))
+
+    def test_redirect(self):
+        redirect = self.dao.get_wiki_page('Avior')
+        self.assertEqual((redirect.redirect, redirect.image, redirect.numbers), ('Sentinel Avior of Proposition', None, None))
+        page = Scrapper(mock.Mock(), self.dao).local_page('Avior')
+        self.assertEqual((page.title, page.image), ('Sentinel Avior of Proposition', 'D-BT03-045EN.png'))
+
+    def test_image_of_redirected_card_from_mirror(self):
+        with open(os.path.join(self.mirror, 'D-BT03-045EN.png'), 'wb') as file:
+            file.write(b'image')
+        store = mock.Mock()
+        with mock.patch('modules.scrapper.requests.get', side_effect=AssertionError('wiki must not be fetched')):
+            self.assertTrue(Scrapper(store, self.dao).extract_image('Avior'))
+        store.put.assert_called_once_with('Avior', b'image')
+        self.assertEqual(self.numbers('Avior'), ['D-BT03-045EN'])
+
+    def test_series_page_is_preferred(self):
+        self.assertEqual(Scrapper(mock.Mock(), self.dao).local_page('Blaster Blade').title, 'Blaster Blade (V Series)')
+
+    def test_reading_again_replaces_pages(self):
+        summary = ingest_dump(self.dao, FIXTURE, printings=True)
+        self.assertEqual(summary.card_pages, self.summary.card_pages)
+        self.assertEqual(len(self.dao.get_wiki_pages('avior')), 1)
+        self.assertEqual(self.numbers('Blaster Blade'), ['D-PR-0012', 'V-BT01-001EN', 'V-SD01-003EN'])